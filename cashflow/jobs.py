@@ -0,0 +1,14 @@
+"""Background job handlers for the cash-flow app (see core.jobs)."""
+from core.jobs import register
+
+
+@register('cashflow_sync', label='Cash flow sync')
+def cashflow_sync_job(job, ctx, full=False):
+    from cashflow.sync import sync_all, sync_summary
+
+    if job.created_by is None:
+        raise ValueError('The user who started this sync no longer exists.')
+    ctx.progress(0, 1, 'Syncing cash flow…', force=True)
+    result = sync_all(job.created_by, full=full)
+    success, message, detail = sync_summary(result)
+    return {**result, 'success': success, 'message': message, 'detail': detail}
@@ -0,0 +1,49 @@
+"""
+Management command: sync_weekly_revenue
+
+Brings the weekly sales revenue cash-flow entries up to date.  By default
+only the ISO weeks touched since the previous run are recomputed; --full
+recomputes every week from all history (audits, or after hard deletes).
+
+Usage:
+  python manage.py sync_weekly_revenue
+  python manage.py sync_weekly_revenue --full
+  python manage.py sync_weekly_revenue --user admin
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cashflow.sync import sync_weekly_sales_revenue
+
+
+class Command(BaseCommand):
+    help = 'Sync the weekly sales revenue cash-flow entries (incremental by default).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every week instead of the weeks changed since the last run.',
+        )
+        parser.add_argument(
+            '--user', default=None,
+            help='Username recorded on new entries (default: first superuser).',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('No user to record the entries under; pass --user.')
+
+        started = time.perf_counter()
+        count = sync_weekly_sales_revenue(user, full=options['full'])
+        elapsed = time.perf_counter() - started
+        mode = 'full' if options['full'] else 'incremental'
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} weekly entr{"y" if count == 1 else "ies"} written ({mode}, {elapsed:.2f}s).'
+        ))
@@ -110,24 +110,24 @@ class CashFlowTransaction(SoftDeleteModel):
     def __str__(self):
         return f"{self.transaction_number} ({self.get_flow_type_display()} - {self.get_category_display()})"
 
+    @staticmethod
+    def _number_seed():
+        from core.sequences import existing_max
+        return existing_max(CashFlowTransaction, 'transaction_number', 'CF-', include_id=False)
+
     @staticmethod
     def generate_next_number():
         """Generate the next sequential transaction number CF-XXXXXX."""
-        from django.db.models import Max
-        last = (
-            CashFlowTransaction.all_objects
-            .filter(transaction_number__startswith='CF-')
-            .aggregate(max_num=Max('transaction_number'))
-        )['max_num']
-        if last:
-            try:
-                seq = int(last.replace('CF-', '')) + 1
-            except ValueError:
-                seq = 1
-        else:
-            seq = 1
+        from core.sequences import next_value
+        seq = next_value('CF', seed=CashFlowTransaction._number_seed)
         return f'CF-{seq:06d}'
 
+    @staticmethod
+    def generate_next_numbers(count):
+        """Allocate *count* consecutive transaction numbers at once (bulk writers)."""
+        from core.sequences import next_values
+        return [f'CF-{seq:06d}' for seq in next_values('CF', count, seed=CashFlowTransaction._number_seed)]
+
 
 class CashFlowLogAction(models.TextChoices):
     CREATED = 'CREATED', 'Created'
@@ -163,3 +163,18 @@ class CashFlowLog(TimeStampedModel):
 
     def __str__(self):
         return f"{self.transaction.transaction_number} - {self.get_action_display()} by {self.performed_by}"
+
+
+class CashFlowSyncState(TimeStampedModel):
+    """
+    Progress marker of an incremental sync (see cashflow.sync).
+
+    ``watermark`` is the time the last successful run started; the next run
+    only looks at documents changed since then.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    last_full_sync_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
@@ -103,18 +103,17 @@ def grn_posted_to_cashflow(sender, instance, created, **kwargs):
     if _already_exists('GoodsReceipt', instance.pk):
         return
 
+    # First PO line price per item, loaded once for the whole GRN.
+    po_prices = {}
+    if instance.purchase_order_id:
+        for item_id, price in (
+            instance.purchase_order.lines.order_by('pk').values_list('item_id', 'unit_price')
+        ):
+            po_prices.setdefault(item_id, price)
+
     total = Decimal('0')
     for line in instance.lines.select_related('item', 'unit').all():
-        unit_price = Decimal('0')
-        if instance.purchase_order:
-            po_line = (
-                instance.purchase_order.lines
-                .filter(item=line.item)
-                .only('unit_price')
-                .first()
-            )
-            if po_line:
-                unit_price = po_line.unit_price
+        unit_price = po_prices.get(line.item_id, Decimal('0'))
         if unit_price == 0:
             unit_price = getattr(line.item, 'cost_price', None) or Decimal('0')
         total += line.qty * unit_price
@@ -202,12 +201,61 @@ def expense_paid_to_cashflow(sender, instance, created, **kwargs):
         category='EXPENSES',
         amount=instance.amount,
         transaction_date=instance.date,
-        reason=(
-            f'{instance.category.name}: {instance.item_description}'
-            if instance.item_description
-            else instance.category.name
-        ),
+        reason=_expense_reason(instance),
         reference_no=instance.reference_no or '',
         notes=instance.memo or '',
         user=instance.created_by,
     )
+
+
+def _expense_reason(expense):
+    if expense.item_description:
+        return f'{expense.category.name}: {expense.item_description}'
+    return expense.category.name
+
+
+def expenses_paid_to_cashflow(expenses):
+    """
+    Bulk counterpart of expense_paid_to_cashflow for newly bulk_create()d
+    expenses, which send no post_save: one CASH_OUT entry and CREATED log
+    per PAID expense, numbered from a single sequence allocation.
+    """
+    from cashflow.models import (
+        CashFlowTransaction, CashFlowStatus, PaymentMethod, CashFlowLog, CashFlowLogAction,
+    )
+    from core.models import ExpenseStatus
+
+    paid = [e for e in expenses if e.status == ExpenseStatus.PAID and e.amount > 0]
+    if not paid:
+        return []
+
+    numbers = CashFlowTransaction.generate_next_numbers(len(paid))
+    txns = CashFlowTransaction.objects.bulk_create([
+        CashFlowTransaction(
+            transaction_number=number,
+            category='EXPENSES',
+            flow_type='CASH_OUT',
+            amount=expense.amount,
+            transaction_date=expense.date,
+            payment_method=PaymentMethod.CASH,
+            reference_no=expense.reference_no or str(expense.pk),
+            reason=_expense_reason(expense),
+            notes=expense.memo or '',
+            status=CashFlowStatus.PENDING,
+            created_by=expense.created_by,
+            source_type='Expense',
+            source_id=expense.pk,
+            is_auto_generated=True,
+        )
+        for number, expense in zip(numbers, paid)
+    ])
+    CashFlowLog.objects.bulk_create([
+        CashFlowLog(
+            transaction=txn,
+            action=CashFlowLogAction.CREATED,
+            performed_by=txn.created_by,
+            details=f'Auto-generated from Expense {txn.source_id}.',
+        )
+        for txn in txns
+    ])
+    return txns
@@ -1,14 +1,17 @@
 """
-cashflow/sync.py — Full cash-flow sync.
+cashflow/sync.py — Cash-flow sync.
 
-ALL auto-generated entries are deleted and rebuilt on every sync to ensure
-accuracy after retroactive data changes.
+Procurement and expense entries are deleted and rebuilt on every sync to
+ensure accuracy after retroactive data changes.
 
 sync_weekly_sales_revenue:
   Aggregates all posted sales activity (POS, Delivery/Pickup via Invoice,
   Services via Invoice, minus Sales Returns) into one CASH_IN / SALES entry
   per ISO week.  Amount = weekly revenue.  COGS tracked in notes only.
-  The current (incomplete) week is skipped.
+  The current (incomplete) week is skipped.  Incremental: a watermark in
+  CashFlowSyncState limits each run to the weeks touched by documents
+  changed since the previous one, and entries are upserted.  ``full=True``
+  recomputes all history (audits).
 
 sync_procurement_cashflow:
   Rebuilds CASH_OUT for posted GoodsReceipts and CASH_IN for posted
@@ -20,13 +23,16 @@ sync_expense_cashflow:
   matching amount + date already exists.
 
 sync_all:
-  Orchestrates all syncs and returns a combined summary dict.
+  Orchestrates all syncs and returns a combined summary dict.  The sync
+  button runs it as a background job (cashflow.jobs, core.jobs).
 """
 
 from decimal import Decimal
-from datetime import timedelta, date
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
 
 from django.db import transaction as db_transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 
@@ -49,10 +55,73 @@ def _sunday_of(d):
     return d + timedelta(days=7 - iso_weekday)
 
 
-@db_transaction.atomic
-def sync_weekly_sales_revenue(user):
+# ═══════════════════════════════════════════════════════════════════════════
+# WEEKLY SALES REVENUE — incremental, one entry per ISO week
+# ═══════════════════════════════════════════════════════════════════════════
+
+WEEKLY_SALES_SYNC = 'weekly_sales_revenue'
+
+# Documents saved by transactions that were still open when the previous run
+# read its watermark carry an updated_at slightly before it; re-reading this
+# much history catches them.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def _week_bounds(source_id):
+    """(monday, sunday) of the YYYYWW week *source_id*."""
+    monday = date.fromisocalendar(source_id // 100, source_id % 100, 1)
+    return monday, monday + timedelta(days=6)
+
+
+def _week_ranges(week_ids):
+    """Merge week ids into contiguous (first monday, last sunday) date ranges."""
+    ranges = []
+    for source_id in sorted(week_ids):
+        monday, sunday = _week_bounds(source_id)
+        if ranges and ranges[-1][1] + timedelta(days=1) == monday:
+            ranges[-1][1] = sunday
+        else:
+            ranges.append([monday, sunday])
+    return ranges
+
+
+def _date_q(field, ranges):
+    q = Q(pk__in=[])
+    for start, end in ranges:
+        q |= Q(**{f'{field}__range': (start, end)})
+    return q
+
+
+def _datetime_q(field, ranges):
+    # Sale dates are the UTC date of posted_at, as read back by the ORM.
+    q = Q(pk__in=[])
+    for start, end in ranges:
+        q |= Q(**{
+            f'{field}__gte': datetime.combine(start, time.min, tzinfo=dt_timezone.utc),
+            f'{field}__lt': datetime.combine(end + timedelta(days=1), time.min, tzinfo=dt_timezone.utc),
+        })
+    return q
+
+
+def _sale_date(posted_at, created_at):
+    return (posted_at or created_at).date()
+
+
+def _posted_fulfillment():
+    """Exists() filter: the invoice's sales order has a posted delivery or pickup."""
+    from core.models import DocumentStatus
+    from sales.models import DeliveryNote, SalesPickup
+
+    posted = DocumentStatus.POSTED
+    return (
+        Exists(DeliveryNote.objects.filter(sales_order=OuterRef('sales_order_id'), status=posted))
+        | Exists(SalesPickup.objects.filter(sales_order=OuterRef('sales_order_id'), status=posted))
+    )
+
+
+def _weekly_buckets(ranges=None):
     """
-    Recalculate weekly revenue and replace ALL WeeklySalesRevenue entries.
+    Revenue and COGS per ISO week, keyed by YYYYWW.
 
     Revenue sources (all combined per ISO week):
       • POS Sales     (POSTED) → grand_total
@@ -61,182 +130,317 @@ def sync_weekly_sales_revenue(user):
       • Sales Returns (POSTED) → negative revenue     (refund deduction)
 
     COGS:
-      • POS Sales       → sum(line.item.cost_price × qty)
+      • POS Sales       → linked invoice.grand_total_cogs, else
+                          sum(line.line_cogs), or item.cost_price × qty
+                          for lines posted before the snapshot
       • Invoices        → invoice.grand_total_cogs
       • Sales Returns   → reduces COGS (items returned)
 
-    The current (incomplete) week is skipped — only finished weeks are synced.
-
-    Returns the number of new entries created.
+    An invoice is counted once: invoices of posted POS sales are counted with
+    the sale, service invoices that are also sales-order invoices with the
+    sales order.  *ranges* limits the documents read to those date ranges;
+    None reads all history.  Every source is one or two grouped queries.
     """
-    from cashflow.models import (
-        CashFlowTransaction, CashFlowCategory, CashFlowType,
-        CashFlowStatus, PaymentMethod, CashFlowLog, CashFlowLogAction,
-    )
     from core.models import DocumentStatus, Invoice
-    from pos.models import POSSale, SaleStatus
-    from sales.models import SalesReturn
+    from pos.models import POSSale, POSSaleLine, SaleStatus
+    from sales.models import SalesOrderLine, SalesReturn, SalesReturnLine
     from services.models import CustomerService, ServiceStatus
 
-    today = timezone.now().date()
-    current_week_key = _week_source_id(today)
-
-    # ── Per-week buckets ──────────────────────────────────────────────────
     buckets = {}
 
-    def _get_bucket(d):
-        key = _week_source_id(d)
-        if key not in buckets:
-            buckets[key] = {
-                'revenue': Decimal('0'),
-                'cogs': Decimal('0'),
-                'monday': _monday_of(d),
-                'sunday': _sunday_of(d),
-                'iso_year': d.isocalendar()[0],
-                'iso_week': d.isocalendar()[1],
-            }
-        return buckets[key]
-
-    # Track invoice PKs we've already counted to avoid double-counting
-    seen_invoice_pks = set()
+    def _add(d, revenue, cogs):
+        b = buckets.setdefault(_week_source_id(d), {'revenue': Decimal('0'), 'cogs': Decimal('0')})
+        b['revenue'] += revenue
+        b['cogs'] += cogs
 
     # ── 1. POS Sales ──────────────────────────────────────────────────────
-    for sale in POSSale.objects.filter(
-        status=SaleStatus.POSTED
-    ).prefetch_related('lines__item', 'lines__unit', 'invoices'):
-        sale_date = sale.posted_at.date() if sale.posted_at else sale.created_at.date()
-        b = _get_bucket(sale_date)
-        b['revenue'] += sale.grand_total or Decimal('0')
-        # COGS: use linked invoice.grand_total_cogs if available
-        pos_invoice = sale.invoices.filter(is_void=False).first()
-        if pos_invoice and pos_invoice.grand_total_cogs:
-            b['cogs'] += pos_invoice.grand_total_cogs
-            seen_invoice_pks.add(pos_invoice.pk)
-        else:
-            for line in sale.lines.all():
-                b['cogs'] += (line.item.cost_price or Decimal('0')) * line.qty
-            if pos_invoice:
-                seen_invoice_pks.add(pos_invoice.pk)
-
-    # ── 2. Invoices from Sales Orders (Delivery Notes / Pickups) ──────────
-    for inv in (
-        Invoice.objects.filter(
-            sales_order__isnull=False,
-            is_void=False,
+    sales = POSSale.objects.filter(status=SaleStatus.POSTED)
+    if ranges is not None:
+        sales = sales.filter(
+            _datetime_q('posted_at', ranges)
+            | (Q(posted_at__isnull=True) & _datetime_q('created_at', ranges))
         )
-        .exclude(pk__in=seen_invoice_pks)
-        .select_related('sales_order')
+    sale_ids = sales.values('pk')
+
+    # COGS from the first (latest-dated) non-void invoice of each sale.
+    invoice_cogs = {}
+    for sale_id, cogs in (
+        Invoice.objects.filter(pos_sale_id__in=sale_ids, is_void=False)
+        .order_by('pos_sale_id', '-date', '-created_at')
+        .values_list('pos_sale_id', 'grand_total_cogs')
     ):
-        # Only count invoices whose linked SO has at least one POSTED
-        # fulfillment (delivery or pickup).  The invoice date is the date.
-        so = inv.sales_order
-        if not so:
-            continue
-        has_posted = (
-            so.deliveries.filter(status=DocumentStatus.POSTED).exists()
-            or so.pickups.filter(status=DocumentStatus.POSTED).exists()
-        )
-        if not has_posted:
-            continue
+        invoice_cogs.setdefault(sale_id, cogs)
+    line_cogs = {}
+    for sale_id, qty, cost, snapshot in (
+        POSSaleLine.objects.filter(sale_id__in=sale_ids)
+        .values_list('sale_id', 'qty', 'item__cost_price', 'line_cogs')
+    ):
+        if snapshot is None:
+            snapshot = (cost or Decimal('0')) * qty
+        line_cogs[sale_id] = line_cogs.get(sale_id, Decimal('0')) + snapshot
 
-        b = _get_bucket(inv.date)
-        b['revenue'] += inv.grand_total or Decimal('0')
-        b['cogs'] += inv.grand_total_cogs or Decimal('0')
-        seen_invoice_pks.add(inv.pk)
+    for pk, posted_at, created_at, grand_total in sales.values_list(
+        'pk', 'posted_at', 'created_at', 'grand_total',
+    ):
+        cogs = invoice_cogs.get(pk) or line_cogs.get(pk, Decimal('0'))
+        _add(_sale_date(posted_at, created_at), grand_total or Decimal('0'), cogs)
+
+    # ── 2. Invoices from Sales Orders (Delivery Notes / Pickups) ──────────
+    # Only invoices whose sales order has at least one POSTED fulfillment.
+    so_invoices = (
+        Invoice.objects.filter(sales_order__isnull=False, is_void=False)
+        .exclude(pos_sale__status=SaleStatus.POSTED)
+        .filter(_posted_fulfillment())
+    )
+    in_range = so_invoices if ranges is None else so_invoices.filter(_date_q('date', ranges))
+    for inv_date, grand_total, cogs in in_range.values_list('date', 'grand_total', 'grand_total_cogs'):
+        _add(inv_date, grand_total or Decimal('0'), cogs or Decimal('0'))
 
     # ── 3. Invoices from Customer Services (COMPLETED) ────────────────────
-    for svc in (
+    services = (
         CustomerService.objects.filter(
             status=ServiceStatus.COMPLETED,
             invoice__isnull=False,
+            invoice__is_void=False,
         )
-        .select_related('invoice')
+        .exclude(invoice__pos_sale__status=SaleStatus.POSTED)
+        .exclude(invoice__in=so_invoices.values('pk'))
+        .annotate(day=Coalesce('completion_date', 'service_date'))
+    )
+    if ranges is not None:
+        services = services.filter(_date_q('day', ranges))
+    seen_invoice_pks = set()
+    for invoice_id, day, grand_total, cogs in services.order_by('pk').values_list(
+        'invoice_id', 'day', 'invoice__grand_total', 'invoice__grand_total_cogs',
     ):
-        inv = svc.invoice
-        if inv.pk in seen_invoice_pks or inv.is_void:
+        if invoice_id in seen_invoice_pks:
             continue
-        svc_date = svc.completion_date or svc.service_date
-        b = _get_bucket(svc_date)
-        b['revenue'] += inv.grand_total or Decimal('0')
-        b['cogs'] += inv.grand_total_cogs or Decimal('0')
-        seen_invoice_pks.add(inv.pk)
+        seen_invoice_pks.add(invoice_id)
+        _add(day, grand_total or Decimal('0'), cogs or Decimal('0'))
 
     # ── 4. Sales Returns (reduce revenue and COGS) ────────────────────────
-    for sr in SalesReturn.objects.filter(
-        status=DocumentStatus.POSTED
-    ).select_related('sales_order').prefetch_related('lines__item', 'lines__unit'):
-        b = _get_bucket(sr.return_date)
-        for line in sr.lines.all():
-            b['cogs'] -= (line.item.cost_price or Decimal('0')) * line.qty
-            unit_price = Decimal('0')
-            if sr.sales_order_id:
-                so_line = (
-                    sr.sales_order.lines
-                    .filter(item=line.item)
-                    .only('unit_price')
-                    .first()
-                )
-                if so_line:
-                    unit_price = so_line.unit_price
-            if unit_price == 0:
-                unit_price = line.item.cost_price or Decimal('0')
-            b['revenue'] -= unit_price * line.qty
+    returns = SalesReturn.objects.filter(status=DocumentStatus.POSTED)
+    if ranges is not None:
+        returns = returns.filter(_date_q('return_date', ranges))
+    # Price of the first line of the sales order selling the returned item.
+    so_prices = {}
+    for so_id, item_id, unit_price in (
+        SalesOrderLine.objects.filter(sales_order_id__in=returns.values('sales_order_id'))
+        .order_by('pk')
+        .values_list('sales_order_id', 'item_id', 'unit_price')
+    ):
+        so_prices.setdefault((so_id, item_id), unit_price)
+    for return_date, so_id, item_id, qty, cost in (
+        SalesReturnLine.objects.filter(sales_return__in=returns.values('pk'))
+        .values_list(
+            'sales_return__return_date', 'sales_return__sales_order_id',
+            'item_id', 'qty', 'item__cost_price',
+        )
+    ):
+        cost = cost or Decimal('0')
+        unit_price = so_prices.get((so_id, item_id)) or cost
+        _add(return_date, -unit_price * qty, -cost * qty)
 
-    # ── Delete all existing WeeklySalesRevenue entries ─────────────────────
-    CashFlowTransaction.objects.filter(
+    return buckets
+
+
+def _touched_weeks(since):
+    """
+    YYYYWW keys of the weeks holding a document saved at or after *since*.
+
+    Covers POS sales, invoices (and the POS sale or service they belong to)
+    including those whose COGS sync_invoice_cogs recomputed, customer
+    services, sales returns, and sales orders whose deliveries or pickups
+    changed (that decides whether their invoices count).
+    """
+    from core.models import Invoice
+    from pos.models import POSSale
+    from sales.models import DeliveryNote, SalesOrder, SalesPickup, SalesReturn
+    from services.models import CustomerService
+
+    changed = Q(updated_at__gte=since)
+    days = set()
+
+    for posted_at, created_at in (
+        POSSale.objects.filter(changed).order_by().values_list('posted_at', 'created_at')
+    ):
+        days.add(_sale_date(posted_at, created_at))
+
+    orders = SalesOrder.all_objects.filter(
+        Q(updated_at__gte=since)
+        | Q(pk__in=DeliveryNote.all_objects.filter(changed).values('sales_order_id'))
+        | Q(pk__in=SalesPickup.all_objects.filter(changed).values('sales_order_id'))
+    )
+    # sync_invoice_cogs stamps cogs_synced_at but leaves updated_at alone.
+    invoices = Invoice.objects.filter(
+        changed | Q(cogs_synced_at__gte=since) | Q(sales_order__in=orders.values('pk'))
+    )
+    for inv_date, posted_at, created_at in invoices.order_by().values_list(
+        'date', 'pos_sale__posted_at', 'pos_sale__created_at',
+    ):
+        days.add(inv_date)
+        if created_at:
+            days.add(_sale_date(posted_at, created_at))
+
+    for day in (
+        CustomerService.objects.filter(changed | Q(invoice__in=invoices.values('pk')))
+        .annotate(day=Coalesce('completion_date', 'service_date'))
+        .order_by().values_list('day', flat=True)
+    ):
+        days.add(day)
+
+    days.update(
+        SalesReturn.all_objects.filter(changed | Q(sales_order__in=orders.values('pk')))
+        .order_by().values_list('return_date', flat=True)
+    )
+    return {_week_source_id(d) for d in days if d}
+
+
+def _weekly_entry_values(source_id, b):
+    monday, _ = _week_bounds(source_id)
+    iso_year, iso_week = source_id // 100, source_id % 100
+    revenue = b['revenue']
+    gross = revenue - b['cogs']
+    return {
+        'amount': revenue.quantize(Decimal('0.01')),
+        'transaction_date': monday,
+        'reference_no': f'WEEK-{iso_year}-W{iso_week:02d}',
+        'reason': f'Weekly sales revenue — Week {iso_week:02d} of {iso_year}',
+        'notes': (
+            f'Revenue: ₱{revenue:.2f} | '
+            f'COGS: ₱{b["cogs"]:.2f} | '
+            f'Gross profit: ₱{gross:.2f}'
+        ),
+    }
+
+
+@db_transaction.atomic
+def sync_weekly_sales_revenue(user, full=False):
+    """
+    Bring the WeeklySalesRevenue entries (one CASH_IN / SALES entry per ISO
+    week, amount = weekly revenue, COGS in the notes) up to date.
+
+    Incremental by default: only weeks holding a document changed since the
+    previous run (plus weeks that were still in progress then) are
+    recomputed, and their entries are updated in place, created, or removed
+    when the week no longer has revenue.  With nothing changed a run is a
+    handful of indexed queries.
+
+    ``full=True`` — and the first run — recompute every week from all
+    history and drop entries of weeks without revenue; use it for audits.
+    Changes that leave no updated_at trace (hard-deleted documents, a
+    document moved to another week) are only picked up by a full run;
+    edited item cost prices are picked up once sync_invoice_cogs has
+    recomputed the affected invoices.
+
+    The current (incomplete) week is skipped — only finished weeks are synced.
+
+    Returns the number of entries created or updated.
+    """
+    from cashflow.models import (
+        CashFlowTransaction, CashFlowCategory, CashFlowType, CashFlowStatus,
+        PaymentMethod, CashFlowLog, CashFlowLogAction, CashFlowSyncState,
+    )
+
+    started = timezone.now()
+    today = started.date()
+    CashFlowSyncState.objects.get_or_create(name=WEEKLY_SALES_SYNC)
+    state = CashFlowSyncState.objects.select_for_update().get(name=WEEKLY_SALES_SYNC)
+    full = full or state.watermark is None
+
+    entries = CashFlowTransaction.objects.filter(
         source_type='WeeklySalesRevenue',
         is_auto_generated=True,
-    ).delete()
+    )
+    if full:
+        buckets = _weekly_buckets()
+        weeks = None
+    else:
+        weeks = _touched_weeks(state.watermark - WATERMARK_OVERLAP)
+        # Weeks still in progress at the last run are due now.
+        week = _monday_of(state.watermark.date())
+        while _sunday_of(week) <= today:
+            weeks.add(_week_source_id(week))
+            week += timedelta(days=7)
+        buckets = _weekly_buckets(_week_ranges(weeks)) if weeks else {}
+        entries = entries.filter(source_id__in=weeks)
+
+    existing = {}
+    stale = []
+    for txn in entries.order_by('pk'):
+        if txn.source_id in existing:
+            stale.append(txn.pk)  # duplicate entry for the same week
+        else:
+            existing[txn.source_id] = txn
 
-    # ── Create one entry per completed week with revenue > 0 ─────────────
     created_count = 0
+    changed = []
+    logs = []
+    current_week_key = _week_source_id(today)
     for source_id, b in sorted(buckets.items()):
         # Skip the current incomplete week
-        if source_id == current_week_key and b['sunday'] > today:
+        if source_id == current_week_key and _sunday_of(today) > today:
             continue
-
-        revenue = b['revenue']
-        if revenue <= 0:
+        if b['revenue'] <= 0:
             continue
-
-        gross = revenue - b['cogs']
-        iso_year = b['iso_year']
-        iso_week = b['iso_week']
-
-        txn = CashFlowTransaction.objects.create(
-            transaction_number=CashFlowTransaction.generate_next_number(),
-            category=CashFlowCategory.SALES,
-            flow_type=CashFlowType.CASH_IN,
-            amount=revenue.quantize(Decimal('0.01')),
-            transaction_date=b['monday'],
-            payment_method=PaymentMethod.CASH,
-            reference_no=f'WEEK-{iso_year}-W{iso_week:02d}',
-            reason=f'Weekly sales revenue — Week {iso_week:02d} of {iso_year}',
-            notes=(
-                f'Revenue: ₱{revenue:.2f} | '
-                f'COGS: ₱{b["cogs"]:.2f} | '
-                f'Gross profit: ₱{gross:.2f}'
-            ),
-            status=CashFlowStatus.PENDING,
-            created_by=user,
-            source_type='WeeklySalesRevenue',
-            source_id=source_id,
-            is_auto_generated=True,
+        values = _weekly_entry_values(source_id, b)
+        details = (
+            f'Sync: weekly revenue for Week {source_id % 100:02d}/{source_id // 100}. '
+            f'{values["notes"].replace(" | ", ", ")}.'
         )
+        txn = existing.pop(source_id, None)
+        if txn is None:
+            txn = CashFlowTransaction.objects.create(
+                transaction_number=CashFlowTransaction.generate_next_number(),
+                category=CashFlowCategory.SALES,
+                flow_type=CashFlowType.CASH_IN,
+                payment_method=PaymentMethod.CASH,
+                status=CashFlowStatus.PENDING,
+                created_by=user,
+                source_type='WeeklySalesRevenue',
+                source_id=source_id,
+                is_auto_generated=True,
+                **values,
+            )
+            logs.append(CashFlowLog(
+                transaction=txn, action=CashFlowLogAction.CREATED,
+                performed_by=user, details=details,
+            ))
+            created_count += 1
+            continue
 
-        CashFlowLog.objects.create(
-            transaction=txn,
-            action=CashFlowLogAction.CREATED,
-            performed_by=user,
-            details=(
-                f'Sync: weekly revenue for Week {iso_week:02d}/{iso_year}. '
-                f'Revenue=₱{revenue:.2f}, COGS=₱{b["cogs"]:.2f}, '
-                f'Gross=₱{gross:.2f}.'
-            ),
+        old = {field: getattr(txn, field) for field in values}
+        if old == values:
+            continue
+        for field, value in values.items():
+            setattr(txn, field, value)
+        txn.updated_at = started
+        changed.append(txn)
+        logs.append(CashFlowLog(
+            transaction=txn, action=CashFlowLogAction.UPDATED,
+            performed_by=user, details=details,
+            old_values={'amount': str(old['amount']), 'notes': old['notes']},
+            new_values={'amount': str(values['amount']), 'notes': values['notes']},
+        ))
+
+    # Weeks that were recomputed but no longer have revenue.
+    stale.extend(txn.pk for txn in existing.values())
+    if stale:
+        CashFlowTransaction.objects.filter(pk__in=stale).delete()
+    if changed:
+        CashFlowTransaction.objects.bulk_update(
+            changed, ['amount', 'transaction_date', 'reference_no', 'reason', 'notes', 'updated_at'],
         )
-        created_count += 1
+    CashFlowLog.objects.bulk_create(logs)
 
-    return created_count
+    state.watermark = started
+    update_fields = ['watermark', 'updated_at']
+    if full:
+        state.last_full_sync_at = started
+        update_fields.append('last_full_sync_at')
+    state.save(update_fields=update_fields)
+
+    return created_count + len(changed)
 
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -477,9 +681,10 @@ def sync_expense_cashflow(user):
 # SYNC ALL — orchestrate a full cash-flow sync
 # ═══════════════════════════════════════════════════════════════════════════
 
-def sync_all(user):
+def sync_all(user, full=False):
     """
-    Run all sync functions and return a summary dict.
+    Run all sync functions and return a summary dict.  *full* forces a full
+    rebuild of the weekly sales revenue entries.
 
     Returns dict with keys: sales, grn, purchase_return, expense, errors.
     Each error is a string describing which module failed and why.
@@ -493,7 +698,7 @@ def sync_all(user):
     }
 
     try:
-        results['sales'] = sync_weekly_sales_revenue(user)
+        results['sales'] = sync_weekly_sales_revenue(user, full=full)
     except Exception as exc:
         results['errors'].append(f'Sales sync failed: {exc}')
 
@@ -510,3 +715,23 @@ def sync_all(user):
         results['errors'].append(f'Expense sync failed: {exc}')
 
     return results
+
+
+def sync_summary(result):
+    """(success, message, detail) describing a sync_all() result for the UI."""
+    parts = []
+    if result['sales']:
+        parts.append(f"{result['sales']} weekly sales entr{'y' if result['sales'] == 1 else 'ies'}")
+    if result['grn']:
+        parts.append(f"{result['grn']} goods receipt(s)")
+    if result['purchase_return']:
+        parts.append(f"{result['purchase_return']} purchase return(s)")
+    if result['expense']:
+        parts.append(f"{result['expense']} expense(s)")
+
+    if result['errors']:
+        return False, ' | '.join(result['errors']), ', '.join(parts) if parts else None
+
+    total = result['sales'] + result['grn'] + result['purchase_return'] + result['expense']
+    summary = ', '.join(parts) if parts else 'Everything is up to date'
+    return True, f'Cash flow sync complete — {total} entries created.', summary
@@ -3,6 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from django.http import JsonResponse
+from django.urls import reverse
 from django.db.models import Sum, Q, DecimalField
 from django.db.models.functions import Coalesce
 
@@ -28,8 +29,43 @@ def _log(transaction, action, user, details='', old_values=None, new_values=None
 # ═══════════════════════════════════════════════════════════════════════════
 # TRANSACTION LIST
 # ═══════════════════════════════════════════════════════════════════════════
+TRANSACTION_COLUMNS = [
+    ('transaction_number', 'Txn #'),
+    ('transaction_date', 'Date'),
+    ('flow_type', 'Type'),
+    ('category', 'Category'),
+    ('amount', 'Amount'),
+    ('reason', 'Reason'),
+    ('payment_method', 'Payment'),
+    ('reference_no', 'Reference'),
+    ('status', 'Status'),
+    ('source', 'Source'),
+    ('created_by', 'By'),
+]
+
+
+def _transaction_rows(qs):
+    for txn in qs.iterator(chunk_size=2000):
+        yield {
+            'transaction_number': txn.transaction_number,
+            'transaction_date': txn.transaction_date,
+            'flow_type': txn.get_flow_type_display(),
+            'category': txn.get_category_display(),
+            'amount': txn.amount,
+            'reason': txn.reason,
+            'payment_method': txn.get_payment_method_display(),
+            'reference_no': txn.reference_no,
+            'status': txn.get_status_display(),
+            'source': txn.source_type if txn.is_auto_generated else 'Manual',
+            'created_by': txn.created_by.get_short_name() or txn.created_by.username,
+        }
+
+
 @login_required
 def transaction_list(request):
+    """Cash flow transactions with filters; ?export=csv|xlsx downloads the filtered list."""
+    from reports.exports import export_response
+
     qs = CashFlowTransaction.objects.select_related('created_by', 'approved_by').all()
 
     # Filters
@@ -50,6 +86,12 @@ def transaction_list(request):
     if date_to:
         qs = qs.filter(transaction_date__lte=date_to)
 
+    response = export_response(
+        request, f'cashflow_{timezone.now():%Y%m%d}', 'Cash Flow', TRANSACTION_COLUMNS, _transaction_rows(qs),
+    )
+    if response:
+        return response
+
     # Summary totals — only APPROVED transactions count toward the net
     approved_q = Q(status=CashFlowStatus.APPROVED)
     totals = qs.aggregate(
@@ -271,43 +313,22 @@ def log_list(request):
 @login_required
 def sync_cashflow(request):
     """
-    POST-only AJAX view.  Rebuilds weekly sales revenue entries and
+    POST-only AJAX view.  Queues a background job that syncs weekly sales
+    revenue entries (incremental; ``full=1`` recomputes all weeks) and
     backfills any missing GoodsReceipt, PurchaseReturn, and Expense entries.
-    Returns JSON so the frontend can show results via Swal.fire.
+    Returns JSON with the job's status URL; the page polls it and shows the
+    result via Swal.fire.  A sync already in progress is reused.
     """
     if request.method != 'POST':
         return redirect('cashflow_list')
 
-    from cashflow.sync import sync_all
-    try:
-        result = sync_all(request.user)
-    except Exception as exc:
-        return JsonResponse({
-            'success': False,
-            'message': f'Sync failed: {exc}',
-        }, status=500)
-
-    parts = []
-    if result['sales']:
-        parts.append(f"{result['sales']} weekly sales entr{'y' if result['sales'] == 1 else 'ies'}")
-    if result['grn']:
-        parts.append(f"{result['grn']} goods receipt(s)")
-    if result['purchase_return']:
-        parts.append(f"{result['purchase_return']} purchase return(s)")
-    if result['expense']:
-        parts.append(f"{result['expense']} expense(s)")
-
-    if result['errors']:
-        return JsonResponse({
-            'success': False,
-            'message': ' | '.join(result['errors']),
-            'detail': ', '.join(parts) if parts else None,
-        }, status=500)
-
-    total = result['sales'] + result['grn'] + result['purchase_return'] + result['expense']
-    summary = ', '.join(parts) if parts else 'Everything is up to date'
+    from core.jobs import enqueue, job_status
+    job, created = enqueue(
+        'cashflow_sync', {'full': request.POST.get('full') == '1'}, user=request.user,
+    )
     return JsonResponse({
         'success': True,
-        'message': f'Cash flow sync complete — {total} entries created.',
-        'detail': summary,
-    })
+        'created': created,
+        'job': job_status(job),
+        'status_url': reverse('job_status', args=[job.pk]),
+    }, status=202)
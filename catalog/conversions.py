@@ -0,0 +1,204 @@
+"""
+In-process unit-conversion registry.
+
+All active UnitConversion rows are loaded once into an in-memory graph keyed
+by (from_unit_id, to_unit_id, item_id) so conversion lookups in posting, COGS
+and serializer paths cost no queries.  The graph is dropped by the
+post_save/post_delete signals in catalog.signals, and revalidated against a
+version stamp derived from the UnitConversion table (row count, max pk, max
+updated_at) so other gunicorn workers — and rolled-back transactions — never
+keep serving stale factors:
+
+  * inside a transaction that touched conversions the stamp is checked on
+    every access (the writes may still be rolled back);
+  * otherwise it is checked at most every CONVERSION_GRAPH_TTL seconds
+    (settings, default 5).
+
+Besides direct and reverse records the graph resolves multi-hop paths
+(roll → meter → foot) using the shortest chain of conversions.
+"""
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+class ConversionRecord(NamedTuple):
+    """Immutable snapshot of one active UnitConversion row."""
+    pk: int
+    from_unit_id: int
+    to_unit_id: int
+    item_id: Optional[int]
+    factor: Decimal
+    conversion_price: Optional[Decimal]
+
+
+class ConversionGraph:
+    """Conversion records indexed for O(1) lookups plus a unit adjacency map."""
+
+    def __init__(self, records=()):
+        self._records = {}
+        self._neighbours = {}
+        for rec in records:
+            key = (rec.from_unit_id, rec.to_unit_id, rec.item_id)
+            # Mirror .filter(...).first(): lowest pk wins on duplicates.
+            if key in self._records and self._records[key].pk < rec.pk:
+                continue
+            self._records[key] = rec
+            self._neighbours.setdefault(rec.from_unit_id, set()).add(rec.to_unit_id)
+            self._neighbours.setdefault(rec.to_unit_id, set()).add(rec.from_unit_id)
+
+    def __len__(self):
+        return len(self._records)
+
+    def record(self, from_unit_id, to_unit_id, item_id=None):
+        """Stored from→to record; the item-specific one takes precedence over the global one."""
+        if item_id is not None:
+            rec = self._records.get((from_unit_id, to_unit_id, item_id))
+            if rec is not None:
+                return rec
+        return self._records.get((from_unit_id, to_unit_id, None))
+
+    def lookup(self, from_unit_id, to_unit_id, item_id=None):
+        """
+        Return (record, is_reverse) with the same priority as the original query chain:
+        item-specific direct → global direct → item-specific reverse → global reverse.
+        Reverse records with a zero factor are skipped.
+        """
+        if item_id is not None:
+            rec = self._records.get((from_unit_id, to_unit_id, item_id))
+            if rec is not None:
+                return rec, False
+        rec = self._records.get((from_unit_id, to_unit_id, None))
+        if rec is not None:
+            return rec, False
+        if item_id is not None:
+            rec = self._records.get((to_unit_id, from_unit_id, item_id))
+            if rec is not None and rec.factor != 0:
+                return rec, True
+        rec = self._records.get((to_unit_id, from_unit_id, None))
+        if rec is not None and rec.factor != 0:
+            return rec, True
+        return None, False
+
+    def _edge_ratio(self, from_unit_id, to_unit_id, item_id):
+        rec, is_reverse = self.lookup(from_unit_id, to_unit_id, item_id)
+        if rec is None:
+            return None
+        return (Decimal('1'), rec.factor) if is_reverse else (rec.factor, Decimal('1'))
+
+    def path_ratio(self, from_unit_id, to_unit_id, item_id=None):
+        """
+        (numerator, denominator) of the factor along the shortest chain of
+        conversions from *from_unit_id* to *to_unit_id*, or None when the units
+        are not connected for this item.  Keeping the ratio unreduced lets
+        callers multiply before dividing, so 150 ft → roll gives exactly 1.
+        """
+        if from_unit_id == to_unit_id:
+            return Decimal('1'), Decimal('1')
+        ratios = {from_unit_id: (Decimal('1'), Decimal('1'))}
+        queue = deque([from_unit_id])
+        while queue:
+            unit_id = queue.popleft()
+            for nxt in sorted(self._neighbours.get(unit_id, ())):
+                if nxt in ratios:
+                    continue
+                edge = self._edge_ratio(unit_id, nxt, item_id)
+                if edge is None:
+                    continue
+                num, den = ratios[unit_id]
+                ratios[nxt] = (num * edge[0], den * edge[1])
+                if nxt == to_unit_id:
+                    return ratios[nxt]
+                queue.append(nxt)
+        return None
+
+    def path_factor(self, from_unit_id, to_unit_id, item_id=None):
+        """Multi-hop factor from *from_unit_id* to *to_unit_id*, or None."""
+        ratio = self.path_ratio(from_unit_id, to_unit_id, item_id)
+        if ratio is None:
+            return None
+        return ratio[0] / ratio[1]
+
+    def factor(self, from_unit_id, to_unit_id, item_id=None):
+        """Direct/reverse factor when a record exists, else the multi-hop factor."""
+        if from_unit_id == to_unit_id:
+            return Decimal('1')
+        edge = self._edge_ratio(from_unit_id, to_unit_id, item_id)
+        if edge is not None:
+            return edge[0] / edge[1]
+        return self.path_factor(from_unit_id, to_unit_id, item_id)
+
+
+def _version_stamp():
+    """Cheap fingerprint of the UnitConversion table (one aggregate query)."""
+    from catalog.models import UnitConversion
+    from core.versioning import version_stamp
+
+    return version_stamp([UnitConversion])
+
+
+def _load_records():
+    from catalog.models import UnitConversion
+
+    return [
+        ConversionRecord(*row)
+        for row in UnitConversion.objects.order_by('pk').values_list(
+            'pk', 'from_unit_id', 'to_unit_id', 'item_id', 'factor', 'conversion_price',
+        )
+    ]
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.graph = None
+        self.stamp = None
+        self.checked_at = 0.0
+        # True while a transaction that wrote conversions may still roll back.
+        self.volatile = False
+
+
+_registry = _Registry()
+
+
+def get_conversion_graph():
+    """Return the current ConversionGraph, (re)loading it when stale."""
+    reg = _registry
+    ttl = getattr(settings, 'CONVERSION_GRAPH_TTL', 5)
+    now = time.monotonic()
+    graph = reg.graph
+    if graph is not None and not reg.volatile and now - reg.checked_at < ttl:
+        return graph
+
+    stamp = _version_stamp()
+    with reg.lock:
+        if reg.graph is None or stamp != reg.stamp:
+            reg.graph = ConversionGraph(_load_records())
+            reg.stamp = stamp
+        reg.checked_at = now
+        if not connection.in_atomic_block:
+            reg.volatile = False
+        return reg.graph
+
+
+def invalidate_conversion_graph():
+    """Drop the cached graph; the next lookup reloads it."""
+    reg = _registry
+    with reg.lock:
+        reg.graph = None
+        reg.stamp = None
+        if connection.in_atomic_block:
+            reg.volatile = True
+    if connection.in_atomic_block:
+        transaction.on_commit(_drop_after_commit)
+
+
+def _drop_after_commit():
+    with _registry.lock:
+        _registry.graph = None
+        _registry.stamp = None
@@ -107,32 +107,27 @@ def convert_to_base_unit(qty, sale_unit, base_unit, item=None):
     - If sale_unit == base_unit, return qty unchanged.
     - When *item* is supplied, item-specific UnitConversion records are
       checked first before falling back to global (item=NULL) ones.
-    - Looks up a UnitConversion (direct or reverse), even across categories.
+    - Looks up a UnitConversion (direct or reverse), even across categories,
+      then falls back to a multi-hop path (roll → meter → foot).
       Raises ValueError only when no applicable conversion exists.
+
+    Lookups are served from the in-process graph in catalog.conversions.
     """
     if sale_unit.pk == base_unit.pk:
         return qty
 
-    def _lookup(from_u, to_u):
-        """Return (conv, is_reverse) or (None, False). Item-specific first."""
-        if item is not None:
-            c = UnitConversion.objects.filter(
-                from_unit=from_u, to_unit=to_u, item=item, is_active=True
-            ).first()
-            if c:
-                return c, False
-        c = UnitConversion.objects.filter(
-            from_unit=from_u, to_unit=to_u, item__isnull=True, is_active=True
-        ).first()
-        return c, False
+    from catalog.conversions import get_conversion_graph
+
+    graph = get_conversion_graph()
+    item_id = item.pk if item is not None else None
 
     # Try direct: sale_unit → base_unit
-    conv, _ = _lookup(sale_unit, base_unit)
+    conv = graph.record(sale_unit.pk, base_unit.pk, item_id)
     if conv:
         return qty * conv.factor
 
     # Try reverse: base_unit → sale_unit, then divide by factor
-    conv, _ = _lookup(base_unit, sale_unit)
+    conv = graph.record(base_unit.pk, sale_unit.pk, item_id)
     if conv:
         if conv.factor == 0:
             raise ValueError(
@@ -140,6 +135,11 @@ def convert_to_base_unit(qty, sale_unit, base_unit, item=None):
             )
         return qty / conv.factor
 
+    # Try a chain of conversions through intermediate units
+    ratio = graph.path_ratio(sale_unit.pk, base_unit.pk, item_id)
+    if ratio is not None:
+        return qty * ratio[0] / ratio[1]
+
     raise ValueError(
         f'No unit conversion configured between {sale_unit} and {base_unit}'
         + (f' for item {item.code}' if item is not None and getattr(item, 'code', None) else '')
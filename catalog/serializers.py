@@ -38,7 +38,68 @@ class ProductSpecSerializer(serializers.ModelSerializer):
         fields = ['id', 'model_name', 'variant', 'dimensions', 'weight']
 
 
-class ItemSerializer(serializers.ModelSerializer):
+class UnitConversionFieldsMixin:
+    """
+    Conversion-aware price fields for item serializers.
+
+    The target unit comes from the ``unit``/``unit_id`` query param.  List
+    views resolve it once and pass ``target_unit`` plus a ``price_map`` built
+    by catalog.utils.bulk_convert_prices in the serializer context, so a page
+    of items costs no per-item queries; without them each item falls back to
+    the single-item conversion helpers.
+    """
+
+    def _target_unit(self):
+        if 'target_unit' in self.context:
+            return self.context['target_unit']
+        request = self.context.get('request')
+        if not request:
+            return None
+        target_unit_id = request.query_params.get('unit') or request.query_params.get('unit_id')
+        if not target_unit_id:
+            return None
+        try:
+            target_unit = Unit.objects.get(id=int(target_unit_id))
+        except (Unit.DoesNotExist, ValueError, TypeError):
+            target_unit = None
+        # Serializers are reused across items of a page; resolve the unit once.
+        self.context['target_unit'] = target_unit
+        return target_unit
+
+    def _converted(self, obj):
+        price_map = self.context.get('price_map')
+        if price_map is not None and obj.id in price_map:
+            return price_map[obj.id]
+        target_unit = self._target_unit()
+        if target_unit is None:
+            return None
+        from catalog.utils import bulk_convert_prices
+        return bulk_convert_prices([obj], target_unit)[obj.id]
+
+    def get_conversion_factor(self, obj):
+        """Conversion factor from stock_unit to the requested unit (if any)."""
+        converted = self._converted(obj)
+        if converted is None:
+            return None
+        factor = converted['factor']
+        return float(factor) if factor else None
+
+    def get_converted_selling_price(self, obj):
+        """Selling price adjusted for the requested unit."""
+        converted = self._converted(obj)
+        if converted is None:
+            return float(obj.selling_price)
+        return float(converted['selling_price'])
+
+    def get_converted_cost_price(self, obj):
+        """Cost price adjusted for the requested unit (never uses conversion_price)."""
+        converted = self._converted(obj)
+        if converted is None:
+            return float(obj.cost_price)
+        return float(converted['cost_price'])
+
+
+class ItemSerializer(UnitConversionFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     unit_name = serializers.CharField(source='default_unit.abbreviation', read_only=True)
     default_unit_category = serializers.CharField(source='default_unit.category', read_only=True)
@@ -79,88 +140,8 @@ class ItemSerializer(serializers.ModelSerializer):
         """Return the item's stock unit abbreviation."""
         return obj.stock_unit.abbreviation if obj.stock_unit else None
 
-    def get_conversion_factor(self, obj):
-        """
-        Get conversion factor from stock_unit to the requested selling_unit (if different).
-        Request context can include 'unit_id' to specify target unit.
-        """
-        from catalog.utils import get_conversion_factor
-        
-        request = self.context.get('request')
-        if not request:
-            return None
-        
-        target_unit_id = request.query_params.get('unit') or request.query_params.get('unit_id')
-        if not target_unit_id:
-            return None
-        
-        try:
-            target_unit = Unit.objects.get(id=int(target_unit_id))
-        except (Unit.DoesNotExist, ValueError, TypeError):
-            return None
-        
-        factor = get_conversion_factor(obj.stock_unit, target_unit, item=obj)
-        return float(factor) if factor else None
-
-    def get_converted_selling_price(self, obj):
-        """
-        Get selling price adjusted for the requested unit.
-        """
-        from catalog.utils import convert_price_for_unit
-        
-        request = self.context.get('request')
-        if not request:
-            return float(obj.selling_price)
-        
-        target_unit_id = request.query_params.get('unit') or request.query_params.get('unit_id')
-        if not target_unit_id:
-            return float(obj.selling_price)
-        
-        try:
-            target_unit = Unit.objects.get(id=int(target_unit_id))
-        except (Unit.DoesNotExist, ValueError, TypeError):
-            return float(obj.selling_price)
-        
-        converted = convert_price_for_unit(
-            obj.selling_price,
-            obj.stock_unit,
-            target_unit,
-            item=obj,
-            round_places=4
-        )
-        return float(converted)
 
-    def get_converted_cost_price(self, obj):
-        """
-        Get cost price adjusted for the requested unit.
-        """
-        from catalog.utils import convert_price_for_unit
-        
-        request = self.context.get('request')
-        if not request:
-            return float(obj.cost_price)
-        
-        target_unit_id = request.query_params.get('unit') or request.query_params.get('unit_id')
-        if not target_unit_id:
-            return float(obj.cost_price)
-        
-        try:
-            target_unit = Unit.objects.get(id=int(target_unit_id))
-        except (Unit.DoesNotExist, ValueError, TypeError):
-            return float(obj.cost_price)
-        
-        converted = convert_price_for_unit(
-            obj.cost_price,
-            obj.stock_unit,
-            target_unit,
-            item=obj,
-            round_places=4,
-            use_conversion_price=False,
-        )
-        return float(converted)
-
-
-class ItemListSerializer(serializers.ModelSerializer):
+class ItemListSerializer(UnitConversionFieldsMixin, serializers.ModelSerializer):
     """Lighter serializer for list views with optional available_qty."""
     category_name = serializers.CharField(source='category.name', read_only=True)
     unit_name = serializers.CharField(source='default_unit.abbreviation', read_only=True)
@@ -195,52 +176,6 @@ class ItemListSerializer(serializers.ModelSerializer):
         """Return the item's stock unit abbreviation."""
         return obj.stock_unit.abbreviation if obj.stock_unit else None
 
-    def get_conversion_factor(self, obj):
-        """Get conversion factor if unit param specified."""
-        from catalog.utils import get_conversion_factor
-        
-        request = self.context.get('request')
-        if not request:
-            return None
-        
-        target_unit_id = request.query_params.get('unit') or request.query_params.get('unit_id')
-        if not target_unit_id:
-            return None
-        
-        try:
-            target_unit = Unit.objects.get(id=int(target_unit_id))
-        except (Unit.DoesNotExist, ValueError, TypeError):
-            return None
-        
-        factor = get_conversion_factor(obj.stock_unit, target_unit, item=obj)
-        return float(factor) if factor else None
-
-    def get_converted_selling_price(self, obj):
-        """Get selling price adjusted for the requested unit."""
-        from catalog.utils import convert_price_for_unit
-        
-        request = self.context.get('request')
-        if not request:
-            return float(obj.selling_price)
-        
-        target_unit_id = request.query_params.get('unit') or request.query_params.get('unit_id')
-        if not target_unit_id:
-            return float(obj.selling_price)
-        
-        try:
-            target_unit = Unit.objects.get(id=int(target_unit_id))
-        except (Unit.DoesNotExist, ValueError, TypeError):
-            return float(obj.selling_price)
-        
-        converted = convert_price_for_unit(
-            obj.selling_price,
-            obj.stock_unit,
-            target_unit,
-            item=obj,
-            round_places=4
-        )
-        return float(converted)
-
     def get_available_qty(self, obj):
         available_map = self.context.get('available_map') or {}
         return available_map.get(obj.id)
@@ -0,0 +1,17 @@
+"""
+Catalog signal handlers.
+
+Any UnitConversion write drops the in-process conversion graph
+(catalog.conversions) so the next lookup reloads it.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalog.conversions import invalidate_conversion_graph
+from catalog.models import UnitConversion
+
+
+@receiver(post_save, sender=UnitConversion)
+@receiver(post_delete, sender=UnitConversion)
+def unit_conversion_changed(sender, instance, **kwargs):
+    invalidate_conversion_graph()
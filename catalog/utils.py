@@ -12,38 +12,15 @@ def _lookup_conversion_record(from_unit, to_unit, item=None) -> Tuple:
 
     Returns (conversion_record, is_reverse) where is_reverse=True means the stored
     record goes to_unit→from_unit and the effective factor is 1/record.factor.
+    The record is a catalog.conversions.ConversionRecord served from the
+    in-process conversion graph (no query per call).
 
     Priority: item-specific direct → global direct → item-specific reverse → global reverse.
     """
-    from catalog.models import UnitConversion
+    from catalog.conversions import get_conversion_graph
 
-    if item is not None:
-        c = UnitConversion.objects.filter(
-            from_unit=from_unit, to_unit=to_unit, item=item, is_active=True
-        ).first()
-        if c:
-            return c, False
-
-    c = UnitConversion.objects.filter(
-        from_unit=from_unit, to_unit=to_unit, item__isnull=True, is_active=True
-    ).first()
-    if c:
-        return c, False
-
-    if item is not None:
-        c = UnitConversion.objects.filter(
-            from_unit=to_unit, to_unit=from_unit, item=item, is_active=True
-        ).first()
-        if c and c.factor != 0:
-            return c, True
-
-    c = UnitConversion.objects.filter(
-        from_unit=to_unit, to_unit=from_unit, item__isnull=True, is_active=True
-    ).first()
-    if c and c.factor != 0:
-        return c, True
-
-    return None, False
+    item_id = item.pk if item is not None else None
+    return get_conversion_graph().lookup(from_unit.pk, to_unit.pk, item_id)
 
 
 def get_conversion_factor(from_unit, to_unit, item=None) -> Optional[Decimal]:
@@ -56,7 +33,8 @@ def get_conversion_factor(from_unit, to_unit, item=None) -> Optional[Decimal]:
         item: Optional item for item-specific conversions
 
     Returns:
-        Decimal conversion factor or None if not found
+        Decimal conversion factor or None if not found.  Falls back to a
+        multi-hop path (roll → meter → foot) when no direct record exists.
 
     Example:
         From 1 roll to meters: factor = 50 (1 roll = 50 meters)
@@ -67,10 +45,10 @@ def get_conversion_factor(from_unit, to_unit, item=None) -> Optional[Decimal]:
     if from_unit.pk == to_unit.pk:
         return Decimal('1')
 
-    conv, is_reverse = _lookup_conversion_record(from_unit, to_unit, item)
-    if conv is None:
-        return None
-    return Decimal('1') / conv.factor if is_reverse else conv.factor
+    from catalog.conversions import get_conversion_graph
+
+    item_id = item.pk if item is not None else None
+    return get_conversion_graph().factor(from_unit.pk, to_unit.pk, item_id)
 
 
 def convert_price_for_unit(
@@ -109,26 +87,42 @@ def convert_price_for_unit(
     if not base_unit or not selling_unit:
         return Decimal(str(base_price)).quantize(Decimal(10) ** -round_places)
 
-    if base_unit.pk == selling_unit.pk:
-        return Decimal(str(base_price)).quantize(Decimal(10) ** -round_places)
+    from catalog.conversions import get_conversion_graph
+
+    return _convert_price(
+        get_conversion_graph(), base_price, base_unit.pk, selling_unit.pk,
+        item.pk if item is not None else None, round_places, use_conversion_price,
+    )
+
 
+def _convert_price(graph, base_price, base_unit_id, target_unit_id, item_id=None,
+                   round_places: int = 4, use_conversion_price: bool = True) -> Decimal:
+    """Price conversion against an already-resolved ConversionGraph (see convert_price_for_unit)."""
+    quantum = Decimal(10) ** -round_places
     base_price_dec = Decimal(str(base_price))
 
-    conv, is_reverse = _lookup_conversion_record(base_unit, selling_unit, item)
+    if base_unit_id == target_unit_id:
+        return base_price_dec.quantize(quantum)
+
+    conv, is_reverse = graph.lookup(base_unit_id, target_unit_id, item_id)
 
     if conv is None:
-        return base_price_dec.quantize(Decimal(10) ** -round_places)
+        # No direct record — try a chain of conversions (roll → meter → foot).
+        ratio = graph.path_ratio(base_unit_id, target_unit_id, item_id)
+        if ratio is None or ratio[0] == 0:
+            return base_price_dec.quantize(quantum)
+        return (base_price_dec * ratio[1] / ratio[0]).quantize(quantum)
 
     if use_conversion_price and not is_reverse and conv.conversion_price is not None:
-        return conv.conversion_price.quantize(Decimal(10) ** -round_places)
+        return conv.conversion_price.quantize(quantum)
 
     factor = Decimal('1') / conv.factor if is_reverse else conv.factor
 
     if factor == 0:
-        return base_price_dec.quantize(Decimal(10) ** -round_places)
+        return base_price_dec.quantize(quantum)
 
     adjusted_price = base_price_dec / factor
-    return adjusted_price.quantize(Decimal(10) ** -round_places)
+    return adjusted_price.quantize(quantum)
 
 
 def get_item_price_for_unit(item, selling_unit, use_selling_price: bool = True) -> Decimal:
@@ -159,6 +153,57 @@ def get_item_price_for_unit(item, selling_unit, use_selling_price: bool = True)
     return convert_price_for_unit(price, base_unit, selling_unit, item=item)
 
 
+def bulk_convert_prices(items, target_unit, round_places: int = 4) -> dict:
+    """
+    Convert selling price, cost price and conversion factor for many items at once.
+
+    The conversion graph is resolved once for the whole batch, so the cost is
+    independent of the number of items (zero queries when the graph is warm).
+    Items should have ``default_unit`` and ``selling_unit`` loaded
+    (select_related) so ``stock_unit`` does not hit the database.
+
+    Args:
+        items: QuerySet or list of Item objects
+        target_unit: Unit to price in
+        round_places: Decimal places to round converted prices to
+
+    Returns:
+        Dict mapping item.id to {'selling_price', 'cost_price', 'factor'} where
+        the prices match convert_price_for_unit (selling uses conversion_price,
+        cost never does) and factor matches get_conversion_factor (None when
+        the units are not connected).
+    """
+    if not target_unit:
+        return {}
+
+    from catalog.conversions import get_conversion_graph
+
+    graph = get_conversion_graph()
+    target_id = target_unit.pk
+    result = {}
+    for item in items:
+        base_unit = item.stock_unit
+        base_id = base_unit.pk if base_unit else None
+        if base_id is None:
+            result[item.id] = {
+                'selling_price': Decimal(str(item.selling_price)),
+                'cost_price': Decimal(str(item.cost_price or 0)),
+                'factor': None,
+            }
+            continue
+        result[item.id] = {
+            'selling_price': _convert_price(
+                graph, item.selling_price, base_id, target_id, item.pk, round_places,
+            ),
+            'cost_price': _convert_price(
+                graph, item.cost_price or Decimal('0'), base_id, target_id, item.pk,
+                round_places, use_conversion_price=False,
+            ),
+            'factor': graph.factor(base_id, target_id, item.pk),
+        }
+    return result
+
+
 def bulk_get_prices_for_unit(items, selling_unit, use_selling_price: bool = True) -> dict:
     """
     Efficiently get adjusted prices for multiple items.
@@ -171,9 +216,20 @@ def bulk_get_prices_for_unit(items, selling_unit, use_selling_price: bool = True
     Returns:
         Dict mapping item.id to adjusted price (Decimal)
     """
+    if not selling_unit:
+        return {item.id: Decimal('0') for item in items}
+
+    items = list(items)
+    converted = bulk_convert_prices(items, selling_unit)
+    key = 'selling_price' if use_selling_price else 'cost_price'
     result = {}
     for item in items:
-        result[item.id] = get_item_price_for_unit(item, selling_unit, use_selling_price)
+        if item.stock_unit.pk == selling_unit.pk:
+            # Same unit: returned as-is, like get_item_price_for_unit.
+            price = item.selling_price if use_selling_price else item.cost_price
+            result[item.id] = Decimal(str(price))
+        else:
+            result[item.id] = converted[item.id][key]
     return result
 
 
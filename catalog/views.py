@@ -1,7 +1,7 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
 from django.db.models import ProtectedError
 from django.core.paginator import Paginator
 from rest_framework import viewsets
@@ -48,7 +48,7 @@ class UnitConversionViewSet(viewsets.ModelViewSet):
 
 
 class ItemViewSet(viewsets.ModelViewSet):
-    queryset = Item.objects.select_related('category', 'default_unit').all()
+    queryset = Item.objects.select_related('category', 'default_unit', 'selling_unit').all()
     search_fields = ['code', 'name', 'barcode']
     filterset_fields = ['item_type', 'category', 'is_active']
 
@@ -74,9 +74,25 @@ class ItemViewSet(viewsets.ModelViewSet):
                 )
                 available_map = {row['item']: row['available'] for row in balances}
 
+        # Optional target unit: resolved once, prices converted for the whole page
+        target_unit = None
+        target_unit_id = request.query_params.get('unit') or request.query_params.get('unit_id')
+        if target_unit_id:
+            try:
+                target_unit = Unit.objects.filter(pk=int(target_unit_id)).first()
+            except (ValueError, TypeError):
+                target_unit = None
+
         page = self.paginate_queryset(queryset)
         serializer_kwargs = {'context': self.get_serializer_context()}
         serializer_kwargs['context']['available_map'] = available_map
+        serializer_kwargs['context']['target_unit'] = target_unit
+        if target_unit is not None:
+            from catalog.utils import bulk_convert_prices
+            page_items = page if page is not None else list(queryset)
+            serializer_kwargs['context']['price_map'] = bulk_convert_prices(page_items, target_unit)
+            if page is None:
+                queryset = page_items
 
         if page is not None:
             serializer = self.get_serializer(page, many=True, **serializer_kwargs)
@@ -155,10 +171,48 @@ def item_list_view(request):
     })
 
 
+CATALOG_EXPORT_COLUMNS = [
+    ('code', 'Code'),
+    ('name', 'Name'),
+    ('type', 'Type'),
+    ('category', 'Category'),
+    ('default_unit', 'Default Unit'),
+    ('selling_unit', 'Selling Unit'),
+    ('cost_price', 'Cost Price'),
+    ('selling_price', 'Selling Price'),
+    ('barcode', 'Barcode'),
+    ('minimum_stock', 'Min Stock'),
+    ('maximum_stock', 'Max Stock'),
+    ('reorder_point', 'Reorder Point'),
+    ('description', 'Description'),
+    ('status', 'Status'),
+]
+
+
+def _catalog_export_rows(items_qs):
+    for item in items_qs.iterator(chunk_size=2000):
+        yield {
+            'code': item.code,
+            'name': item.name,
+            'type': item.get_item_type_display(),
+            'category': item.category.name if item.category_id else '',
+            'default_unit': item.default_unit.abbreviation if item.default_unit_id else '',
+            'selling_unit': item.selling_unit.abbreviation if item.selling_unit_id else '',
+            'cost_price': item.cost_price or 0,
+            'selling_price': item.selling_price or 0,
+            'barcode': item.barcode or '',
+            'minimum_stock': item.minimum_stock or 0,
+            'maximum_stock': item.maximum_stock or 0,
+            'reorder_point': item.reorder_point or 0,
+            'description': item.description or '',
+            'status': 'Active' if item.is_active else 'Inactive',
+        }
+
+
 @login_required
 def catalog_export_excel_view(request):
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment
+    """Stream the filtered catalog as Excel (default) or, with ?export=csv, CSV."""
+    from reports.exports import csv_response, xlsx_response
 
     items_qs = Item.objects.select_related('category', 'default_unit', 'selling_unit').all()
     item_type = request.GET.get('type', '')
@@ -176,54 +230,10 @@ def catalog_export_excel_view(request):
         )
     items_qs = items_qs.order_by('category__name', 'name')
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Item Catalog'
-
-    header_font = Font(bold=True, color='FFFFFF')
-    header_fill = PatternFill(start_color='1F4E79', end_color='1F4E79', fill_type='solid')
-    center = Alignment(horizontal='center', vertical='center')
-
-    headers = [
-        'Code', 'Name', 'Type', 'Category', 'Default Unit', 'Selling Unit',
-        'Cost Price', 'Selling Price', 'Barcode',
-        'Min Stock', 'Max Stock', 'Reorder Point', 'Description', 'Status',
-    ]
-    ws.append(headers)
-    for idx, _ in enumerate(headers, 1):
-        c = ws.cell(row=1, column=idx)
-        c.font = header_font
-        c.fill = header_fill
-        c.alignment = center
-
-    for item in items_qs:
-        ws.append([
-            item.code,
-            item.name,
-            item.get_item_type_display(),
-            item.category.name if item.category_id else '',
-            item.default_unit.abbreviation if item.default_unit_id else '',
-            item.selling_unit.abbreviation if item.selling_unit_id else '',
-            float(item.cost_price or 0),
-            float(item.selling_price or 0),
-            item.barcode or '',
-            float(item.minimum_stock or 0),
-            float(item.maximum_stock or 0),
-            float(item.reorder_point or 0),
-            item.description or '',
-            'Active' if item.is_active else 'Inactive',
-        ])
-
-    for col in ws.columns:
-        max_len = max((len(str(cell.value or '')) for cell in col), default=8)
-        ws.column_dimensions[col[0].column_letter].width = min(max_len + 4, 42)
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="catalog_items.xlsx"'
-    wb.save(response)
-    return response
+    rows = _catalog_export_rows(items_qs)
+    if request.GET.get('export') == 'csv':
+        return csv_response('catalog_items.csv', CATALOG_EXPORT_COLUMNS, rows)
+    return xlsx_response('catalog_items.xlsx', 'Item Catalog', CATALOG_EXPORT_COLUMNS, rows)
 
 
 @login_required
@@ -2,7 +2,7 @@ from django.contrib import admin
 from core.models import (
     BusinessProfile, SalesChannel, ExpenseCategory, Expense,
     Invoice, InvoiceLine, SupplyCategory, SupplyItem, SupplyMovement,
-    TargetGoal,
+    TargetGoal, DocumentSequence, Job,
 )
 
 
@@ -65,3 +65,20 @@ class SupplyMovementAdmin(admin.ModelAdmin):
 class TargetGoalAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'priority', 'status', 'due_date', 'progress_pct')
     list_filter = ('status', 'priority')
+
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_value', 'updated_at')
+    search_fields = ('name',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'kind', 'status', 'progress_pct', 'message', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = (
+        'kind', 'params', 'dedupe_key', 'status', 'progress_done', 'progress_total',
+        'message', 'output', 'result', 'error', 'worker', 'started_at',
+        'heartbeat_at', 'finished_at', 'created_by',
+    )
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Job handlers register themselves from each app's jobs module.
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('jobs')
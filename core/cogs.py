@@ -1,4 +1,6 @@
+from collections import defaultdict
 from decimal import Decimal
+
 from catalog.utils import calculate_line_cogs_with_conversion
 
 
@@ -9,9 +11,13 @@ def pos_sale_cogs(pos_sale):
     Each line's COGS is calculated as:
     - cost_price adjusted for the line's selling unit / item's stock unit
     - multiplied by the quantity ordered in that unit
+    Lines stamped when the sale was posted use their line_cogs snapshot.
     """
     total = Decimal('0')
     for line in pos_sale.lines.select_related('item', 'unit').all():
+        if line.line_cogs is not None:
+            total += line.line_cogs
+            continue
         cogs = calculate_line_cogs_with_conversion(line.item, line.qty, line.unit)
         total += cogs
     return total
@@ -22,12 +28,16 @@ def sales_order_cogs(sales_order):
     """
     Calculate COGS for a sales order with unit conversions applied.
     
-    Includes both regular lines and price list bundle lines.
+    Includes both regular lines and price list bundle lines.  Lines stamped
+    when the order was approved use their line_cogs snapshot.
     """
     total = Decimal('0')
     
     # Regular order lines
     for line in sales_order.lines.select_related('item', 'unit').all():
+        if line.line_cogs is not None:
+            total += line.line_cogs
+            continue
         cogs = calculate_line_cogs_with_conversion(line.item, line.qty_ordered, line.unit)
         total += cogs
     
@@ -35,6 +45,9 @@ def sales_order_cogs(sales_order):
     for bundle in sales_order.price_list_lines.prefetch_related(
         'price_list__items__item', 'price_list__items__unit'
     ).all():
+        if bundle.line_cogs is not None:
+            total += bundle.line_cogs
+            continue
         for pli in bundle.price_list.items.all():
             item_cogs = calculate_line_cogs_with_conversion(
                 pli.item,
@@ -52,11 +65,15 @@ def service_invoice_cogs(invoice):
     """
     Calculate COGS for a service invoice with unit conversions applied.
     
-    Each service line's COGS is calculated with its unit conversion factor.
+    Each service line's COGS is calculated with its unit conversion factor,
+    or taken from its line_cogs snapshot once the service is completed.
     """
     total = Decimal('0')
     for svc in invoice.customer_services.prefetch_related('lines__item', 'lines__unit').all():
         for line in svc.lines.all():
+            if line.line_cogs is not None:
+                total += line.line_cogs
+                continue
             cogs = calculate_line_cogs_with_conversion(line.item, line.qty, line.unit)
             total += cogs
     return total
@@ -72,3 +89,305 @@ def compute_invoice_cogs(invoice):
     else:
         cogs = service_invoice_cogs(invoice)
     return cogs.quantize(Decimal('0.01'))
+
+
+# ── Bulk engine ──────────────────────────────────────────────────────────────
+
+class UnitCostTable:
+    """
+    Item cost per unit, as get_item_cogs_for_unit computes it, from item
+    rows read in one query and the in-process conversion graph.
+    """
+
+    def __init__(self, item_ids=(), items=()):
+        from catalog.models import Item
+
+        self._graph = None
+        # Items already loaded (e.g. select_related on posted lines) cost no
+        # query; line FKs reach inactive items too, so the rest are read
+        # unfiltered.
+        self._items = {
+            item.pk: (item.cost_price or Decimal('0'), item.selling_unit_id or item.default_unit_id)
+            for item in items
+        }
+        missing = set(item_ids) - set(self._items)
+        if missing:
+            self._items.update(
+                (pk, (cost or Decimal('0'), selling_unit_id or default_unit_id))
+                for pk, cost, default_unit_id, selling_unit_id in Item.all_objects.filter(
+                    pk__in=missing,
+                ).values_list('pk', 'cost_price', 'default_unit_id', 'selling_unit_id')
+            )
+        self._costs = {}
+
+    def unit_cost(self, item_id, unit_id):
+        key = (item_id, unit_id)
+        cost = self._costs.get(key)
+        if cost is None:
+            from catalog.utils import _convert_price
+
+            cost_price, stock_unit_id = self._items[item_id]
+            if stock_unit_id == unit_id:
+                cost = Decimal(str(cost_price))
+            else:
+                if self._graph is None:
+                    from catalog.conversions import get_conversion_graph
+                    self._graph = get_conversion_graph()
+                cost = _convert_price(self._graph, cost_price, stock_unit_id, unit_id, item_id,
+                                      use_conversion_price=False)
+            self._costs[key] = cost
+        return cost
+
+    def line_cogs(self, item_id, qty, unit_id):
+        """calculate_line_cogs_with_conversion for an (item, qty, unit) row."""
+        if item_id is None or unit_id is None:
+            return Decimal('0')
+        return self.unit_cost(item_id, unit_id) * Decimal(str(qty))
+
+
+def bulk_invoice_cogs(invoices):
+    """
+    {invoice pk: COGS} for *invoices*, equal to compute_invoice_cogs() for
+    each, from one query per source line type (POS lines, sales order
+    lines, bundle lines and their price-list items, service lines) plus one
+    for the items of lines without a line_cogs snapshot.  Only pk,
+    pos_sale_id and sales_order_id are read from the invoices.
+    """
+    from pos.models import POSSaleLine
+    from pricing.models import PriceListItem
+    from sales.models import SalesOrderLine, SalesOrderPriceListLine
+    from services.models import ServiceLine
+
+    invoices = list(invoices)
+    if not invoices:
+        return {}
+    pos_ids = {inv.pos_sale_id for inv in invoices if inv.pos_sale_id}
+    so_ids = {inv.sales_order_id for inv in invoices if not inv.pos_sale_id and inv.sales_order_id}
+    service_invoice_ids = [inv.pk for inv in invoices if not inv.pos_sale_id and not inv.sales_order_id]
+
+    def rows(queryset, *fields):
+        return list(queryset.order_by().values_list(*fields)) if queryset is not None else []
+
+    pos_lines = rows(
+        POSSaleLine.objects.filter(sale_id__in=pos_ids) if pos_ids else None,
+        'sale_id', 'item_id', 'qty', 'unit_id', 'line_cogs',
+    )
+    so_lines = rows(
+        SalesOrderLine.objects.filter(sales_order_id__in=so_ids) if so_ids else None,
+        'sales_order_id', 'item_id', 'qty_ordered', 'unit_id', 'line_cogs',
+    )
+    bundles = rows(
+        SalesOrderPriceListLine.objects.filter(sales_order_id__in=so_ids) if so_ids else None,
+        'sales_order_id', 'price_list_id', 'qty_multiplier', 'line_cogs',
+    )
+    # Only bundles without a snapshot are costed from their price-list items.
+    unstamped_lists = {b[1] for b in bundles if b[3] is None}
+    bundle_items = rows(
+        PriceListItem.objects.filter(price_list_id__in=unstamped_lists) if unstamped_lists else None,
+        'price_list_id', 'item_id', 'min_qty', 'unit_id',
+    )
+    service_lines = rows(
+        ServiceLine.objects.filter(service__invoice_id__in=service_invoice_ids) if service_invoice_ids else None,
+        'service__invoice_id', 'item_id', 'qty', 'unit_id', 'line_cogs',
+    )
+
+    # Lines stamped at posting use their line_cogs snapshot; the rest are
+    # costed at the items' current cost.
+    costs = UnitCostTable({
+        row[1] for row in [*pos_lines, *so_lines, *service_lines] if row[4] is None
+    } | {row[1] for row in bundle_items})
+
+    def line_cogs(item_id, qty, unit_id, snapshot=None):
+        return snapshot if snapshot is not None else costs.line_cogs(item_id, qty, unit_id)
+
+    by_pos, by_so, by_service = defaultdict(Decimal), defaultdict(Decimal), defaultdict(Decimal)
+    for sale_id, *line in pos_lines:
+        by_pos[sale_id] += line_cogs(*line)
+    for so_id, *line in so_lines:
+        by_so[so_id] += line_cogs(*line)
+    items_by_list = defaultdict(list)
+    for price_list_id, item_id, qty, unit_id in bundle_items:
+        items_by_list[price_list_id].append((item_id, qty, unit_id))
+    for so_id, price_list_id, multiplier, snapshot in bundles:
+        if snapshot is not None:
+            by_so[so_id] += snapshot
+            continue
+        for item_id, qty, unit_id in items_by_list[price_list_id]:
+            by_so[so_id] += costs.line_cogs(item_id, qty, unit_id) * multiplier
+    for invoice_id, *line in service_lines:
+        by_service[invoice_id] += line_cogs(*line)
+
+    result = {}
+    for inv in invoices:
+        if inv.pos_sale_id:
+            cogs = by_pos[inv.pos_sale_id]
+        elif inv.sales_order_id:
+            cogs = by_so[inv.sales_order_id]
+        else:
+            cogs = by_service[inv.pk]
+        result[inv.pk] = cogs.quantize(Decimal('0.01'))
+    return result
+
+
+
+# ── Posting-time snapshot ────────────────────────────────────────────────────
+
+SNAPSHOT_FIELDS = ['unit_cost', 'line_cogs']
+SNAPSHOT_PLACES = Decimal('0.0001')
+
+
+def stamp_line_costs(lines, qty_field='qty'):
+    """
+    Set the unit_cost / line_cogs snapshot on *lines* (POS, sales order,
+    delivery and service lines, stock moves) from their items' current cost
+    in each line's unit.  Nothing is saved; items already loaded on the
+    lines cost no query.  Returns the stamped lines.
+    """
+    lines = [line for line in lines if line.item_id and line.unit_id]
+    if not lines:
+        return lines
+    loaded = type(lines[0]).item
+    costs = UnitCostTable(
+        {line.item_id for line in lines},
+        items=[line.item for line in lines if loaded.is_cached(line)],
+    )
+    for line in lines:
+        cost = costs.unit_cost(line.item_id, line.unit_id)
+        line.unit_cost = cost.quantize(SNAPSHOT_PLACES)
+        line.line_cogs = (cost * Decimal(str(getattr(line, qty_field)))).quantize(SNAPSHOT_PLACES)
+    return lines
+
+
+def _bundle_set_costs(price_list_ids):
+    """{price list pk: current cost of one set of its items} in two queries."""
+    from pricing.models import PriceListItem
+
+    components = list(
+        PriceListItem.objects.filter(price_list_id__in=set(price_list_ids))
+        .order_by().values_list('price_list_id', 'item_id', 'min_qty', 'unit_id')
+    )
+    costs = UnitCostTable({row[1] for row in components})
+    set_costs = defaultdict(Decimal)
+    for price_list_id, item_id, qty, unit_id in components:
+        set_costs[price_list_id] += costs.line_cogs(item_id, qty, unit_id)
+    return set_costs
+
+
+def stamp_bundle_costs(bundle_lines):
+    """
+    Set the snapshot on sales order bundle lines: unit_cost is the cost of
+    one set of the price list's items, line_cogs that times qty_multiplier.
+    """
+    bundle_lines = list(bundle_lines)
+    if not bundle_lines:
+        return bundle_lines
+    set_costs = _bundle_set_costs(b.price_list_id for b in bundle_lines)
+    for bundle in bundle_lines:
+        cost = set_costs[bundle.price_list_id]
+        bundle.unit_cost = cost.quantize(SNAPSHOT_PLACES)
+        bundle.line_cogs = (cost * bundle.qty_multiplier).quantize(SNAPSHOT_PLACES)
+    return bundle_lines
+
+
+def bundle_cogs(bundle_lines):
+    """{bundle line pk: COGS}: its line_cogs snapshot, or its current cost if not stamped."""
+    bundle_lines = list(bundle_lines)
+    unstamped = [b for b in bundle_lines if b.line_cogs is None]
+    set_costs = _bundle_set_costs(b.price_list_id for b in unstamped) if unstamped else {}
+    return {
+        b.pk: b.line_cogs if b.line_cogs is not None else set_costs[b.price_list_id] * b.qty_multiplier
+        for b in bundle_lines
+    }
+
+
+def line_cogs_by(queryset, key=None, qty_field='qty'):
+    """
+    COGS of the lines in *queryset* (POS, sales order or service lines)
+    grouped by the values() path *key* — {key value: COGS}, or {None: total}
+    without a key.  *key* may be a tuple of paths, giving tuple keys.  One
+    grouped SUM over line_cogs; lines not stamped yet are costed at their
+    items' current cost, which costs a second query only when there are any.
+    """
+    from django.db.models import Count, Q, Sum
+
+    keys = (key,) if isinstance(key, str) else tuple(key or ())
+    stats = dict(total=Sum('line_cogs'), unstamped=Count('pk', filter=Q(line_cogs__isnull=True)))
+    queryset = queryset.order_by()
+    if keys:
+        rows = queryset.values(*keys).annotate(**stats).values_list(*keys, 'total', 'unstamped')
+    else:
+        agg = queryset.aggregate(**stats)
+        rows = [(None, agg['total'], agg['unstamped'])]
+
+    def key_of(row):
+        return tuple(row[:len(keys)]) if len(keys) > 1 else row[0]
+
+    totals = {}
+    missing = False
+    for row in rows:
+        totals[key_of(row)] = row[-2] or Decimal('0')
+        missing = missing or row[-1] > 0
+    if missing:
+        unstamped = list(
+            queryset.filter(line_cogs__isnull=True)
+            .values_list(*(keys or ('pk',)), 'item_id', qty_field, 'unit_id')
+        )
+        costs = UnitCostTable({row[-3] for row in unstamped})
+        for row in unstamped:
+            value = key_of(row) if keys else None
+            totals[value] = totals.get(value, Decimal('0')) + costs.line_cogs(*row[-3:])
+    return totals
+
+
+def stamp_sales_order_costs(sales_order):
+    """Stamp and save the snapshot on a sales order's lines and bundles (on approval)."""
+    from sales.models import SalesOrderLine, SalesOrderPriceListLine
+
+    lines = stamp_line_costs(sales_order.lines.select_related('item'), qty_field='qty_ordered')
+    if lines:
+        SalesOrderLine.objects.bulk_update(lines, SNAPSHOT_FIELDS)
+    bundles = stamp_bundle_costs(sales_order.price_list_lines.all())
+    if bundles:
+        SalesOrderPriceListLine.objects.bulk_update(bundles, SNAPSHOT_FIELDS)
+
+
+def stale_cogs_filter():
+    """
+    Q matching invoices whose COGS may have changed since cogs_synced_at:
+    never synced, or the invoice, its source document, a line's item (cost
+    changes bump Item.updated_at), a bundle price list or the unit
+    conversions changed after it.  Line edits are caught through their
+    document, which is saved with them.
+    """
+    from django.db.models import Exists, F, Max, OuterRef, Q
+
+    from catalog.models import UnitConversion
+    from pos.models import POSSale, POSSaleLine
+    from pricing.models import PriceListItem
+    from sales.models import SalesOrder, SalesOrderLine, SalesOrderPriceListLine
+    from services.models import CustomerService, ServiceLine
+
+    synced = OuterRef('cogs_synced_at')
+    outer_synced = OuterRef(synced)  # from a subquery nested one level deeper
+    stale = (
+        Q(cogs_synced_at__isnull=True)
+        | Q(updated_at__gt=F('cogs_synced_at'))
+        | Exists(POSSale.objects.filter(pk=OuterRef('pos_sale_id'), updated_at__gt=synced))
+        | Exists(POSSaleLine.objects.filter(sale_id=OuterRef('pos_sale_id'), item__updated_at__gt=synced))
+        | Exists(SalesOrder.all_objects.filter(pk=OuterRef('sales_order_id'), updated_at__gt=synced))
+        | Exists(SalesOrderLine.objects.filter(
+            sales_order_id=OuterRef('sales_order_id'), item__updated_at__gt=synced,
+        ))
+        | Exists(SalesOrderPriceListLine.objects.filter(sales_order_id=OuterRef('sales_order_id')).filter(
+            Q(price_list__updated_at__gt=synced)
+            | Exists(PriceListItem.all_objects.filter(
+                price_list_id=OuterRef('price_list_id'),
+            ).filter(Q(updated_at__gt=outer_synced) | Q(item__updated_at__gt=outer_synced)))
+        ))
+        | Exists(CustomerService.objects.filter(invoice_id=OuterRef('pk'), updated_at__gt=synced))
+        | Exists(ServiceLine.objects.filter(service__invoice_id=OuterRef('pk'), item__updated_at__gt=synced))
+    )
+    conversions_changed = UnitConversion.all_objects.aggregate(at=Max('updated_at'))['at']
+    if conversions_changed:
+        stale |= Q(cogs_synced_at__lt=conversions_changed)
+    return stale
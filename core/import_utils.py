@@ -1,37 +1,117 @@
 """
 Reusable CSV import infrastructure.
 Provides base classes and helpers for importing CSV data into Django models.
+
+Importers are set-based (see BulkImporter): the file is streamed in
+batches; for each batch the categories / units / items it mentions are
+loaded in a few queries into Lookup dicts, its rows are validated, and its
+records are committed together — new ones with bulk_create, existing ones
+with one UPDATE of their changed fields.  Per-row errors still come back
+through ImportResult.
 """
+import codecs
 import csv
 import io
+import itertools
 import traceback
+from collections import defaultdict
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
 
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
 from django.http import HttpResponse
+from django.utils import timezone
 
+CSV_CHUNK_SIZE = 64 * 1024
+IMPORT_BATCH_SIZE = 1000
+LOOKUP_CHUNK_SIZE = 500
 
-def parse_csv_upload(uploaded_file):
-    """Parse an uploaded CSV file and return (headers, rows) or raise ValueError."""
+
+def _decoded_chunks(chunks):
+    """
+    Decode byte chunks incrementally: UTF-8 (BOM stripped) unless the first
+    chunk is not valid UTF-8, then latin-1.  Invalid UTF-8 further on
+    switches the rest of the file to latin-1 instead of failing.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b'')
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        yield decoder.decode(first)
+    except UnicodeDecodeError:
+        decoder = codecs.getincrementaldecoder('latin-1')()
+        yield decoder.decode(first)
+    for chunk in chunks:
+        pending = decoder.getstate()[0]
+        try:
+            yield decoder.decode(chunk)
+        except UnicodeDecodeError:
+            data = pending + chunk
+            try:
+                data.decode('utf-8')
+            except UnicodeDecodeError as e:
+                valid = e.start
+            decoder = codecs.getincrementaldecoder('latin-1')()
+            yield data[:valid].decode('utf-8') + decoder.decode(data[valid:])
+    yield decoder.decode(b'', final=True)
+
+
+def _lines(texts):
+    """Split decoded text into lines ending in '\\n', as iterating a StringIO does."""
+    pending = ''
+    for text in texts:
+        pending += text
+        start = 0
+        end = pending.find('\n')
+        while end >= 0:
+            yield pending[start:end + 1]
+            start = end + 1
+            end = pending.find('\n', start)
+        pending = pending[start:]
+    if pending:
+        yield pending
+
+
+def iter_csv_upload(uploaded_file, chunk_size=CSV_CHUNK_SIZE):
+    """
+    Streaming parse_csv_upload(): returns (headers, rows) where rows is an
+    iterator of row dicts decoded from the upload chunk by chunk, so memory
+    does not grow with the file.  Raises ValueError for a missing, non-CSV
+    or empty file; rows raises ValueError for a row the csv module rejects.
+    """
     if not uploaded_file:
         raise ValueError('No file was uploaded.')
     if not uploaded_file.name.lower().endswith('.csv'):
         raise ValueError('Only CSV files are accepted.')
-    try:
-        decoded = uploaded_file.read().decode('utf-8-sig')
-    except UnicodeDecodeError:
-        try:
-            uploaded_file.seek(0)
-            decoded = uploaded_file.read().decode('latin-1')
-        except Exception:
-            raise ValueError('Could not decode the file. Please save it as UTF-8 CSV.')
 
-    reader = csv.DictReader(io.StringIO(decoded))
-    headers = reader.fieldnames or []
-    rows = list(reader)
-    if not rows:
+    reader = csv.DictReader(_lines(_decoded_chunks(uploaded_file.chunks(chunk_size))))
+    try:
+        headers = reader.fieldnames or []
+        first = next(reader, None)
+    except csv.Error as e:
+        raise ValueError(f'Could not read the CSV file: {e}')
+    if first is None:
         raise ValueError('The CSV file is empty (no data rows found).')
-    return headers, rows
+
+    def rows():
+        yield first
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                raise ValueError(f'Could not read line {reader.line_num} of the CSV file: {e}')
+            yield row
+
+    return headers, rows()
+
+
+def parse_csv_upload(uploaded_file):
+    """Parse an uploaded CSV file and return (headers, rows) or raise ValueError."""
+    headers, rows = iter_csv_upload(uploaded_file)
+    return headers, list(rows)
 
 
 def normalize_header(h):
@@ -144,3 +224,264 @@ class ImportResult:
             'errors': self.errors,
             'warnings': self.warnings,
         }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SET-BASED IMPORT ENGINE
+# ═══════════════════════════════════════════════════════════════════════════
+
+def normalize_row(row):
+    """CSV row keyed by normalize_header(), values stripped, empty cells dropped."""
+    return {normalize_header(k): v.strip() for k, v in row.items() if k and v}
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def get_or_create_unique(model, defaults=None, **lookup):
+    """get_or_create() that reports a lost race on a unique field as (existing or None, False)."""
+    try:
+        with transaction.atomic():
+            return model.objects.get_or_create(defaults=defaults, **lookup)
+    except IntegrityError:
+        return model.objects.filter(**lookup).first(), False
+
+
+class ImportRowError(Exception):
+    """Raised by BulkImporter.build() to reject a row with a message."""
+
+
+class Lookup:
+    """
+    Case-insensitive index of model instances by one or more fields.
+
+    get() tries the fields in order and, like filter(field__iexact=v).first(),
+    returns the first instance in queryset order.  Lookup(queryset, *fields)
+    indexes a whole (small) table; Lookup.matching() loads only the rows
+    whose fields match values taken from the file.
+    """
+
+    def __init__(self, queryset=None, *fields):
+        self.fields = fields
+        self.index = {field: {} for field in fields}
+        self.aliases = {}
+        if queryset is not None:
+            for obj in queryset:
+                self.add(obj)
+
+    @classmethod
+    def matching(cls, queryset, values_by_field):
+        """Index the rows of *queryset* matching {field: values} case-insensitively."""
+        lookup = cls(None, *values_by_field)
+        for field, values in values_by_field.items():
+            # Both spellings: SQLite's LOWER() only folds ASCII.
+            keys = sorted({v for v in values if v} | {v.lower() for v in values if v})
+            for chunk in chunked(keys, LOOKUP_CHUNK_SIZE):
+                rows = queryset.annotate(lookup_key=Lower(field)).filter(lookup_key__in=chunk)
+                for obj in rows:
+                    lookup.add(obj, field)
+        return lookup
+
+    def add(self, obj, field=None):
+        for name in (field,) if field else self.fields:
+            value = getattr(obj, name)
+            if value:
+                self.index[name].setdefault(str(value).lower(), obj)
+
+    def alias(self, value, obj):
+        """Make get(value) return *obj* from now on."""
+        self.aliases[value.lower()] = obj
+
+    def get(self, value, *fields):
+        if not value:
+            return None
+        key = value.lower()
+        for field in fields or self.fields:
+            obj = self.index[field].get(key)
+            if obj is not None:
+                return obj
+        return None if fields else self.aliases.get(key)
+
+
+class BulkImporter:
+    """
+    Set-based CSV import.  run(rows) takes the rows of iter_csv_upload()
+    (or any iterable of row dicts) and works through them batch_size rows
+    at a time, so memory is bounded by the batch, not the file:
+
+      1. start() runs once first, e.g. to load small reference tables;
+      2. prepare(rows) loads the records one batch refers to, in a few
+         queries (rows are normalize_row() dicts);
+      3. build(row_num, norm) turns each row into (instance, created), or
+         raises ImportRowError; None skips a blank row.  Rows of the same
+         record in a batch return the same instance, so the last one wins;
+      4. write(objs) saves the batch's instances in one transaction,
+         normally with save_records().  When that fails, the records are
+         written one at a time so only the offending rows are reported;
+      5. finish() runs once at the end.
+
+    Set fields with assign() so save_records() knows what changed: new
+    records go out with bulk_create, existing ones get one UPDATE of their
+    changed fields (bulk_update's CASE per row is slow on large batches)
+    and unchanged ones none.
+
+    Bulk writes send no post_save: *invalidate_groups* are the dashboard
+    groups (theme.metrics) the saves would have invalidated.
+    """
+    batch_size = IMPORT_BATCH_SIZE
+    invalidate_groups = ()
+
+    def __init__(self, user=None):
+        self.user = user
+        self.result = ImportResult()
+        self.changed = defaultdict(set)   # id(instance) -> changed field names
+
+    def start(self):
+        pass
+
+    def prepare(self, rows):
+        pass
+
+    def build(self, row_num, norm):
+        raise NotImplementedError
+
+    def write(self, objs):
+        raise NotImplementedError
+
+    def finish(self):
+        if self.invalidate_groups and self.result.success_count:
+            from theme.metrics import invalidate
+            groups = self.invalidate_groups
+            transaction.on_commit(lambda: invalidate(*groups))
+
+    def assign(self, obj, values):
+        """Set {field: value} on *obj*, remembering the fields whose value changed."""
+        for name, value in values.items():
+            field = obj._meta.get_field(name)
+            current = getattr(obj, field.attname)
+            new = value.pk if field.is_relation and value is not None else value
+            if current != new:
+                self.changed[id(obj)].add(name)
+            setattr(obj, name, value)
+
+    def save_records(self, model, objs):
+        """bulk_create the new instances, UPDATE the changed fields of the others."""
+        new = [obj for obj in objs if obj._state.adding]
+        new_ids = {id(obj) for obj in new}
+        model._base_manager.bulk_create(new)
+        now = timezone.now()
+        for obj in objs:
+            changed = self.changed.get(id(obj))
+            if not changed or id(obj) in new_ids:
+                continue
+            values = {name: getattr(obj, name) for name in changed}
+            if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+                values['updated_at'] = now
+            model._base_manager.filter(pk=obj.pk).update(**values)
+
+    def resolve(self, lookup, value, row_num, create, warning):
+        """
+        lookup.get(value), else create(value) -> (obj, created), done once
+        per new value; *warning* is added on the row that created it.
+        """
+        obj = lookup.get(value)
+        if obj is None and value:
+            obj, created = create(value)
+            if obj is None:
+                return None
+            lookup.add(obj)
+            lookup.alias(value, obj)
+            if created:
+                self.result.add_warning(row_num, warning)
+        return obj
+
+    def reject(self, row_num, message, row):
+        self.result.add_error(row_num, message, row)
+        self.result.skipped += 1
+
+    def run(self, rows):
+        self.start()
+        batch = []
+        for row_num, row in self._numbered(rows):
+            batch.append((row_num, row))
+            if len(batch) == self.batch_size:
+                self._run_batch(batch)
+                batch = []
+        if batch:
+            self._run_batch(batch)
+        self.finish()
+        return self.result
+
+    def _numbered(self, rows):
+        rows = iter(rows)
+        for row_num in itertools.count(2):
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            except ValueError as e:
+                # The file cannot be read past this point.
+                self.result.add_error(row_num, str(e))
+                return
+            yield row_num, row
+
+    def _run_batch(self, batch):
+        numbered = []
+        for row_num, row in batch:
+            try:
+                numbered.append((row_num, row, normalize_row(row)))
+            except Exception as e:
+                self.reject(row_num, str(e), row)
+        self.prepare([norm for _, _, norm in numbered])
+
+        # id(instance) -> [instance, [(row_num, row, created), ...]]
+        records = {}
+        for row_num, row, norm in numbered:
+            try:
+                built = self.build(row_num, norm)
+            except Exception as e:
+                self.reject(row_num, str(e), row)
+                continue
+            if built is None:
+                self.result.skipped += 1
+                continue
+            obj, created = built
+            records.setdefault(id(obj), [obj, []])[1].append((row_num, row, created))
+
+        records = list(records.values())
+        if not records:
+            return
+        try:
+            with transaction.atomic():
+                self.write([obj for obj, _ in records])
+        except Exception:
+            for obj, entries in records:
+                self._forget_insert(obj, entries)
+                try:
+                    with transaction.atomic():
+                        self.write([obj])
+                except Exception as e:
+                    self._forget_insert(obj, entries)
+                    for row_num, row, _ in entries:
+                        self.reject(row_num, str(e), row)
+                else:
+                    self._count(entries)
+        else:
+            for _, entries in records:
+                self._count(entries)
+        self.changed.clear()
+
+    def _forget_insert(self, obj, entries):
+        # A rolled-back bulk_create may already have set pks on new records.
+        if entries[0][2]:
+            obj.pk = None
+            obj._state.adding = True
+
+    def _count(self, entries):
+        for _, _, created in entries:
+            if created:
+                self.result.created += 1
+            else:
+                self.result.updated += 1
@@ -6,18 +6,13 @@ CSV Import views for all modules:
   4. Supply Items (Inventory)
   5. Procurement (Stock-In / Supply Movements)
 """
-import traceback
-from decimal import Decimal
-
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import transaction, IntegrityError
-from django.utils import timezone
 
-from core.import_utils import (
-    parse_csv_upload, normalize_header, safe_decimal, safe_date,
-    safe_int, generate_csv_template, ImportResult,
+from core.import_utils import iter_csv_upload, parse_csv_upload, generate_csv_template, ImportResult
+from core.importers import (
+    CatalogImporter, ExpenseImporter, SupplyImporter, import_sales_orders, import_stock_in,
 )
 
 
@@ -62,115 +57,13 @@ def catalog_import(request):
             'cancel_url': '/catalog/items/',
         })
 
-    from catalog.models import Item, Category, Unit, ItemType
-
     result = ImportResult()
     try:
-        headers, rows = parse_csv_upload(request.FILES.get('csv_file'))
+        headers, rows = iter_csv_upload(request.FILES.get('csv_file'))
     except ValueError as e:
         result.add_error(1, str(e))
-        return render(request, 'core/import_summary_modal.html', {
-            'result': result,
-            'cancel_url': '/catalog/items/',
-        })
-
-    # Process each row individually with savepoint to prevent full rollback
-    for i, row in enumerate(rows, start=2):
-        try:
-            with transaction.atomic():
-                norm = {normalize_header(k): v.strip() for k, v in row.items() if v}
-
-                code = norm.get('item_code_sku', '').strip()
-                name = norm.get('product___service_name', '').strip()
-                if not code and not name:
-                    result.skipped += 1
-                    continue
-                if not code:
-                    result.add_error(i, 'Item Code (SKU) is required.', row)
-                    result.skipped += 1
-                    continue
-
-                # Resolve category
-                cat_name = norm.get('category', '')
-                category = None
-                if cat_name:
-                    category = Category.objects.filter(name__iexact=cat_name).first()
-                    if not category:
-                        category = Category.objects.filter(code__iexact=cat_name).first()
-                    if not category:
-                        cat_code = cat_name[:30].upper().replace(' ', '_')
-                        try:
-                            category, created_cat = Category.objects.get_or_create(
-                                code=cat_code,
-                                defaults={'name': cat_name},
-                            )
-                        except IntegrityError:
-                            category = Category.objects.filter(code=cat_code).first()
-                            created_cat = False
-                        if created_cat:
-                            result.add_warning(i, f'Created new category: {cat_name}')
-
-                # Resolve unit
-                unit_name = norm.get('unit', 'pcs')
-                unit = Unit.objects.filter(abbreviation__iexact=unit_name).first()
-                if not unit:
-                    unit = Unit.objects.filter(name__iexact=unit_name).first()
-                if not unit:
-                    abbr = unit_name[:10].lower()
-                    try:
-                        unit, created_unit = Unit.objects.get_or_create(
-                            abbreviation=abbr,
-                            defaults={'name': unit_name},
-                        )
-                    except IntegrityError:
-                        unit = Unit.objects.filter(abbreviation=abbr).first()
-                        created_unit = False
-                    if created_unit:
-                        result.add_warning(i, f'Created new unit: {unit_name}')
-
-                # Resolve item type
-                item_type_raw = norm.get('item_type', 'RAW').upper()
-                if item_type_raw in ('RAW', 'RAW MATERIAL'):
-                    item_type = ItemType.RAW
-                elif item_type_raw in ('FINISHED', 'FINISHED PRODUCT'):
-                    item_type = ItemType.FINISHED
-                elif item_type_raw in ('SERVICE',):
-                    item_type = ItemType.SERVICE
-                else:
-                    result.add_error(i, f'Invalid Item Type "{item_type_raw}". Use RAW, FINISHED, or SERVICE.', row)
-                    result.skipped += 1
-                    continue
-
-                defaults = {
-                    'name': name or code,
-                    'item_type': item_type,
-                    'category': category or Category.objects.first(),
-                    'default_unit': unit,
-                    'barcode': norm.get('barcode', ''),
-                    'description': norm.get('description', ''),
-                    'cost_price': safe_decimal(norm.get('item_cost')),
-                    'selling_price': safe_decimal(norm.get('item_selling_price')),
-                    'minimum_stock': safe_decimal(norm.get('minimum_stock')),
-                    'maximum_stock': safe_decimal(norm.get('maximum_stock')),
-                    'reorder_point': safe_decimal(norm.get('reorder_point')),
-                }
-
-                if not defaults['category']:
-                    result.add_error(i, 'No category found and none exists in the system.', row)
-                    result.skipped += 1
-                    continue
-
-                obj, created = Item.objects.update_or_create(
-                    code=code, defaults=defaults
-                )
-                if created:
-                    result.created += 1
-                else:
-                    result.updated += 1
-
-        except Exception as e:
-            result.add_error(i, str(e), row)
-            result.skipped += 1
+    else:
+        result = CatalogImporter(request.user).run(rows)
 
     return render(request, 'core/import_summary_modal.html', {
         'result': result,
@@ -202,78 +95,13 @@ def expense_import(request):
             'cancel_url': '/expenses/',
         })
 
-    from core.models import Expense, ExpenseCategory, ExpenseStatus
-
     result = ImportResult()
     try:
-        headers, rows = parse_csv_upload(request.FILES.get('csv_file'))
+        headers, rows = iter_csv_upload(request.FILES.get('csv_file'))
     except ValueError as e:
         result.add_error(1, str(e))
-        return render(request, 'core/import_summary_modal.html', {
-            'result': result,
-            'cancel_url': '/core/expenses/',
-        })
-
-    for i, row in enumerate(rows, start=2):
-        try:
-            with transaction.atomic():
-                norm = {normalize_header(k): v.strip() for k, v in row.items() if v}
-
-                date_val = safe_date(norm.get('purchase_date', ''))
-                if not date_val:
-                    result.add_error(i, 'Purchase Date is required or invalid format.', row)
-                    result.skipped += 1
-                    continue
-
-                amount = safe_decimal(norm.get('total_cost'))
-                if amount <= 0:
-                    result.add_error(i, 'Total Cost must be greater than 0.', row)
-                    result.skipped += 1
-                    continue
-
-                # Resolve category
-                cat_name = norm.get('category', 'General')
-                category = ExpenseCategory.objects.filter(name__iexact=cat_name).first()
-                if not category:
-                    category = ExpenseCategory.objects.filter(code__iexact=cat_name).first()
-                if not category:
-                    cat_code = cat_name[:30].upper().replace(' ', '_')
-                    try:
-                        category, created_cat = ExpenseCategory.objects.get_or_create(
-                            code=cat_code,
-                            defaults={'name': cat_name},
-                        )
-                    except IntegrityError:
-                        category = ExpenseCategory.objects.filter(code=cat_code).first()
-                        created_cat = False
-                    if created_cat:
-                        result.add_warning(i, f'Created new expense category: {cat_name}')
-
-                # Resolve status
-                status_raw = norm.get('status', 'PAID').upper()
-                status = ExpenseStatus.PAID
-                for choice in ExpenseStatus.choices:
-                    if status_raw in (choice[0], choice[1].upper()):
-                        status = choice[0]
-                        break
-
-                expense = Expense.objects.create(
-                    date=date_val,
-                    category=category,
-                    item_description=norm.get('item_description', ''),
-                    amount=amount,
-                    status=status,
-                    vendor=norm.get('vendor_name', ''),
-                    business_address=norm.get('business_address', ''),
-                    reference_no=norm.get('reference_no', ''),
-                    memo=norm.get('notes', ''),
-                    created_by=request.user,
-                )
-                result.created += 1
-
-        except Exception as e:
-            result.add_error(i, str(e), row)
-            result.skipped += 1
+    else:
+        result = ExpenseImporter(request.user).run(rows)
 
     return render(request, 'core/import_summary_modal.html', {
         'result': result,
@@ -306,144 +134,13 @@ def sales_order_import(request):
             'cancel_url': '/sales/orders/',
         })
 
-    from catalog.models import Item, Unit
-    from partners.models import Customer
-    from warehouses.models import Warehouse
-    from sales.models import SalesOrder, SalesOrderLine, PaymentStatus
-    from core.models import SalesChannel, DocumentStatus
-
     result = ImportResult()
     try:
         headers, rows = parse_csv_upload(request.FILES.get('csv_file'))
     except ValueError as e:
         result.add_error(1, str(e))
-        return render(request, 'core/import_summary_modal.html', {
-            'result': result,
-            'cancel_url': '/sales/orders/',
-        })
-
-    # Group rows by receipt_no or customer+date to create one SO per group
-    groups = {}
-    for i, row in enumerate(rows, start=2):
-        norm = {normalize_header(k): v.strip() for k, v in row.items() if v}
-        receipt = norm.get('receipt_no', '')
-        cust = norm.get('customer_name', '')
-        date_str = norm.get('billing_date', '')
-        key = receipt or f"{cust}_{date_str}_{i}"
-        if key not in groups:
-            groups[key] = {'meta': norm, 'lines': [], 'row_start': i}
-        groups[key]['lines'].append((i, norm))
-
-    default_warehouse = Warehouse.objects.first()
-    if not default_warehouse:
-        result.add_error(1, 'No warehouse exists. Please create one first.')
-        return render(request, 'core/import_summary_modal.html', {
-            'result': result,
-            'cancel_url': '/sales/orders/',
-        })
-
-    for key, group in groups.items():
-        meta = group['meta']
-        row_start = group['row_start']
-        try:
-            with transaction.atomic():
-                date_val = safe_date(meta.get('billing_date', ''))
-                if not date_val:
-                    result.add_error(row_start, 'Billing Date is required or invalid.', meta)
-                    result.skipped += len(group['lines'])
-                    continue
-
-                # Resolve customer
-                cust_name = meta.get('customer_name', 'Walk-in')
-                customer = Customer.objects.filter(name__iexact=cust_name).first()
-                if not customer:
-                    cust_code = cust_name[:30].upper().replace(' ', '-')
-                    customer, _ = Customer.objects.get_or_create(
-                        code=cust_code,
-                        defaults={'name': cust_name, 'address': meta.get('business_address', '')}
-                    )
-                    result.add_warning(row_start, f'Created new customer: {cust_name}')
-
-                # Resolve payment status
-                ps_raw = meta.get('payment_status', 'UNPAID').upper()
-                payment_status = PaymentStatus.UNPAID
-                for choice in PaymentStatus.choices:
-                    if ps_raw in (choice[0], choice[1].upper()):
-                        payment_status = choice[0]
-                        break
-
-                # Resolve sales channel
-                channel_name = meta.get('sales_channel', '')
-                channel = None
-                if channel_name:
-                    channel = SalesChannel.objects.filter(name__iexact=channel_name).first()
-                    if not channel:
-                        ch_code = channel_name[:30].upper().replace(' ', '_')
-                        try:
-                            channel, created_ch = SalesChannel.objects.get_or_create(
-                                code=ch_code,
-                                defaults={'name': channel_name},
-                            )
-                        except IntegrityError:
-                            channel = SalesChannel.objects.filter(code=ch_code).first()
-                            created_ch = False
-                        if created_ch:
-                            result.add_warning(row_start, f'Created new sales channel: {channel_name}')
-
-                # Generate document number
-                from django.utils.timezone import now
-                ts = now().strftime('%Y%m%d%H%M%S')
-                import random
-                doc_num = f"SO-IMP-{ts}-{random.randint(1000,9999)}"
-
-                so = SalesOrder.objects.create(
-                    document_number=doc_num,
-                    customer=customer,
-                    warehouse=default_warehouse,
-                    order_date=date_val,
-                    payment_status=payment_status,
-                    sales_channel=channel,
-                    receipt_no=meta.get('receipt_no', ''),
-                    shipping_address=meta.get('business_address', ''),
-                    notes=meta.get('notes', ''),
-                    status=DocumentStatus.DRAFT,
-                    created_by=request.user,
-                )
-
-                for line_i, line_norm in group['lines']:
-                    item_code = line_norm.get('item_code_sku', '')
-                    item_name = line_norm.get('product___service_name', '')
-
-                    item = None
-                    if item_code:
-                        item = Item.objects.filter(code__iexact=item_code).first()
-                    if not item and item_name:
-                        item = Item.objects.filter(name__iexact=item_name).first()
-                    if not item:
-                        result.add_error(line_i, f'Item not found: {item_code or item_name}. Skipping line.', line_norm)
-                        continue
-
-                    qty = safe_decimal(line_norm.get('quantity', '1'))
-                    price = safe_decimal(line_norm.get('item_price'))
-                    if price <= 0:
-                        price = item.selling_price
-                    discount_pct = safe_decimal(line_norm.get('discount_pct', '0'))
-
-                    SalesOrderLine.objects.create(
-                        sales_order=so,
-                        item=item,
-                        qty_ordered=qty,
-                        unit=item.stock_unit,
-                        unit_price=price,
-                        discount_value=safe_decimal(line_norm.get('discount_pct', '0')),
-                        notes=line_norm.get('notes', ''),
-                    )
-
-                result.created += 1
-
-        except Exception as e:
-            result.add_error(row_start, str(e), meta)
-            result.skipped += 1
+    else:
+        result = import_sales_orders(rows, request.user)
 
     return render(request, 'core/import_summary_modal.html', {
         'result': result,
@@ -477,73 +174,13 @@ def supply_import(request):
             'cancel_url': '/supplies/',
         })
 
-    from core.models import SupplyItem, SupplyCategory
-
     result = ImportResult()
     try:
-        headers, rows = parse_csv_upload(request.FILES.get('csv_file'))
+        headers, rows = iter_csv_upload(request.FILES.get('csv_file'))
     except ValueError as e:
         result.add_error(1, str(e))
-        return render(request, 'core/import_summary_modal.html', {
-            'result': result,
-            'cancel_url': '/supplies/',
-        })
-
-    for i, row in enumerate(rows, start=2):
-        try:
-            with transaction.atomic():
-                norm = {normalize_header(k): v.strip() for k, v in row.items() if v}
-
-                name = norm.get('product_name', '').strip()
-                code = norm.get('item_code', '').strip()
-                if not code and not name:
-                    result.skipped += 1
-                    continue
-                if not code:
-                    code = name[:50].upper().replace(' ', '-')
-
-                # Resolve category
-                cat_name = norm.get('category', '')
-                category = None
-                if cat_name:
-                    category = SupplyCategory.objects.filter(name__iexact=cat_name).first()
-                    if not category:
-                        cat_code = cat_name[:30].upper().replace(' ', '_')
-                        try:
-                            category, created_cat = SupplyCategory.objects.get_or_create(
-                                code=cat_code,
-                                defaults={'name': cat_name},
-                            )
-                        except IntegrityError:
-                            category = SupplyCategory.objects.filter(code=cat_code).first()
-                            created_cat = False
-                        if created_cat:
-                            result.add_warning(i, f'Created new supply category: {cat_name}')
-
-                defaults = {
-                    'name': name or code,
-                    'category': category,
-                    'supplier_brand': norm.get('supplier_brand', norm.get('supplier', '')),
-                    'units_per_piece': safe_decimal(norm.get('units_per_piece', '1'), Decimal('1')),
-                    'unit': norm.get('units', 'pcs'),
-                    'cost_per_unit': safe_decimal(norm.get('item_cost')),
-                    'current_stock': safe_decimal(norm.get('available_stocks')),
-                    'low_stock_alert_level': safe_decimal(norm.get('low_stock_alert_level')),
-                    'minimum_stock': safe_decimal(norm.get('minimum_stock')),
-                    'notes': norm.get('notes', ''),
-                }
-
-                obj, created = SupplyItem.objects.update_or_create(
-                    code=code, defaults=defaults
-                )
-                if created:
-                    result.created += 1
-                else:
-                    result.updated += 1
-
-        except Exception as e:
-            result.add_error(i, str(e), row)
-            result.skipped += 1
+    else:
+        result = SupplyImporter(request.user).run(rows)
 
     return render(request, 'core/import_summary_modal.html', {
         'result': result,
@@ -578,233 +215,13 @@ def procurement_import(request):
             'cancel_url': '/procurement/goods-receipts/',
         })
 
-    from catalog.models import Item, Unit as CatalogUnit
-    from procurement.models import (
-        GoodsReceipt, GoodsReceiptLine,
-        PurchaseOrder, PurchaseOrderLine,
-    )
-    from partners.models import Supplier
-    from warehouses.models import Warehouse, Location
-    from core.models import DocumentStatus
-    from inventory.services import post_goods_receipt, generate_document_number
-
     result = ImportResult()
     try:
         headers, rows = parse_csv_upload(request.FILES.get('csv_file'))
     except ValueError as e:
         result.add_error(1, str(e))
-        return render(request, 'core/import_summary_modal.html', {
-            'result': result,
-            'cancel_url': '/procurement/goods-receipts/',
-        })
-
-    # Resolve defaults (first active warehouse / first supplier) used as fallback
-    default_warehouse = Warehouse.objects.first()
-    default_supplier = Supplier.objects.first()
-
-    # Group rows into GRN batches: one GRN per (date, warehouse, supplier)
-    # We process each row individually but group them into GRNs
-    from collections import defaultdict
-    grn_groups = defaultdict(list)  # key -> list of (i, norm, row)
-
-    for i, row in enumerate(rows, start=2):
-        norm = {normalize_header(k): v.strip() for k, v in row.items() if v}
-        date_val = safe_date(norm.get('stock-in_date', norm.get('stockin_date', norm.get('stock_in_date', ''))))
-        if not date_val:
-            result.add_error(i, 'Stock-In Date is required or invalid format.', row)
-            result.skipped += 1
-            continue
-
-        # Resolve warehouse
-        wh_val = norm.get('warehouse', '').strip()
-        warehouse = None
-        if wh_val:
-            warehouse = Warehouse.objects.filter(code__iexact=wh_val).first() or \
-                        Warehouse.objects.filter(name__iexact=wh_val).first()
-        if not warehouse:
-            warehouse = default_warehouse
-        if not warehouse:
-            result.add_error(i, 'No warehouse found and no default warehouse exists.', row)
-            result.skipped += 1
-            continue
-
-        # Resolve supplier
-        sup_val = norm.get('supplier', '').strip()
-        supplier = None
-        if sup_val:
-            supplier = Supplier.objects.filter(name__iexact=sup_val).first() or \
-                       Supplier.objects.filter(code__iexact=sup_val).first()
-        if not supplier:
-            supplier = default_supplier
-        if not supplier:
-            result.add_error(i, 'No supplier found and no default supplier exists.', row)
-            result.skipped += 1
-            continue
-
-        grn_key = (date_val, warehouse.pk, supplier.pk)
-        grn_groups[grn_key].append((i, norm, row, warehouse, supplier, date_val))
-
-    # Process each GRN group
-    for grn_key, line_entries in grn_groups.items():
-        date_val, wh_pk, sup_pk = grn_key
-        warehouse = line_entries[0][3]
-        supplier = line_entries[0][4]
-
-        try:
-            with transaction.atomic():
-                # Get default location for this warehouse
-                default_location = Location.objects.filter(
-                    warehouse=warehouse, is_active=True
-                ).first()
-
-                # Build GRN lines first; validate all before creating GRN
-                grn_lines_data = []
-                for (i, norm, row, _wh, _sup, _dt) in line_entries:
-                    item_name = norm.get('product_name', '').strip()
-                    item_code = norm.get('item_code', '').strip()
-
-                    # Resolve catalog item — name first, code fallback, partial fallback
-                    catalog_item = None
-                    suggestion = None
-                    if item_name:
-                        catalog_item = Item.objects.filter(name__iexact=item_name).first()
-                    if not catalog_item and item_code:
-                        catalog_item = Item.objects.filter(code__iexact=item_code).first()
-                    if not catalog_item and item_name:
-                        partial_qs = Item.objects.filter(name__icontains=item_name)
-                        if partial_qs.count() == 1:
-                            catalog_item = partial_qs.first()
-                        elif partial_qs.exists():
-                            suggestion = ', '.join(partial_qs.values_list('name', flat=True)[:5])
-
-                    if not catalog_item:
-                        tried = []
-                        if item_name:
-                            tried.append(f'name "{item_name}"')
-                        if item_code:
-                            tried.append(f'code "{item_code}"')
-                        tried_str = ' and '.join(tried) if tried else '(no name or code provided)'
-                        msg = f'Item not found by {tried_str}.'
-                        if suggestion:
-                            msg += f' Close matches: {suggestion}'
-                        result.add_error(i, msg, row)
-                        result.skipped += 1
-                        continue
-
-                    qty = safe_decimal(norm.get('qty', norm.get('stocks_added', '0')))
-                    if qty <= 0:
-                        result.add_error(i, 'Qty must be greater than 0.', row)
-                        result.skipped += 1
-                        continue
-
-                    # Resolve unit
-                    unit_val = norm.get('unit', '').strip()
-                    unit = None
-                    if unit_val:
-                        unit = CatalogUnit.objects.filter(abbreviation__iexact=unit_val).first() or \
-                               CatalogUnit.objects.filter(name__iexact=unit_val).first()
-                    if not unit:
-                        unit = catalog_item.stock_unit
-
-                    # Resolve location
-                    loc_val = norm.get('location', '').strip()
-                    location = None
-                    if loc_val:
-                        location = Location.objects.filter(
-                            warehouse=warehouse, code__iexact=loc_val
-                        ).first()
-                    if not location:
-                        location = default_location
-                    if not location:
-                        result.add_error(i, f'No location found for warehouse "{warehouse.code}".', row)
-                        result.skipped += 1
-                        continue
-
-                    unit_cost = safe_decimal(norm.get('unit_cost', '0'))
-
-                    grn_lines_data.append({
-                        'item': catalog_item,
-                        'location': location,
-                        'qty': qty,
-                        'unit': unit,
-                        'unit_cost': unit_cost,
-                        'notes': norm.get('notes', ''),
-                        'row_num': i,
-                    })
-
-                if not grn_lines_data:
-                    continue
-
-                # ── Step 1: Create a Purchase Order (APPROVED) ──────────────
-                # Every import stock-in must originate from a PO so that
-                # qty_received tracking, cost averaging, and audit trails work
-                # correctly. We create the PO as APPROVED (already authorised)
-                # since the goods are being received immediately.
-                po = PurchaseOrder.objects.create(
-                    document_number=generate_document_number('PO', PurchaseOrder),
-                    supplier=supplier,
-                    warehouse=warehouse,
-                    order_date=date_val,
-                    expected_date=date_val,
-                    status=DocumentStatus.APPROVED,
-                    notes=f'Auto-generated from CSV import on {date_val}',
-                    created_by=request.user,
-                    approved_by=request.user,
-                    approved_at=timezone.now(),
-                )
-
-                # Create PO lines — one per unique item (merge duplicates by sum)
-                po_line_map = {}  # item.pk -> PurchaseOrderLine
-                for line_data in grn_lines_data:
-                    item_pk = line_data['item'].pk
-                    if item_pk in po_line_map:
-                        existing = po_line_map[item_pk]
-                        existing.qty_ordered += line_data['qty']
-                        existing.save(update_fields=['qty_ordered'])
-                    else:
-                        po_line = PurchaseOrderLine.objects.create(
-                            purchase_order=po,
-                            item=line_data['item'],
-                            qty_ordered=line_data['qty'],
-                            qty_received=Decimal('0'),
-                            unit=line_data['unit'],
-                            unit_price=line_data['unit_cost'],
-                        )
-                        po_line_map[item_pk] = po_line
-
-                # ── Step 2: Create GRN linked to the PO ─────────────────────
-                grn = GoodsReceipt.objects.create(
-                    document_number=generate_document_number('GRN', GoodsReceipt),
-                    purchase_order=po,
-                    supplier=supplier,
-                    warehouse=warehouse,
-                    receipt_date=date_val,
-                    notes=f'Imported via CSV on {date_val}',
-                    created_by=request.user,
-                )
-
-                # Create GRN lines
-                for line_data in grn_lines_data:
-                    GoodsReceiptLine.objects.create(
-                        goods_receipt=grn,
-                        item=line_data['item'],
-                        location=line_data['location'],
-                        qty=line_data['qty'],
-                        unit=line_data['unit'],
-                        notes=line_data['notes'],
-                    )
-
-                # ── Step 3: Post the GRN ─────────────────────────────────────
-                # post_goods_receipt will: create StockMoves, update
-                # StockBalances, update po_line.qty_received, and recalculate
-                # item.cost_price via weighted average using po_line.unit_price.
-                post_goods_receipt(grn, request.user)
-                result.created += len(grn_lines_data)
-
-        except Exception as e:
-            for (i, norm, row, _wh, _sup, _dt) in line_entries:
-                result.add_error(i, f'GRN creation/posting failed: {e}', row)
-                result.skipped += 1
+    else:
+        result = import_stock_in(rows, request.user)
 
     return render(request, 'core/import_summary_modal.html', {
         'result': result,
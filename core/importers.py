@@ -0,0 +1,575 @@
+"""
+CSV importers behind core.import_views, built on the set-based engine in
+core.import_utils.
+
+Catalog items, expenses and supply items are BulkImporter subclasses that
+stream the upload (iter_csv_upload) a batch at a time: new records go out
+with bulk_create and existing ones get an UPDATE only when a row changes
+them.
+
+Sales orders and stock-ins group rows from anywhere in the file into
+documents, so they read the whole file (parse_csv_upload) first.  Each
+document is created in its own transaction (stock-ins are posted through
+inventory.services.post_goods_receipt), with every customer / channel /
+warehouse / supplier / item resolved up front and the lines written with
+bulk_create.
+"""
+import random
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.import_utils import (
+    BulkImporter, ImportResult, ImportRowError, Lookup, get_or_create_unique,
+    normalize_row, safe_date, safe_decimal,
+)
+
+
+def _category_code(name):
+    return name[:30].upper().replace(' ', '_')
+
+
+def _choice(choices, raw, default):
+    """Choice value whose value or label matches *raw* (case-insensitive)."""
+    raw = raw.upper()
+    for value, label in choices:
+        if raw in (value, label.upper()):
+            return value
+    return default
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 1. CATALOG ITEMS
+# ═══════════════════════════════════════════════════════════════════════════
+
+class CatalogImporter(BulkImporter):
+    """Items by Item Code (SKU): new codes are created, known codes updated."""
+    invalidate_groups = ('stock',)
+
+    def start(self):
+        from catalog.models import Category, ItemType, Unit
+
+        self.item_types = {
+            'RAW': ItemType.RAW, 'RAW MATERIAL': ItemType.RAW,
+            'FINISHED': ItemType.FINISHED, 'FINISHED PRODUCT': ItemType.FINISHED,
+            'SERVICE': ItemType.SERVICE,
+        }
+        self.categories = Lookup(Category.objects.all(), 'name', 'code')
+        self.units = Lookup(Unit.objects.all(), 'abbreviation', 'name')
+        self._default_category = None
+
+    def prepare(self, rows):
+        from catalog.models import Item
+
+        codes = {norm['item_code_sku'] for norm in rows if norm.get('item_code_sku')}
+        # Archived items too: their codes are taken.
+        self.items = Item.all_objects.in_bulk(codes, field_name='code')
+
+    @property
+    def default_category(self):
+        from catalog.models import Category
+
+        if self._default_category is None:
+            self._default_category = Category.objects.first()
+        return self._default_category
+
+    def _create_category(self, name):
+        from catalog.models import Category
+        return get_or_create_unique(Category, code=_category_code(name), defaults={'name': name})
+
+    def _create_unit(self, name):
+        from catalog.models import Unit
+        return get_or_create_unique(Unit, abbreviation=name[:10].lower(), defaults={'name': name})
+
+    def build(self, row_num, norm):
+        from catalog.models import Item
+
+        code = norm.get('item_code_sku', '')
+        name = norm.get('product___service_name', '')
+        if not code and not name:
+            return None
+        if not code:
+            raise ImportRowError('Item Code (SKU) is required.')
+
+        cat_name = norm.get('category', '')
+        category = self.resolve(
+            self.categories, cat_name, row_num, self._create_category, f'Created new category: {cat_name}',
+        )
+        unit_name = norm.get('unit', 'pcs')
+        unit = self.resolve(self.units, unit_name, row_num, self._create_unit, f'Created new unit: {unit_name}')
+        if unit is None:
+            raise ImportRowError(f'Could not create unit "{unit_name}".')
+
+        item_type_raw = norm.get('item_type', 'RAW').upper()
+        item_type = self.item_types.get(item_type_raw)
+        if item_type is None:
+            raise ImportRowError(f'Invalid Item Type "{item_type_raw}". Use RAW, FINISHED, or SERVICE.')
+
+        category = category or self.default_category
+        if not category:
+            raise ImportRowError('No category found and none exists in the system.')
+
+        item = self.items.get(code)
+        created = item is None
+        if created:
+            item = self.items[code] = Item(code=code)
+        elif not item.is_active:
+            raise ImportRowError(f'Item Code (SKU) "{code}" belongs to a deleted item.')
+
+        self.assign(item, {
+            'name': name or code,
+            'item_type': item_type,
+            'category': category,
+            'default_unit': unit,
+            'barcode': norm.get('barcode', ''),
+            'description': norm.get('description', ''),
+            'cost_price': safe_decimal(norm.get('item_cost')),
+            'selling_price': safe_decimal(norm.get('item_selling_price')),
+            'minimum_stock': safe_decimal(norm.get('minimum_stock')),
+            'maximum_stock': safe_decimal(norm.get('maximum_stock')),
+            'reorder_point': safe_decimal(norm.get('reorder_point')),
+        })
+        return item, created
+
+    def write(self, objs):
+        from catalog.models import Item
+        self.save_records(Item, objs)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 2. EXPENSES
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ExpenseImporter(BulkImporter):
+    """One expense per row; PAID ones get their cash flow entry like a saved expense."""
+    invalidate_groups = ('expenses',)
+
+    def start(self):
+        from core.models import ExpenseCategory, ExpenseStatus
+
+        self.statuses = ExpenseStatus.choices
+        self.default_status = ExpenseStatus.PAID
+        self.categories = Lookup(ExpenseCategory.objects.all(), 'name', 'code')
+
+    def _create_category(self, name):
+        from core.models import ExpenseCategory
+        return get_or_create_unique(ExpenseCategory, code=_category_code(name), defaults={'name': name})
+
+    def build(self, row_num, norm):
+        from core.models import Expense
+
+        date_val = safe_date(norm.get('purchase_date', ''))
+        if not date_val:
+            raise ImportRowError('Purchase Date is required or invalid format.')
+        amount = safe_decimal(norm.get('total_cost'))
+        if amount <= 0:
+            raise ImportRowError('Total Cost must be greater than 0.')
+
+        cat_name = norm.get('category', 'General')
+        category = self.resolve(
+            self.categories, cat_name, row_num, self._create_category,
+            f'Created new expense category: {cat_name}',
+        )
+        if category is None:
+            raise ImportRowError(f'Could not create expense category "{cat_name}".')
+
+        return Expense(
+            date=date_val,
+            category=category,
+            item_description=norm.get('item_description', ''),
+            amount=amount,
+            status=_choice(self.statuses, norm.get('status', 'PAID'), self.default_status),
+            vendor=norm.get('vendor_name', ''),
+            business_address=norm.get('business_address', ''),
+            reference_no=norm.get('reference_no', ''),
+            memo=norm.get('notes', ''),
+            created_by=self.user,
+        ), True
+
+    def write(self, objs):
+        from cashflow.signals import expenses_paid_to_cashflow
+        from core.models import Expense
+
+        expenses_paid_to_cashflow(Expense.objects.bulk_create(objs))
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 3. SUPPLY ITEMS
+# ═══════════════════════════════════════════════════════════════════════════
+
+class SupplyImporter(BulkImporter):
+    """Supply items by Item Code (derived from the name when blank)."""
+
+    @staticmethod
+    def _code(norm):
+        return norm.get('item_code', '') or norm.get('product_name', '')[:50].upper().replace(' ', '-')
+
+    def start(self):
+        from core.models import SupplyCategory
+        self.categories = Lookup(SupplyCategory.objects.all(), 'name')
+
+    def prepare(self, rows):
+        from core.models import SupplyItem
+
+        codes = {self._code(norm) for norm in rows} - {''}
+        self.items = SupplyItem.all_objects.in_bulk(codes, field_name='code')
+
+    def _create_category(self, name):
+        from core.models import SupplyCategory
+        return get_or_create_unique(SupplyCategory, code=_category_code(name), defaults={'name': name})
+
+    def build(self, row_num, norm):
+        from core.models import SupplyItem
+
+        name = norm.get('product_name', '')
+        code = self._code(norm)
+        if not code:
+            return None
+
+        cat_name = norm.get('category', '')
+        category = self.resolve(
+            self.categories, cat_name, row_num, self._create_category,
+            f'Created new supply category: {cat_name}',
+        )
+
+        item = self.items.get(code)
+        created = item is None
+        if created:
+            item = self.items[code] = SupplyItem(code=code)
+        elif not item.is_active:
+            raise ImportRowError(f'Item Code "{code}" belongs to a deleted supply item.')
+
+        self.assign(item, {
+            'name': name or code,
+            'category': category,
+            'supplier_brand': norm.get('supplier_brand', norm.get('supplier', '')),
+            'units_per_piece': safe_decimal(norm.get('units_per_piece', '1'), Decimal('1')),
+            'unit': norm.get('units', 'pcs'),
+            'cost_per_unit': safe_decimal(norm.get('item_cost')),
+            'current_stock': safe_decimal(norm.get('available_stocks')),
+            'low_stock_alert_level': safe_decimal(norm.get('low_stock_alert_level')),
+            'minimum_stock': safe_decimal(norm.get('minimum_stock')),
+            'notes': norm.get('notes', ''),
+        })
+        return item, created
+
+    def write(self, objs):
+        from core.models import SupplyItem
+        self.save_records(SupplyItem, objs)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 4. SALES ORDERS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def import_sales_orders(rows, user):
+    """
+    One DRAFT sales order per Receipt No (or per row without one), each in
+    its own transaction.  Returns an ImportResult; created counts orders.
+    """
+    from catalog.models import Item
+    from core.models import DocumentStatus, SalesChannel
+    from partners.models import Customer
+    from sales.models import PaymentStatus, SalesOrder, SalesOrderLine
+    from warehouses.models import Warehouse
+
+    result = ImportResult()
+    groups = {}
+    for i, row in enumerate(rows, start=2):
+        norm = normalize_row(row)
+        key = norm.get('receipt_no', '') or f"{norm.get('customer_name', '')}_{norm.get('billing_date', '')}_{i}"
+        if key not in groups:
+            groups[key] = {'meta': norm, 'lines': [], 'row_start': i}
+        groups[key]['lines'].append((i, norm))
+
+    default_warehouse = Warehouse.objects.first()
+    if not default_warehouse:
+        result.add_error(1, 'No warehouse exists. Please create one first.')
+        return result
+
+    metas = [group['meta'] for group in groups.values()]
+    lines = [norm for group in groups.values() for _, norm in group['lines']]
+    customers = Lookup.matching(
+        Customer.objects.all(), {'name': [meta.get('customer_name', 'Walk-in') for meta in metas]},
+    )
+    channels = Lookup(SalesChannel.objects.all(), 'name')
+    items = Lookup.matching(Item.objects.select_related('default_unit', 'selling_unit'), {
+        'code': [norm.get('item_code_sku', '') for norm in lines],
+        'name': [norm.get('product___service_name', '') for norm in lines],
+    })
+
+    for group in groups.values():
+        meta = group['meta']
+        row_start = group['row_start']
+        try:
+            with transaction.atomic():
+                date_val = safe_date(meta.get('billing_date', ''))
+                if not date_val:
+                    result.add_error(row_start, 'Billing Date is required or invalid.', meta)
+                    result.skipped += len(group['lines'])
+                    continue
+
+                cust_name = meta.get('customer_name', 'Walk-in')
+                customer = customers.get(cust_name)
+                if not customer:
+                    customer, created = get_or_create_unique(
+                        Customer, code=cust_name[:30].upper().replace(' ', '-'),
+                        defaults={'name': cust_name, 'address': meta.get('business_address', '')},
+                    )
+                    customers.alias(cust_name, customer)
+                    if created:
+                        result.add_warning(row_start, f'Created new customer: {cust_name}')
+
+                channel_name = meta.get('sales_channel', '')
+                channel = channels.get(channel_name)
+                if channel_name and not channel:
+                    channel, created = get_or_create_unique(
+                        SalesChannel, code=_category_code(channel_name), defaults={'name': channel_name},
+                    )
+                    if channel:
+                        channels.add(channel)
+                        channels.alias(channel_name, channel)
+                    if created:
+                        result.add_warning(row_start, f'Created new sales channel: {channel_name}')
+
+                ts = timezone.now().strftime('%Y%m%d%H%M%S')
+                so = SalesOrder.objects.create(
+                    document_number=f"SO-IMP-{ts}-{random.randint(1000, 9999)}",
+                    customer=customer,
+                    warehouse=default_warehouse,
+                    order_date=date_val,
+                    payment_status=_choice(PaymentStatus.choices, meta.get('payment_status', 'UNPAID'), PaymentStatus.UNPAID),
+                    sales_channel=channel,
+                    receipt_no=meta.get('receipt_no', ''),
+                    shipping_address=meta.get('business_address', ''),
+                    notes=meta.get('notes', ''),
+                    status=DocumentStatus.DRAFT,
+                    created_by=user,
+                )
+
+                so_lines = []
+                for line_i, line_norm in group['lines']:
+                    item_code = line_norm.get('item_code_sku', '')
+                    item_name = line_norm.get('product___service_name', '')
+                    item = items.get(item_code, 'code') or items.get(item_name, 'name')
+                    if not item:
+                        result.add_error(line_i, f'Item not found: {item_code or item_name}. Skipping line.', line_norm)
+                        continue
+
+                    price = safe_decimal(line_norm.get('item_price'))
+                    if price <= 0:
+                        price = item.selling_price
+                    so_lines.append(SalesOrderLine(
+                        sales_order=so,
+                        item=item,
+                        qty_ordered=safe_decimal(line_norm.get('quantity', '1')),
+                        unit=item.stock_unit,
+                        unit_price=price,
+                        discount_value=safe_decimal(line_norm.get('discount_pct', '0')),
+                        notes=line_norm.get('notes', ''),
+                    ))
+                SalesOrderLine.objects.bulk_create(so_lines)
+                result.created += 1
+
+        except Exception as e:
+            result.add_error(row_start, str(e), meta)
+            result.skipped += 1
+
+    return result
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 5. PROCUREMENT / STOCK-IN
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _find_item(items, name, code):
+    """Catalog item by exact name, then code, then a unique partial name match."""
+    from catalog.models import Item
+
+    item = items.get(name, 'name') or items.get(code, 'code')
+    if item or not name:
+        return item, None
+    partial = list(Item.objects.filter(name__icontains=name).select_related(
+        'default_unit', 'selling_unit',
+    )[:6])
+    if len(partial) == 1:
+        return partial[0], None
+    return None, ', '.join(p.name for p in partial[:5]) or None
+
+
+def import_stock_in(rows, user):
+    """
+    One APPROVED purchase order + posted goods receipt per (date, warehouse,
+    supplier) group, each in its own transaction.  Returns an ImportResult;
+    created counts received lines.
+    """
+    from catalog.models import Item, Unit
+    from core.models import DocumentStatus
+    from inventory.services import generate_document_number, post_goods_receipt
+    from partners.models import Supplier
+    from procurement.models import GoodsReceipt, GoodsReceiptLine, PurchaseOrder, PurchaseOrderLine
+    from warehouses.models import Location, Warehouse
+
+    result = ImportResult()
+    warehouses = Lookup(Warehouse.objects.all(), 'code', 'name')
+    suppliers = Lookup(Supplier.objects.all(), 'name', 'code')
+    default_warehouse = Warehouse.objects.first()
+    default_supplier = Supplier.objects.first()
+
+    # Group rows into GRN batches: one GRN per (date, warehouse, supplier)
+    grn_groups = defaultdict(list)
+    for i, row in enumerate(rows, start=2):
+        norm = normalize_row(row)
+        date_val = safe_date(norm.get('stock-in_date', norm.get('stockin_date', norm.get('stock_in_date', ''))))
+        if not date_val:
+            result.add_error(i, 'Stock-In Date is required or invalid format.', row)
+            result.skipped += 1
+            continue
+
+        warehouse = warehouses.get(norm.get('warehouse', '')) or default_warehouse
+        if not warehouse:
+            result.add_error(i, 'No warehouse found and no default warehouse exists.', row)
+            result.skipped += 1
+            continue
+
+        supplier = suppliers.get(norm.get('supplier', '')) or default_supplier
+        if not supplier:
+            result.add_error(i, 'No supplier found and no default supplier exists.', row)
+            result.skipped += 1
+            continue
+
+        grn_groups[(date_val, warehouse.pk, supplier.pk)].append((i, norm, row, warehouse, supplier))
+
+    entries = [entry for group in grn_groups.values() for entry in group]
+    items = Lookup.matching(Item.objects.select_related('default_unit', 'selling_unit'), {
+        'name': [norm.get('product_name', '') for _, norm, _, _, _ in entries],
+        'code': [norm.get('item_code', '') for _, norm, _, _, _ in entries],
+    })
+    units = Lookup(Unit.objects.all(), 'abbreviation', 'name')
+    locations = {}
+    default_locations = {}
+    for location in Location.objects.filter(
+        warehouse_id__in={wh_pk for _, wh_pk, _ in grn_groups}, is_active=True,
+    ):
+        locations.setdefault((location.warehouse_id, location.code.lower()), location)
+        default_locations.setdefault(location.warehouse_id, location)
+
+    for (date_val, wh_pk, sup_pk), line_entries in grn_groups.items():
+        warehouse = line_entries[0][3]
+        supplier = line_entries[0][4]
+
+        try:
+            with transaction.atomic():
+                # Validate all lines before creating the documents
+                grn_lines_data = []
+                for (i, norm, row, _wh, _sup) in line_entries:
+                    item_name = norm.get('product_name', '')
+                    item_code = norm.get('item_code', '')
+                    catalog_item, suggestion = _find_item(items, item_name, item_code)
+                    if not catalog_item:
+                        tried = []
+                        if item_name:
+                            tried.append(f'name "{item_name}"')
+                        if item_code:
+                            tried.append(f'code "{item_code}"')
+                        tried_str = ' and '.join(tried) if tried else '(no name or code provided)'
+                        msg = f'Item not found by {tried_str}.'
+                        if suggestion:
+                            msg += f' Close matches: {suggestion}'
+                        result.add_error(i, msg, row)
+                        result.skipped += 1
+                        continue
+
+                    qty = safe_decimal(norm.get('qty', norm.get('stocks_added', '0')))
+                    if qty <= 0:
+                        result.add_error(i, 'Qty must be greater than 0.', row)
+                        result.skipped += 1
+                        continue
+
+                    location = (
+                        locations.get((wh_pk, norm.get('location', '').lower()))
+                        or default_locations.get(wh_pk)
+                    )
+                    if not location:
+                        result.add_error(i, f'No location found for warehouse "{warehouse.code}".', row)
+                        result.skipped += 1
+                        continue
+
+                    grn_lines_data.append({
+                        'item': catalog_item,
+                        'location': location,
+                        'qty': qty,
+                        'unit': units.get(norm.get('unit', '')) or catalog_item.stock_unit,
+                        'unit_cost': safe_decimal(norm.get('unit_cost', '0')),
+                        'notes': norm.get('notes', ''),
+                    })
+
+                if not grn_lines_data:
+                    continue
+
+                # Every stock-in originates from an APPROVED PO so that
+                # qty_received tracking, cost averaging and audit trails work.
+                po = PurchaseOrder.objects.create(
+                    document_number=generate_document_number('PO', PurchaseOrder),
+                    supplier=supplier,
+                    warehouse=warehouse,
+                    order_date=date_val,
+                    expected_date=date_val,
+                    status=DocumentStatus.APPROVED,
+                    notes=f'Auto-generated from CSV import on {date_val}',
+                    created_by=user,
+                    approved_by=user,
+                    approved_at=timezone.now(),
+                )
+
+                # One PO line per item, duplicate rows summed
+                po_lines = {}
+                for line_data in grn_lines_data:
+                    po_line = po_lines.get(line_data['item'].pk)
+                    if po_line:
+                        po_line.qty_ordered += line_data['qty']
+                    else:
+                        po_lines[line_data['item'].pk] = PurchaseOrderLine(
+                            purchase_order=po,
+                            item=line_data['item'],
+                            qty_ordered=line_data['qty'],
+                            qty_received=Decimal('0'),
+                            unit=line_data['unit'],
+                            unit_price=line_data['unit_cost'],
+                        )
+                PurchaseOrderLine.objects.bulk_create(po_lines.values())
+
+                grn = GoodsReceipt.objects.create(
+                    document_number=generate_document_number('GRN', GoodsReceipt),
+                    purchase_order=po,
+                    supplier=supplier,
+                    warehouse=warehouse,
+                    receipt_date=date_val,
+                    notes=f'Imported via CSV on {date_val}',
+                    created_by=user,
+                )
+                GoodsReceiptLine.objects.bulk_create([
+                    GoodsReceiptLine(
+                        goods_receipt=grn,
+                        item=line_data['item'],
+                        location=line_data['location'],
+                        qty=line_data['qty'],
+                        unit=line_data['unit'],
+                        notes=line_data['notes'],
+                    )
+                    for line_data in grn_lines_data
+                ])
+
+                # Creates the stock moves and balances, updates
+                # po_line.qty_received and re-averages item.cost_price.
+                post_goods_receipt(grn, user)
+                result.created += len(grn_lines_data)
+
+        except Exception as e:
+            for (i, norm, row, _wh, _sup) in line_entries:
+                result.add_error(i, f'GRN creation/posting failed: {e}', row)
+                result.skipped += 1
+
+    return result
@@ -0,0 +1,361 @@
+"""
+Background jobs for long syncs and rebuilds.
+
+A job is a core.Job row plus a handler registered under its ``kind``::
+
+    @register('cashflow_sync', label='Cash flow sync')
+    def cashflow_sync(job, ctx, full=False):
+        ...
+        return {...}  # stored in Job.result (must be JSON-serialisable)
+
+Handlers receive the Job, a JobContext for progress / output, and the job's
+params as keyword arguments.  Handlers live in each app's ``jobs`` module,
+which is imported when the app registry is ready.
+
+``enqueue(kind, params, user)`` creates the row and hands it to the backend
+selected by ``settings.JOBS_BACKEND``:
+
+* ``thread`` (default) — run on an in-process thread pool once the
+  enqueueing transaction commits.  Single-node deployments need nothing
+  else, but a job dies with its worker process.
+* ``db`` — leave the row queued; ``manage.py run_jobs`` workers claim and
+  run queued jobs.
+* ``inline`` — run synchronously once the transaction commits (tests).
+
+Only one queued or running job may exist per kind + params (a partial
+unique index on ``dedupe_key``); enqueueing a duplicate returns the active
+job instead.  A running job whose heartbeat (refreshed every minute by the
+running process) is older than ``JOBS_STALE_AFTER`` seconds is failed, so a
+job lost with its process does not block its key forever.  With the
+``thread`` and ``inline`` backends nothing else will ever claim a queued
+job, so one still queued after ``JOBS_STALE_AFTER`` seconds (its process
+died before running it) is failed the same way.
+"""
+import io
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# How often progress() writes to the database, in seconds.
+PROGRESS_INTERVAL = 1.0
+# How often a running job's heartbeat is refreshed even without progress.
+HEARTBEAT_INTERVAL = 60.0
+OUTPUT_LIMIT = 20000
+
+_handlers = {}
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class _Handler:
+    def __init__(self, kind, func, label):
+        self.kind = kind
+        self.func = func
+        self.label = label
+
+
+def register(kind, label=None):
+    """Decorator registering *func* as the handler of jobs of *kind*."""
+    def decorator(func):
+        _handlers[kind] = _Handler(kind, func, label or kind.replace('_', ' ').capitalize())
+        return func
+    return decorator
+
+
+def registered_kinds():
+    return sorted(_handlers)
+
+
+def job_label(kind):
+    handler = _handlers.get(kind)
+    return handler.label if handler else kind
+
+
+def dedupe_key(kind, params):
+    return f'{kind}:{json.dumps(params or {}, sort_keys=True, default=str)}'[:255]
+
+
+def _worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+class JobContext:
+    """Progress and output reporting for a running job."""
+
+    def __init__(self, job):
+        self.job = job
+        self._output = []
+        self._size = 0
+        self._last_write = 0.0
+
+    def progress(self, done=None, total=None, message=None, force=False):
+        """Record progress; written at most once per PROGRESS_INTERVAL unless *force*."""
+        job = self.job
+        if done is not None:
+            job.progress_done = done
+        if total is not None:
+            job.progress_total = total
+        if message is not None:
+            job.message = str(message)[:255]
+        now = time.monotonic()
+        if force or now - self._last_write >= PROGRESS_INTERVAL:
+            self._last_write = now
+            self._save()
+
+    def log(self, text):
+        """Append *text* to the job output (the tail is kept) and use its last line as message."""
+        text = str(text)
+        self._output.append(text)
+        self._size += len(text)
+        while self._size > OUTPUT_LIMIT and len(self._output) > 1:
+            self._size -= len(self._output.pop(0))
+        lines = [line for line in text.splitlines() if line.strip()]
+        self.progress(message=lines[-1].strip() if lines else None)
+
+    @property
+    def output(self):
+        return ''.join(self._output)[-OUTPUT_LIMIT:]
+
+    def _save(self):
+        from core.models import Job
+        job = self.job
+        job.heartbeat_at = timezone.now()
+        Job.objects.filter(pk=job.pk).update(
+            progress_done=job.progress_done,
+            progress_total=job.progress_total,
+            message=job.message,
+            output=self.output,
+            heartbeat_at=job.heartbeat_at,
+        )
+
+
+class _OutputWriter(io.TextIOBase):
+    """File-like stdout/stderr for call_command that feeds JobContext.log()."""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def write(self, text):
+        self.ctx.log(text)
+        return len(text)
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, job_id):
+        super().__init__(daemon=True, name=f'job-{job_id}-heartbeat')
+        self.job_id = job_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        from django.db import connection
+        from core.models import Job
+
+        try:
+            while not self.stopped.wait(HEARTBEAT_INTERVAL):
+                Job.objects.filter(pk=self.job_id).update(heartbeat_at=timezone.now())
+        finally:
+            connection.close()
+
+
+def run_command(ctx, name, **options):
+    """Run management command *name* with its output captured into the job."""
+    from django.core.management import call_command
+
+    out = _OutputWriter(ctx)
+    call_command(name, stdout=out, stderr=out, **options)
+    return {'output': ctx.output[-2000:]}
+
+
+# ── Queue ───────────────────────────────────────────────────────────────────
+
+def reap_stale_jobs():
+    """
+    Fail running jobs whose heartbeat is older than JOBS_STALE_AFTER and,
+    unless run_jobs workers drain the queue (the ``db`` backend), queued
+    jobs created before then.
+    """
+    from core.models import Job, JobStatus
+
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, 'JOBS_STALE_AFTER', 1800))
+    reaped = Job.objects.filter(status=JobStatus.RUNNING, heartbeat_at__lt=cutoff).update(
+        status=JobStatus.FAILED,
+        error='Worker stopped responding.',
+        finished_at=now,
+    )
+    if getattr(settings, 'JOBS_BACKEND', 'thread') != 'db':
+        reaped += Job.objects.filter(status=JobStatus.QUEUED, created_at__lt=cutoff).update(
+            status=JobStatus.FAILED,
+            error='Worker stopped before the job started.',
+            finished_at=now,
+        )
+    return reaped
+
+
+def enqueue(kind, params=None, user=None):
+    """
+    Queue a *kind* job and return (job, created).  When an identical job is
+    already queued or running, that job is returned with created=False.
+    """
+    from core.models import ACTIVE_JOB_STATUSES, Job
+
+    if kind not in _handlers:
+        raise ValueError(f'Unknown job kind: {kind}')
+    params = params or {}
+    key = dedupe_key(kind, params)
+    reap_stale_jobs()
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                kind=kind, params=params, dedupe_key=key, created_by=user,
+            )
+    except IntegrityError:
+        active = Job.objects.filter(dedupe_key=key, status__in=ACTIVE_JOB_STATUSES).first()
+        if active is None:  # finished in the meantime
+            return enqueue(kind, params, user)
+        return active, False
+
+    backend = getattr(settings, 'JOBS_BACKEND', 'thread')
+    if backend == 'thread':
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job.pk))
+    elif backend == 'inline':
+        transaction.on_commit(lambda: run_job(job.pk))
+    return job, True
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'JOBS_THREADS', 2),
+                thread_name_prefix='jobs',
+            )
+        return _executor
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def claim_next(worker=None):
+    """Claim the oldest queued job for this worker; None when the queue is empty."""
+    from core.models import Job, JobStatus
+
+    for job_id in Job.objects.filter(status=JobStatus.QUEUED).order_by('created_at', 'pk').values_list('pk', flat=True)[:10]:
+        if _claim(job_id, worker):
+            return job_id
+    return None
+
+
+def _claim(job_id, worker=None):
+    # A conditional UPDATE: of two workers racing for a job, one sees 0 rows.
+    from core.models import Job, JobStatus
+
+    now = timezone.now()
+    return Job.objects.filter(pk=job_id, status=JobStatus.QUEUED).update(
+        status=JobStatus.RUNNING,
+        worker=(worker or _worker_name())[:100],
+        started_at=now,
+        heartbeat_at=now,
+    ) == 1
+
+
+def run_job(job_id, claimed=False):
+    """
+    Run job *job_id*, claiming it first unless *claimed*.  Returns the Job,
+    or None when another worker got it.
+    """
+    from core.models import Job, JobStatus
+
+    if not claimed and not _claim(job_id):
+        return None
+    job = Job.objects.select_related('created_by').get(pk=job_id)
+    handler = _handlers.get(job.kind)
+    ctx = JobContext(job)
+    heartbeat = _Heartbeat(job.pk)
+    heartbeat.start()
+    try:
+        if handler is None:
+            raise ValueError(f'Unknown job kind: {job.kind}')
+        result = handler.func(job, ctx, **job.params)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        job.status = JobStatus.FAILED
+        job.error = f'{exc}\n\n{traceback.format_exc()}'[-OUTPUT_LIMIT:]
+        job.message = str(exc)[:255]
+        job.result = None
+    else:
+        job.status = JobStatus.SUCCEEDED
+        job.result = result
+        if job.progress_total:
+            job.progress_done = job.progress_total
+    finally:
+        heartbeat.stopped.set()
+    job.output = ctx.output
+    job.finished_at = job.heartbeat_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'error', 'message', 'result', 'output', 'progress_done',
+        'finished_at', 'heartbeat_at', 'updated_at',
+    ])
+    return job
+
+
+def job_status(job):
+    """JSON-able status of *job* for polling."""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'label': job_label(job.kind),
+        'status': job.status,
+        'finished': job.is_finished,
+        'progress': {
+            'done': job.progress_done,
+            'total': job.progress_total,
+            'pct': job.progress_pct,
+        },
+        'message': job.message,
+        'result': job.result,
+        'error': job.error.split('\n\n', 1)[0] if job.error else '',
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# ── Maintenance commands ───────────────────────────────────────────────────
+
+@register('resync_inventory', label='Inventory resync')
+def resync_inventory_job(job, ctx, **options):
+    return run_command(ctx, 'resync_inventory', **options)
+
+
+@register('sync_invoice_cogs', label='Invoice COGS sync')
+def sync_invoice_cogs_job(job, ctx, **options):
+    return run_command(ctx, 'sync_invoice_cogs', **options)
+
+
+@register('sync_payments', label='Payment sync')
+def sync_payments_job(job, ctx, **options):
+    return run_command(ctx, 'sync_payments', **options)
+
+
+@register('sync_pos_stock_moves', label='POS stock move sync')
+def sync_pos_stock_moves_job(job, ctx, **options):
+    return run_command(ctx, 'sync_pos_stock_moves', **options)
@@ -0,0 +1,91 @@
+"""
+Management command: backfill_line_costs
+
+Stamps the unit_cost / line_cogs snapshot on lines posted before it was
+recorded at posting time, using each item's current cost in the line's unit:
+  - POSSaleLine              of non-draft POS sales
+  - SalesOrderLine           of approved / posted orders   (× qty_ordered)
+  - SalesOrderPriceListLine  of approved / posted orders   (set cost × qty_multiplier)
+  - DeliveryLine             of posted deliveries
+  - ServiceLine              of completed services
+  - StockMove                posted moves
+
+Only lines without a snapshot are touched, in pk-ordered batches, so the
+command can be stopped and re-run at any time.
+
+Usage:
+  python manage.py backfill_line_costs                   # live run
+  python manage.py backfill_line_costs --dry-run         # count lines without saving
+  python manage.py backfill_line_costs --batch-size 5000
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.cogs import SNAPSHOT_FIELDS, stamp_bundle_costs, stamp_line_costs
+
+
+def _targets():
+    from core.models import DocumentStatus
+    from inventory.models import MoveStatus, StockMove
+    from pos.models import POSSaleLine, SaleStatus
+    from sales.models import DeliveryLine, SalesOrderLine, SalesOrderPriceListLine
+    from services.models import ServiceLine, ServiceStatus
+
+    so_posted = [DocumentStatus.APPROVED, DocumentStatus.POSTED]
+    return [
+        (POSSaleLine, POSSaleLine.objects.exclude(sale__status=SaleStatus.DRAFT), 'qty'),
+        (SalesOrderLine, SalesOrderLine.objects.filter(sales_order__status__in=so_posted), 'qty_ordered'),
+        (SalesOrderPriceListLine, SalesOrderPriceListLine.objects.filter(sales_order__status__in=so_posted), None),
+        (DeliveryLine, DeliveryLine.objects.filter(delivery__status=DocumentStatus.POSTED), 'qty'),
+        (ServiceLine, ServiceLine.objects.filter(service__status=ServiceStatus.COMPLETED), 'qty'),
+        (StockMove, StockMove.objects.filter(status=MoveStatus.POSTED), 'qty'),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Stamp unit_cost / line_cogs on posted lines that have no COGS snapshot yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Count the lines that would be stamped without saving.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Lines stamped per batch (default 2000).',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = max(1, options['batch_size'])
+
+        total = 0
+        for model, queryset, qty_field in _targets():
+            queryset = queryset.filter(line_cogs__isnull=True)
+            if dry_run:
+                count = queryset.count()
+            else:
+                count = self._stamp(model, queryset, qty_field, batch_size)
+            total += count
+            self.stdout.write(f'  {model.__name__}: {count}')
+
+        label = 'Dry-run complete' if dry_run else 'Backfill complete'
+        self.stdout.write(self.style.SUCCESS(f'\n{label}. {total} lines stamped.'))
+
+    def _stamp(self, model, queryset, qty_field, batch_size):
+        if qty_field:
+            queryset = queryset.select_related('item')
+        count = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                return count
+            last_pk = batch[-1].pk
+            if qty_field:
+                batch = stamp_line_costs(batch, qty_field=qty_field)
+            else:
+                batch = stamp_bundle_costs(batch)
+            with transaction.atomic():
+                model.objects.bulk_update(batch, SNAPSHOT_FIELDS)
+            count += len(batch)
@@ -0,0 +1,66 @@
+"""
+Management command: run_jobs
+
+Worker for the database job queue (core.jobs, JOBS_BACKEND = 'db').  Claims
+queued jobs oldest first and runs them one at a time; several workers may
+run side by side — a job is claimed with a conditional UPDATE, so each job
+runs once.
+
+Usage:
+  python manage.py run_jobs                 # work until interrupted
+  python manage.py run_jobs --once          # drain the queue, then exit
+  python manage.py run_jobs --enqueue sync_invoice_cogs
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.jobs import claim_next, enqueue, reap_stale_jobs, registered_kinds, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when the queue is empty instead of polling.',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=2.0,
+            help='Seconds to wait between polls of an empty queue (default: 2).',
+        )
+        parser.add_argument(
+            '--enqueue', metavar='KIND', default=None,
+            help=f'Queue a job of this kind and exit. Kinds: {", ".join(registered_kinds())}.',
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            try:
+                job, created = enqueue(options['enqueue'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            state = 'Queued' if created else 'Already active:'
+            self.stdout.write(f'{state} {job}')
+            return
+
+        ran = 0
+        try:
+            while True:
+                close_old_connections()
+                reap_stale_jobs()
+                job_id = claim_next()
+                if job_id is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                job = run_job(job_id, claimed=True)
+                ran += 1
+                style = self.style.SUCCESS if job.status == 'SUCCEEDED' else self.style.ERROR
+                self.stdout.write(style(f'{job} {job.message}'.rstrip()))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'{ran} job(s) run.')
@@ -9,14 +9,23 @@ Iterates every Invoice and computes its COGS from the linked source document:
   - Service     → sum(item.cost_price × qty) across ServiceLine
                   (uses CustomerService.invoice FK back-reference)
 
+Invoices are processed in batches: the source lines of a batch are read in a
+handful of queries and costed with core.cogs.bulk_invoice_cogs, and changed
+totals are written back with bulk_update.  Each synced invoice records
+cogs_synced_at; --only-stale recomputes only invoices whose document, lines'
+items, bundle price lists or unit conversions changed since then.
+
 Usage:
   python manage.py sync_invoice_cogs              # all invoices
+  python manage.py sync_invoice_cogs --only-stale # only invoices changed since their last sync
   python manage.py sync_invoice_cogs --invoice 42 # single invoice by PK
   python manage.py sync_invoice_cogs --dry-run    # print without saving
 """
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
 
-from core.cogs import compute_invoice_cogs
+from core.cogs import compute_invoice_cogs, bulk_invoice_cogs, stale_cogs_filter
 from core.models import Invoice
 
 
@@ -32,41 +41,38 @@ class Command(BaseCommand):
             '--dry-run', action='store_true',
             help='Print computed COGS without saving.',
         )
+        parser.add_argument(
+            '--only-stale', action='store_true',
+            help='Only recompute invoices whose sources changed since their last sync.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Invoices costed per batch (default 500).',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         single_pk = options['invoice']
+        batch_size = max(1, options['batch_size'])
 
-        qs = Invoice.objects.select_related('pos_sale', 'sales_order')
+        qs = Invoice.objects.all()
         if single_pk:
             qs = qs.filter(pk=single_pk)
+        if options['only_stale']:
+            qs = qs.filter(stale_cogs_filter())
 
         updated = 0
         skipped = 0
-
-        for inv in qs.iterator():
-            try:
-                cogs = compute_invoice_cogs(inv)
-            except Exception as e:
-                self.stderr.write(
-                    f'  [WARN] Invoice {inv.invoice_number} COGS error: {e}'
-                )
-                continue
-
-            if dry_run:
-                self.stdout.write(
-                    f'  INV {inv.invoice_number:<20} '
-                    f'revenue={inv.grand_total:>12,.2f}  '
-                    f'cogs={cogs:>12,.2f}'
-                )
-                skipped += 1
-            else:
-                if inv.grand_total_cogs != cogs:
-                    inv.grand_total_cogs = cogs
-                    inv.save(update_fields=['grand_total_cogs'])
-                    updated += 1
-                else:
-                    skipped += 1
+        fields = ('pk', 'invoice_number', 'grand_total', 'grand_total_cogs', 'pos_sale_id', 'sales_order_id')
+        batch = []
+        for inv in qs.only(*fields).iterator(chunk_size=batch_size):
+            batch.append(inv)
+            if len(batch) == batch_size:
+                u, s = self._sync_batch(batch, dry_run)
+                updated, skipped, batch = updated + u, skipped + s, []
+        if batch:
+            u, s = self._sync_batch(batch, dry_run)
+            updated, skipped = updated + u, skipped + s
 
         if dry_run:
             self.stdout.write(
@@ -78,3 +84,45 @@ class Command(BaseCommand):
                     f'Sync complete. {updated} updated, {skipped} already correct.'
                 )
             )
+
+    def _costs(self, batch):
+        """{pk: COGS} for *batch*; per invoice (skipping failures) if the batch fails."""
+        try:
+            return bulk_invoice_cogs(batch)
+        except Exception:
+            costs = {}
+            for inv in batch:
+                try:
+                    costs[inv.pk] = compute_invoice_cogs(inv)
+                except Exception as e:
+                    self.stderr.write(
+                        f'  [WARN] Invoice {inv.invoice_number} COGS error: {e}'
+                    )
+            return costs
+
+    def _sync_batch(self, batch, dry_run):
+        """Cost *batch* and write changed totals; returns (updated, unchanged)."""
+        # Taken before reading the sources, so a change made meanwhile stays stale.
+        synced_at = timezone.now()
+        costs = self._costs(batch)
+        if dry_run:
+            for inv in batch:
+                if inv.pk in costs:
+                    self.stdout.write(
+                        f'  INV {inv.invoice_number:<20} '
+                        f'revenue={inv.grand_total:>12,.2f}  '
+                        f'cogs={costs[inv.pk]:>12,.2f}'
+                    )
+            return 0, len(costs)
+
+        changed = []
+        for inv in batch:
+            if inv.pk in costs and inv.grand_total_cogs != costs[inv.pk]:
+                inv.grand_total_cogs = costs[inv.pk]
+                changed.append(inv)
+        with transaction.atomic():
+            if changed:
+                Invoice.objects.bulk_update(changed, ['grand_total_cogs'])
+            # A plain UPDATE, so updated_at (a staleness signal) is left alone.
+            Invoice.objects.filter(pk__in=list(costs)).update(cogs_synced_at=synced_at)
+        return len(changed), len(costs) - len(changed)
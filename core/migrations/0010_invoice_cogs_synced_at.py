@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='cogs_synced_at',
+            field=models.DateTimeField(blank=True, help_text='When sync_invoice_cogs last computed grand_total_cogs (used by --only-stale).', null=True),
+        ),
+    ]
@@ -215,6 +215,10 @@ class Invoice(TimeStampedModel):
         max_digits=15, decimal_places=2, default=0,
         help_text='Computed COGS for this invoice (synced via sync_invoice_cogs command).',
     )
+    cogs_synced_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text='When sync_invoice_cogs last computed grand_total_cogs (used by --only-stale).',
+    )
     notes = models.TextField(blank=True, default='')
     is_paid = models.BooleanField(default=False)
     paid_at = models.DateTimeField(null=True, blank=True)
@@ -457,3 +461,83 @@ class TargetGoal(TimeStampedModel):
             delta = (self.due_date - date.today()).days
             return max(delta, 0)
         return 999
+
+
+class DocumentSequence(models.Model):
+    """
+    Counter row per numbering series (PO, GRN, POS, RFN, INV, CF, ...).
+
+    Numbers are allocated by core.sequences, which bumps ``last_value`` with a
+    single UPDATE so the row lock serialises concurrent allocations instead of
+    racing on MAX(id)+1.
+    """
+    name = models.CharField(max_length=30, unique=True)
+    last_value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+
+class JobStatus(models.TextChoices):
+    QUEUED = 'QUEUED', 'Queued'
+    RUNNING = 'RUNNING', 'Running'
+    SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+    FAILED = 'FAILED', 'Failed'
+
+
+ACTIVE_JOB_STATUSES = (JobStatus.QUEUED, JobStatus.RUNNING)
+
+
+class Job(TimeStampedModel):
+    """
+    A background job (see core.jobs): long syncs and rebuilds run off the
+    request path.  At most one queued/running job per ``dedupe_key``.
+    """
+    kind = models.CharField(max_length=50, db_index=True)
+    params = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(max_length=255, db_index=True)
+    status = models.CharField(
+        max_length=20, choices=JobStatus.choices,
+        default=JobStatus.QUEUED, db_index=True,
+    )
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True, default='')
+    output = models.TextField(blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    worker = models.CharField(max_length=100, blank=True, default='')
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='jobs',
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=ACTIVE_JOB_STATUSES),
+                name='unique_active_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    @property
+    def progress_pct(self):
+        if not self.progress_total:
+            return 100 if self.status == JobStatus.SUCCEEDED else 0
+        return min(100, int(self.progress_done * 100 / self.progress_total))
@@ -34,6 +34,9 @@ urlpatterns = [
     path('invoices/<int:pk>/mark-paid/', views.invoice_mark_paid, name='invoice_mark_paid'),
     path('invoices/<int:pk>/payments/<int:payment_pk>/delete/', views.invoice_delete_payment, name='invoice_delete_payment'),
 
+    # Background jobs
+    path('jobs/<int:pk>/', views.job_status_view, name='job_status'),
+
     # Supply Categories
     path('supply-categories/', views.supply_category_list, name='supply_category_list'),
     path('supply-categories/new/', views.supply_category_create, name='supply_category_create'),
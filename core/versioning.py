@@ -0,0 +1,23 @@
+"""
+Version stamps for in-process caches built from database tables.
+
+A stamp fingerprints a table with one aggregate query — row count, highest
+pk and, when the model has one, the latest updated_at — so it changes when
+a row is created, deleted, or saved through the ORM.  The unit conversion
+graph (catalog.conversions), the price book (pricing.services) and the POS
+bundle definitions (pos.services.bundles) keep the stamp they were built
+from and reload when it differs.
+"""
+from django.db.models import Count, Max
+
+
+def version_stamp(models):
+    """Tuple of (count, max pk[, max updated_at]) per model in *models*, soft-deleted rows included."""
+    stamp = []
+    for model in models:
+        manager = getattr(model, 'all_objects', model._default_manager)
+        aggregates = {'n': Count('pk'), 'max_pk': Max('pk')}
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            aggregates['max_updated'] = Max('updated_at')
+        stamp.append(tuple(manager.aggregate(**aggregates).values()))
+    return tuple(stamp)
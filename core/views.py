@@ -5,7 +5,7 @@ from django.contrib import messages
 from django.db.models import Sum, Q, F, DecimalField
 from django.db.models.functions import Coalesce, TruncMonth, TruncDate
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from datetime import timedelta
 
 from core.models import (
@@ -197,8 +197,8 @@ def expense_delete(request, pk):
 # INVOICE GENERATOR
 # ═══════════════════════════════════════════════════════════════════════════
 def _next_invoice_number():
-    last = Invoice.objects.order_by('-id').first()
-    num = (last.id + 1) if last else 1
+    from core.sequences import existing_max, next_value
+    num = next_value('INV', seed=lambda: existing_max(Invoice, 'invoice_number'))
     return f"{num:06d}"
 
 def _compute_cogs_for_invoice(inv):
@@ -694,3 +694,18 @@ def goal_delete(request, pk):
 @login_required
 def dictionary_view(request):
     return render(request, 'core/dictionary.html')
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# BACKGROUND JOBS
+# ═══════════════════════════════════════════════════════════════════════════
+@login_required
+def job_status_view(request, pk):
+    """Polling endpoint: JSON status / progress / result of a background job."""
+    from core.jobs import job_status
+    from core.models import Job
+
+    job = get_object_or_404(Job, pk=pk)
+    if job.created_by_id != request.user.pk and not request.user.is_staff:
+        return JsonResponse({'error': 'Not found.'}, status=404)
+    return JsonResponse(job_status(job))
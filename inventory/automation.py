@@ -21,20 +21,19 @@ from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 
-from django.db.models import Max
 from inventory.services import generate_document_number
 
 
 def _generate_invoice_number():
     """
     Generate the next invoice number as a zero-padded 6-digit string.
-    Uses MAX(id) across ALL invoice rows (including any soft-deleted) so the
-    number is always strictly increasing and never collides.
+    Allocated from the INV series in core.sequences, so it is strictly
+    increasing and never collides across concurrent workers.
     Must be called inside a transaction.atomic() block.
     """
     from core.models import Invoice
-    result = Invoice.objects.aggregate(max_id=Max('id'))
-    next_num = (result['max_id'] or 0) + 1
+    from core.sequences import existing_max, next_value
+    next_num = next_value('INV', seed=lambda: existing_max(Invoice, 'invoice_number'))
     return f"{next_num:06d}"
 
 
@@ -459,16 +458,21 @@ def auto_create_invoice_from_delivery(delivery, user):
 
 
 @transaction.atomic
-def auto_create_invoice_from_pos_sale(sale, user):
+def auto_create_invoice_from_pos_sale(sale, user, lines=None, is_new=False):
     """
     Auto-create an Invoice when a POS Sale is posted.
     Returns the created Invoice or existing one.
+
+    *lines* may pass the sale lines already in memory (with item and unit
+    loaded); *is_new* skips the lookup for an existing invoice when the sale
+    was created in the same transaction.
     """
     from core.models import Invoice, InvoiceLine
 
-    existing = Invoice.objects.filter(pos_sale=sale).first()
-    if existing:
-        return existing
+    if not is_new:
+        existing = Invoice.objects.filter(pos_sale=sale).first()
+        if existing:
+            return existing
 
     inv_number = _generate_invoice_number()
 
@@ -487,8 +491,10 @@ def auto_create_invoice_from_pos_sale(sale, user):
         created_by=user,
     )
 
-    for line in sale.lines.select_related('item', 'unit'):
-        InvoiceLine.objects.create(
+    if lines is None:
+        lines = sale.lines.select_related('item', 'unit')
+    InvoiceLine.objects.bulk_create([
+        InvoiceLine(
             invoice=inv,
             item_code=line.item.code,
             item_name=line.item.name,
@@ -498,5 +504,7 @@ def auto_create_invoice_from_pos_sale(sale, user):
             discount=line.discount_amount,
             line_total=line.line_total,
         )
+        for line in lines
+    ])
 
     return inv
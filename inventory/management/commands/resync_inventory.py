@@ -26,13 +26,24 @@ The command does two independent phases:
     delta per (item, location) bucket.  CANCELLED documents are skipped
     (their reversal moves cancel out).  At the end, bulk-updates StockBalance.
 
+Phases 1 and 2 are partitioned by document type and item-id range and the
+partitions run in a process pool (see inventory/resync.py).  Completed
+partitions are checkpointed, so an interrupted run continues with --resume.
+Each phase reports its throughput.  --serial runs the original
+single-process implementation, which the partitioned one must match.
+
 Usage:
     python manage.py resync_inventory                  # applies changes by default
     python manage.py resync_inventory --dry-run        # preview without saving
     python manage.py resync_inventory --phase 1        # moves only (applies)
     python manage.py resync_inventory --phase 2 --dry-run
     python manage.py resync_inventory --quiet          # no per-row output
+    python manage.py resync_inventory --workers 8 --chunk-items 1000
+    python manage.py resync_inventory --resume         # continue an interrupted run
+    python manage.py resync_inventory --serial         # single process, no checkpoints
 """
+import os
+import uuid
 from collections import defaultdict
 from decimal import Decimal, InvalidOperation
 
@@ -42,7 +53,8 @@ from django.utils import timezone
 
 from catalog.models import convert_to_base_unit
 from core.models import DocumentStatus
-from inventory.models import StockBalance, StockMove, MoveStatus, MoveType
+from inventory import resync
+from inventory.models import ResyncCheckpoint, StockBalance, StockMove, MoveStatus, MoveType
 
 
 # ── helpers ─────────────────────────────────────────────────────────────────
@@ -221,49 +233,56 @@ def _delete_orphaned_moves(dry_run, warn_fn, info_fn):
 
 # ── Phase 1 helpers ──────────────────────────────────────────────────────────
 
-def _fix_moves_for_doc(moves_qs, line_lookup_fn, warn_fn, dry_run, stats):
+def _check_move(move, line, warn_fn):
     """
-    For each StockMove in moves_qs, call line_lookup_fn(move) to retrieve the
-    source line.  Recalculate correct base-unit qty and update if changed.
+    Compare *move* with its source *line*.  Returns (status, qty, unit) where
+    status is 'updated' (qty/unit are the corrected values), 'already_correct',
+    'no_line', or None for adjustment lines without a difference.
     """
-    for move in moves_qs.select_related('item__default_unit', 'item__selling_unit', 'unit'):
-        line = line_lookup_fn(move)
-        if line is None:
-            stats['no_line'] += 1
-            continue
+    if line is None:
+        return 'no_line', None, None
 
-        target_unit = _inventory_unit(move.item)
+    target_unit = _inventory_unit(move.item)
 
-        line_qty = getattr(line, 'qty', None)
-        line_unit = getattr(line, 'unit', None)
-        if line_qty is None or line_unit is None:
-            stats['no_line'] += 1
-            continue
+    line_qty = getattr(line, 'qty', None)
+    line_unit = getattr(line, 'unit', None)
+    if line_qty is None or line_unit is None:
+        return 'no_line', None, None
 
-        # For adjustments the stored qty is abs(diff); we need to handle sign
-        if move.move_type == 'ADJUST':
-            raw_diff = line.qty_counted - line.qty_system
-            if raw_diff == 0:
-                continue
-            correct_qty = _safe_convert(
-                abs(raw_diff), line_unit, target_unit,
-                f"Move#{move.pk} ADJUST", warn_fn, item=move.item,
-            )
-        else:
-            correct_qty = _safe_convert(
-                line_qty, line_unit, target_unit,
-                f"Move#{move.pk}", warn_fn, item=move.item,
-            )
+    # For adjustments the stored qty is abs(diff); we need to handle sign
+    if move.move_type == 'ADJUST':
+        raw_diff = line.qty_counted - line.qty_system
+        if raw_diff == 0:
+            return None, None, None
+        correct_qty = _safe_convert(
+            abs(raw_diff), line_unit, target_unit,
+            f"Move#{move.pk} ADJUST", warn_fn, item=move.item,
+        )
+    else:
+        correct_qty = _safe_convert(
+            line_qty, line_unit, target_unit,
+            f"Move#{move.pk}", warn_fn, item=move.item,
+        )
 
-        if correct_qty == move.qty and move.unit_id == target_unit.pk:
-            stats['already_correct'] += 1
-            continue
+    if correct_qty == move.qty and move.unit_id == target_unit.pk:
+        return 'already_correct', None, None
+    return 'updated', correct_qty, target_unit
 
-        if not dry_run:
+
+def _fix_moves_for_doc(moves_qs, line_lookup_fn, warn_fn, dry_run, stats):
+    """
+    For each StockMove in moves_qs, call line_lookup_fn(move) to retrieve the
+    source line.  Recalculate correct base-unit qty and update if changed.
+    """
+    for move in moves_qs.select_related('item__default_unit', 'item__selling_unit', 'unit'):
+        status, correct_qty, target_unit = _check_move(move, line_lookup_fn(move), warn_fn)
+        if status is None:
+            continue
+        stats[status] += 1
+        if status == 'updated' and not dry_run:
             move.qty = correct_qty
             move.unit = target_unit
             move.save(update_fields=['qty', 'unit_id'])
-        stats['updated'] += 1
 
 
 def _document_reference_number(doc):
@@ -280,8 +299,8 @@ def _document_posted_at(doc):
     return getattr(doc, 'posted_at', None) or getattr(doc, 'updated_at', None) or getattr(doc, 'created_at', None)
 
 
-def _document_posted_by(doc):
-    return getattr(doc, 'posted_by', None) or getattr(doc, 'created_by', None)
+def _document_posted_by_id(doc):
+    return getattr(doc, 'posted_by_id', None) or getattr(doc, 'created_by_id', None)
 
 
 def _line_batch(line):
@@ -415,7 +434,7 @@ def _iter_expected_moves(warn_fn):
     ]
 
     for ref_type, docs in doc_specs:
-        for doc in docs:
+        for doc in docs.iterator(chunk_size=resync.ITERATOR_CHUNK):
             for line in doc.lines.all():
                 qty = _line_qty(ref_type, line, warn_fn)
                 if qty in (None, Decimal('0')):
@@ -435,18 +454,20 @@ def _iter_expected_moves(warn_fn):
                     'batch_number': _line_batch(line),
                     'serial_number': _line_serial(line),
                     'notes': _line_notes(ref_type, line),
-                    'created_by': getattr(doc, 'created_by', None),
-                    'posted_by': _document_posted_by(doc),
+                    'created_by_id': getattr(doc, 'created_by_id', None),
+                    'posted_by_id': _document_posted_by_id(doc),
                     'posted_at': _document_posted_at(doc),
                 }
 
     # ── POS bundle component moves (not represented by POSSaleLine) ──────────
-    for sale in POSSale.objects.filter(status=SaleStatus.POSTED).prefetch_related(
+    from pos.models import POSSaleBundleLine
+    for sale in POSSale.objects.filter(
+        status=SaleStatus.POSTED, pk__in=POSSaleBundleLine.objects.values('sale_id'),
+    ).prefetch_related(
         'bundle_lines__price_list__items__item__default_unit',
         'bundle_lines__price_list__items__item__selling_unit',
-        'bundle_lines__price_list__items__item__stock_unit',
         'bundle_lines__price_list__items__unit',
-    ).select_related('location'):
+    ).select_related('location').iterator(chunk_size=resync.ITERATOR_CHUNK):
         for bundle_line in sale.bundle_lines.all():
             for pli in bundle_line.price_list.items.all():
                 item = pli.item
@@ -475,8 +496,8 @@ def _iter_expected_moves(warn_fn):
                     'batch_number': '',
                     'serial_number': '',
                     'notes': f'Bundle: {bundle_line.price_list.name}',
-                    'created_by': getattr(sale, 'created_by', None),
-                    'posted_by': _document_posted_by(sale),
+                    'created_by_id': getattr(sale, 'created_by_id', None),
+                    'posted_by_id': _document_posted_by_id(sale),
                     'posted_at': _document_posted_at(sale),
                 }
 
@@ -523,8 +544,8 @@ def _backfill_missing_moves(warn_fn, dry_run, info_fn):
                 serial_number=payload['serial_number'],
                 notes=payload['notes'],
                 status=MoveStatus.POSTED,
-                created_by=payload['created_by'],
-                posted_by=payload['posted_by'],
+                created_by_id=payload['created_by_id'],
+                posted_by_id=payload['posted_by_id'],
                 posted_at=payload['posted_at'],
             )
         existing_keys.add(key)
@@ -822,7 +843,6 @@ def _build_balance_from_documents(warn_fn):
         'lines__item__default_unit', 'lines__item__selling_unit', 'lines__unit', 'lines__location',
         'bundle_lines__price_list__items__item__default_unit',
         'bundle_lines__price_list__items__item__selling_unit',
-        'bundle_lines__price_list__items__item__stock_unit',
         'bundle_lines__price_list__items__unit',
     ).select_related('location'):
         for line in sale.lines.all():
@@ -931,6 +951,30 @@ class Command(BaseCommand):
             default=False,
             help='Suppress per-document output; only show summary.',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=min(4, os.cpu_count() or 1),
+            help='Worker processes for phases 1 and 2 (default: min(4, CPUs); 1 = in-process).',
+        )
+        parser.add_argument(
+            '--chunk-items',
+            type=int,
+            default=resync.DEFAULT_CHUNK_ITEMS,
+            help=f'Item ids per partition (default {resync.DEFAULT_CHUNK_ITEMS}).',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            default=False,
+            help='Continue the last interrupted run, skipping partitions it completed.',
+        )
+        parser.add_argument(
+            '--serial',
+            action='store_true',
+            default=False,
+            help='Use the single-process implementation (no partitions or checkpoints).',
+        )
 
     # ── internal output helpers ──────────────────────────────────────────────
 
@@ -958,6 +1002,9 @@ class Command(BaseCommand):
         self._quiet = options['quiet']
         dry_run = options['dry_run']
         phase = options['phase']
+        self._serial = options['serial']
+        self._workers = max(1, options['workers'])
+        self._chunk_items = max(1, options['chunk_items'])
 
         mode = 'DRY-RUN' if dry_run else 'APPLYING'
         self.stdout.write(self.style.SUCCESS(
@@ -969,6 +1016,17 @@ class Command(BaseCommand):
                 '  No changes will be saved.  Re-run without --dry-run to commit.\n'
             ))
 
+        if self._workers > 1 and not self._serial:
+            reason = resync.serial_reason()
+            if reason:
+                self.stdout.write(self.style.WARNING(f'  Running partitions in-process: {reason}.'))
+                self._workers = 1
+
+        # Checkpoints only make sense when partitions are applied as they finish.
+        self._run_id = None
+        if not dry_run and not self._serial:
+            self._run_id = self._start_run(options['resume'])
+
         if phase in ('0', 'all'):
             self._run_phase0(dry_run)
         if phase in ('1', 'all'):
@@ -978,8 +1036,40 @@ class Command(BaseCommand):
         if phase in ('3', 'all'):
             self._run_phase3()
 
+        if self._run_id:
+            ResyncCheckpoint.objects.filter(run_id=self._run_id).delete()
         self.stdout.write(self.style.SUCCESS('\n=== Done ===\n'))
 
+    # ── checkpoints ──────────────────────────────────────────────────────────
+
+    def _start_run(self, resume):
+        if resume:
+            run_id = ResyncCheckpoint.objects.order_by('-created_at').values_list('run_id', flat=True).first()
+            if run_id:
+                done = ResyncCheckpoint.objects.filter(run_id=run_id).count()
+                self.stdout.write(f'  Resuming run {run_id} ({done} partition(s) already done).')
+                return run_id
+            self.stdout.write('  No interrupted run to resume; starting a new one.')
+        # A new run makes the checkpoints of any interrupted one meaningless.
+        ResyncCheckpoint.objects.all().delete()
+        return uuid.uuid4().hex
+
+    def _completed(self, phase):
+        """{partition key: stored result} of the partitions of *phase* done in this run."""
+        if not self._run_id:
+            return {}
+        return dict(
+            ResyncCheckpoint.objects.filter(run_id=self._run_id, phase=phase)
+            .values_list('partition', 'result')
+        )
+
+    def _checkpoint(self, phase, partition, result):
+        if self._run_id:
+            ResyncCheckpoint.objects.create(
+                run_id=self._run_id, phase=phase,
+                partition=resync.partition_key(*partition), result=result,
+            )
+
     # ── Phase 0: clean up StockMoves ─────────────────────────────────────────
 
     def _run_phase0(self, dry_run):
@@ -1013,6 +1103,7 @@ class Command(BaseCommand):
         self.stdout.write('\n--- Phase 1: Correcting StockMove quantities ---')
 
         total_stats = {'updated': 0, 'already_correct': 0, 'no_line': 0, 'backfilled': 0}
+        rate = resync.Throughput('moves')
 
         with transaction.atomic():
             po_backfilled = _ensure_grn_purchase_orders(self._warn, dry_run, self._info)
@@ -1020,6 +1111,43 @@ class Command(BaseCommand):
                 transaction.set_rollback(True)
         self._info(f'  Missing GRN purchase orders created: {po_backfilled}')
 
+        if self._serial:
+            self._fix_moves_serial(dry_run, total_stats, rate)
+        else:
+            self._fix_moves_partitioned(dry_run, total_stats, rate)
+
+        with transaction.atomic():
+            backfilled = _backfill_missing_moves(self._warn, dry_run, self._info)
+            if dry_run:
+                transaction.set_rollback(True)
+        self._info(f'  Missing moves backfilled: {backfilled}')
+        total_stats['backfilled'] += backfilled
+
+        # Fix reversal moves: their qty should mirror the corrected original
+        if self._serial:
+            rev_updated = self._fix_reversals_serial(dry_run)
+        else:
+            rev_updated = resync.fix_reversals(dry_run)
+
+        self._info(f'  Reversal moves corrected: {rev_updated}')
+        total_stats['updated'] += rev_updated
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n  Phase 1 total — updated: {total_stats["updated"]}  '
+            f'already_correct: {total_stats["already_correct"]}  '
+            f'missing_source: {total_stats["no_line"]}  '
+            f'backfilled: {total_stats["backfilled"]}'
+        ))
+        self.stdout.write(f'  Phase 1 throughput: {rate}')
+
+    def _report_stats(self, stats):
+        self._info(
+            f'    -> updated={stats["updated"]}  '
+            f'ok={stats["already_correct"]}  '
+            f'missing_line={stats["no_line"]}'
+        )
+
+    def _fix_moves_serial(self, dry_run, total_stats, rate):
         for ref_type, lookup_factory in REFERENCE_TYPE_LOOKUPS.items():
             moves_qs = StockMove.objects.filter(
                 reference_type=ref_type,
@@ -1039,22 +1167,69 @@ class Command(BaseCommand):
                 if dry_run:
                     transaction.set_rollback(True)
 
-            self._info(
-                f'    -> updated={stats["updated"]}  '
-                f'ok={stats["already_correct"]}  '
-                f'missing_line={stats["no_line"]}'
-            )
+            self._report_stats(stats)
+            rate.add(count)
             for k, v in stats.items():
                 total_stats[k] += v
 
-        with transaction.atomic():
-            backfilled = _backfill_missing_moves(self._warn, dry_run, self._info)
-            if dry_run:
-                transaction.set_rollback(True)
-        self._info(f'  Missing moves backfilled: {backfilled}')
-        total_stats['backfilled'] += backfilled
+    def _fix_moves_partitioned(self, dry_run, total_stats, rate):
+        """Fix moves per (reference type, item range) partition, in parallel."""
+        from django.db.models import Count, Max, Min
 
-        # Fix reversal moves: their qty should mirror the corrected original
+        counts = {
+            row['reference_type']: row
+            for row in StockMove.objects.filter(
+                reference_type__in=list(REFERENCE_TYPE_LOOKUPS), status=MoveStatus.POSTED,
+            ).exclude(reference_number__startswith='REV-')
+            .order_by().values('reference_type')
+            .annotate(n=Count('pk'), lo=Min('item_id'), hi=Max('item_id'))
+        }
+        per_type = {
+            ref_type: {'moves': 0, 'updated': 0, 'already_correct': 0, 'no_line': 0}
+            for ref_type in counts
+        }
+
+        def add(ref_type, result):
+            per_type[ref_type]['moves'] += result['moves']
+            for k, v in result['stats'].items():
+                per_type[ref_type][k] += v
+
+        done = self._completed('1')
+        pending = []
+        for ref_type in REFERENCE_TYPE_LOOKUPS:
+            if ref_type not in counts:
+                continue
+            row = counts[ref_type]
+            for lo, hi in resync.item_ranges(row['lo'], row['hi'], self._chunk_items):
+                key = resync.partition_key(ref_type, lo, hi)
+                if key in done:
+                    add(ref_type, done[key])
+                else:
+                    pending.append((ref_type, lo, hi))
+
+        def on_result(partition, result):
+            for msg in result['warnings']:
+                self._warn(msg)
+            if not dry_run:
+                # The fixes and their checkpoint commit together.
+                with transaction.atomic():
+                    resync.apply_move_updates(result['updates'])
+                    self._checkpoint('1', partition, {'moves': result['moves'], 'stats': result['stats']})
+            add(partition[0], result)
+            rate.add(result['moves'])
+
+        self._info(f'  {len(pending)} partition(s) to process with {self._workers} worker(s).')
+        resync.run_partitions(resync.fix_moves_partition, pending, self._workers, on_result)
+
+        for ref_type in REFERENCE_TYPE_LOOKUPS:
+            if ref_type in per_type:
+                stats = per_type[ref_type]
+                self._info(f'  {ref_type:<35} {stats.pop("moves"):>5} moves')
+                self._report_stats(stats)
+                for k, v in stats.items():
+                    total_stats[k] += v
+
+    def _fix_reversals_serial(self, dry_run):
         rev_moves = StockMove.objects.filter(
             reference_number__startswith='REV-',
             status=MoveStatus.POSTED,
@@ -1076,16 +1251,7 @@ class Command(BaseCommand):
                     rev.unit = orig.unit
                     rev.save(update_fields=['qty', 'unit_id'])
                 rev_updated += 1
-
-        self._info(f'  Reversal moves corrected: {rev_updated}')
-        total_stats['updated'] += rev_updated
-
-        self.stdout.write(self.style.SUCCESS(
-            f'\n  Phase 1 total — updated: {total_stats["updated"]}  '
-            f'already_correct: {total_stats["already_correct"]}  '
-            f'missing_source: {total_stats["no_line"]}  '
-            f'backfilled: {total_stats["backfilled"]}'
-        ))
+        return rev_updated
 
     # ── Phase 2: recalculate StockBalance from document lines ────────────────
 
@@ -1093,10 +1259,42 @@ class Command(BaseCommand):
         self.stdout.write('\n--- Phase 2: Recalculating StockBalance ---')
 
         self.stdout.write('  Building correct balances from all posted documents...')
-        correct_bal = _build_balance_from_documents(self._warn)
+        if self._serial:
+            correct_bal = _build_balance_from_documents(self._warn)
+        else:
+            rate = resync.Throughput('lines')
+            correct_bal = self._build_balance_partitioned(rate)
+            self.stdout.write(f'  Phase 2 throughput: {rate}')
 
         self.stdout.write(f'  Computed {len(correct_bal)} (item, location) buckets.')
-
+        self._reconcile_balances(correct_bal, dry_run)
+
+    def _build_balance_partitioned(self, rate):
+        """Sum the balance deltas of every (document type, item range) partition."""
+        done = self._completed('2')
+        results = list(done.values())
+        for result in results:
+            rate.add(result['lines'])
+        pending = [
+            (source, lo, hi)
+            for source in [*resync.sources(), resync.BUNDLE_SOURCE]
+            for lo, hi in resync.item_ranges(*resync.balance_bounds(source), self._chunk_items)
+            if resync.partition_key(source, lo, hi) not in done
+        ]
+
+        def on_result(partition, result):
+            for msg in result['warnings']:
+                self._warn(msg)
+            # Deltas are kept until the reconcile so a resumed run can reuse them.
+            self._checkpoint('2', partition, {'lines': result['lines'], 'deltas': result['deltas']})
+            results.append(result)
+            rate.add(result['lines'])
+
+        self._info(f'  {len(pending)} partition(s) to process with {self._workers} worker(s).')
+        resync.run_partitions(resync.balance_partition, pending, self._workers, on_result)
+        return resync.merge_deltas(results)
+
+    def _reconcile_balances(self, correct_bal, dry_run):
         # Load all existing balances into a dict for comparison
         existing = {
             (b.item_id, b.location_id): b
@@ -1134,6 +1332,7 @@ class Command(BaseCommand):
                         f'{old_qty} -> {new_qty}'
                     )
                     bal_obj.qty_on_hand = new_qty
+                    bal_obj.updated_at = timezone.now()
                     to_update.append(bal_obj)
                 else:
                     unchanged += 1
@@ -1148,7 +1347,7 @@ class Command(BaseCommand):
                 if to_create:
                     StockBalance.objects.bulk_create(to_create)
                 if to_update:
-                    StockBalance.objects.bulk_update(to_update, ['qty_on_hand'])
+                    StockBalance.objects.bulk_update(to_update, ['qty_on_hand', 'updated_at'])
 
             self.stdout.write(self.style.SUCCESS(
                 f'  Committed: {len(to_create)} created, {len(to_update)} updated.'
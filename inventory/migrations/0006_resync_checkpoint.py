@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_alter_stockmove_move_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResyncCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(db_index=True, max_length=40)),
+                ('phase', models.CharField(max_length=10)),
+                ('partition', models.CharField(max_length=100)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'unique_together': {('run_id', 'phase', 'partition')},
+            },
+        ),
+    ]
@@ -52,6 +52,14 @@ class StockMove(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     posted_at = models.DateTimeField(null=True, blank=True)
+    unit_cost = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='Item cost per move unit when posted (COGS snapshot)',
+    )
+    line_cogs = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='unit_cost × qty when posted',
+    )
 
     class Meta:
         ordering = ['-created_at']
@@ -235,3 +243,22 @@ class InventoryToSupplyTransferLine(models.Model):
     def __str__(self):
         target = self.supply_item.code if self.supply_item else 'Auto'
         return f"{self.item.code} → {target} x{self.qty}"
+
+
+class ResyncCheckpoint(models.Model):
+    """
+    A completed partition of a ``resync_inventory`` run, so an interrupted
+    run can resume where it stopped.  Deleted when the run finishes.
+    """
+    run_id = models.CharField(max_length=40, db_index=True)
+    phase = models.CharField(max_length=10)
+    partition = models.CharField(max_length=100)
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('run_id', 'phase', 'partition')
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.run_id} phase {self.phase}: {self.partition}"
@@ -0,0 +1,422 @@
+"""
+Chunked, parallel pipeline behind ``manage.py resync_inventory``.
+
+Phase 1 (StockMove qty fixes) and phase 2 (StockBalance rebuild) are split
+into partitions: one per reference type (document type) and item-id range.
+A partition only reads — its moves or document lines are streamed with
+``.iterator(chunk_size=...)`` and its source lines are loaded in one query
+instead of one query per move — and returns plain data:
+
+* phase 1: the (move pk, qty, unit) updates plus per-type stats;
+* phase 2: the (item, location) → qty deltas of its lines.
+
+Partitions run in a process pool, each worker with its own database
+connection; the parent process applies the results and records each
+completed partition as an inventory.ResyncCheckpoint in the same
+transaction, so a crashed run can resume without redoing (or re-applying)
+finished partitions.  Results are identical to the serial implementation
+kept in the command module (``--serial``); only warning order differs.
+"""
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal
+
+DEFAULT_CHUNK_ITEMS = 500
+ITERATOR_CHUNK = 2000
+
+BUNDLE_SOURCE = 'POSSaleBundle'
+
+# Warning label prefixes used by the serial phase 2.
+BALANCE_LABELS = {
+    'GoodsReceipt': 'GRN',
+    'DeliveryNote': 'DN',
+    'SalesPickup': 'Pickup',
+    'StockTransfer': 'Transfer',
+    'StockAdjustment': 'Adj',
+    'DamagedReport': 'Damaged',
+    'POSSale': 'POSSale',
+    'POSRefund': 'POSRefund',
+    'InventoryToSupplyTransfer': 'IST',
+    'PurchaseReturn': 'PurchReturn',
+    'SalesReturn': 'SalesReturn',
+    'CustomerService': 'Service',
+}
+
+# Sign of a line's qty on its location's balance (transfers and adjustments
+# are handled separately).
+BALANCE_SIGNS = {
+    'GoodsReceipt': 1,
+    'DeliveryNote': -1,
+    'SalesPickup': -1,
+    'DamagedReport': -1,
+    'POSSale': -1,
+    'POSRefund': 1,
+    'InventoryToSupplyTransfer': -1,
+    'PurchaseReturn': -1,
+    'SalesReturn': 1,
+    'CustomerService': -1,
+}
+
+
+def sources():
+    """
+    {reference_type: (line model, line → document field, posted documents)}
+    for every document type that moves stock.
+    """
+    from core.models import DocumentStatus
+    from inventory.models import (
+        DamagedReport, DamagedReportLine, InventoryToSupplyTransfer,
+        InventoryToSupplyTransferLine, StockAdjustment, StockAdjustmentLine,
+        StockTransfer, StockTransferLine,
+    )
+    from pos.models import POSRefund, POSRefundLine, POSSale, POSSaleLine, RefundStatus, SaleStatus
+    from procurement.models import GoodsReceipt, GoodsReceiptLine, PurchaseReturn, PurchaseReturnLine
+    from sales.models import (
+        DeliveryLine, DeliveryNote, SalesPickup, SalesPickupLine, SalesReturn, SalesReturnLine,
+    )
+    from services.models import CustomerService, ServiceLine, ServiceStatus
+
+    posted = DocumentStatus.POSTED
+    return {
+        'GoodsReceipt': (GoodsReceiptLine, 'goods_receipt', GoodsReceipt.objects.filter(status=posted)),
+        'DeliveryNote': (DeliveryLine, 'delivery', DeliveryNote.objects.filter(status=posted)),
+        'SalesPickup': (SalesPickupLine, 'pickup', SalesPickup.objects.filter(status=posted)),
+        'StockTransfer': (StockTransferLine, 'transfer', StockTransfer.objects.filter(status=posted)),
+        'StockAdjustment': (StockAdjustmentLine, 'adjustment', StockAdjustment.objects.filter(status=posted)),
+        'DamagedReport': (DamagedReportLine, 'report', DamagedReport.objects.filter(status=posted)),
+        'POSSale': (POSSaleLine, 'sale', POSSale.objects.filter(status=SaleStatus.POSTED)),
+        'POSRefund': (POSRefundLine, 'refund', POSRefund.objects.filter(status=RefundStatus.POSTED)),
+        'InventoryToSupplyTransfer': (
+            InventoryToSupplyTransferLine, 'transfer',
+            InventoryToSupplyTransfer.objects.filter(status=posted),
+        ),
+        'PurchaseReturn': (PurchaseReturnLine, 'purchase_return', PurchaseReturn.objects.filter(status=posted)),
+        'SalesReturn': (SalesReturnLine, 'sales_return', SalesReturn.objects.filter(status=posted)),
+        'CustomerService': (ServiceLine, 'service', CustomerService.objects.filter(status=ServiceStatus.COMPLETED)),
+    }
+
+
+def item_ranges(lo, hi, chunk_items=DEFAULT_CHUNK_ITEMS):
+    """
+    Half-open [lo, hi) item-id ranges covering item ids *lo*..*hi*, aligned to
+    multiples of *chunk_items* so partition keys stay stable between runs.
+    """
+    if lo is None:
+        return []
+    start = lo - lo % chunk_items
+    return [(first, first + chunk_items) for first in range(start, hi + 1, chunk_items)]
+
+
+def balance_bounds(source):
+    """(min, max) item id of the lines phase 2 reads for *source*."""
+    from django.db.models import Max, Min
+
+    if source == BUNDLE_SOURCE:
+        from pos.models import POSSale, POSSaleBundleLine, SaleStatus
+        from pricing.models import PriceListItem
+
+        lines = PriceListItem.objects.filter(price_list_id__in=POSSaleBundleLine.objects.filter(
+            sale__in=POSSale.objects.filter(status=SaleStatus.POSTED).values('pk'),
+        ).values('price_list_id'))
+    else:
+        line_model, doc_field, docs = sources()[source]
+        lines = line_model.objects.filter(**{f'{doc_field}__in': docs.values('pk')})
+    bounds = lines.aggregate(lo=Min('item_id'), hi=Max('item_id'))
+    return bounds['lo'], bounds['hi']
+
+
+def partition_key(source, lo, hi):
+    return f'{source}:{lo}-{hi}'
+
+
+# ── Phase 1: StockMove qty fixes ────────────────────────────────────────────
+
+def _match_grn_line(move, candidates):
+    """The GoodsReceiptLine the serial GRN lookup would pick for *move*."""
+    matching = [
+        line for line in candidates
+        if line.location_id == move.to_location_id
+        and (not move.batch_number or line.batch_number == move.batch_number)
+        and (not move.serial_number or line.serial_number == move.serial_number)
+    ]
+    for line in matching:
+        if line.unit_id == move.unit_id:
+            return line
+    if matching:
+        return matching[0]
+    return candidates[0] if candidates else None
+
+
+def fix_moves_partition(ref_type, lo, hi):
+    """
+    Compute qty fixes for the POSTED non-reversal moves of *ref_type* with
+    item id in [lo, hi).  Source lines are loaded in one query; a move's line
+    is the first (lowest pk) line of its document and item, as in the serial
+    lookups.
+    """
+    from inventory.management.commands.resync_inventory import _check_move
+    from inventory.models import MoveStatus, StockMove
+
+    line_model, doc_field, _ = sources()[ref_type]
+    warnings = []
+    moves = (
+        StockMove.objects.filter(
+            reference_type=ref_type, status=MoveStatus.POSTED,
+            item_id__gte=lo, item_id__lt=hi,
+        )
+        .exclude(reference_number__startswith='REV-')
+    )
+    lines = defaultdict(list)
+    for line in (
+        line_model.objects.filter(**{
+            f'{doc_field}_id__in': moves.values('reference_id'),
+            'item_id__gte': lo, 'item_id__lt': hi,
+        })
+        .select_related('unit').order_by('pk').iterator(chunk_size=ITERATOR_CHUNK)
+    ):
+        lines[(getattr(line, f'{doc_field}_id'), line.item_id)].append(line)
+
+    stats = {'updated': 0, 'already_correct': 0, 'no_line': 0}
+    updates = []
+    count = 0
+    for move in (
+        moves.order_by('pk')
+        .select_related('item__default_unit', 'item__selling_unit', 'unit')
+        .iterator(chunk_size=ITERATOR_CHUNK)
+    ):
+        count += 1
+        candidates = lines.get((move.reference_id, move.item_id), [])
+        if ref_type == 'GoodsReceipt':
+            line = _match_grn_line(move, candidates)
+        else:
+            line = candidates[0] if candidates else None
+        status, qty, unit = _check_move(move, line, warnings.append)
+        if status in stats:
+            stats[status] += 1
+        if status == 'updated':
+            updates.append((move.pk, str(qty), unit.pk))
+    return {'moves': count, 'stats': stats, 'updates': updates, 'warnings': warnings}
+
+
+def apply_move_updates(updates):
+    """
+    Write (pk, qty, unit id) updates, one UPDATE per distinct qty/unit pair
+    (a CASE per row, as bulk_update builds, is slow on large batches).
+    """
+    from inventory.models import StockMove
+
+    by_value = defaultdict(list)
+    for pk, qty, unit_id in updates:
+        by_value[(Decimal(qty), unit_id)].append(pk)
+    for (qty, unit_id), pks in by_value.items():
+        for start in range(0, len(pks), 500):
+            StockMove.objects.filter(pk__in=pks[start:start + 500]).update(qty=qty, unit_id=unit_id)
+
+
+def fix_reversals(dry_run):
+    """
+    Make REV- moves mirror the qty/unit of the move they reverse.  Reads the
+    reversals and their originals in two queries; returns the number fixed.
+    """
+    from django.db.models import Q
+    from inventory.models import MoveStatus, StockMove
+
+    reversals = StockMove.objects.filter(reference_number__startswith='REV-', status=MoveStatus.POSTED)
+    rows = list(reversals.values_list('pk', 'reference_type', 'reference_id', 'reference_number', 'qty', 'unit_id'))
+    if not rows:
+        return 0
+    in_scope = Q(reference_id__in=reversals.values('reference_id'))
+    if any(row[2] is None for row in rows):
+        in_scope |= Q(reference_id__isnull=True)
+    originals = {}
+    # Default StockMove ordering (newest first), as .first() did per reversal.
+    for ref_type, ref_id, number, qty, unit_id in (
+        StockMove.objects.filter(in_scope, status=MoveStatus.POSTED)
+        .values_list('reference_type', 'reference_id', 'reference_number', 'qty', 'unit_id')
+        .iterator(chunk_size=ITERATOR_CHUNK)
+    ):
+        originals.setdefault((ref_type, ref_id, number), (qty, unit_id))
+
+    updates = []
+    for pk, ref_type, ref_id, number, qty, unit_id in rows:
+        orig = originals.get((ref_type, ref_id, number[4:]))
+        if orig and (orig[0] != qty or orig[1] != unit_id):
+            updates.append((pk, str(orig[0]), orig[1]))
+    if updates and not dry_run:
+        apply_move_updates(updates)
+    return len(updates)
+
+
+# ── Phase 2: StockBalance rebuild ───────────────────────────────────────────
+
+def balance_partition(source, lo, hi):
+    """
+    (item, location) → qty deltas of the posted document lines of *source*
+    with item id in [lo, hi), streamed.  Same conversions and signs as the
+    serial _build_balance_from_documents.
+    """
+    from inventory.management.commands.resync_inventory import _accumulate, _inventory_unit, _safe_convert
+
+    bal = defaultdict(Decimal)
+    warnings = []
+    if source == BUNDLE_SOURCE:
+        count = _bundle_balance(bal, warnings, lo, hi)
+        return _balance_result(bal, warnings, count)
+
+    line_model, doc_field, docs = sources()[source]
+    lines = line_model.objects.filter(**{
+        f'{doc_field}__in': docs.values('pk'),
+        'item_id__gte': lo, 'item_id__lt': hi,
+    }).select_related('item__default_unit', 'item__selling_unit', 'unit')
+    if source == 'POSSale':
+        from django.db.models import F
+        lines = lines.annotate(doc_location_id=F('sale__location_id'))
+
+    label = BALANCE_LABELS[source]
+    sign = BALANCE_SIGNS.get(source)
+    count = 0
+    for line in lines.order_by('pk').iterator(chunk_size=ITERATOR_CHUNK):
+        count += 1
+        item = line.item
+        doc_id = getattr(line, f'{doc_field}_id')
+        if source == 'CustomerService' and line.location_id is None:
+            continue
+        if source == 'StockAdjustment':
+            raw_diff = line.qty_counted - line.qty_system
+            if raw_diff == 0:
+                continue
+            q = _safe_convert(abs(raw_diff), line.unit, _inventory_unit(item),
+                              f'{label}#{doc_id} item={item.code}', warnings.append, item=item)
+            _accumulate(bal, line.item_id, line.location_id, q if raw_diff > 0 else -q)
+            continue
+        q = _safe_convert(line.qty, line.unit, _inventory_unit(item),
+                          f'{label}#{doc_id} item={item.code}', warnings.append, item=item)
+        if source == 'StockTransfer':
+            _accumulate(bal, line.item_id, line.from_location_id, -q)
+            _accumulate(bal, line.item_id, line.to_location_id, q)
+        elif source == 'POSSale':
+            _accumulate(bal, line.item_id, line.location_id or line.doc_location_id, -q)
+        else:
+            _accumulate(bal, line.item_id, line.location_id, sign * q)
+    return _balance_result(bal, warnings, count)
+
+
+def _bundle_balance(bal, warnings, lo, hi):
+    """Bundle component deductions of posted POS sales for components in [lo, hi)."""
+    from inventory.management.commands.resync_inventory import _accumulate, _inventory_unit, _safe_convert
+    from pos.models import POSSale, POSSaleBundleLine, SaleStatus
+    from pricing.models import PriceListItem
+
+    bundle_lines = list(
+        POSSaleBundleLine.objects.filter(
+            sale__in=POSSale.objects.filter(status=SaleStatus.POSTED).values('pk'),
+        ).values_list('sale_id', 'sale__location_id', 'price_list_id', 'price_list__name', 'qty_sets')
+    )
+    components = defaultdict(list)
+    for pli in PriceListItem.objects.filter(
+        price_list_id__in={row[2] for row in bundle_lines},
+        item_id__gte=lo, item_id__lt=hi,
+    ).select_related('item__default_unit', 'item__selling_unit', 'unit'):
+        components[pli.price_list_id].append(pli)
+
+    count = 0
+    for sale_id, location_id, price_list_id, name, qty_sets in bundle_lines:
+        for pli in components.get(price_list_id, ()):
+            count += 1
+            item = pli.item
+            qty = pli.min_qty * qty_sets
+            if qty <= Decimal('0'):
+                continue
+            q = _safe_convert(qty, pli.unit, _inventory_unit(item),
+                              f'POSSale#{sale_id} bundle={name} item={item.code}',
+                              warnings.append, item=item)
+            _accumulate(bal, item.pk, location_id, -q)
+    return count
+
+
+def _balance_result(bal, warnings, count):
+    return {
+        'lines': count,
+        'deltas': [[item_id, location_id, str(qty)] for (item_id, location_id), qty in bal.items()],
+        'warnings': warnings,
+    }
+
+
+def merge_deltas(results):
+    """Sum the deltas of phase 2 partition results into one (item, location) → qty dict."""
+    bal = defaultdict(Decimal)
+    for result in results:
+        for item_id, location_id, qty in result['deltas']:
+            bal[(item_id, location_id)] += Decimal(qty)
+    return bal
+
+
+# ── Running partitions ──────────────────────────────────────────────────────
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:  # spawn / forkserver start methods: a fresh interpreter
+        django.setup()
+    from django.db import connections
+    connections.close_all()
+
+
+def serial_reason():
+    """
+    Why partitions must run in this process rather than a pool, or None.
+    Workers use their own connections, so they only see committed data,
+    and on SQLite their long reads would block the parent's writes unless
+    the database is in WAL mode.
+    """
+    from django.db import connection
+
+    if connection.in_atomic_block:
+        return 'inside a transaction'
+    if connection.vendor == 'sqlite':
+        if connection.is_in_memory_db():
+            return 'in-memory SQLite database'
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            if cursor.fetchone()[0].lower() != 'wal':
+                return 'SQLite database not in WAL mode (PRAGMA journal_mode=WAL)'
+    return None
+
+
+def run_partitions(func, partitions, workers=1, on_result=None):
+    """
+    Run ``func(*partition)`` for every partition tuple and call
+    ``on_result(partition, result)`` in this process as each one completes.
+    With workers > 1 the partitions run in a process pool; callers check
+    serial_reason() first.
+    """
+    if workers <= 1 or len(partitions) <= 1:
+        for partition in partitions:
+            on_result(partition, func(*partition))
+        return
+
+    from django.db import connections
+
+    # Children must open their own connections, not share this one.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(func, *partition): partition for partition in partitions}
+        for future in as_completed(futures):
+            on_result(futures[future], future.result())
+
+
+class Throughput:
+    """Counts rows processed by a phase and reports the rate."""
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.count = 0
+        self.started = time.perf_counter()
+
+    def add(self, n):
+        self.count += n
+
+    def __str__(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return f'{self.count} {self.unit} in {elapsed:.2f}s ({self.count / elapsed:,.0f} {self.unit}/s)'
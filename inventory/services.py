@@ -4,6 +4,7 @@ All stock changes go through this service to ensure consistency.
 """
 from decimal import Decimal
 from django.db import transaction
+from django.db.models import Q, Sum
 from django.utils import timezone
 
 from inventory.models import (
@@ -14,29 +15,162 @@ from audit.models import AuditLog
 from catalog.models import convert_to_base_unit
 
 
-def _update_balance(item, location, qty_delta, reserved_delta=Decimal('0')):
+class BalanceBatch:
     """
-    Atomically update (or create) a StockBalance row.
-    Uses select_for_update to prevent race conditions.
+    Collects StockBalance deltas for a whole document and applies them at once.
+
+    Deltas are aggregated per (item, location) across all lines, every affected
+    row is locked with one ordered SELECT ... FOR UPDATE, negative stock is
+    validated in memory and the rows are written back with bulk_update, so a
+    document costs the same handful of queries regardless of its line count.
+
+    With ``check_available=True`` the guard compares against
+    qty_on_hand - qty_reserved (POS behaviour) instead of qty_on_hand.
+
+    With ``track_item_totals=True`` apply() also records, in ``item_totals``,
+    each item's qty_on_hand summed over all locations before the write (one
+    grouped query, independent of how many locations hold the item).
     """
-    balance, created = StockBalance.objects.select_for_update().get_or_create(
-        item=item,
-        location=location,
-        defaults={'qty_on_hand': Decimal('0'), 'qty_reserved': Decimal('0')},
-    )
-    balance.qty_on_hand += qty_delta
-    balance.qty_reserved += reserved_delta
 
-    # Check negative stock
-    warehouse = location.warehouse
-    if not warehouse.allow_negative_stock and balance.qty_on_hand < 0:
-        raise ValueError(
-            f"Insufficient stock for {item.code} at {location}. "
-            f"Available: {balance.qty_on_hand - qty_delta}, Requested: {abs(qty_delta)}"
+    def __init__(self, check_available=False, track_item_totals=False):
+        self.check_available = check_available
+        self.track_item_totals = track_item_totals
+        self.item_totals = {}
+        self._deltas = {}
+
+    def __len__(self):
+        return len(self._deltas)
+
+    def add(self, item, location, qty_delta, reserved_delta=Decimal('0'), label=''):
+        """Queue a signed delta for *item* at *location*."""
+        key = (item.pk, location.pk)
+        entry = self._deltas.get(key)
+        if entry is None:
+            entry = self._deltas[key] = {
+                'item': item,
+                'location': location,
+                'qty': Decimal('0'),
+                'reserved': Decimal('0'),
+                'requested': Decimal('0'),
+                'label': label,
+            }
+        entry['qty'] += qty_delta
+        entry['reserved'] += reserved_delta
+        if qty_delta < 0:
+            entry['requested'] -= qty_delta
+        return entry
+
+    def apply(self):
+        """
+        Lock, validate and write every queued delta.
+        Returns a dict mapping (item_id, location_id) to the updated StockBalance.
+        Raises ValueError (before writing anything) when a row would go negative
+        in a warehouse that does not allow negative stock.
+        """
+        if not self._deltas:
+            return {}
+
+        keys = sorted(self._deltas)
+        balances = _lock_balances(keys)
+        missing = [key for key in keys if key not in balances]
+        if missing:
+            StockBalance.objects.bulk_create(
+                [
+                    StockBalance(
+                        item_id=item_id, location_id=location_id,
+                        qty_on_hand=Decimal('0'), qty_reserved=Decimal('0'),
+                    )
+                    for item_id, location_id in missing
+                ],
+                ignore_conflicts=True,
+            )
+            balances.update(_lock_balances(missing))
+
+        if self.track_item_totals:
+            self.item_totals = _item_on_hand_totals({item_id for item_id, _ in keys})
+
+        now = timezone.now()
+        for key in keys:
+            entry = self._deltas[key]
+            balance = balances[key]
+            available_before = (
+                balance.qty_available if self.check_available else balance.qty_on_hand
+            )
+            balance.qty_on_hand += entry['qty']
+            balance.qty_reserved += entry['reserved']
+            balance.updated_at = now
+
+            if entry['qty'] >= 0 or balance.location.warehouse.allow_negative_stock:
+                continue
+            remaining = balance.qty_available if self.check_available else balance.qty_on_hand
+            if remaining < 0:
+                item = entry['item']
+                prefix = f"[{entry['label']}] " if entry['label'] else ''
+                raise ValueError(
+                    f"{prefix}Insufficient stock for {item.code} at {entry['location']}. "
+                    f"Available: {available_before}, Requested: {entry['requested']}"
+                )
+
+        StockBalance.objects.bulk_update(
+            [balances[key] for key in keys],
+            ['qty_on_hand', 'qty_reserved', 'updated_at'],
         )
+        self._deltas = {}
+        return balances
+
+
+def _lock_balances(keys):
+    """Lock the StockBalance rows for *keys* ((item_id, location_id) pairs) in pk order."""
+    items_by_location = {}
+    for item_id, location_id in keys:
+        items_by_location.setdefault(location_id, []).append(item_id)
+    # One condition per location keeps the WHERE clause small for large documents.
+    cond = Q()
+    for location_id, item_ids in items_by_location.items():
+        cond |= Q(location_id=location_id, item_id__in=item_ids)
+    rows = (
+        StockBalance.objects
+        .select_for_update(of=('self',))
+        .select_related('location__warehouse')
+        .filter(cond)
+        .order_by('pk')
+    )
+    return {(b.item_id, b.location_id): b for b in rows}
+
+
+def _item_on_hand_totals(item_ids):
+    """Map item_id to qty_on_hand summed across every location (one grouped query)."""
+    rows = (
+        StockBalance.objects
+        .filter(item_id__in=list(item_ids))
+        .values('item_id')
+        .annotate(total=Sum('qty_on_hand'))
+        .values_list('item_id', 'total')
+    )
+    return {item_id: total or Decimal('0') for item_id, total in rows}
+
+
+def _update_balance(item, location, qty_delta, reserved_delta=Decimal('0')):
+    """
+    Atomically update (or create) a single StockBalance row.
+    Thin wrapper over BalanceBatch for callers that touch one row only.
+    """
+    batch = BalanceBatch()
+    batch.add(item, location, qty_delta, reserved_delta)
+    return batch.apply()[(item.pk, location.pk)]
+
 
-    balance.save()
-    return balance
+def _add_to_source_lines(lines, field, qty_by_item):
+    """
+    Add qty_by_item[item_id] to *field* on every line in *lines* (PO/SO lines)
+    and write them back in one bulk_update.
+    """
+    changed = []
+    for src in lines.filter(item_id__in=list(qty_by_item)):
+        setattr(src, field, getattr(src, field) + qty_by_item[src.item_id])
+        changed.append(src)
+    if changed:
+        lines.model.objects.bulk_update(changed, [field])
 
 
 def _create_audit(user, action, obj, changes=None):
@@ -51,6 +185,17 @@ def _create_audit(user, action, obj, changes=None):
     )
 
 
+def _create_moves(moves):
+    """
+    bulk_create *moves*, first stamping the unit_cost / line_cogs snapshot at
+    the current item cost on those that do not carry one yet.
+    """
+    from core.cogs import stamp_line_costs
+
+    stamp_line_costs([move for move in moves if move.unit_cost is None])
+    return StockMove.objects.bulk_create(moves)
+
+
 @transaction.atomic
 def post_goods_receipt(grn, user):
     """
@@ -64,8 +209,18 @@ def post_goods_receipt(grn, user):
 
     now = timezone.now()
     moves = []
-
-    for line in grn.lines.select_related('item__default_unit', 'item__selling_unit', 'unit').all():
+    balances = BalanceBatch(track_item_totals=True)
+    received_by_item = {}
+    # item_id -> stock-unit qty received, stock-unit qty without a PO price,
+    # and the value of the priced receipts (for the weighted average cost)
+    receipts = {}
+    po_lines = {}
+    if grn.purchase_order_id:
+        # First PO line per item, like .filter(item=...).first()
+        for po_line in grn.purchase_order.lines.order_by('pk'):
+            po_lines.setdefault(po_line.item_id, po_line)
+
+    for line in grn.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
         move = StockMove(
             move_type=MoveType.RECEIVE,
@@ -85,39 +240,59 @@ def post_goods_receipt(grn, user):
             posted_at=now,
         )
         moves.append(move)
-        _update_balance(line.item, line.location, base_qty)
-
-        # Update PO received qty if linked
-        if grn.purchase_order:
-            po_lines = grn.purchase_order.lines.filter(item=line.item)
-            for po_line in po_lines:
-                po_line.qty_received += line.qty
-                po_line.save(update_fields=['qty_received'])
+        balances.add(line.item, line.location, base_qty)
+        received_by_item[line.item_id] = received_by_item.get(line.item_id, Decimal('0')) + line.qty
 
-    StockMove.objects.bulk_create(moves)
+        receipt = receipts.setdefault(
+            line.item_id, {'qty': Decimal('0'), 'unpriced_qty': Decimal('0'), 'value': None},
+        )
+        receipt['qty'] += base_qty
+        po_line = po_lines.get(line.item_id)
+        if po_line is not None and po_line.unit_price > 0:
+            value = line.qty * po_line.unit_price
+            receipt['value'] = (receipt['value'] or Decimal('0')) + value
+            # Priced receipts are valued at the PO price, not the item cost.
+            if base_qty:
+                move.unit_cost = (value / base_qty).quantize(Decimal('0.0001'))
+                move.line_cogs = value.quantize(Decimal('0.0001'))
+        else:
+            receipt['unpriced_qty'] += base_qty
 
-    # Weighted average cost update
+    # Lock the items first so concurrent receipts of the same item apply
+    # their cost updates one after the other.
     from catalog.models import Item
-    for line in grn.lines.select_related('item').all():
-        item = line.item
-        if item.cost_price is None:
-            item.cost_price = Decimal('0')
-        total_existing_qty = sum(
-            b.qty_on_hand for b in StockBalance.objects.filter(item=item)
-        )
-        # total_existing_qty already includes the qty we just added
-        old_qty = total_existing_qty - line.qty
-        if old_qty + line.qty > 0:
-            po_unit_price = Decimal('0')
-            if grn.purchase_order:
-                po_line = grn.purchase_order.lines.filter(item=line.item).first()
-                if po_line:
-                    po_unit_price = po_line.unit_price
-            if po_unit_price > 0:
-                old_value = old_qty * item.cost_price
-                new_value = line.qty * po_unit_price
-                item.cost_price = (old_value + new_value) / (old_qty + line.qty)
-                item.save(update_fields=['cost_price', 'updated_at'])
+    items = {
+        item.pk: item
+        for item in Item.objects.select_for_update().filter(pk__in=list(receipts)).order_by('pk')
+    }
+    balances.apply()
+
+    # Update PO received qty if linked
+    if grn.purchase_order_id:
+        _add_to_source_lines(grn.purchase_order.lines.all(), 'qty_received', received_by_item)
+
+    _create_moves(moves)
+
+    # Weighted average cost update: existing stock at the current cost plus
+    # the priced receipts, per stock unit.  Receipts without a PO price come
+    # in at the current cost.
+    costed = []
+    for item_id, receipt in receipts.items():
+        if receipt['value'] is None:
+            continue
+        item = items[item_id]
+        cost = item.cost_price or Decimal('0')
+        old_qty = max(balances.item_totals.get(item_id, Decimal('0')), Decimal('0'))
+        new_qty = old_qty + receipt['qty']
+        if new_qty <= 0:
+            continue
+        item.cost_price = (
+            (old_qty + receipt['unpriced_qty']) * cost + receipt['value']
+        ) / new_qty
+        item.updated_at = now
+        costed.append(item)
+    if costed:
+        Item.objects.bulk_update(costed, ['cost_price', 'updated_at'])
 
     grn.status = DocumentStatus.POSTED
     grn.posted_by = user
@@ -133,7 +308,8 @@ def post_delivery(delivery, user):
     """
     Post a Delivery Note: creates DELIVER StockMoves and updates balances.
     """
-    from sales.models import DeliveryNote
+    from sales.models import DeliveryLine, DeliveryNote
+    from core.cogs import SNAPSHOT_FIELDS, stamp_line_costs
     from core.models import DocumentStatus
 
     if delivery.status != DocumentStatus.DRAFT:
@@ -141,8 +317,11 @@ def post_delivery(delivery, user):
 
     now = timezone.now()
     moves = []
+    balances = BalanceBatch()
+    delivered_by_item = {}
 
-    for line in delivery.lines.select_related('item__default_unit', 'item__selling_unit', 'unit').all():
+    lines = list(delivery.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location'))
+    for line in lines:
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
         move = StockMove(
             move_type=MoveType.DELIVER,
@@ -162,16 +341,18 @@ def post_delivery(delivery, user):
             posted_at=now,
         )
         moves.append(move)
-        _update_balance(line.item, line.location, -base_qty)
+        balances.add(line.item, line.location, -base_qty)
+        delivered_by_item[line.item_id] = delivered_by_item.get(line.item_id, Decimal('0')) + line.qty
 
-        # Update SO delivered qty if linked (track in the SO line's own unit)
-        if delivery.sales_order:
-            so_lines = delivery.sales_order.lines.filter(item=line.item)
-            for so_line in so_lines:
-                so_line.qty_delivered += line.qty
-                so_line.save(update_fields=['qty_delivered'])
+    balances.apply()
 
-    StockMove.objects.bulk_create(moves)
+    # Update SO delivered qty if linked (track in the SO line's own unit)
+    if delivery.sales_order_id:
+        _add_to_source_lines(delivery.sales_order.lines.all(), 'qty_delivered', delivered_by_item)
+
+    _create_moves(moves)
+    stamp_line_costs(lines)
+    DeliveryLine.objects.bulk_update(lines, SNAPSHOT_FIELDS)
 
     delivery.status = DocumentStatus.POSTED
     delivery.posted_by = user
@@ -196,8 +377,10 @@ def post_sales_pickup(pickup, user):
 
     now = timezone.now()
     moves = []
+    balances = BalanceBatch()
+    delivered_by_item = {}
 
-    for line in pickup.lines.select_related('item__default_unit', 'item__selling_unit', 'unit').all():
+    for line in pickup.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
         move = StockMove(
             move_type=MoveType.DELIVER,
@@ -217,16 +400,16 @@ def post_sales_pickup(pickup, user):
             posted_at=now,
         )
         moves.append(move)
-        _update_balance(line.item, line.location, -base_qty)
+        balances.add(line.item, line.location, -base_qty)
+        delivered_by_item[line.item_id] = delivered_by_item.get(line.item_id, Decimal('0')) + line.qty
+
+    balances.apply()
 
-        # Update SO delivered qty if linked (track in the SO line's own unit)
-        if pickup.sales_order:
-            so_lines = pickup.sales_order.lines.filter(item=line.item)
-            for so_line in so_lines:
-                so_line.qty_delivered += line.qty
-                so_line.save(update_fields=['qty_delivered'])
+    # Update SO delivered qty if linked (track in the SO line's own unit)
+    if pickup.sales_order_id:
+        _add_to_source_lines(pickup.sales_order.lines.all(), 'qty_delivered', delivered_by_item)
 
-    StockMove.objects.bulk_create(moves)
+    _create_moves(moves)
 
     pickup.status = DocumentStatus.POSTED
     pickup.posted_by = user
@@ -249,8 +432,11 @@ def post_transfer(transfer, user):
 
     now = timezone.now()
     moves = []
+    balances = BalanceBatch()
 
-    for line in transfer.lines.select_related('item__default_unit', 'item__selling_unit', 'unit').all():
+    for line in transfer.lines.select_related(
+        'item__default_unit', 'item__selling_unit', 'unit', 'from_location', 'to_location',
+    ).all():
         # Validate locations belong to correct warehouses
         if line.from_location.warehouse_id != transfer.from_warehouse_id:
             raise ValueError(
@@ -281,10 +467,11 @@ def post_transfer(transfer, user):
             posted_at=now,
         )
         moves.append(move)
-        _update_balance(line.item, line.from_location, -base_qty)
-        _update_balance(line.item, line.to_location, base_qty)
+        balances.add(line.item, line.from_location, -base_qty)
+        balances.add(line.item, line.to_location, base_qty)
 
-    StockMove.objects.bulk_create(moves)
+    balances.apply()
+    _create_moves(moves)
 
     transfer.status = DocumentStatus.POSTED
     transfer.posted_by = user
@@ -307,8 +494,9 @@ def post_adjustment(adjustment, user):
 
     now = timezone.now()
     moves = []
+    balances = BalanceBatch()
 
-    for line in adjustment.lines.select_related('item__default_unit', 'item__selling_unit', 'unit').all():
+    for line in adjustment.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
         raw_diff = line.qty_counted - line.qty_system
         if raw_diff == 0:
             continue
@@ -333,9 +521,10 @@ def post_adjustment(adjustment, user):
             posted_at=now,
         )
         moves.append(move)
-        _update_balance(line.item, line.location, base_diff)
+        balances.add(line.item, line.location, base_diff)
 
-    StockMove.objects.bulk_create(moves)
+    balances.apply()
+    _create_moves(moves)
 
     adjustment.status = DocumentStatus.POSTED
     adjustment.posted_by = user
@@ -358,8 +547,9 @@ def post_damaged_report(report, user):
 
     now = timezone.now()
     moves = []
+    balances = BalanceBatch()
 
-    for line in report.lines.select_related('item__default_unit', 'item__selling_unit', 'unit').all():
+    for line in report.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
         move = StockMove(
             move_type=MoveType.DAMAGE,
@@ -378,9 +568,10 @@ def post_damaged_report(report, user):
             posted_at=now,
         )
         moves.append(move)
-        _update_balance(line.item, line.location, -base_qty)
+        balances.add(line.item, line.location, -base_qty)
 
-    StockMove.objects.bulk_create(moves)
+    balances.apply()
+    _create_moves(moves)
 
     report.status = DocumentStatus.POSTED
     report.posted_by = user
@@ -441,8 +632,9 @@ def cancel_document(doc, user):
             reference_type=doc.__class__.__name__,
             reference_id=doc.pk,
             status=MoveStatus.POSTED,
-        )
+        ).select_related('item', 'unit', 'from_location', 'to_location')
         reversal_moves = []
+        balances = BalanceBatch()
         for orig in original_moves:
             reversal = StockMove(
                 move_type=orig.move_type,
@@ -457,6 +649,8 @@ def cancel_document(doc, user):
                 batch_number=orig.batch_number,
                 serial_number=orig.serial_number,
                 notes=f"Reversal of move #{orig.pk}",
+                unit_cost=orig.unit_cost,
+                line_cogs=orig.line_cogs,
                 status=MoveStatus.POSTED,
                 created_by=user,
                 posted_by=user,
@@ -466,11 +660,12 @@ def cancel_document(doc, user):
 
             # Reverse balance effects
             if orig.to_location:
-                _update_balance(orig.item, orig.to_location, -orig.qty)
+                balances.add(orig.item, orig.to_location, -orig.qty)
             if orig.from_location:
-                _update_balance(orig.item, orig.from_location, orig.qty)
+                balances.add(orig.item, orig.from_location, orig.qty)
 
-        StockMove.objects.bulk_create(reversal_moves)
+        balances.apply()
+        _create_moves(reversal_moves)
 
     doc.status = DocumentStatus.CANCELLED
     doc.save(update_fields=['status', 'updated_at'])
@@ -489,8 +684,9 @@ def post_purchase_return(pr, user):
 
     now = timezone.now()
     moves = []
+    balances = BalanceBatch()
 
-    for line in pr.lines.select_related('item__default_unit', 'item__selling_unit', 'unit').all():
+    for line in pr.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
         move = StockMove(
             move_type=MoveType.RETURN_OUT,
@@ -509,9 +705,10 @@ def post_purchase_return(pr, user):
             posted_at=now,
         )
         moves.append(move)
-        _update_balance(line.item, line.location, -base_qty)
+        balances.add(line.item, line.location, -base_qty)
 
-    StockMove.objects.bulk_create(moves)
+    balances.apply()
+    _create_moves(moves)
 
     pr.status = DocumentStatus.POSTED
     pr.posted_by = user
@@ -533,8 +730,9 @@ def post_sales_return(sr, user):
 
     now = timezone.now()
     moves = []
+    balances = BalanceBatch()
 
-    for line in sr.lines.select_related('item__default_unit', 'item__selling_unit', 'unit').all():
+    for line in sr.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
         move = StockMove(
             move_type=MoveType.RETURN_IN,
@@ -553,9 +751,10 @@ def post_sales_return(sr, user):
             posted_at=now,
         )
         moves.append(move)
-        _update_balance(line.item, line.location, base_qty)
+        balances.add(line.item, line.location, base_qty)
 
-    StockMove.objects.bulk_create(moves)
+    balances.apply()
+    _create_moves(moves)
 
     sr.status = DocumentStatus.POSTED
     sr.posted_by = user
@@ -586,11 +785,12 @@ def post_inventory_to_supply(ist, user):
     now = timezone.now()
     moves = []
     supply_movements = []
+    balances = BalanceBatch()
 
     for line in ist.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
         # Deduct inventory stock
-        _update_balance(line.item, line.location, -base_qty)
+        balances.add(line.item, line.location, -base_qty)
 
         move = StockMove(
             move_type=MoveType.SUPPLY_OUT,
@@ -649,7 +849,8 @@ def post_inventory_to_supply(ist, user):
         )
         supply_movements.append(sm)
 
-    StockMove.objects.bulk_create(moves)
+    balances.apply()
+    _create_moves(moves)
 
     # Save supply movements individually so the .save() triggers current_stock recalc
     for sm in supply_movements:
@@ -685,8 +886,9 @@ def cancel_inventory_to_supply(ist, user):
             reference_type='InventoryToSupplyTransfer',
             reference_id=ist.pk,
             status=MoveStatus.POSTED,
-        )
+        ).select_related('item', 'unit', 'from_location', 'to_location')
         reversal_moves = []
+        balances = BalanceBatch()
         for orig in original_moves:
             reversal = StockMove(
                 move_type=orig.move_type,
@@ -700,6 +902,8 @@ def cancel_inventory_to_supply(ist, user):
                 reference_number=f"REV-{orig.reference_number}",
                 batch_number=orig.batch_number,
                 notes=f"Reversal of move #{orig.pk}",
+                unit_cost=orig.unit_cost,
+                line_cogs=orig.line_cogs,
                 status=MoveStatus.POSTED,
                 created_by=user,
                 posted_by=user,
@@ -707,9 +911,10 @@ def cancel_inventory_to_supply(ist, user):
             )
             reversal_moves.append(reversal)
             if orig.from_location:
-                _update_balance(orig.item, orig.from_location, orig.qty)
+                balances.add(orig.item, orig.from_location, orig.qty)
 
-        StockMove.objects.bulk_create(reversal_moves)
+        balances.apply()
+        _create_moves(reversal_moves)
 
         # Reverse SupplyMovements: add OUT movements to cancel each IN
         for line in ist.lines.select_related('supply_item', 'unit').all():
@@ -733,7 +938,14 @@ def cancel_inventory_to_supply(ist, user):
 
 
 def generate_document_number(prefix, model_class):
-    """Generate sequential document numbers like PO-000001, GRN-000001, etc."""
-    last = model_class.all_objects.order_by('-id').first()
-    next_num = (last.id + 1) if last else 1
+    """Generate sequential document numbers like PO-000001, GRN-000001, etc.
+
+    Numbers come from the *prefix* series in core.sequences; call this inside
+    the transaction that saves the document to keep the series gapless.
+    """
+    from core.sequences import existing_max, next_value
+
+    next_num = next_value(
+        prefix, seed=lambda: existing_max(model_class, 'document_number', f'{prefix}-'),
+    )
     return f"{prefix}-{next_num:06d}"
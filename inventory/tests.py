@@ -94,6 +94,35 @@ class PostGoodsReceiptTests(PostingTestMixin, TestCase):
         with self.assertRaises(ValueError):
             post_goods_receipt(grn, self.user)
 
+    def test_post_grn_updates_weighted_average_cost(self):
+        self.item.cost_price = Decimal('10')
+        self.item.save()
+        StockBalance.objects.create(item=self.item, location=self.location, qty_on_hand=Decimal('30'))
+        StockBalance.objects.create(item=self.item, location=self.location2, qty_on_hand=Decimal('20'))
+        po = PurchaseOrder.objects.create(
+            document_number='PO-WAC', supplier=self.supplier, warehouse=self.warehouse,
+            order_date=timezone.now().date(), created_by=self.user,
+        )
+        PurchaseOrderLine.objects.create(
+            purchase_order=po, item=self.item, qty_ordered=Decimal('50'),
+            unit=self.unit, unit_price=Decimal('16'),
+        )
+        grn = GoodsReceipt.objects.create(
+            document_number='GRN-WAC', purchase_order=po, supplier=self.supplier,
+            warehouse=self.warehouse, receipt_date=timezone.now().date(), created_by=self.user,
+        )
+        # Two lines of the same item: both count towards one cost update.
+        for loc, qty in ((self.location, Decimal('30')), (self.location2, Decimal('20'))):
+            GoodsReceiptLine.objects.create(
+                goods_receipt=grn, item=self.item, location=loc, qty=qty, unit=self.unit,
+            )
+        post_goods_receipt(grn, self.user)
+
+        # (50 x 10 + 50 x 16) / 100
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.cost_price, Decimal('13'))
+        self.assertEqual(po.lines.get().qty_received, Decimal('50'))
+
 
 class PostDeliveryTests(PostingTestMixin, TestCase):
 
@@ -295,3 +324,209 @@ class CancelDocumentTests(PostingTestMixin, TestCase):
         # Original + reversal moves
         all_moves = StockMove.objects.filter(reference_type='GoodsReceipt', reference_id=grn.pk)
         self.assertEqual(all_moves.count(), 2)
+
+
+class BalanceBatchTests(PostingTestMixin, TestCase):
+
+    def _seed(self, item, location, qty):
+        StockBalance.objects.create(
+            item=item, location=location,
+            qty_on_hand=qty, qty_reserved=Decimal('0'),
+        )
+
+    def test_deltas_for_same_row_are_aggregated(self):
+        self._seed(self.item, self.location, Decimal('10'))
+        dn = DeliveryNote.objects.create(
+            document_number='DN-AGG-01', customer=self.customer,
+            warehouse=self.warehouse, delivery_date=timezone.now().date(),
+            created_by=self.user,
+        )
+        for qty in (Decimal('6'), Decimal('6')):
+            DeliveryLine.objects.create(
+                delivery=dn, item=self.item, location=self.location, qty=qty, unit=self.unit,
+            )
+        with self.assertRaises(ValueError):
+            post_delivery(dn, self.user)
+
+        bal = StockBalance.objects.get(item=self.item, location=self.location)
+        self.assertEqual(bal.qty_on_hand, Decimal('10'))
+
+    def test_missing_balance_rows_are_created(self):
+        from inventory.services import BalanceBatch
+
+        batch = BalanceBatch()
+        batch.add(self.item, self.location, Decimal('5'))
+        batch.add(self.item, self.location2, Decimal('7'))
+        batch.apply()
+
+        self.assertEqual(
+            StockBalance.objects.get(item=self.item, location=self.location).qty_on_hand, Decimal('5'),
+        )
+        self.assertEqual(
+            StockBalance.objects.get(item=self.item, location=self.location2).qty_on_hand, Decimal('7'),
+        )
+
+
+class PostingQueryCountTests(PostingTestMixin, TestCase):
+    """Posting a document must cost the same number of queries regardless of line count."""
+
+    def _make_items(self, n):
+        items = []
+        for i in range(n):
+            item = Item.objects.create(
+                code=f'QC-{i:03d}', name=f'Query Count {i}', item_type='RAW',
+                category=self.category, default_unit=self.unit,
+            )
+            StockBalance.objects.create(
+                item=item, location=self.location,
+                qty_on_hand=Decimal('100'), qty_reserved=Decimal('0'),
+            )
+            items.append(item)
+        return items
+
+    def _count_queries(self, fn):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            fn()
+        return len(ctx.captured_queries)
+
+    def _delivery(self, items, number):
+        dn = DeliveryNote.objects.create(
+            document_number=number, customer=self.customer,
+            warehouse=self.warehouse, delivery_date=timezone.now().date(),
+            created_by=self.user,
+        )
+        for item in items:
+            DeliveryLine.objects.create(
+                delivery=dn, item=item, location=self.location, qty=Decimal('1'), unit=self.unit,
+            )
+        return dn
+
+    def _transfer(self, items, number):
+        transfer = StockTransfer.objects.create(
+            document_number=number, from_warehouse=self.warehouse,
+            to_warehouse=self.warehouse, created_by=self.user,
+        )
+        for item in items:
+            StockTransferLine.objects.create(
+                transfer=transfer, item=item, from_location=self.location,
+                to_location=self.location2, qty=Decimal('1'), unit=self.unit,
+            )
+        return transfer
+
+    def _damage(self, items, number):
+        report = DamagedReport.objects.create(
+            document_number=number, warehouse=self.warehouse, created_by=self.user,
+        )
+        for item in items:
+            DamagedReportLine.objects.create(
+                report=report, item=item, location=self.location, qty=Decimal('1'), unit=self.unit,
+            )
+        return report
+
+    def _adjustment(self, items, number):
+        adj = StockAdjustment.objects.create(
+            document_number=number, warehouse=self.warehouse, created_by=self.user,
+        )
+        for item in items:
+            StockAdjustmentLine.objects.create(
+                adjustment=adj, item=item, location=self.location,
+                qty_counted=Decimal('90'), qty_system=Decimal('100'), unit=self.unit,
+            )
+        return adj
+
+    def _assert_constant(self, build, post):
+        items = self._make_items(30)
+        small = build(items[:1], 'QC-SMALL')
+        large = build(items[1:], 'QC-LARGE')
+        small_queries = self._count_queries(lambda: post(small, self.user))
+        large_queries = self._count_queries(lambda: post(large, self.user))
+        self.assertEqual(small_queries, large_queries)
+        return large
+
+    def _receipt(self, items, number, po=None):
+        grn = GoodsReceipt.objects.create(
+            document_number=number, purchase_order=po, supplier=self.supplier,
+            warehouse=self.warehouse, receipt_date=timezone.now().date(),
+            created_by=self.user,
+        )
+        GoodsReceiptLine.objects.bulk_create([
+            GoodsReceiptLine(
+                goods_receipt=grn, item=item, location=self.location, qty=Decimal('10'), unit=self.unit,
+            )
+            for item in items
+        ])
+        return grn
+
+    def _priced_po(self, items, number):
+        po = PurchaseOrder.objects.create(
+            document_number=number, supplier=self.supplier, warehouse=self.warehouse,
+            order_date=timezone.now().date(), created_by=self.user,
+        )
+        PurchaseOrderLine.objects.bulk_create([
+            PurchaseOrderLine(
+                purchase_order=po, item=item, qty_ordered=Decimal('10'),
+                unit=self.unit, unit_price=Decimal('20'),
+            )
+            for item in items
+        ])
+        return po
+
+    def test_goods_receipt_500_lines(self):
+        """Benchmark: cost updates of a 500-line GRN with stock in many locations."""
+        locations = [self.location2] + [
+            Location.objects.create(warehouse=self.warehouse, code=f'QC-BIN-{i}', name=f'QC Bin {i}')
+            for i in range(3)
+        ]
+        items = [
+            Item(
+                code=f'QC-GRN-{i:03d}', name=f'GRN Bench {i}', item_type='RAW',
+                category=self.category, default_unit=self.unit, cost_price=Decimal('10'),
+            )
+            for i in range(501)
+        ]
+        Item.objects.bulk_create(items)
+        StockBalance.objects.bulk_create([
+            StockBalance(item=item, location=loc, qty_on_hand=Decimal('5'))
+            for item in items for loc in locations
+        ])
+        small = self._receipt(items[:1], 'QC-GRN-S', self._priced_po(items[:1], 'QC-PO-S'))
+        large = self._receipt(items[1:], 'QC-GRN-L', self._priced_po(items[1:], 'QC-PO-L'))
+
+        small_queries = self._count_queries(lambda: post_goods_receipt(small, self.user))
+        large_queries = self._count_queries(lambda: post_goods_receipt(large, self.user))
+        # Only the bulk writes grow: the SQLite backend splits them into batches.
+        self.assertLess(large_queries, small_queries + 15)
+
+        # 20 on hand at 10 + 10 received at 20
+        item = Item.objects.get(pk=items[-1].pk)
+        self.assertEqual(item.cost_price.quantize(Decimal('0.0001')), Decimal('13.3333'))
+        self.assertEqual(StockMove.objects.filter(reference_id=large.pk, move_type=MoveType.RECEIVE).count(), 500)
+
+    def test_delivery_query_count_is_constant(self):
+        self._assert_constant(self._delivery, post_delivery)
+
+    def test_transfer_query_count_is_constant(self):
+        self._assert_constant(self._transfer, post_transfer)
+
+    def test_damaged_report_query_count_is_constant(self):
+        self._assert_constant(self._damage, post_damaged_report)
+
+    def test_adjustment_query_count_is_constant(self):
+        self._assert_constant(self._adjustment, post_adjustment)
+
+    def test_cancel_query_count_is_constant(self):
+        items = self._make_items(30)
+        small = self._delivery(items[:1], 'QC-CAN-S')
+        large = self._delivery(items[1:], 'QC-CAN-L')
+        post_delivery(small, self.user)
+        post_delivery(large, self.user)
+        small_queries = self._count_queries(lambda: cancel_document(small, self.user))
+        large_queries = self._count_queries(lambda: cancel_document(large, self.user))
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(
+            StockBalance.objects.get(item=items[-1], location=self.location).qty_on_hand,
+            Decimal('100'),
+        )
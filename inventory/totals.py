@@ -0,0 +1,58 @@
+"""
+Per-item stock totals across all locations, computed in SQL.
+
+StockBalance holds one row per item/location.  The dashboard and the stock
+reports need the per-item sum; these helpers push the grouping into the
+query (a correlated subquery per annotated column) so a page costs the same
+number of queries whatever the size of the catalog.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from inventory.models import StockBalance
+
+QTY_FIELD = DecimalField(max_digits=15, decimal_places=4)
+
+
+def _balance_sum(field):
+    totals = (
+        StockBalance.objects
+        .filter(item=OuterRef('pk'))
+        .order_by()
+        .values('item')
+        .annotate(total=Sum(field))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=QTY_FIELD), Decimal('0'), output_field=QTY_FIELD)
+
+
+def with_stock_totals(items):
+    """Annotate an Item queryset with total_on_hand and total_reserved over every location."""
+    return items.annotate(
+        total_on_hand=_balance_sum('qty_on_hand'),
+        total_reserved=_balance_sum('qty_reserved'),
+    )
+
+
+def low_stock_items(items=None):
+    """Active items with a reorder point whose total on hand is at or below it, annotated."""
+    from catalog.models import Item
+
+    if items is None:
+        items = Item.objects.all()
+    return with_stock_totals(
+        items.filter(is_active=True, reorder_point__gt=0)
+    ).filter(total_on_hand__lte=F('reorder_point'))
+
+
+def inventory_valuation(warehouse_id=None):
+    """Sum of qty_on_hand x cost_price over the balances of active items (negative stock included)."""
+    balances = StockBalance.objects.filter(item__is_active=True)
+    if warehouse_id:
+        balances = balances.filter(location__warehouse_id=warehouse_id)
+    value = F('qty_on_hand') * Coalesce(F('item__cost_price'), Decimal('0'), output_field=QTY_FIELD)
+    return balances.aggregate(
+        total=Coalesce(Sum(value, output_field=QTY_FIELD), Decimal('0'), output_field=QTY_FIELD),
+    )['total']
@@ -210,3 +210,12 @@ if not DEBUG:
 # QR Code settings
 # ---------------------------------------------------------------------------
 QR_CODE_DIR = MEDIA_ROOT / 'qrcodes'
+
+# ---------------------------------------------------------------------------
+# Background jobs (core.jobs)
+# ---------------------------------------------------------------------------
+# 'thread' runs jobs on an in-process thread pool; 'db' leaves them queued
+# for `manage.py run_jobs` workers; 'inline' runs them on commit (tests).
+JOBS_BACKEND = os.environ.get('DJANGO_JOBS_BACKEND', 'thread')
+JOBS_THREADS = int(os.environ.get('DJANGO_JOBS_THREADS', '2'))
+JOBS_STALE_AFTER = 30 * 60  # seconds without a heartbeat (or, thread backend, still queued) before a job is failed
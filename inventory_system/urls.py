@@ -23,13 +23,13 @@ from reports.views import (
     stock_on_hand_report, stock_movement_report,
     damaged_summary_report, low_stock_report,
 )
-from pricing.views import PriceListViewSet, PriceListItemViewSet, DiscountRuleViewSet, price_lookup
+from pricing.views import PriceListViewSet, PriceListItemViewSet, DiscountRuleViewSet, price_lookup, price_resolve
 from pos.views import (
     POSRegisterViewSet, POSShiftViewSet, POSSaleViewSet,
     POSRefundViewSet, CashEntryViewSet,
     api_open_shift, api_close_shift, api_shift_summary,
 )
-from theme.views import dashboard_view
+from theme.views import dashboard_view, dashboard_widgets_api
 
 # ── DRF Router ─────────────────────────────────────────────────────────────
 router = DefaultRouter()
@@ -92,6 +92,7 @@ urlpatterns = [
 
     # Pricing API endpoints
     path('api/pricing/price/', price_lookup, name='api_price_lookup'),
+    path('api/pricing/resolve/', price_resolve, name='api_price_resolve'),
 
     # Report API endpoints
     path('api/reports/stock-on-hand/', stock_on_hand_report, name='api_stock_on_hand'),
@@ -101,6 +102,7 @@ urlpatterns = [
 
     # Template views
     path('dashboard/', dashboard_view, name='dashboard'),
+    path('dashboard/widgets/', dashboard_widgets_api, name='dashboard_widgets'),
     path('accounts/', include('accounts.urls')),
     path('catalog/', include('catalog.urls')),
     path('partners/', include('partners.urls')),
@@ -0,0 +1,100 @@
+import math
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the single-pass POS checkout (checkout_cart) for several cart sizes. '
+        'Runs against throwaway fixtures inside a transaction that is always rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1,10,100',
+            help='Comma-separated cart sizes in lines (default: 1,10,100).',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Checkouts per cart size (default: 20).',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers.')
+        iterations = options['iterations']
+        if not sizes or min(sizes) < 1 or iterations < 1:
+            raise CommandError('Cart sizes and --iterations must be positive.')
+
+        results = []
+        with transaction.atomic():
+            fixtures = self._fixtures(max(sizes))
+            for size in sizes:
+                results.append((size, *self._run(fixtures, size, iterations)))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"lines":>6} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8}')
+        for size, p50, p95, queries in results:
+            self.stdout.write(f'{size:>6} {p50:>9.1f} {p95:>9.1f} {queries:>8}')
+        self.stdout.write(self.style.SUCCESS('Done. All benchmark data was rolled back.'))
+
+    def _fixtures(self, n_items):
+        from accounts.models import User
+        from catalog.models import Category, Item, Unit
+        from inventory.models import StockBalance
+        from pos.models import POSRegister
+        from pos.services import open_shift
+        from warehouses.models import Location, Warehouse
+
+        user = User.objects.create_user(username='__pos_benchmark__', password=None)
+        category = Category.objects.create(code='__BENCH__', name='POS benchmark')
+        unit = Unit.objects.create(name='__bench_pcs__', abbreviation='__bpcs__')
+        warehouse = Warehouse.objects.create(code='__BENCH__', name='POS benchmark')
+        location = Location.objects.create(warehouse=warehouse, code='__BENCH__', name='POS benchmark')
+        items = Item.objects.bulk_create([
+            Item(
+                code=f'__BENCH-{i:04d}__', name=f'Benchmark item {i}', item_type='FINISHED',
+                category=category, default_unit=unit,
+                cost_price=Decimal('5'), selling_price=Decimal('10'),
+            )
+            for i in range(n_items)
+        ])
+        StockBalance.objects.bulk_create([
+            StockBalance(item=item, location=location, qty_on_hand=Decimal('1000000'))
+            for item in items
+        ])
+        register = POSRegister.objects.create(
+            name='__bench__', warehouse=warehouse, default_location=location,
+        )
+        shift = open_shift(register, user, Decimal('0'))
+        return {'user': user, 'items': items, 'shift': shift}
+
+    def _run(self, fixtures, size, iterations):
+        from pos.services import checkout_cart
+
+        lines = [
+            {'item': item.pk, 'qty': Decimal('1'), 'unit_price': Decimal('10')}
+            for item in fixtures['items'][:size]
+        ]
+        payments = [{'method': 'CASH', 'amount': Decimal('10') * size}]
+        timings = []
+        queries = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                checkout_cart(fixtures['shift'], fixtures['user'], lines, payments)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = len(ctx.captured_queries)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[max(0, math.ceil(0.95 * len(timings)) - 1)]
+        return p50, p95, queries
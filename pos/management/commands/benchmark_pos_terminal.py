@@ -0,0 +1,164 @@
+"""
+Management command: benchmark_pos_terminal
+
+Load test of one terminal sale through the HTTP endpoints, comparing the
+per-line terminal (new sale, then item search, price lookup and add-line
+per item, price lookup and update-qty per quantity change, then checkout)
+with the client-side cart (one checkout request; the register snapshot is
+loaded once per terminal session, then refreshed with ?since= deltas;
+both are reported on their own rows).  Counts
+HTTP requests, database queries and milliseconds per sale.  Runs against
+throwaway fixtures inside a transaction that is always rolled back.
+
+Usage:
+  python manage.py benchmark_pos_terminal
+  python manage.py benchmark_pos_terminal --items 30 --bumps 1 --iterations 5
+"""
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+
+class Command(BaseCommand):
+    help = 'Compare requests, queries and time per POS sale: per-line terminal endpoints vs client-side cart.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=30, help='Lines per sale (default: 30).')
+        parser.add_argument(
+            '--bumps', type=int, default=1,
+            help='Quantity changes per line (default: 1).',
+        )
+        parser.add_argument('--iterations', type=int, default=5, help='Sales per flow (default: 5).')
+
+    def handle(self, *args, **options):
+        n_items, bumps, iterations = options['items'], options['bumps'], options['iterations']
+        if n_items < 1 or bumps < 0 or iterations < 1:
+            raise CommandError('--items and --iterations must be positive, --bumps not negative.')
+
+        results = []
+        with override_settings(ALLOWED_HOSTS=['*']), transaction.atomic():
+            fixtures = self._fixtures(n_items)
+            self.client = Client()
+            self.client.force_login(fixtures['user'])
+            results.append(('snapshot (per load)', *self._measure(self._snapshot, fixtures, 1)))
+            results.append(('snapshot delta', *self._measure(self._snapshot_delta, fixtures, iterations)))
+            results.append(('per-line terminal', *self._measure(self._per_line_sale, fixtures, iterations, bumps)))
+            payload = self._cart_payload(fixtures, bumps)
+            results.append(('client-side cart', *self._measure(self._cart_sale, fixtures, iterations, payload)))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{n_items} lines, {bumps} quantity change(s) per line')
+        self.stdout.write(f'{"flow":<20} {"requests":>9} {"queries":>8} {"ms":>9}')
+        for label, requests, queries, ms in results:
+            self.stdout.write(f'{label:<20} {requests:>9} {queries:>8} {ms:>9.1f}')
+        self.stdout.write(self.style.SUCCESS('Done. All benchmark data was rolled back.'))
+
+    def _fixtures(self, n_items):
+        from accounts.models import User
+        from catalog.models import Category, Item, Unit
+        from inventory.models import StockBalance
+        from pos.models import POSRegister
+        from pos.services import open_shift
+        from pricing.models import PriceList, PriceListItem
+        from warehouses.models import Location, Warehouse
+
+        user = User.objects.create_user(username='__pos_terminal_benchmark__', password=None)
+        category = Category.objects.create(code='__TBENCH__', name='Terminal benchmark')
+        unit = Unit.objects.create(name='__tbench_pcs__', abbreviation='__tbpcs__')
+        warehouse = Warehouse.objects.create(code='__TBENCH__', name='Terminal benchmark')
+        location = Location.objects.create(warehouse=warehouse, code='__TBENCH__', name='Terminal benchmark')
+        items = Item.objects.bulk_create([
+            Item(
+                code=f'__TBENCH-{i:04d}__', name=f'Terminal benchmark item {i}', item_type='FINISHED',
+                category=category, default_unit=unit,
+                cost_price=Decimal('5'), selling_price=Decimal('10'),
+            )
+            for i in range(n_items)
+        ])
+        StockBalance.objects.bulk_create([
+            StockBalance(item=item, location=location, qty_on_hand=Decimal('1000000'))
+            for item in items
+        ])
+        price_list = PriceList.objects.create(name='__tbench__')
+        PriceListItem.objects.bulk_create([
+            PriceListItem(price_list=price_list, item=item, unit=unit, price=price, min_qty=min_qty)
+            for item in items
+            for min_qty, price in ((Decimal('1'), Decimal('9.5')), (Decimal('2'), Decimal('9.25')))
+        ])
+        register = POSRegister.objects.create(
+            name='__tbench__', warehouse=warehouse, default_location=location, price_list=price_list,
+        )
+        shift = open_shift(register, user, Decimal('0'))
+        return {'user': user, 'items': items, 'register': register, 'shift': shift}
+
+    def _measure(self, flow, fixtures, iterations, *args):
+        requests = queries = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                requests = flow(fixtures, *args)
+            queries = len(ctx.captured_queries)
+        return requests, queries, (time.perf_counter() - started) * 1000 / iterations
+
+    def _ok(self, response):
+        if response.status_code != 200:
+            raise CommandError(f'{response.request["PATH_INFO"]} returned {response.status_code}: {response.content[:200]!r}')
+        return response.json()
+
+    def _snapshot(self, fixtures):
+        fixtures['version'] = self._ok(self.client.get(f'/pos/terminal/{fixtures["shift"].pk}/snapshot/'))['version']
+        return 1
+
+    def _snapshot_delta(self, fixtures):
+        response = self.client.get(f'/pos/terminal/{fixtures["shift"].pk}/snapshot/', {'since': fixtures['version']})
+        if response.status_code != 304:
+            self._ok(response)
+        return 1
+
+    def _per_line_sale(self, fixtures, bumps):
+        register = fixtures['register'].pk
+        sale_id = self._ok(self.client.post(f'/pos/terminal/{fixtures["shift"].pk}/new-sale/'))['sale_id']
+        requests = 1
+        for item in fixtures['items']:
+            self._ok(self.client.get('/api/items/', {'search': item.code, 'register': register}))
+            price = self._ok(self.client.get('/api/pricing/price/', {'item': item.pk, 'qty': 1, 'register': register}))
+            line = self._ok(self.client.post(f'/pos/terminal/sale/{sale_id}/add-line/', {
+                'item_id': item.pk, 'qty': 1, 'unit_price': price['price'],
+            }))
+            requests += 3
+            for qty in range(2, bumps + 2):
+                price = self._ok(self.client.get('/api/pricing/price/', {'item': item.pk, 'qty': qty, 'register': register}))
+                self._ok(self.client.post(f'/pos/terminal/line/{line["line_id"]}/update-qty/', {
+                    'qty': qty, 'new_unit_price': price['price'],
+                }))
+                requests += 2
+        self._ok(self.client.post(f'/pos/terminal/sale/{sale_id}/checkout/', {'payments': '[]'}))
+        return requests + 1
+
+    def _cart_payload(self, fixtures, bumps):
+        """The checkout the terminal builds locally from the snapshot."""
+        from pos.services.terminal import register_price, register_tiers
+
+        qty = Decimal(bumps + 1)
+        tiers = register_tiers(fixtures['register'], {item.pk: item.default_unit_id for item in fixtures['items']})
+        lines = [
+            {'item': item.pk, 'qty': str(qty),
+             'unit_price': str(register_price(tiers.get(item.pk, []), qty, item.selling_price))}
+            for item in fixtures['items']
+        ]
+        grand_total = sum(Decimal(l['qty']) * Decimal(l['unit_price']) for l in lines).quantize(Decimal('0.01'))
+        return json.dumps({
+            'lines': lines, 'grand_total': str(grand_total),
+            'payments': [{'method': 'CASH', 'amount': str(grand_total)}],
+        })
+
+    def _cart_sale(self, fixtures, payload):
+        self._ok(self.client.post(
+            f'/pos/terminal/{fixtures["shift"].pk}/checkout/', payload, content_type='application/json',
+        ))
+        return 1
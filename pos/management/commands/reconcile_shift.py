@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pos.models import POSShift, ShiftStatus
+from pos.services import reconcile_shift
+
+
+class Command(BaseCommand):
+    help = (
+        'Verify the running POS shift totals against a full aggregate of payments, '
+        'refunds and cash entries, and report drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'shift_ids', nargs='*', type=int,
+            help='Shift ids to check (default: all open shifts).',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Check every shift, open or closed.',
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Overwrite drifted totals with the aggregated values.',
+        )
+
+    def handle(self, *args, **options):
+        shifts = POSShift.objects.select_related('register').order_by('pk')
+        if options['shift_ids']:
+            shifts = shifts.filter(pk__in=options['shift_ids'])
+            missing = set(options['shift_ids']) - set(shifts.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f'Unknown shift id(s): {", ".join(map(str, sorted(missing)))}')
+        elif not options['all']:
+            shifts = shifts.filter(status=ShiftStatus.OPEN)
+
+        checked = drifted = 0
+        for shift in shifts.iterator():
+            checked += 1
+            drift = reconcile_shift(shift, fix=options['fix'])
+            if not drift:
+                continue
+            drifted += 1
+            self.stdout.write(self.style.WARNING(
+                f'Shift #{shift.pk} @ {shift.register.name} ({shift.status}):'
+            ))
+            for field, (stored, expected) in drift.items():
+                self.stdout.write(f'  {field}: stored {stored}, expected {expected} ({expected - stored:+})')
+
+        summary = f'Done. Checked={checked}, Drifted={drifted}'
+        if options['fix'] and drifted:
+            summary += ' (fixed)'
+        self.stdout.write(self.style.SUCCESS(summary) if not drifted or options['fix'] else summary)
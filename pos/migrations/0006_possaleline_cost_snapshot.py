@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0005_add_pos_sale_bundle_line'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='possaleline',
+            name='line_cogs',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='unit_cost × qty when posted', max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='possaleline',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Item cost per line unit when posted (COGS snapshot)', max_digits=15, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0006_possaleline_cost_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='possale',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, editable=False, help_text='Id the terminal gave the sale; a retried or replayed checkout with it is not posted twice.', null=True, unique=True),
+        ),
+    ]
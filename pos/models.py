@@ -107,6 +107,10 @@ class POSSale(TimeStampedModel):
     posted_at = models.DateTimeField(null=True, blank=True)
     stock_deducted = models.BooleanField(default=False)
     notes = models.TextField(blank=True, default='')
+    client_uuid = models.UUIDField(
+        null=True, blank=True, unique=True, editable=False,
+        help_text='Id the terminal gave the sale; a retried or replayed checkout with it is not posted twice.',
+    )
 
     class Meta:
         ordering = ['-created_at']
@@ -131,6 +135,14 @@ class POSSaleLine(models.Model):
     batch_number = models.CharField(max_length=100, blank=True, default='')
     serial_number = models.CharField(max_length=100, blank=True, default='')
     qr_uid_used = models.UUIDField(null=True, blank=True)
+    unit_cost = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='Item cost per line unit when posted (COGS snapshot)',
+    )
+    line_cogs = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='unit_cost × qty when posted',
+    )
 
     def __str__(self):
         return f"POS Line: {self.item.code} x{self.qty}"
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from pos.models import (
     POSRegister, POSShift, POSSale, POSSaleLine,
-    POSPayment, POSRefund, POSRefundLine, CashEntry,
+    POSPayment, POSRefund, POSRefundLine, CashEntry, PaymentMethod,
 )
 
 
@@ -166,3 +166,67 @@ class CreateRefundRequestSerializer(serializers.Serializer):
     original_sale = serializers.IntegerField()
     reason = serializers.CharField(required=False, default='')
     lines = POSRefundLineSerializer(many=True)
+
+
+class CartLineSerializer(serializers.Serializer):
+    item = serializers.IntegerField()
+    qty = serializers.DecimalField(max_digits=15, decimal_places=4)
+    unit = serializers.IntegerField(required=False, allow_null=True)
+    unit_price = serializers.DecimalField(max_digits=15, decimal_places=4, required=False, allow_null=True)
+    discount_amount = serializers.DecimalField(max_digits=15, decimal_places=2, default=0)
+    tax_rate = serializers.DecimalField(max_digits=5, decimal_places=2, default=0)
+    location = serializers.IntegerField(required=False, allow_null=True)
+    batch_number = serializers.CharField(required=False, default='', allow_blank=True)
+    serial_number = serializers.CharField(required=False, default='', allow_blank=True)
+    qr_uid_used = serializers.UUIDField(required=False, allow_null=True)
+
+
+class CartBundleSerializer(serializers.Serializer):
+    price_list = serializers.IntegerField()
+    qty_sets = serializers.DecimalField(max_digits=15, decimal_places=4, default=1)
+
+
+class CartPaymentSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=PaymentMethod.choices, default=PaymentMethod.CASH)
+    amount = serializers.DecimalField(max_digits=15, decimal_places=2)
+    reference_no = serializers.CharField(required=False, default='', allow_blank=True)
+
+
+class CheckoutRequestSerializer(serializers.Serializer):
+    shift = serializers.IntegerField()
+    customer = serializers.IntegerField(required=False, allow_null=True)
+    channel = serializers.IntegerField(required=False, allow_null=True)
+    notes = serializers.CharField(required=False, default='', allow_blank=True)
+    lines = CartLineSerializer(many=True, required=False, default=list)
+    bundles = CartBundleSerializer(many=True, required=False, default=list)
+    payments = CartPaymentSerializer(many=True)
+
+
+class TerminalCartLineSerializer(CartLineSerializer):
+    # Terminal lines are in the item's stock unit, the unit its prices are in.
+    unit = None
+    unit_price = serializers.DecimalField(max_digits=15, decimal_places=4)
+
+
+class TerminalCartBundleSerializer(CartBundleSerializer):
+    unit_price = serializers.DecimalField(max_digits=15, decimal_places=4)
+
+
+class TerminalCheckoutSerializer(serializers.Serializer):
+    """A cart built in the POS terminal, with the prices and total it showed."""
+    lines = TerminalCartLineSerializer(many=True, required=False, default=list)
+    bundles = TerminalCartBundleSerializer(many=True, required=False, default=list)
+    payments = CartPaymentSerializer(many=True)
+    grand_total = serializers.DecimalField(max_digits=15, decimal_places=2)
+    draft = serializers.IntegerField(required=False, allow_null=True)
+    client_uuid = serializers.UUIDField(required=False, allow_null=True)
+
+
+class OfflineSaleSerializer(serializers.Serializer):
+    """A sale the terminal completed offline and queued for replay."""
+    client_uuid = serializers.UUIDField()
+    version = serializers.CharField(max_length=100)
+    lines = TerminalCartLineSerializer(many=True, required=False, default=list)
+    bundles = TerminalCartBundleSerializer(many=True, required=False, default=list)
+    payments = CartPaymentSerializer(many=True)
+    grand_total = serializers.DecimalField(max_digits=15, decimal_places=2)
@@ -1,9 +1,27 @@
 from pos.services.checkout import (
+    mark_sale_paid,
     post_pos_sale,
+    checkout_cart,
+    sale_totals,
     post_pos_refund,
     void_sale,
     open_shift,
     close_shift,
+    reconcile_shift,
+    apply_cash_entry,
     generate_sale_number,
     generate_refund_number,
 )
+from pos.services.bundles import (
+    bundle_availability,
+    bundle_definitions,
+)
+from pos.services.terminal import (
+    StalePrices,
+    checkout_terminal_cart,
+    register_snapshot,
+    replay_offline_sales,
+    snapshot_delta,
+    snapshot_version,
+    terminal_bundles,
+)
@@ -0,0 +1,118 @@
+"""
+Bundle (price list sold as a set) definitions and availability for the POS
+terminal.
+
+Definitions — price per set and the quantity of each component per set in
+the item's stock unit — are cached in-process and rebuilt when the version
+stamp of price lists, price list rows or items changes, or when the unit
+conversion graph is reloaded.  Availability for every bundle at a warehouse
+comes from one grouped StockBalance query.
+"""
+import threading
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+
+def _version_stamp():
+    """Fingerprint of the tables bundle definitions are built from (one aggregate query each)."""
+    from catalog.models import Item
+    from core.versioning import version_stamp
+    from pricing.models import PriceList, PriceListItem
+
+    return version_stamp([PriceList, PriceListItem, Item])
+
+
+def _load_definitions(graph):
+    from django.db.models import Prefetch
+    from pos.services.terminal import _in_stock_unit
+    from pricing.models import PriceList, PriceListItem
+
+    price_lists = (
+        PriceList.objects
+        .filter(items__is_active=True)
+        .distinct()
+        .prefetch_related(Prefetch(
+            'items',
+            queryset=PriceListItem.objects.filter(is_active=True).select_related('item').order_by('pk'),
+        ))
+        .order_by('name')
+    )
+    bundles = []
+    for pl in price_lists:
+        components = []
+        for pli in pl.items.all():
+            item = pli.item
+            qty = _in_stock_unit(graph, pli.min_qty, pli.unit_id, item.selling_unit_id or item.default_unit_id, item.pk)
+            components.append({'item': item.pk, 'code': item.code, 'name': item.name, 'qty': qty})
+        bundles.append({
+            'id': pl.pk,
+            'name': pl.name,
+            'unit_price': sum((pli.price for pli in pl.items.all()), Decimal('0')),
+            'components': components,
+        })
+    return bundles
+
+
+class _Cache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bundles = None
+        self.stamp = None
+        self.graph = None
+
+
+_cache = _Cache()
+
+
+def bundle_definitions():
+    """
+    Bundles offered by the terminal, ordered by name: active price lists
+    with active rows, as {'id', 'name', 'unit_price' (per set),
+    'components': [{'item', 'code', 'name', 'qty' (per set, stock unit)}]}.
+    Treat the result as read-only; it is shared between requests.
+    """
+    from catalog.conversions import get_conversion_graph
+
+    graph = get_conversion_graph()
+    stamp = _version_stamp()
+    with _cache.lock:
+        if _cache.bundles is None or stamp != _cache.stamp or graph is not _cache.graph:
+            _cache.bundles = _load_definitions(graph)
+            _cache.stamp = stamp
+            _cache.graph = graph
+        return _cache.bundles
+
+
+def bundle_availability(warehouse_id, bundles=None):
+    """
+    *bundles* (default: bundle_definitions()) with the stock available at
+    the warehouse: each component gets 'available' (on hand less reserved,
+    summed over the warehouse's locations) and each bundle 'max_sets', the
+    whole sets that stock covers (min over components of available /
+    qty; None when no component takes stock).  One query for all bundles.
+    """
+    from inventory.models import StockBalance
+
+    bundles = bundle_definitions() if bundles is None else bundles
+    item_ids = {c['item'] for b in bundles for c in b['components']}
+    available = dict(
+        StockBalance.objects
+        .filter(location__warehouse_id=warehouse_id, item_id__in=item_ids)
+        .values('item')
+        .annotate(available=Sum(F('qty_on_hand') - F('qty_reserved')))
+        .values_list('item', 'available')
+    ) if item_ids else {}
+
+    result = []
+    for bundle in bundles:
+        components = []
+        max_sets = None
+        for component in bundle['components']:
+            stock = available.get(component['item']) or Decimal('0')
+            components.append({**component, 'available': stock})
+            if component['qty'] > 0:
+                sets = max(0, int(stock // component['qty']))
+                max_sets = sets if max_sets is None else min(max_sets, sets)
+        result.append({**bundle, 'components': components, 'max_sets': max_sets})
+    return result
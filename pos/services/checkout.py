@@ -1,14 +1,16 @@
 """
 POS posting engine — checkout, refund, void, shift management.
-All stock changes delegate to inventory.services._update_balance for consistency.
+All stock changes delegate to inventory.services.BalanceBatch for consistency.
 """
 from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 
-from inventory.models import StockMove, StockBalance, MoveType, MoveStatus
-from inventory.services import _update_balance, _create_audit
+from inventory.models import StockMove, MoveType, MoveStatus
+from inventory.services import BalanceBatch, _create_audit, _create_moves
 from catalog.models import convert_to_base_unit
+from core.cogs import SNAPSHOT_FIELDS, stamp_line_costs
+from core.sequences import existing_max, next_value
 from pos.models import (
     POSSale, POSSaleLine, POSSaleBundleLine, POSPayment,
     POSRefund, POSRefundLine,
@@ -19,15 +21,13 @@ from pos.models import (
 
 def generate_sale_number():
     """Generate sequential POS sale number like POS-000001."""
-    last = POSSale.objects.order_by('-id').first()
-    next_num = (last.id + 1) if last else 1
+    next_num = next_value('POS', seed=lambda: existing_max(POSSale, 'sale_no', 'POS-'))
     return f"POS-{next_num:06d}"
 
 
 def generate_refund_number():
     """Generate sequential POS refund number like RFN-000001."""
-    last = POSRefund.objects.order_by('-id').first()
-    next_num = (last.id + 1) if last else 1
+    next_num = next_value('RFN', seed=lambda: existing_max(POSRefund, 'refund_no', 'RFN-'))
     return f"RFN-{next_num:06d}"
 
 
@@ -51,46 +51,25 @@ def open_shift(register, user, opening_cash=Decimal('0')):
 
 @transaction.atomic
 def close_shift(shift, user, closing_cash_declared=Decimal('0')):
-    """Close an open shift, computing variance."""
+    """
+    Close an open shift, computing variance.
+
+    The stored totals are kept current by every posting (see
+    _apply_shift_deltas), so closing reads them instead of re-aggregating the
+    shift's payments, refunds and cash entries.  Use the reconcile_shift
+    command to check them against the records.
+    """
+    shift = POSShift.objects.select_for_update(of=('self',)).select_related('register').get(pk=shift.pk)
     if shift.status != ShiftStatus.OPEN:
         raise ValueError("Shift is not open.")
 
-    now = timezone.now()
-
-    # Recompute totals from actual sale/refund/cash-entry records
-    from django.db.models import Sum, Q
-    cash_sales = POSPayment.objects.filter(
-        sale__shift=shift,
-        sale__status__in=[SaleStatus.PAID, SaleStatus.POSTED],
-        method=PaymentMethod.CASH,
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-
-    noncash_sales = POSPayment.objects.filter(
-        sale__shift=shift,
-        sale__status__in=[SaleStatus.PAID, SaleStatus.POSTED],
-    ).exclude(method=PaymentMethod.CASH).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-
-    refund_total = POSRefund.objects.filter(
-        shift=shift,
-        status=RefundStatus.POSTED,
-    ).aggregate(total=Sum('grand_total'))['total'] or Decimal('0')
-
-    cash_in = CashEntry.objects.filter(
-        shift=shift, entry_type=CashEntryType.CASH_IN,
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-    cash_out = CashEntry.objects.filter(
-        shift=shift, entry_type=CashEntryType.CASH_OUT,
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-
-    shift.cash_sales_total = cash_sales
-    shift.noncash_sales_total = noncash_sales
-    shift.refund_total = refund_total
-    shift.cash_in_out_total = cash_in - cash_out
     shift.closing_cash_declared = closing_cash_declared
     shift.closed_by = user
-    shift.closed_at = now
+    shift.closed_at = timezone.now()
     shift.status = ShiftStatus.CLOSED
-    shift.save()
+    shift.save(update_fields=[
+        'closing_cash_declared', 'closed_by', 'closed_at', 'status', 'updated_at',
+    ])
 
     _create_audit(user, 'UPDATE', shift, {
         'action': 'close_shift',
@@ -101,11 +80,34 @@ def close_shift(shift, user, closing_cash_declared=Decimal('0')):
     return shift
 
 
+@transaction.atomic
+def mark_sale_paid(sale_id, user):
+    """
+    Mark a DRAFT sale PAID and add its payments to the shift totals.
+    A PAID sale counts towards the shift whether or not it is posted later,
+    matching shift_totals_from_records().
+    """
+    sale = POSSale.objects.select_for_update().get(pk=sale_id)
+    if sale.status != SaleStatus.DRAFT:
+        raise ValueError(f"Sale {sale.sale_no} is not in DRAFT status.")
+
+    cash, noncash = _payment_totals(sale)
+    if cash + noncash < sale.grand_total:
+        raise ValueError(f"Payments ({cash + noncash}) < grand total ({sale.grand_total}).")
+
+    sale.status = SaleStatus.PAID
+    sale.save(update_fields=['status', 'updated_at'])
+    _apply_shift_deltas(sale.shift, cash_sales=cash, noncash_sales=noncash)
+    _create_audit(user, 'UPDATE', sale, {'action': 'mark_paid', 'grand_total': str(sale.grand_total)})
+    return sale
+
+
 @transaction.atomic
 def post_pos_sale(sale_id, user):
     """
     Post a POS sale: validate payments, create StockMove rows, update balances.
-    Sale must be in PAID status with shift OPEN.
+    Sale must be in PAID status with shift OPEN; its payments were added to
+    the shift totals when it was marked paid.
     """
     sale = POSSale.objects.select_for_update().get(pk=sale_id)
 
@@ -125,24 +127,15 @@ def post_pos_sale(sale_id, user):
 
     now = timezone.now()
     moves = []
-    warehouse = sale.warehouse
+    # Stock availability is checked against qty_on_hand - qty_reserved for
+    # all lines at once when the batch is applied (with row locking).
+    balances = BalanceBatch(check_available=True)
 
-    for line in sale.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
+    lines = list(sale.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location'))
+    for line in lines:
         loc = line.location or sale.location
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
 
-        # Stock availability check (with row locking)
-        balance, _ = StockBalance.objects.select_for_update().get_or_create(
-            item=line.item, location=loc,
-            defaults={'qty_on_hand': Decimal('0'), 'qty_reserved': Decimal('0')},
-        )
-        available = balance.qty_on_hand - balance.qty_reserved
-        if base_qty > available and not warehouse.allow_negative_stock:
-            raise ValueError(
-                f"Insufficient stock for {line.item.code} at {loc}. "
-                f"Available: {available}, Requested: {base_qty} {line.item.stock_unit.abbreviation}"
-            )
-
         move = StockMove(
             move_type=MoveType.POS_SALE,
             item=line.item,
@@ -161,10 +154,7 @@ def post_pos_sale(sale_id, user):
             posted_at=now,
         )
         moves.append(move)
-
-        # Update balance
-        balance.qty_on_hand -= base_qty
-        balance.save()
+        balances.add(line.item, loc, -base_qty)
 
     # Expand bundle lines into per-item stock moves
     for bundle_line in sale.bundle_lines.select_related('price_list').prefetch_related(
@@ -178,17 +168,6 @@ def post_pos_sale(sale_id, user):
             base_qty = convert_to_base_unit(qty, pli.unit, item.stock_unit, item=item)
 
             loc = sale.location
-            balance, _ = StockBalance.objects.select_for_update().get_or_create(
-                item=item, location=loc,
-                defaults={'qty_on_hand': Decimal('0'), 'qty_reserved': Decimal('0')},
-            )
-            available = balance.qty_on_hand - balance.qty_reserved
-            if base_qty > available and not warehouse.allow_negative_stock:
-                raise ValueError(
-                    f"[Bundle: {bundle_line.price_list.name}] Insufficient stock for {item.code} at {loc}. "
-                    f"Available: {available}, Requested: {base_qty} {item.stock_unit.abbreviation}"
-                )
-
             move = StockMove(
                 move_type=MoveType.POS_SALE,
                 item=item,
@@ -207,10 +186,11 @@ def post_pos_sale(sale_id, user):
                 posted_at=now,
             )
             moves.append(move)
-            balance.qty_on_hand -= base_qty
-            balance.save()
+            balances.add(item, loc, -base_qty, label=f"Bundle: {bundle_line.price_list.name}")
 
-    StockMove.objects.bulk_create(moves)
+    balances.apply()
+    _create_moves(moves)
+    POSSaleLine.objects.bulk_update(stamp_line_costs(lines), SNAPSHOT_FIELDS)
 
     sale.status = SaleStatus.POSTED
     sale.posted_by = user
@@ -218,9 +198,6 @@ def post_pos_sale(sale_id, user):
     sale.stock_deducted = True
     sale.save(update_fields=['status', 'posted_by', 'posted_at', 'stock_deducted', 'updated_at'])
 
-    # Update shift totals
-    _update_shift_totals(shift)
-
     # Auto-create Invoice
     from inventory.automation import auto_create_invoice_from_pos_sale
     auto_create_invoice_from_pos_sale(sale, user)
@@ -229,6 +206,234 @@ def post_pos_sale(sale_id, user):
     return sale
 
 
+def sale_totals(lines, bundle_lines=()):
+    """
+    Sale header totals from (unsaved or saved) sale lines and bundle lines.
+    Same rules as the terminal: discounts are per line, tax applies to the
+    discounted line amount, bundles are neither discounted nor taxed.
+    """
+    item_subtotal = sum((l.qty * l.unit_price for l in lines), Decimal('0'))
+    bundle_subtotal = sum((bl.line_total for bl in bundle_lines), Decimal('0'))
+    discount_total = sum((l.discount_amount for l in lines), Decimal('0'))
+    tax_total = sum(
+        ((l.qty * l.unit_price - l.discount_amount) * l.tax_rate / 100 for l in lines),
+        Decimal('0'),
+    )
+    subtotal = item_subtotal + bundle_subtotal
+    return {
+        'subtotal': subtotal,
+        'discount_total': discount_total,
+        'tax_total': tax_total,
+        'grand_total': subtotal - discount_total + tax_total,
+    }
+
+
+def _apply_shift_deltas(shift, cash_sales=Decimal('0'), noncash_sales=Decimal('0'),
+                        refund=Decimal('0'), cash_in_out=Decimal('0')):
+    """
+    Add signed deltas to the stored shift totals with one UPDATE (F() expressions).
+    Raises ValueError when the shift was closed in the meantime.
+    """
+    from django.db.models import F
+
+    updated = POSShift.objects.filter(pk=shift.pk, status=ShiftStatus.OPEN).update(
+        cash_sales_total=F('cash_sales_total') + cash_sales,
+        noncash_sales_total=F('noncash_sales_total') + noncash_sales,
+        refund_total=F('refund_total') + refund,
+        cash_in_out_total=F('cash_in_out_total') + cash_in_out,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        raise ValueError(f"Shift #{shift.pk} is not open.")
+
+
+@transaction.atomic
+def checkout_cart(shift, user, lines, payments, bundles=(), customer=None, channel=None, notes='',
+                  client_uuid=None):
+    """
+    Single-pass checkout: create, pay and post a complete POS sale in one transaction.
+
+    *lines*: dicts with item, qty and optionally unit, unit_price,
+    discount_amount, tax_rate, location, batch_number, serial_number,
+    qr_uid_used (ids for foreign keys; unit defaults to the item's stock
+    unit, unit_price to its selling price, location to the register's).
+    *bundles*: dicts with price_list and qty_sets.
+    *payments*: dicts with method, amount and optionally reference_no.
+    *client_uuid*: the terminal's id for the sale (POSSale.client_uuid).
+
+    Items, units, locations and bundles are loaded with one query each,
+    stock for every line is validated under one locking query, and lines,
+    payments, stock moves and invoice lines are bulk-created, so the number
+    of queries does not grow with the size of the cart.  Shift totals are
+    updated by delta.
+    """
+    from catalog.models import Item, Unit
+    from pricing.models import PriceList
+    from warehouses.models import Location
+
+    if shift.status != ShiftStatus.OPEN:
+        raise ValueError(f"Shift #{shift.pk} is not open. Cannot post sale.")
+    lines = list(lines)
+    bundles = list(bundles)
+    payments = list(payments)
+    if not lines and not bundles:
+        raise ValueError("Cart is empty.")
+
+    register = shift.register
+    default_location = register.default_location
+
+    items = Item.objects.select_related('default_unit', 'selling_unit').in_bulk(
+        {l['item'] for l in lines}
+    )
+    unit_ids = {l['unit'] for l in lines if l.get('unit')}
+    units = Unit.objects.in_bulk(unit_ids) if unit_ids else {}
+    location_ids = {l['location'] for l in lines if l.get('location')}
+    locations = (
+        Location.objects.select_related('warehouse').in_bulk(location_ids) if location_ids else {}
+    )
+    price_lists = {}
+    if bundles:
+        price_lists = PriceList.objects.prefetch_related(
+            'items__item__default_unit', 'items__item__selling_unit', 'items__unit',
+        ).in_bulk({b['price_list'] for b in bundles})
+
+    sale_lines = []
+    for data in lines:
+        item = items.get(data['item'])
+        if item is None:
+            raise ValueError(f"Item #{data['item']} does not exist.")
+        unit = units.get(data['unit']) if data.get('unit') else item.stock_unit
+        if unit is None:
+            raise ValueError(f"Unit #{data['unit']} does not exist.")
+        location = locations.get(data['location']) if data.get('location') else default_location
+        if location is None:
+            raise ValueError(f"Location #{data['location']} does not exist.")
+        qty = Decimal(str(data['qty']))
+        if qty <= 0:
+            raise ValueError(f"Quantity for {item.code} must be positive.")
+        unit_price = data.get('unit_price')
+        unit_price = Decimal(str(unit_price)) if unit_price is not None else item.selling_price
+        discount = Decimal(str(data.get('discount_amount') or 0))
+        tax_rate = Decimal(str(data.get('tax_rate') or 0))
+        line_subtotal = qty * unit_price - discount
+        sale_lines.append(POSSaleLine(
+            item=item,
+            location=location,
+            qty=qty,
+            unit=unit,
+            unit_price=unit_price,
+            discount_amount=discount,
+            tax_rate=tax_rate,
+            line_total=line_subtotal + line_subtotal * tax_rate / 100,
+            batch_number=data.get('batch_number') or '',
+            serial_number=data.get('serial_number') or '',
+            qr_uid_used=data.get('qr_uid_used'),
+        ))
+
+    bundle_lines = []
+    for data in bundles:
+        price_list = price_lists.get(data['price_list'])
+        if price_list is None:
+            raise ValueError(f"Bundle #{data['price_list']} does not exist.")
+        qty_sets = Decimal(str(data.get('qty_sets') or 1))
+        if qty_sets <= 0:
+            raise ValueError(f"Quantity for bundle {price_list.name} must be positive.")
+        set_price = sum((pli.price for pli in price_list.items.all()), Decimal('0'))
+        bundle_lines.append(POSSaleBundleLine(
+            price_list=price_list,
+            qty_sets=qty_sets,
+            unit_price=set_price,
+            line_total=set_price * qty_sets,
+        ))
+
+    totals = sale_totals(sale_lines, bundle_lines)
+    sale_payments = [
+        POSPayment(
+            method=p.get('method') or PaymentMethod.CASH,
+            amount=Decimal(str(p['amount'])),
+            reference_no=p.get('reference_no') or '',
+        )
+        for p in payments
+    ]
+    payment_sum = sum((p.amount for p in sale_payments), Decimal('0'))
+    if payment_sum < totals['grand_total']:
+        raise ValueError(
+            f"Payment total ({payment_sum}) is less than grand total ({totals['grand_total']})."
+        )
+
+    now = timezone.now()
+    sale = POSSale.objects.create(
+        sale_no=generate_sale_number(),
+        register=register,
+        shift=shift,
+        warehouse=register.warehouse,
+        location=default_location,
+        customer=customer,
+        channel=channel,
+        status=SaleStatus.POSTED,
+        created_by=user,
+        posted_by=user,
+        posted_at=now,
+        stock_deducted=True,
+        notes=notes,
+        client_uuid=client_uuid,
+        **totals,
+    )
+    for obj in sale_lines + bundle_lines + sale_payments:
+        obj.sale = sale
+    stamp_line_costs(sale_lines)
+    POSSaleLine.objects.bulk_create(sale_lines)
+    if bundle_lines:
+        POSSaleBundleLine.objects.bulk_create(bundle_lines)
+    POSPayment.objects.bulk_create(sale_payments)
+
+    moves = []
+    balances = BalanceBatch(check_available=True)
+
+    def deduct(item, location, qty, unit, label='', batch_number='', serial_number=''):
+        base_qty = convert_to_base_unit(qty, unit, item.stock_unit, item=item)
+        moves.append(StockMove(
+            move_type=MoveType.POS_SALE,
+            item=item,
+            qty=base_qty,
+            unit=item.stock_unit,
+            from_location=location,
+            to_location=None,
+            reference_type='POSSale',
+            reference_id=sale.pk,
+            reference_number=sale.sale_no,
+            batch_number=batch_number,
+            serial_number=serial_number,
+            status=MoveStatus.POSTED,
+            created_by=user,
+            posted_by=user,
+            posted_at=now,
+        ))
+        balances.add(item, location, -base_qty, label=label)
+
+    for line in sale_lines:
+        deduct(line.item, line.location, line.qty, line.unit,
+               batch_number=line.batch_number, serial_number=line.serial_number)
+    for bundle_line in bundle_lines:
+        for pli in bundle_line.price_list.items.all():
+            qty = pli.min_qty * bundle_line.qty_sets
+            if qty > 0:
+                deduct(pli.item, default_location, qty, pli.unit,
+                       label=f"Bundle: {bundle_line.price_list.name}")
+
+    balances.apply()
+    _create_moves(moves)
+
+    cash = sum((p.amount for p in sale_payments if p.method == PaymentMethod.CASH), Decimal('0'))
+    _apply_shift_deltas(shift, cash_sales=cash, noncash_sales=payment_sum - cash)
+
+    from inventory.automation import auto_create_invoice_from_pos_sale
+    auto_create_invoice_from_pos_sale(sale, user, lines=sale_lines, is_new=True)
+
+    _create_audit(user, 'POST', sale, {'lines': len(moves), 'grand_total': str(sale.grand_total)})
+    return sale
+
+
 @transaction.atomic
 def sync_pos_sale_stock_moves(sale_id, user):
     """Idempotent backfill: ensure StockMove rows exist for a completed POS sale.
@@ -255,14 +460,14 @@ def sync_pos_sale_stock_moves(sale_id, user):
 
     now = timezone.now()
     moves = []
-    warehouse = sale.warehouse
+    balances = BalanceBatch()
 
     for line in sale.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
         loc = line.location or sale.location
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
 
-        # Deduct using the core inventory helper (enforces negative-stock rule)
-        _update_balance(line.item, loc, -base_qty)
+        # Deduct using the core inventory batch (enforces negative-stock rule)
+        balances.add(line.item, loc, -base_qty)
 
         moves.append(StockMove(
             move_type=MoveType.POS_SALE,
@@ -283,7 +488,8 @@ def sync_pos_sale_stock_moves(sale_id, user):
             notes='Backfilled stock move from POS receipt sync',
         ))
 
-    StockMove.objects.bulk_create(moves)
+    balances.apply()
+    _create_moves(moves)
     sale.stock_deducted = True
     # If the sale was PAID but not POSTED, we keep the status as-is (this is sync only).
     sale.save(update_fields=['stock_deducted', 'updated_at'])
@@ -307,6 +513,7 @@ def post_pos_refund(refund_id, user):
 
     now = timezone.now()
     moves = []
+    balances = BalanceBatch()
 
     for line in refund.lines.select_related('item__default_unit', 'item__selling_unit', 'unit', 'location').all():
         base_qty = convert_to_base_unit(line.qty, line.unit, line.item.stock_unit, item=line.item)
@@ -326,21 +533,31 @@ def post_pos_refund(refund_id, user):
             posted_at=now,
         )
         moves.append(move)
-        _update_balance(line.item, line.location, base_qty)
+        balances.add(line.item, line.location, base_qty)
 
-    StockMove.objects.bulk_create(moves)
+    balances.apply()
+    _create_moves(moves)
 
     refund.status = RefundStatus.POSTED
     refund.posted_by = user
     refund.posted_at = now
     refund.save(update_fields=['status', 'posted_by', 'posted_at', 'updated_at'])
 
-    # Mark original sale as refunded
-    original = refund.original_sale
+    # Mark original sale as refunded; its payments leave its shift's sales totals.
+    original = POSSale.objects.select_for_update().select_related('shift').get(pk=refund.original_sale_id)
+    was_counted = original.status in (SaleStatus.PAID, SaleStatus.POSTED)
     original.status = SaleStatus.REFUNDED
     original.save(update_fields=['status', 'updated_at'])
 
-    _update_shift_totals(shift)
+    cash = noncash = Decimal('0')
+    if was_counted:
+        cash, noncash = _payment_totals(original)
+    if original.shift_id == shift.pk:
+        _apply_shift_deltas(shift, cash_sales=-cash, noncash_sales=-noncash, refund=refund.grand_total)
+    else:
+        _apply_shift_deltas(shift, refund=refund.grand_total)
+        if was_counted and original.shift.status == ShiftStatus.OPEN:
+            _apply_shift_deltas(original.shift, cash_sales=-cash, noncash_sales=-noncash)
     _create_audit(user, 'POST', refund, {'lines': len(moves), 'grand_total': str(refund.grand_total)})
     return refund
 
@@ -361,14 +578,16 @@ def void_sale(sale_id, user):
 
     now = timezone.now()
 
+    was_counted = sale.status in (SaleStatus.PAID, SaleStatus.POSTED)
     if sale.status == SaleStatus.POSTED:
         # Create reversal moves
         original_moves = StockMove.objects.filter(
             reference_type='POSSale',
             reference_id=sale.pk,
             status=MoveStatus.POSTED,
-        )
+        ).select_related('item', 'unit', 'from_location')
         reversal_moves = []
+        balances = BalanceBatch()
         for orig in original_moves:
             reversal = StockMove(
                 move_type=MoveType.RETURN_IN,
@@ -381,6 +600,8 @@ def void_sale(sale_id, user):
                 reference_id=sale.pk,
                 reference_number=f"VOID-{sale.sale_no}",
                 notes=f"Void reversal of {sale.sale_no}",
+                unit_cost=orig.unit_cost,
+                line_cogs=orig.line_cogs,
                 status=MoveStatus.POSTED,
                 created_by=user,
                 posted_by=user,
@@ -388,51 +609,88 @@ def void_sale(sale_id, user):
             )
             reversal_moves.append(reversal)
             if orig.from_location:
-                _update_balance(orig.item, orig.from_location, orig.qty)
+                balances.add(orig.item, orig.from_location, orig.qty)
 
-        StockMove.objects.bulk_create(reversal_moves)
+        balances.apply()
+        _create_moves(reversal_moves)
 
     sale.status = SaleStatus.VOID
     sale.save(update_fields=['status', 'updated_at'])
 
-    if sale.shift.status == ShiftStatus.OPEN:
-        _update_shift_totals(sale.shift)
+    if was_counted and sale.shift.status == ShiftStatus.OPEN:
+        cash, noncash = _payment_totals(sale)
+        _apply_shift_deltas(sale.shift, cash_sales=-cash, noncash_sales=-noncash)
 
     _create_audit(user, 'CANCEL', sale, {'action': 'void_sale'})
     return sale
 
 
-def _update_shift_totals(shift):
-    """Recompute shift stored totals from actual records."""
-    from django.db.models import Sum
+def _payment_totals(sale):
+    """(cash, non-cash) payment totals of a sale."""
+    cash = noncash = Decimal('0')
+    for method, amount in sale.payments.values_list('method', 'amount'):
+        if method == PaymentMethod.CASH:
+            cash += amount
+        else:
+            noncash += amount
+    return cash, noncash
 
-    cash_sales = POSPayment.objects.filter(
-        sale__shift=shift,
-        sale__status__in=[SaleStatus.PAID, SaleStatus.POSTED],
-        method=PaymentMethod.CASH,
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
 
-    noncash_sales = POSPayment.objects.filter(
+def cash_entry_delta(entry):
+    """Signed effect of a cash entry on the shift's cash_in_out_total."""
+    return entry.amount if entry.entry_type == CashEntryType.CASH_IN else -entry.amount
+
+
+def apply_cash_entry(entry, sign=1):
+    """
+    Add (sign=1) or take back (sign=-1) a cash entry's amount on its shift's
+    running totals.  Call inside the transaction that saves or deletes it.
+    """
+    _apply_shift_deltas(entry.shift, cash_in_out=sign * cash_entry_delta(entry))
+
+
+def shift_totals_from_records(shift):
+    """Full re-aggregation of a shift's totals from its payments, refunds and cash entries."""
+    from django.db.models import Q, Sum
+
+    cash = Q(method=PaymentMethod.CASH)
+    payments = POSPayment.objects.filter(
         sale__shift=shift,
         sale__status__in=[SaleStatus.PAID, SaleStatus.POSTED],
-    ).exclude(method=PaymentMethod.CASH).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-
+    ).aggregate(cash=Sum('amount', filter=cash), noncash=Sum('amount', filter=~cash))
     refund_total = POSRefund.objects.filter(
         shift=shift, status=RefundStatus.POSTED,
-    ).aggregate(total=Sum('grand_total'))['total'] or Decimal('0')
-
-    cash_in = CashEntry.objects.filter(
-        shift=shift, entry_type=CashEntryType.CASH_IN,
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-    cash_out = CashEntry.objects.filter(
-        shift=shift, entry_type=CashEntryType.CASH_OUT,
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-
-    shift.cash_sales_total = cash_sales
-    shift.noncash_sales_total = noncash_sales
-    shift.refund_total = refund_total
-    shift.cash_in_out_total = cash_in - cash_out
-    shift.save(update_fields=[
-        'cash_sales_total', 'noncash_sales_total',
-        'refund_total', 'cash_in_out_total', 'updated_at',
-    ])
+    ).aggregate(total=Sum('grand_total'))['total']
+    cash_in = Q(entry_type=CashEntryType.CASH_IN)
+    entries = CashEntry.objects.filter(shift=shift).aggregate(
+        cash_in=Sum('amount', filter=cash_in), cash_out=Sum('amount', filter=~cash_in),
+    )
+    cents = Decimal('0.01')
+    return {
+        'cash_sales_total': (payments['cash'] or Decimal('0')).quantize(cents),
+        'noncash_sales_total': (payments['noncash'] or Decimal('0')).quantize(cents),
+        'refund_total': (refund_total or Decimal('0')).quantize(cents),
+        'cash_in_out_total': (
+            (entries['cash_in'] or Decimal('0')) - (entries['cash_out'] or Decimal('0'))
+        ).quantize(cents),
+    }
+
+
+@transaction.atomic
+def reconcile_shift(shift, fix=False):
+    """
+    Compare a shift's running totals with the full aggregate.
+
+    Returns {field: (stored, expected)} for every total that drifted.  With
+    *fix*, the stored totals are overwritten with the aggregate.
+    """
+    shift = POSShift.objects.select_for_update().get(pk=shift.pk)
+    expected = shift_totals_from_records(shift)
+    drift = {
+        field: (getattr(shift, field), value)
+        for field, value in expected.items()
+        if getattr(shift, field) != value
+    }
+    if drift and fix:
+        POSShift.objects.filter(pk=shift.pk).update(updated_at=timezone.now(), **expected)
+    return drift
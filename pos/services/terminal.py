@@ -0,0 +1,496 @@
+"""
+Client-side cart support for the POS terminal.
+
+The terminal keeps the cart in the browser, prices it from a register
+snapshot (register_snapshot, kept current with snapshot_delta) and sends
+the whole cart once at checkout (checkout_terminal_cart), which refuses
+prices the snapshot no longer matches.  Sales completed while the server
+was unreachable are queued by the terminal and replayed in batches
+(replay_offline_sales); the terminal's client_uuid keeps a retried or
+replayed sale from being posted twice.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from pos.models import POSSale, SaleStatus
+from pos.services.checkout import checkout_cart, sync_pos_sale_stock_moves, void_sale
+
+CENTS = Decimal('0.01')
+QTY = Decimal('0.0001')
+# How far before a ?since= version changes are looked up again (clock skew, slow commits).
+DELTA_OVERLAP = timedelta(seconds=60)
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+# Offline sales posted per transaction by replay_offline_sales.
+REPLAY_BATCH_SIZE = 50
+
+
+class StalePrices(ValueError):
+    """The cart was priced from an outdated snapshot; *stale* lists the current prices."""
+
+    def __init__(self, stale):
+        self.stale = stale
+        super().__init__('Prices changed since the terminal loaded them. Review the cart and check out again.')
+
+
+def _stock_units(item_ids=None):
+    """{item_id: stock unit id} for active items (all of them when *item_ids* is None)."""
+    from catalog.models import Item
+
+    items = Item.objects.all() if item_ids is None else Item.objects.filter(pk__in=item_ids)
+    return {
+        pk: selling_unit_id or default_unit_id
+        for pk, selling_unit_id, default_unit_id in items.values_list('pk', 'selling_unit_id', 'default_unit_id')
+    }
+
+
+def _in_stock_unit(graph, qty, unit_id, stock_unit_id, item_id):
+    """*qty* of *unit_id* expressed in the item's stock unit (unchanged when not convertible)."""
+    factor = graph.factor(unit_id, stock_unit_id, item_id)
+    return qty if not factor else (qty * factor).quantize(QTY)
+
+
+def terminal_bundles():
+    """
+    Bundles offered by the terminal: active price lists with their price per
+    set and their components as (item_id, qty per set in the item's stock
+    unit).  See pos.services.bundles.
+    """
+    from pos.services.bundles import bundle_definitions
+
+    return [
+        {
+            'id': b['id'],
+            'name': b['name'],
+            'unit_price': b['unit_price'],
+            'components': [(c['item'], c['qty']) for c in b['components']],
+        }
+        for b in bundle_definitions()
+    ]
+
+
+def register_tiers(register, stock_units, item_ids=None, graph=None, on=None):
+    """
+    {item_id: [(min_qty, unit_price), ...]} for the register, converted to
+    each item's stock unit (*stock_units*: {item_id: unit id}): the tiers of
+    the register's price list, then those of the default lists, valid
+    today, each group sorted by converted min_qty so rows priced in other
+    units fall in place.  *item_ids* narrows *stock_units*.
+    """
+    from catalog.conversions import get_conversion_graph
+    from catalog.utils import _convert_price
+    from pricing.services import get_price_book
+
+    book = get_price_book()
+    graph = graph or get_conversion_graph()
+    on = on or timezone.localdate()
+    item_ids = stock_units.keys() if item_ids is None else item_ids
+    tiers = {}
+    for item_id in item_ids:
+        stock_unit_id = stock_units.get(item_id)
+        if stock_unit_id is None:
+            continue
+        converted, seen = [], set()
+        for rank, price_list_id in enumerate((register.price_list_id, 'default')):
+            for tier in book.tiers(price_list_id, item_id) if price_list_id else ():
+                if tier.pk in seen or not tier.valid_on(on):
+                    continue
+                seen.add(tier.pk)
+                min_qty = _in_stock_unit(graph, tier.min_qty, tier.unit_id, stock_unit_id, item_id)
+                price = _convert_price(graph, tier.price, tier.unit_id, stock_unit_id, item_id)
+                converted.append((rank, -min_qty, min_qty, price))
+        if converted:
+            converted.sort(key=lambda tier: tier[:2])
+            tiers[item_id] = [(min_qty, price) for _, _, min_qty, price in converted]
+    return tiers
+
+
+def register_price(tiers, qty, selling_price):
+    """Unit price the terminal charges for *qty*: the first tier *qty* reaches, else the item price."""
+    for min_qty, price in tiers:
+        if qty >= min_qty:
+            return price
+    return selling_price
+
+
+def snapshot_version(register):
+    """
+    Version of the register's catalog: the latest change to items, prices,
+    price lists, unit conversions, the register or its warehouse balances,
+    plus the price row and conversion counts so hard deletes show too, and
+    today's date since price rows start and end by date.  Formatted
+    "<microseconds>-<price rows>-<conversions>-<price list id>-<yyyymmdd>".
+    """
+    from django.db.models import Count, Max
+    from catalog.models import Item, UnitConversion
+    from inventory.models import StockBalance
+    from pricing.models import PriceList, PriceListItem
+
+    prices = PriceListItem.all_objects.aggregate(changed=Max('updated_at'), rows=Count('pk'))
+    conversions = UnitConversion.all_objects.aggregate(changed=Max('updated_at'), rows=Count('pk'))
+    changes = [
+        register.updated_at, prices['changed'], conversions['changed'],
+        Item.all_objects.aggregate(changed=Max('updated_at'))['changed'],
+        PriceList.all_objects.aggregate(changed=Max('updated_at'))['changed'],
+        StockBalance.objects.filter(location__warehouse_id=register.warehouse_id)
+        .aggregate(changed=Max('updated_at'))['changed'],
+    ]
+    latest = max(c for c in changes if c is not None)
+    return (
+        f"{(latest - EPOCH) // MICROSECOND}-{prices['rows']}-{conversions['rows']}"
+        f"-{register.price_list_id or 0}-{timezone.localdate():%Y%m%d}"
+    )
+
+
+def _parse_version(version):
+    """(changed datetime, price rows, conversions, price list id, date) or None when malformed."""
+    try:
+        micros, price_rows, conversions, price_list, day = (int(part) for part in version.split('-'))
+        changed = EPOCH + micros * MICROSECOND
+    except (ValueError, OverflowError):
+        return None
+    return changed, price_rows, conversions, price_list, day
+
+
+def _snapshot_items(register, stock_units, item_ids=None):
+    """Snapshot entries for the active items in *stock_units*, ordered by code."""
+    from catalog.conversions import get_conversion_graph
+    from catalog.models import Item
+    from inventory.models import StockBalance
+
+    graph = get_conversion_graph()
+    tiers = register_tiers(register, stock_units, item_ids, graph=graph)
+    balances = StockBalance.objects.filter(location__warehouse_id=register.warehouse_id)
+    items = Item.objects.order_by('code')
+    if item_ids is not None:
+        balances = balances.filter(item_id__in=item_ids)
+        items = items.filter(pk__in=item_ids)
+    available = dict(
+        balances.values('item').annotate(available=Sum(F('qty_on_hand') - F('qty_reserved')))
+        .values_list('item', 'available')
+    )
+    rows = items.values_list(
+        'id', 'code', 'name', 'barcode', 'selling_price',
+        'selling_unit__abbreviation', 'default_unit__abbreviation',
+    )
+    return [
+        {
+            'id': pk,
+            'code': code,
+            'name': name,
+            'barcode': barcode,
+            'unit': selling_unit or default_unit,
+            'price': str(selling_price),
+            'tiers': [[str(min_qty), str(price)] for min_qty, price in tiers.get(pk, ())],
+            'available': str(available[pk]) if available.get(pk) is not None else None,
+        }
+        for pk, code, name, barcode, selling_price, selling_unit, default_unit in rows
+    ]
+
+
+def _snapshot_bundles():
+    return [
+        {
+            'id': b['id'], 'name': b['name'], 'unit_price': str(b['unit_price']),
+            'components': [[item_id, str(qty)] for item_id, qty in b['components']],
+        }
+        for b in terminal_bundles()
+    ]
+
+
+def register_snapshot(register, version=None):
+    """
+    Everything the terminal needs to price and check a cart locally: every
+    active item with its stock unit, its price tiers in that unit (tried in
+    order, first min_qty reached wins, else the item price) and the quantity
+    available in the register's warehouse (None without a stock balance),
+    plus the bundles.  *version* is the snapshot_version the payload
+    represents; the terminal sends it back as ?since= to fetch a delta.
+    """
+    stock_units = _stock_units()
+    return {
+        'register': register.pk,
+        'version': version or snapshot_version(register),
+        'full': True,
+        'generated_at': timezone.now().isoformat(),
+        'items': _snapshot_items(register, stock_units),
+        'bundles': _snapshot_bundles(),
+    }
+
+
+def snapshot_delta(register, since, version=None):
+    """
+    What changed in the register's catalog after version *since*: the
+    entries of changed items (item, price row, price list or balance
+    touched), the ids of items no longer sold ('removed') and the bundles.
+    Changes are looked up from DELTA_OVERLAP before *since* so rows written
+    while that version was computed are not missed.  Falls back to a full
+    snapshot when *since* is malformed or a delta cannot be exact: unit
+    conversions or the register changed, price rows were deleted or the
+    date changed.
+    """
+    from catalog.models import Item, UnitConversion
+    from inventory.models import StockBalance
+    from pricing.models import PriceListItem
+
+    version = version or snapshot_version(register)
+    parsed, current = _parse_version(since), _parse_version(version)
+    if parsed is None:
+        return register_snapshot(register, version)
+    changed, price_rows, conversions, price_list, day = parsed
+    after = changed - DELTA_OVERLAP
+    if (
+        day != current[4]
+        or price_list != current[3]
+        or conversions != current[2]
+        or register.updated_at > changed
+        or UnitConversion.all_objects.filter(updated_at__gt=changed).exists()
+        or current[1] != price_rows + PriceListItem.all_objects.filter(created_at__gt=changed).count()
+    ):
+        return register_snapshot(register, version)
+
+    item_ids = set(Item.all_objects.filter(updated_at__gt=after).values_list('pk', flat=True))
+    item_ids.update(
+        PriceListItem.all_objects
+        .filter(Q(updated_at__gt=after) | Q(price_list__updated_at__gt=after))
+        .values_list('item_id', flat=True)
+    )
+    item_ids.update(
+        StockBalance.objects
+        .filter(location__warehouse_id=register.warehouse_id, updated_at__gt=after)
+        .values_list('item_id', flat=True)
+    )
+    stock_units = _stock_units(item_ids)
+    items = _snapshot_items(register, stock_units, item_ids) if stock_units else []
+    return {
+        'register': register.pk,
+        'version': version,
+        'full': False,
+        'generated_at': timezone.now().isoformat(),
+        'items': items,
+        'removed': sorted(item_ids - stock_units.keys()),
+        'bundles': _snapshot_bundles(),
+    }
+
+
+def stale_cart_prices(register, lines, bundles=(), on=None):
+    """
+    Cart lines (in the item's stock unit) and bundles whose unit_price is
+    not the register's current price (with the price rows valid on *on*,
+    default today), each with the price it should have been.
+    """
+    from catalog.models import Item
+
+    item_ids = {l['item'] for l in lines}
+    selling_prices = dict(Item.objects.filter(pk__in=item_ids).values_list('pk', 'selling_price'))
+    tiers = register_tiers(register, _stock_units(item_ids), item_ids, on=on)
+    stale = []
+    for line in lines:
+        if line['item'] not in selling_prices:
+            continue  # checkout_cart reports unknown items
+        current = register_price(tiers.get(line['item'], []), line['qty'], selling_prices[line['item']])
+        if current != line['unit_price']:
+            stale.append({
+                'item': line['item'], 'qty': str(line['qty']),
+                'unit_price': str(line['unit_price']), 'current_price': str(current),
+            })
+
+    if bundles:
+        set_prices = {b['id']: b['unit_price'] for b in terminal_bundles()}
+        for bundle in bundles:
+            current = set_prices.get(bundle['price_list'])
+            if current is not None and current != bundle['unit_price']:
+                stale.append({
+                    'price_list': bundle['price_list'],
+                    'unit_price': str(bundle['unit_price']), 'current_price': str(current),
+                })
+    return stale
+
+
+def _version_prices(shift, version):
+    """
+    (day, exact, in_shift) for the snapshot *version* an offline sale in
+    *shift* was priced from: the date it priced for; whether the register's
+    prices are still exactly that snapshot's — same price list and price row
+    and conversion counts, no price row, price list, item or conversion
+    saved after it; and whether it can have been taken during the shift —
+    dated from the shift's opening day to today, and not missing a price
+    change saved before the shift opened.  None when *version* is malformed.
+    """
+    from catalog.models import Item, UnitConversion
+    from pricing.models import PriceList, PriceListItem
+
+    parsed = _parse_version(version)
+    if parsed is None:
+        return None
+    changed, price_rows, conversions, price_list, day = parsed
+    try:
+        day = date(day // 10000, day // 100 % 100, day % 100)
+    except ValueError:
+        return None
+    models = (PriceListItem, PriceList, Item, UnitConversion)
+    register = shift.register
+    exact = (
+        price_list == (register.price_list_id or 0)
+        and price_rows == PriceListItem.all_objects.count()
+        and conversions == UnitConversion.all_objects.count()
+        and not any(model.all_objects.filter(updated_at__gt=changed).exists() for model in models)
+    )
+    opened = shift.opened_at
+    in_shift = timezone.localtime(opened).date() <= day <= timezone.localdate() and (
+        changed >= opened
+        or not any(
+            model.all_objects.filter(updated_at__gt=changed, updated_at__lte=opened).exists()
+            for model in models
+        )
+    )
+    return day, exact, in_shift
+
+
+def _check_total(sale, grand_total):
+    total = sale.grand_total.quantize(CENTS)
+    if grand_total is not None and total != grand_total:
+        raise ValueError(f"Cart total ({grand_total}) does not match the sale total ({total}).")
+
+
+@transaction.atomic
+def checkout_terminal_cart(shift, user, lines, payments, bundles=(), grand_total=None, draft=None,
+                           client_uuid=None):
+    """
+    Check out a cart built in the terminal with checkout_cart.
+
+    Raises StalePrices when a line or bundle price differs from the
+    register's current price, and ValueError when the server's grand total,
+    rounded to cents, is not the *grand_total* the terminal showed.  Nothing
+    is written in either case.  *draft* is the id of a DRAFT sale the cart
+    was restored from; it is voided with the checkout.  A checkout whose
+    *client_uuid* was already posted returns that sale instead.
+    """
+    if client_uuid:
+        posted = POSSale.objects.filter(client_uuid=client_uuid).first()
+        if posted is not None:
+            return posted
+
+    lines = list(lines)
+    bundles = list(bundles)
+    stale = stale_cart_prices(shift.register, lines, bundles)
+    if stale:
+        raise StalePrices(stale)
+
+    try:
+        sale = checkout_cart(shift, user, lines, payments, bundles=bundles, client_uuid=client_uuid)
+    except IntegrityError:
+        # The same checkout posted concurrently.
+        posted = POSSale.objects.filter(client_uuid=client_uuid).first() if client_uuid else None
+        if posted is None:
+            raise
+        return posted
+    _check_total(sale, grand_total)
+
+    if draft and POSSale.objects.filter(pk=draft, shift=shift, status=SaleStatus.DRAFT).exists():
+        void_sale(draft, user)
+    return sale
+
+
+def replay_offline_sales(shift, user, sales):
+    """
+    Post sales an offline terminal queued, in transactions of
+    REPLAY_BATCH_SIZE sales.
+
+    *sales*: dicts with client_uuid, version (the snapshot_version the
+    terminal priced the sale from), lines, bundles, payments and
+    grand_total as the terminal recorded them.  Prices are checked against
+    that snapshot's, as of the day it priced for: while the register's
+    prices are still exactly the snapshot's, a sale whose prices differ is
+    refused; once prices changed after it the old ones cannot be rebuilt,
+    so the sale posts at the prices the customer paid and the differences
+    from the current prices are reported and written to the audit log.
+    That leniency only covers snapshots taken during *shift*; a sale priced
+    from an older version must match the current prices.  A
+    sale whose client_uuid is already posted (an earlier replay, a retried
+    request) is not posted again; its stock moves are backfilled if missing.
+    A sale that fails (closed shift, stock, total or price mismatch, unknown
+    version) is rolled back on its own and the others still post.
+
+    Returns one result per sale, in order: {'client_uuid', 'status'
+    ('posted', 'duplicate' or 'error'), 'sale_id', 'sale_no', 'error',
+    'price_mismatches'}; price_mismatches lists the lines and bundles
+    (as stale_cart_prices does) whose price differed, else is empty.
+    """
+    sales = list(sales)
+    results = []
+    for start in range(0, len(sales), REPLAY_BATCH_SIZE):
+        with transaction.atomic():
+            results.extend(_replay_batch(shift, user, sales[start:start + REPLAY_BATCH_SIZE]))
+    return results
+
+
+def _replay_batch(shift, user, sales):
+    from inventory.services import _create_audit
+
+    register = shift.register
+    posted = {
+        sale.client_uuid: sale
+        for sale in POSSale.objects.filter(client_uuid__in=[s['client_uuid'] for s in sales])
+    }
+    versions = {}
+    results = []
+    for data in sales:
+        client_uuid = data['client_uuid']
+        result = {
+            'client_uuid': str(client_uuid), 'status': 'duplicate', 'sale_id': None, 'sale_no': None,
+            'error': None, 'price_mismatches': [],
+        }
+        sale = posted.get(client_uuid)
+        if sale is None:
+            version = data.get('version') or ''
+            if version not in versions:
+                versions[version] = _version_prices(shift, version)
+            if versions[version] is None:
+                result.update(status='error', error='Unknown snapshot version; the sale cannot be price-checked.')
+                results.append(result)
+                continue
+            day, exact, in_shift = versions[version]
+            lines, bundles = list(data['lines']), list(data.get('bundles', ()))
+            mismatches = stale_cart_prices(register, lines, bundles, on=day)
+            if mismatches and (exact or not in_shift):
+                result.update(
+                    status='error', price_mismatches=mismatches,
+                    error=(
+                        'Prices do not match the snapshot the sale was priced from.' if exact
+                        else 'Prices do not match the current prices, and the snapshot predates the shift.'
+                    ),
+                )
+                results.append(result)
+                continue
+            try:
+                with transaction.atomic():
+                    sale = checkout_cart(
+                        shift, user, lines, data['payments'], bundles=bundles, client_uuid=client_uuid,
+                    )
+                    _check_total(sale, data.get('grand_total'))
+                    if mismatches:
+                        _create_audit(user, 'UPDATE', sale, {
+                            'action': 'offline_replay_price_mismatch',
+                            'version': version,
+                            'price_mismatches': mismatches,
+                        })
+                result.update(status='posted', price_mismatches=mismatches)
+            except IntegrityError:
+                sale = POSSale.objects.filter(client_uuid=client_uuid).first()
+                if sale is None:
+                    raise
+            except ValueError as e:
+                result.update(status='error', error=str(e))
+                results.append(result)
+                continue
+            posted[client_uuid] = sale
+        elif not sale.stock_deducted:
+            sync_pos_sale_stock_moves(sale.pk, user)
+        result.update(sale_id=sale.pk, sale_no=sale.sale_no)
+        results.append(result)
+    return results
@@ -1,7 +1,8 @@
 """
 Acceptance tests for POS module.
 Covers: POS sale posting, refund posting, void sale, shift management,
-        stock checks, and concurrency safety.
+        stock checks, concurrency safety, and the terminal's client-side cart
+        with its versioned register snapshot.
 """
 from decimal import Decimal
 from django.test import TestCase
@@ -15,12 +16,12 @@ from inventory.models import StockMove, StockBalance, MoveType
 from pricing.models import PriceList, PriceListItem
 from pos.models import (
     POSRegister, POSShift, POSSale, POSSaleLine,
-    POSPayment, POSRefund, POSRefundLine,
-    ShiftStatus, SaleStatus, RefundStatus, PaymentMethod,
+    POSPayment, POSRefund, POSRefundLine, CashEntry,
+    ShiftStatus, SaleStatus, RefundStatus, PaymentMethod, CashEntryType,
 )
 from pos.services import (
-    open_shift, close_shift,
-    post_pos_sale, post_pos_refund, void_sale,
+    open_shift, close_shift, reconcile_shift,
+    mark_sale_paid, post_pos_sale, post_pos_refund, void_sale, checkout_cart,
     generate_sale_number, generate_refund_number,
 )
 
@@ -227,3 +228,630 @@ class VoidSaleTests(POSTestMixin, TestCase):
         # Original POS_SALE + RETURN_IN reversal
         all_moves = StockMove.objects.filter(reference_type='POSSale', reference_id=sale.pk)
         self.assertEqual(all_moves.count(), 2)
+
+
+class CheckoutCartTests(POSTestMixin, TestCase):
+    """Single-pass checkout: the whole cart is created, paid and posted in one call."""
+
+    def _items(self, n):
+        items = Item.objects.bulk_create([
+            Item(
+                code=f'CART-{i:03d}', name=f'Cart Item {i}', item_type='FINISHED',
+                category=self.category, default_unit=self.unit, selling_price=Decimal('10'),
+            )
+            for i in range(n)
+        ])
+        StockBalance.objects.bulk_create([
+            StockBalance(item=item, location=self.location, qty_on_hand=Decimal('50'))
+            for item in items
+        ])
+        return items
+
+    def _cart(self, items, qty=Decimal('2')):
+        lines = [{'item': item.pk, 'qty': qty, 'unit_price': Decimal('10')} for item in items]
+        payments = [{'method': PaymentMethod.CASH, 'amount': Decimal('10') * qty * len(items)}]
+        return lines, payments
+
+    def test_checkout_posts_sale(self):
+        shift = self._open_shift()
+        lines = [{
+            'item': self.item.pk, 'qty': Decimal('3'), 'unit_price': Decimal('100'),
+            'discount_amount': Decimal('20'), 'tax_rate': Decimal('10'),
+        }]
+        payments = [
+            {'method': PaymentMethod.CASH, 'amount': Decimal('200')},
+            {'method': PaymentMethod.GCASH, 'amount': Decimal('108'), 'reference_no': 'G-1'},
+        ]
+        sale = checkout_cart(shift, self.user, lines, payments)
+
+        self.assertEqual(sale.status, SaleStatus.POSTED)
+        self.assertTrue(sale.stock_deducted)
+        # (300 - 20) + 10% tax
+        self.assertEqual(sale.grand_total, Decimal('308'))
+        self.assertEqual(sale.payments.count(), 2)
+        bal = StockBalance.objects.get(item=self.item, location=self.location)
+        self.assertEqual(bal.qty_on_hand, Decimal('97'))
+        self.assertEqual(
+            StockMove.objects.filter(reference_type='POSSale', reference_id=sale.pk).count(), 1,
+        )
+        invoice = sale.invoices.get()
+        self.assertEqual(invoice.lines.count(), 1)
+        self.assertEqual(invoice.grand_total, Decimal('308'))
+
+        shift.refresh_from_db()
+        self.assertEqual(shift.cash_sales_total, Decimal('200'))
+        self.assertEqual(shift.noncash_sales_total, Decimal('108'))
+
+    def test_checkout_insufficient_stock_writes_nothing(self):
+        shift = self._open_shift()
+        lines, payments = self._cart([self.item], qty=Decimal('101'))
+        with self.assertRaises(ValueError):
+            checkout_cart(shift, self.user, lines, payments)
+        self.assertFalse(POSSale.objects.exists())
+        bal = StockBalance.objects.get(item=self.item, location=self.location)
+        self.assertEqual(bal.qty_on_hand, Decimal('100'))
+
+    def test_checkout_underpaid_is_rejected(self):
+        shift = self._open_shift()
+        lines, payments = self._cart([self.item])
+        payments[0]['amount'] = Decimal('1')
+        with self.assertRaises(ValueError):
+            checkout_cart(shift, self.user, lines, payments)
+        self.assertFalse(POSSale.objects.exists())
+
+    def test_checkout_keeps_a_zero_price(self):
+        shift = self._open_shift()
+        free, paid = self._items(2)
+        lines = [
+            {'item': free.pk, 'qty': Decimal('1'), 'unit_price': Decimal('0.0000')},
+            {'item': paid.pk, 'qty': Decimal('2'), 'unit_price': Decimal('10')},
+        ]
+        sale = checkout_cart(shift, self.user, lines, [{'method': PaymentMethod.CASH, 'amount': Decimal('20')}])
+        self.assertEqual(sale.grand_total, Decimal('20'))
+        self.assertEqual(sale.lines.get(item=free).unit_price, Decimal('0'))
+
+    def test_checkout_query_count_is_flat(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        shift = self._open_shift()
+        items = self._items(111)
+        # Warm up: the first sale creates the POS number sequence row.
+        checkout_cart(shift, self.user, *self._cart([self.item]))
+        counts = []
+        for batch in (items[:1], items[1:11], items[11:111]):
+            lines, payments = self._cart(batch)
+            with CaptureQueriesContext(connection) as ctx:
+                checkout_cart(shift, self.user, lines, payments)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        # Only the bulk inserts grow: the SQLite backend splits them into batches.
+        self.assertLessEqual(counts[2], counts[0] + 5)
+
+    def test_checkout_api(self):
+        from rest_framework.test import APIClient
+
+        shift = self._open_shift()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/pos/sales/checkout/', {
+            'shift': shift.pk,
+            'lines': [{'item': self.item.pk, 'qty': '2', 'unit_price': '100'}],
+            'payments': [{'method': 'CASH', 'amount': '500'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['change'], '300.00')
+
+        response = client.post('/api/pos/sales/checkout/', {
+            'shift': shift.pk,
+            'lines': [{'item': self.item.pk, 'qty': '500', 'unit_price': '100'}],
+            'payments': [{'method': 'CASH', 'amount': '50000'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Insufficient stock', response.json()['error'])
+
+    def test_benchmark_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('benchmark_pos_checkout', sizes='1,3', iterations=2, stdout=out)
+        self.assertIn('rolled back', out.getvalue())
+        self.assertFalse(POSSale.objects.exists())
+
+
+class ShiftTotalsTests(POSTestMixin, TestCase):
+    """Shift totals are kept by delta; closing reads them without re-aggregating."""
+
+    def _post_sale(self, shift, qty, payments):
+        sale = self._create_sale(shift, qty=qty)
+        for method, amount in payments:
+            POSPayment.objects.create(sale=sale, method=method, amount=Decimal(amount))
+        mark_sale_paid(sale.pk, self.user)
+        post_pos_sale(sale.pk, self.user)
+        return sale
+
+    def _refund(self, sale, shift, amount):
+        refund = POSRefund.objects.create(
+            refund_no=generate_refund_number(), original_sale=sale, shift=shift,
+            created_by=self.user, subtotal=Decimal(amount), grand_total=Decimal(amount),
+        )
+        POSRefundLine.objects.create(
+            refund=refund, sale_line=sale.lines.first(), item=self.item,
+            location=self.location, qty=Decimal('1'), unit=self.unit, amount=Decimal(amount),
+        )
+        post_pos_refund(refund.pk, self.user)
+
+    def test_running_totals_match_aggregate(self):
+        from rest_framework.test import APIClient
+
+        shift = self._open_shift()
+        self._post_sale(shift, Decimal('2'), [(PaymentMethod.CASH, '200')])
+        self._post_sale(shift, Decimal('3'), [(PaymentMethod.CASH, '100'), (PaymentMethod.GCASH, '200')])
+        refunded = self._post_sale(shift, Decimal('1'), [(PaymentMethod.CASH, '100')])
+        self._refund(refunded, shift, '100')
+        voided = self._post_sale(shift, Decimal('4'), [(PaymentMethod.CARD, '400')])
+        void_sale(voided.pk, self.user)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/pos/cash-entries/'
+        response = client.post(url, {'shift': shift.pk, 'entry_type': 'CASH_IN', 'amount': '50', 'reason': 'Float'})
+        self.assertEqual(response.status_code, 201, response.content)
+        entry_id = client.post(
+            url, {'shift': shift.pk, 'entry_type': 'CASH_OUT', 'amount': '30', 'reason': 'Supplies'},
+        ).json()['id']
+        client.patch(f'{url}{entry_id}/', {'amount': '20'})
+        client.post(url, {'shift': shift.pk, 'entry_type': 'CASH_OUT', 'amount': '5', 'reason': 'Oops'})
+        client.delete(f'{url}{CashEntry.objects.get(reason="Oops").pk}/')
+
+        shift.refresh_from_db()
+        self.assertEqual(shift.cash_sales_total, Decimal('300'))
+        self.assertEqual(shift.noncash_sales_total, Decimal('200'))
+        self.assertEqual(shift.refund_total, Decimal('100'))
+        self.assertEqual(shift.cash_in_out_total, Decimal('30'))
+        self.assertEqual(reconcile_shift(shift), {})
+
+    def test_close_shift_does_not_reaggregate(self):
+        shift = self._open_shift()
+        for _ in range(3):
+            self._post_sale(shift, Decimal('1'), [(PaymentMethod.CASH, '100')])
+        CashEntry.objects.create(
+            shift=shift, entry_type=CashEntryType.CASH_OUT, amount=Decimal('10'),
+            reason='Unrecorded', created_by=self.user,
+        )
+        with self.assertNumQueries(5):
+            closed = close_shift(shift, self.user, Decimal('1290'))
+        self.assertEqual(closed.expected_cash, Decimal('1300'))
+        self.assertEqual(closed.variance, Decimal('-10'))
+
+    def test_paid_but_unposted_sale_counts_at_close(self):
+        from rest_framework.test import APIClient
+
+        shift = self._open_shift()
+        # More than the 100 in stock: marking paid works, posting fails.
+        sale = self._create_sale(shift, qty=Decimal('150'))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.post(f'/api/pos/sales/{sale.pk}/set-payments/', {
+            'payments': [{'method': 'CASH', 'amount': '10000'}, {'method': 'CARD', 'amount': '5000'}],
+        }, format='json')
+        response = client.post(f'/api/pos/sales/{sale.pk}/mark-paid/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(client.post(f'/api/pos/sales/{sale.pk}/post/').status_code, 400)
+        sale.refresh_from_db()
+        self.assertEqual(sale.status, SaleStatus.PAID)
+        self.assertEqual(client.post(f'/api/pos/sales/{sale.pk}/mark-paid/').status_code, 400)
+
+        self.assertEqual(reconcile_shift(shift), {})
+        closed = close_shift(shift, self.user, Decimal('11000'))
+        self.assertEqual(closed.cash_sales_total, Decimal('10000'))
+        self.assertEqual(closed.noncash_sales_total, Decimal('5000'))
+        self.assertEqual(closed.variance, Decimal('0'))
+
+    def test_voiding_a_paid_sale_takes_its_payments_back(self):
+        shift = self._open_shift()
+        sale = self._create_sale(shift)
+        POSPayment.objects.create(sale=sale, method=PaymentMethod.CASH, amount=sale.grand_total)
+        mark_sale_paid(sale.pk, self.user)
+        void_sale(sale.pk, self.user)
+        shift.refresh_from_db()
+        self.assertEqual(shift.cash_sales_total, Decimal('0'))
+        self.assertEqual(reconcile_shift(shift), {})
+
+    def test_cash_entry_rejected_on_closed_shift(self):
+        from rest_framework.test import APIClient
+
+        shift = close_shift(self._open_shift(), self.user, Decimal('1000'))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/pos/cash-entries/', {
+            'shift': shift.pk, 'entry_type': 'CASH_IN', 'amount': '50', 'reason': 'Late',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CashEntry.objects.exists())
+
+    def test_reconcile_shift_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        shift = self._open_shift()
+        self._post_sale(shift, Decimal('2'), [(PaymentMethod.CASH, '200')])
+        POSShift.objects.filter(pk=shift.pk).update(cash_sales_total=Decimal('150'))
+
+        out = StringIO()
+        call_command('reconcile_shift', stdout=out)
+        self.assertIn('cash_sales_total: stored 150.00, expected 200.00 (+50.00)', out.getvalue())
+        shift.refresh_from_db()
+        self.assertEqual(shift.cash_sales_total, Decimal('150'))
+
+        call_command('reconcile_shift', str(shift.pk), '--fix', stdout=StringIO())
+        shift.refresh_from_db()
+        self.assertEqual(shift.cash_sales_total, Decimal('200'))
+        self.assertEqual(reconcile_shift(shift), {})
+
+
+class TerminalCartTests(POSTestMixin, TestCase):
+    """Client-side terminal cart: register snapshot and single-request checkout."""
+
+    def setUp(self):
+        super().setUp()
+        PriceListItem.objects.create(
+            price_list=self.price_list, item=self.item,
+            unit=self.unit, price=Decimal('90.00'), min_qty=Decimal('10'),
+        )
+        self.shift = self._open_shift()
+        self.client.force_login(self.user)
+
+    def _checkout(self, lines, grand_total, payments=None, **extra):
+        import json
+
+        return self.client.post(
+            f'/pos/terminal/{self.shift.pk}/checkout/',
+            json.dumps({
+                'lines': lines, 'grand_total': grand_total,
+                'payments': payments or [{'method': 'CASH', 'amount': grand_total}], **extra,
+            }),
+            content_type='application/json',
+        )
+
+    def test_snapshot(self):
+        data = self.client.get(f'/pos/terminal/{self.shift.pk}/snapshot/').json()
+        item = next(i for i in data['items'] if i['id'] == self.item.pk)
+        self.assertEqual(
+            [[Decimal(q), Decimal(p)] for q, p in item['tiers']],
+            [[Decimal('10'), Decimal('90')], [Decimal('1'), Decimal('100')]],
+        )
+        self.assertEqual(Decimal(item['available']), Decimal('100'))
+        self.assertEqual(
+            [(b['id'], Decimal(b['unit_price'])) for b in data['bundles']],
+            [(self.price_list.pk, Decimal('190'))],
+        )
+        # The price lookup API resolves the same tiers.
+        response = self.client.get('/api/pricing/price/', {'item': self.item.pk, 'qty': '12', 'register': self.register.pk})
+        self.assertEqual(Decimal(response.json()['price']), Decimal('90'))
+
+    def test_cart_checkout_posts_sale_in_one_request(self):
+        draft = self._create_sale(self.shift)
+        self.assertEqual(
+            self.client.get(f'/pos/terminal/{self.shift.pk}/').context['draft_cart']['draft'], draft.pk,
+        )
+        # (12 x 90 - 0.40) + 1.25% tax = 1093.095, shown as 1093.10
+        response = self._checkout(
+            [{'item': self.item.pk, 'qty': '12', 'unit_price': '90', 'discount_amount': '0.40', 'tax_rate': '1.25'}],
+            '1093.10', payments=[{'method': 'CASH', 'amount': '1100'}], draft=draft.pk,
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.json()['grand_total'], response.json()['change']), ('1093.10', '6.90'))
+
+        sale = POSSale.objects.get(pk=response.json()['sale_id'])
+        self.assertEqual((sale.status, sale.grand_total), (SaleStatus.POSTED, Decimal('1093.10')))
+        self.assertEqual(StockBalance.objects.get(item=self.item, location=self.location).qty_on_hand, Decimal('88'))
+        draft.refresh_from_db()
+        self.assertEqual(draft.status, SaleStatus.VOID)
+
+    def test_stale_prices_are_refused(self):
+        response = self._checkout(
+            [{'item': self.item.pk, 'qty': '12', 'unit_price': '100'}], '1200.00',
+            bundles=[{'price_list': self.price_list.pk, 'qty_sets': '1', 'unit_price': '150'}],
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            [(s.get('item'), s.get('price_list'), Decimal(s['current_price'])) for s in response.json()['stale']],
+            [(self.item.pk, None, Decimal('90')), (None, self.price_list.pk, Decimal('190'))],
+        )
+        self.assertFalse(POSSale.objects.exists())
+        self.assertEqual(StockBalance.objects.get(item=self.item, location=self.location).qty_on_hand, Decimal('100'))
+
+    def test_free_tier_checks_out(self):
+        Item.objects.filter(pk=self.item.pk).update(selling_price=Decimal('100'))
+        PriceListItem.objects.create(
+            price_list=self.price_list, item=self.item,
+            unit=self.unit, price=Decimal('0'), min_qty=Decimal('50'),
+        )
+        response = self._checkout(
+            [
+                {'item': self.item.pk, 'qty': '50', 'unit_price': '0'},
+                {'item': self.item.pk, 'qty': '1', 'unit_price': '100'},
+            ],
+            '100.00',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(POSSale.objects.get(pk=response.json()['sale_id']).grand_total, Decimal('100.00'))
+
+    def test_lines_are_in_the_stock_unit(self):
+        box = Unit.objects.create(name='Box', abbreviation='bx')
+        response = self._checkout([{'item': self.item.pk, 'qty': '2', 'unit': box.pk, 'unit_price': '100'}], '200.00')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(POSSale.objects.get(pk=response.json()['sale_id']).lines.get().unit_id, self.unit.pk)
+
+    def test_total_mismatch_is_refused(self):
+        response = self._checkout([{'item': self.item.pk, 'qty': '2', 'unit_price': '100'}], '200.01')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('does not match', response.json()['error'])
+        self.assertFalse(POSSale.objects.exists())
+        self.assertEqual(StockBalance.objects.get(item=self.item, location=self.location).qty_on_hand, Decimal('100'))
+
+    def test_benchmark_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('benchmark_pos_terminal', items=2, iterations=1, stdout=out)
+        self.assertIn('client-side cart', out.getvalue())
+        self.assertFalse(POSSale.objects.exists())
+
+
+class TerminalSnapshotSyncTests(POSTestMixin, TestCase):
+    """Register snapshot versioning: ETag / 304, ?since= deltas and full fallbacks."""
+
+    def setUp(self):
+        super().setUp()
+        self.other = Item.objects.create(
+            code='ITEM-OTHER', name='Other Item', item_type='FINISHED',
+            category=self.category, default_unit=self.unit, selling_price=Decimal('5'),
+        )
+        self.shift = self._open_shift()
+        self.client.force_login(self.user)
+        self.url = f'/pos/terminal/{self.shift.pk}/snapshot/'
+        # Age every row, and the register less, so the snapshot version is
+        # past the delta lookback window and deltas only see the test's changes.
+        from datetime import timedelta
+        from catalog.models import UnitConversion
+
+        now = timezone.now()
+        for model in (Item, PriceList, PriceListItem, UnitConversion, POSRegister):
+            model.all_objects.update(created_at=now - timedelta(hours=2), updated_at=now - timedelta(hours=2))
+        StockBalance.objects.update(updated_at=now - timedelta(hours=2))
+        POSRegister.all_objects.update(updated_at=now - timedelta(hours=1))
+        self.version = self.client.get(self.url).json()['version']
+
+    def _delta(self):
+        response = self.client.get(self.url, {'since': self.version})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], f'"{self.version}"')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.version}"').status_code, 304)
+        self.assertEqual(self.client.get(self.url, {'since': self.version}).status_code, 304)
+
+    def test_delta_has_changed_prices_and_stock_only(self):
+        pli = PriceListItem.objects.get(item=self.item)
+        pli.price = Decimal('95')
+        pli.save()
+        balance = StockBalance.objects.get(item=self.item)
+        balance.qty_on_hand = Decimal('60')
+        balance.save()
+
+        data = self._delta()
+        self.assertFalse(data['full'])
+        self.assertNotEqual(data['version'], self.version)
+        self.assertEqual([i['id'] for i in data['items']], [self.item.pk])
+        item = data['items'][0]
+        self.assertEqual((Decimal(item['tiers'][0][1]), Decimal(item['available'])), (Decimal('95'), Decimal('60')))
+        self.assertEqual(item['unit'], 'pcs')
+        self.assertEqual(data['removed'], [])
+        self.assertEqual(Decimal(data['bundles'][0]['unit_price']), Decimal('95'))
+
+    def test_deactivated_item_is_removed(self):
+        self.other.soft_delete()
+        data = self._delta()
+        self.assertEqual((data['full'], data['items'], data['removed']), (False, [], [self.other.pk]))
+
+    def test_deleted_price_row_or_bad_version_sends_full_snapshot(self):
+        PriceListItem.objects.filter(item=self.item).delete()
+        data = self._delta()
+        self.assertTrue(data['full'])
+        item = next(i for i in data['items'] if i['id'] == self.item.pk)
+        self.assertEqual(item['tiers'], [])
+        self.assertTrue(self.client.get(self.url, {'since': 'garbage'}).json()['full'])
+
+    def test_tiers_in_other_units_are_converted(self):
+        from catalog.models import UnitConversion
+
+        box = Unit.objects.create(name='Box', abbreviation='box')
+        UnitConversion.objects.create(from_unit=box, to_unit=self.unit, factor=Decimal('12'))
+        PriceListItem.objects.create(
+            price_list=self.price_list, item=self.item, unit=box, price=Decimal('1000'), min_qty=Decimal('1'),
+        )
+        data = self._delta()
+        self.assertTrue(data['full'])  # conversions changed
+        item = next(i for i in data['items'] if i['id'] == self.item.pk)
+        self.assertEqual(
+            [[Decimal(q), Decimal(p)] for q, p in item['tiers']],
+            [[Decimal('12'), Decimal('83.3333')], [Decimal('1'), Decimal('100')]],
+        )
+        response = self.client.post(
+            f'/pos/terminal/{self.shift.pk}/checkout/',
+            '{"lines": [{"item": %d, "qty": "12", "unit_price": "83.3333"}], "grand_total": "1000.00",'
+            ' "payments": [{"method": "CASH", "amount": "1000.00"}]}' % self.item.pk,
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+class OfflineReplayTests(POSTestMixin, TestCase):
+    """Offline queue: replaying sales by client_uuid posts each exactly once, price-checked."""
+
+    def setUp(self):
+        super().setUp()
+        self.shift = self._open_shift()
+        self.client.force_login(self.user)
+
+    def _post(self, url, body):
+        import json
+
+        return self.client.post(url, json.dumps(body), content_type='application/json')
+
+    def _sale(self, qty, unit_price='100', version=None):
+        import uuid
+        from pos.services import snapshot_version
+
+        total = str((Decimal(qty) * Decimal(unit_price)).quantize(Decimal('0.01')))
+        return {
+            'client_uuid': str(uuid.uuid4()),
+            'version': version or snapshot_version(self.register),
+            'lines': [{'item': self.item.pk, 'qty': qty, 'unit_price': unit_price}],
+            'payments': [{'method': 'CASH', 'amount': total}],
+            'grand_total': total,
+        }
+
+    def _replay(self, sales):
+        response = self._post(f'/pos/terminal/{self.shift.pk}/replay/', {'sales': sales})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(r['client_uuid'], r['status']) for r in response.json()['results']]
+
+    def _on_hand(self):
+        return StockBalance.objects.get(item=self.item, location=self.location).qty_on_hand
+
+    def test_replaying_a_batch_twice_posts_it_once(self):
+        batch = [self._sale('2'), self._sale('3')]
+        uuids = [s['client_uuid'] for s in batch]
+        self.assertEqual(self._replay(batch), [(u, 'posted') for u in uuids])
+        self.assertEqual(self._replay(batch), [(u, 'duplicate') for u in uuids])
+
+        self.assertEqual(POSSale.objects.filter(status=SaleStatus.POSTED).count(), 2)
+        self.assertEqual(StockMove.objects.filter(reference_type='POSSale').count(), 2)
+        self.assertEqual(self._on_hand(), Decimal('95'))
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.cash_sales_total, Decimal('500.00'))
+
+    def test_prices_are_checked_against_the_snapshot_version(self):
+        from audit.models import AuditLog
+
+        # Prices unchanged since the version: a price it never offered is refused.
+        forged = self._sale('2', unit_price='1')
+        response = self._post(f'/pos/terminal/{self.shift.pk}/replay/', {'sales': [forged]})
+        result = response.json()['results'][0]
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(result['price_mismatches'][0]['current_price'], '100.0000')
+        self.assertEqual(self._replay([self._sale('1', version='garbage')])[0][1], 'error')
+        self.assertFalse(POSSale.objects.exists())
+
+        # Prices changed after the version: the old price posts, flagged and audited.
+        version = self._sale('1')['version']
+        PriceListItem.objects.filter(item=self.item).update(price=Decimal('110'), updated_at=timezone.now())
+        sale = self._sale('1', version=version)
+        response = self._post(f'/pos/terminal/{self.shift.pk}/replay/', {'sales': [sale]})
+        result = response.json()['results'][0]
+        self.assertEqual(result['status'], 'posted')
+        self.assertEqual(
+            [(m['unit_price'], m['current_price']) for m in result['price_mismatches']], [('100.0000', '110.0000')],
+        )
+        log = AuditLog.objects.get(model_name='POSSale', object_id=result['sale_id'], action='UPDATE')
+        self.assertEqual(log.changes['version'], version)
+        self.assertEqual(log.changes['price_mismatches'], result['price_mismatches'])
+
+        # A version that cannot be from this shift must match the current prices.
+        forged = f'0-0-0-0-{timezone.localdate():%Y%m%d}'
+        for old in (forged, version.rsplit('-', 1)[0] + '-20000101'):
+            response = self._post(f'/pos/terminal/{self.shift.pk}/replay/', {'sales': [self._sale('1', version=old)]})
+            self.assertEqual(response.json()['results'][0]['status'], 'error')
+        self.assertEqual(self._replay([self._sale('1', unit_price='110', version=forged)])[0][1], 'posted')
+        self.assertEqual(POSSale.objects.count(), 2)
+
+    def test_failed_sale_does_not_block_the_rest(self):
+        batch = [self._sale('500'), self._sale('1'), {'client_uuid': 'not-a-uuid'}]
+        batch[1]['grand_total'] = '99.00'
+        ok = self._sale('4')
+        results = self._replay(batch + [ok])
+        self.assertEqual([status for _, status in results], ['error', 'error', 'error', 'posted'])
+        self.assertEqual([str(u) for u in POSSale.objects.values_list('client_uuid', flat=True)], [ok['client_uuid']])
+        self.assertEqual(self._on_hand(), Decimal('96'))
+
+    def test_retried_checkout_is_not_posted_twice(self):
+        sale = self._sale('2')
+        url = f'/pos/terminal/{self.shift.pk}/checkout/'
+        first = self._post(url, sale)
+        second = self._post(url, sale)
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(first.json()['sale_id'], second.json()['sale_id'])
+        # A replay of a sale whose checkout did get through is a duplicate.
+        self.assertEqual(self._replay([sale]), [(sale['client_uuid'], 'duplicate')])
+        self.assertEqual(StockMove.objects.filter(reference_type='POSSale').count(), 1)
+        self.assertEqual(self._on_hand(), Decimal('98'))
+
+
+class BundleAvailabilityTests(POSTestMixin, TestCase):
+    """Bundle menu: cached definitions and sets in stock from one grouped query."""
+
+    def setUp(self):
+        super().setUp()
+        self.part = Item.objects.create(
+            code='ITEM-PART', name='Bundle Part', item_type='FINISHED',
+            category=self.category, default_unit=self.unit,
+        )
+        StockBalance.objects.create(item=self.part, location=self.location, qty_on_hand=Decimal('7'))
+        self.part_price = PriceListItem.objects.create(
+            price_list=self.price_list, item=self.part,
+            unit=self.unit, price=Decimal('50.00'), min_qty=Decimal('2'),
+        )
+        self.shift = self._open_shift()
+        self.client.force_login(self.user)
+
+    def _menu(self):
+        response = self.client.get(f'/pos/terminal/{self.shift.pk}/bundles/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['bundles']
+
+    def test_menu_has_max_sets_and_cached_prices(self):
+        # 100 pcs of the item (1 per set), 7 of the part (2 per set): 3 sets.
+        [bundle] = self._menu()
+        self.assertEqual((bundle['id'], bundle['max_sets'], Decimal(bundle['unit_price'])), (self.price_list.pk, '3', Decimal('150')))
+        self.assertEqual(
+            [(c['item'], Decimal(c['qty']), Decimal(c['available'])) for c in bundle['components']],
+            [(self.item.pk, Decimal('1'), Decimal('100')), (self.part.pk, Decimal('2'), Decimal('7'))],
+        )
+
+        self.part_price.price = Decimal('60')
+        self.part_price.save()
+        self.assertEqual(Decimal(self._menu()[0]['unit_price']), Decimal('160'))
+
+    def test_queries_do_not_grow_with_bundles(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from pos.services import bundle_availability
+
+        def count():
+            bundle_availability(self.warehouse.pk)  # warm the definitions cache
+            with CaptureQueriesContext(connection) as ctx:
+                result = bundle_availability(self.warehouse.pk)
+            return len(result), len(ctx.captured_queries)
+
+        bundles, queries = count()
+        for i in range(5):
+            pl = PriceList.objects.create(name=f'Bundle {i}')
+            PriceListItem.objects.create(price_list=pl, item=self.part, unit=self.unit, price=Decimal('1'), min_qty=Decimal('1'))
+        self.assertEqual(count(), (bundles + 5, queries))
+
+    def test_stock_check_endpoint(self):
+        url = f'/pos/terminal/{self.shift.pk}/bundle-stock/{self.price_list.pk}/'
+        self.assertTrue(self.client.get(url, {'qty': '3'}).json()['stock_ok'])
+        data = self.client.get(url, {'qty': '4'}).json()
+        self.assertFalse(data['stock_ok'])
+        self.assertEqual(
+            [(i['code'], Decimal(i['needed']), i['ok']) for i in data['items']],
+            [('ITEM-POS', Decimal('4'), True), ('ITEM-PART', Decimal('8'), False)],
+        )
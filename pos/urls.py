@@ -14,6 +14,11 @@ urlpatterns = [
     path('shifts/<int:pk>/summary/', views.shift_summary_view, name='pos_shift_summary'),
     # Terminal
     path('terminal/<int:shift_id>/', views.terminal_view, name='pos_terminal'),
+    path('terminal/<int:shift_id>/snapshot/', views.terminal_snapshot, name='pos_terminal_snapshot'),
+    path('terminal/<int:shift_id>/checkout/', views.terminal_cart_checkout, name='pos_terminal_cart_checkout'),
+    path('terminal/<int:shift_id>/replay/', views.terminal_replay, name='pos_terminal_replay'),
+    path('terminal/<int:shift_id>/bundle-stock/<int:price_list_id>/', views.terminal_bundle_stock_check, name='pos_terminal_bundle_stock'),
+    path('terminal/<int:shift_id>/bundles/', views.terminal_bundle_menu, name='pos_terminal_bundle_menu'),
     path('terminal/<int:shift_id>/new-sale/', views.terminal_new_sale, name='pos_terminal_new_sale'),
     path('terminal/sale/<int:sale_id>/add-line/', views.terminal_add_line, name='pos_terminal_add_line'),
     path('terminal/line/<int:line_id>/remove/', views.terminal_remove_line, name='pos_terminal_remove_line'),
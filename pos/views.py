@@ -2,10 +2,12 @@ from decimal import Decimal
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.db import transaction
+from django.http import HttpResponseNotModified, JsonResponse
 from django.views.decorators.http import require_POST
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
@@ -21,12 +23,15 @@ from pos.serializers import (
     CashEntrySerializer,
     OpenShiftRequestSerializer, CloseShiftRequestSerializer,
     AddLineRequestSerializer, SetPaymentsRequestSerializer,
-    CreateRefundRequestSerializer,
+    CreateRefundRequestSerializer, CheckoutRequestSerializer, TerminalCheckoutSerializer,
+    OfflineSaleSerializer,
 )
 from pos.services import (
     open_shift, close_shift,
-    post_pos_sale, post_pos_refund, void_sale,
+    mark_sale_paid, post_pos_sale, post_pos_refund, void_sale, checkout_cart, sale_totals, apply_cash_entry,
     generate_sale_number, generate_refund_number,
+    StalePrices, checkout_terminal_cart, register_snapshot, replay_offline_sales,
+    snapshot_delta, snapshot_version, bundle_availability, bundle_definitions,
 )
 from pos.forms import POSRegisterForm, OpenShiftForm, CloseShiftForm, CashEntryForm
 
@@ -114,18 +119,10 @@ class POSSaleViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], url_path='mark-paid')
     def mark_paid(self, request, pk=None):
         sale = self.get_object()
-        if sale.status != SaleStatus.DRAFT:
-            return Response({'error': 'Sale is not in DRAFT status.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        payment_sum = sum(p.amount for p in sale.payments.all())
-        if payment_sum < sale.grand_total:
-            return Response(
-                {'error': f'Payments ({payment_sum}) < grand total ({sale.grand_total}).'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        sale.status = SaleStatus.PAID
-        sale.save(update_fields=['status', 'updated_at'])
+        try:
+            mark_sale_paid(sale.pk, request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'status': 'paid', 'sale_no': sale.sale_no})
 
     @action(detail=True, methods=['post'], url_path='post')
@@ -138,6 +135,44 @@ class POSSaleViewSet(viewsets.ModelViewSet):
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        """Create, pay and post a complete cart (lines, bundles, payments) in one call."""
+        ser = CheckoutRequestSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        d = ser.validated_data
+
+        shift = get_object_or_404(
+            POSShift.objects.select_related('register__warehouse', 'register__default_location'),
+            pk=d['shift'],
+        )
+        customer = channel = None
+        if d.get('customer'):
+            from partners.models import Customer
+            customer = get_object_or_404(Customer, pk=d['customer'])
+        if d.get('channel'):
+            from core.models import SalesChannel
+            channel = get_object_or_404(SalesChannel, pk=d['channel'])
+
+        try:
+            sale = checkout_cart(
+                shift, request.user, d['lines'], d['payments'], bundles=d['bundles'],
+                customer=customer, channel=channel, notes=d['notes'],
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        cents = Decimal('0.01')
+        grand_total = sale.grand_total.quantize(cents)
+        payment_sum = sum(p['amount'] for p in d['payments'])
+        return Response({
+            'status': 'posted',
+            'sale_id': sale.pk,
+            'sale_no': sale.sale_no,
+            'grand_total': str(grand_total),
+            'change': str((payment_sum - grand_total).quantize(cents)),
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'])
     def void(self, request, pk=None):
         sale = self.get_object()
@@ -171,8 +206,29 @@ class CashEntryViewSet(viewsets.ModelViewSet):
     serializer_class = CashEntrySerializer
     filterset_fields = ['shift', 'entry_type']
 
+    # Every change moves the shift's running cash_in_out_total by the same amount.
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        with transaction.atomic():
+            entry = serializer.save(created_by=self.request.user)
+            self._apply(entry)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            old = CashEntry.objects.select_for_update().select_related('shift').get(pk=serializer.instance.pk)
+            self._apply(old, sign=-1)
+            entry = serializer.save()
+            self._apply(entry)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            self._apply(instance, sign=-1)
+            instance.delete()
+
+    def _apply(self, entry, sign=1):
+        try:
+            apply_cash_entry(entry, sign)
+        except ValueError as e:
+            raise ValidationError({'shift': str(e)})
 
 
 # ── Shift API endpoints ───────────────────────────────────────────────────
@@ -214,19 +270,11 @@ def api_shift_summary(request, pk):
 
 def _recalculate_sale_totals(sale):
     """Recalculate sale subtotal, discount_total, tax_total, grand_total from lines + bundle lines."""
-    lines = sale.lines.all()
-    bundle_lines = sale.bundle_lines.all()
-    item_subtotal = sum(l.qty * l.unit_price for l in lines)
-    bundle_subtotal = sum(bl.line_total for bl in bundle_lines)
-    subtotal = item_subtotal + bundle_subtotal
-    discount_total = sum(l.discount_amount for l in lines)
-    tax_total = sum((l.qty * l.unit_price - l.discount_amount) * l.tax_rate / 100 for l in lines)
-    grand_total = subtotal - discount_total + tax_total
-
-    sale.subtotal = subtotal
-    sale.discount_total = discount_total
-    sale.tax_total = tax_total
-    sale.grand_total = grand_total
+    totals = sale_totals(sale.lines.all(), sale.bundle_lines.all())
+    sale.subtotal = totals['subtotal']
+    sale.discount_total = totals['discount_total']
+    sale.tax_total = totals['tax_total']
+    sale.grand_total = totals['grand_total']
     sale.save(update_fields=['subtotal', 'discount_total', 'tax_total', 'grand_total', 'updated_at'])
 
 
@@ -343,38 +391,37 @@ def terminal_view(request, shift_id):
         messages.error(request, 'This shift is closed.')
         return redirect('pos_shift_list')
 
-    register = shift.register
-    # Get or create a DRAFT sale for this shift
+    # A DRAFT sale left by the per-line terminal endpoints is restored into
+    # the client-side cart and voided when that cart is checked out.
     sale = POSSale.objects.filter(shift=shift, status=SaleStatus.DRAFT).prefetch_related(
-        'lines', 'bundle_lines__price_list',
+        'lines__item', 'bundle_lines__price_list',
     ).first()
-
-    # Build list of available bundles (all active price lists with at least one item)
-    from pricing.models import PriceList, PriceListItem
-    from django.db.models import Prefetch
-    bundles_qs = (
-        PriceList.objects
-        .filter(items__is_active=True)
-        .distinct()
-        .prefetch_related(
-            Prefetch('items', queryset=PriceListItem.objects.filter(is_active=True))
-        )
-        .order_by('name')
-    )
-    available_bundles = []
-    for pl in bundles_qs:
-        unit_price = sum(pli.price for pli in pl.items.all())
-        available_bundles.append({
-            'id': pl.pk,
-            'name': pl.name,
-            'unit_price': unit_price,
-        })
+    draft_cart = None
+    if sale:
+        draft_cart = {
+            'draft': sale.pk,
+            'lines': [
+                {
+                    'item': line.item_id, 'code': line.item.code, 'name': line.item.name,
+                    'qty': str(line.qty), 'unit_price': str(line.unit_price),
+                    'discount_amount': str(line.discount_amount), 'tax_rate': str(line.tax_rate),
+                }
+                for line in sale.lines.all()
+            ],
+            'bundles': [
+                {
+                    'price_list': bl.price_list_id, 'name': bl.price_list.name,
+                    'qty_sets': str(bl.qty_sets), 'unit_price': str(bl.unit_price),
+                }
+                for bl in sale.bundle_lines.all()
+            ],
+        }
 
     return render(request, 'pos/terminal.html', {
         'shift': shift,
-        'register': register,
-        'sale': sale,
-        'available_bundles': available_bundles,
+        'register': shift.register,
+        'draft_cart': draft_cart,
+        'available_bundles': bundle_availability(shift.register.warehouse_id),
     })
 
 
@@ -688,55 +735,72 @@ def terminal_remove_bundle(request, bundle_line_id):
 @login_required
 def terminal_validate_bundle_stock(request, sale_id, price_list_id):
     """Validate that all items in a bundle have sufficient stock. Returns JSON."""
-    from decimal import Decimal as D
-    from django.db.models import Sum
-    from pricing.models import PriceList
-    from inventory.models import StockBalance
-    from catalog.models import convert_to_base_unit
-
     sale = get_object_or_404(POSSale.objects.select_related('warehouse'), pk=sale_id)
-    pl = get_object_or_404(PriceList.objects.prefetch_related('items__item__stock_unit', 'items__unit'), pk=price_list_id)
-    qty_sets = D(request.GET.get('qty', '1'))
+    return _bundle_stock_response(request, sale.warehouse, price_list_id)
 
-    warehouse = sale.warehouse
-    item_results = []
-    stock_ok = True
 
-    for pli in pl.items.all():
-        item = pli.item
-        qty_needed = pli.min_qty * qty_sets
-        try:
-            base_qty = convert_to_base_unit(qty_needed, pli.unit, item.stock_unit, item=item)
-        except Exception:
-            base_qty = qty_needed
+@login_required
+def terminal_bundle_stock_check(request, shift_id, price_list_id):
+    """Bundle stock check for the client-side cart, against the shift's register warehouse."""
+    shift = get_object_or_404(POSShift.objects.select_related('register__warehouse'), pk=shift_id)
+    return _bundle_stock_response(request, shift.register.warehouse, price_list_id)
 
-        agg = StockBalance.objects.filter(
-            item=item,
-            location__warehouse=warehouse,
-        ).aggregate(
-            total_on_hand=Sum('qty_on_hand'),
-            total_reserved=Sum('qty_reserved'),
-        )
-        available = (agg['total_on_hand'] or D('0')) - (agg['total_reserved'] or D('0'))
-        item_ok = available >= base_qty
-        if not item_ok:
-            stock_ok = False
 
+def _bundle_stock_response(request, warehouse, price_list_id):
+    """Per-item stock check of ?qty sets of a bundle at *warehouse*, as JSON."""
+    from pricing.models import PriceList
+
+    pl = get_object_or_404(PriceList, pk=price_list_id)
+    bundle = next((b for b in bundle_definitions() if b['id'] == pl.pk), {'id': pl.pk, 'components': []})
+    bundle = bundle_availability(warehouse.pk, [bundle])[0]
+    qty_sets = Decimal(request.GET.get('qty', '1'))
+
+    item_results = []
+    for component in bundle['components']:
+        needed = component['qty'] * qty_sets
         item_results.append({
-            'code': item.code,
-            'name': item.name,
-            'needed': str(base_qty),
-            'available': str(available),
-            'ok': item_ok,
+            'code': component['code'],
+            'name': component['name'],
+            'needed': str(needed),
+            'available': str(component['available']),
+            'ok': component['available'] >= needed,
         })
 
     return JsonResponse({
-        'stock_ok': stock_ok,
+        'stock_ok': all(item['ok'] for item in item_results),
         'allow_negative_stock': warehouse.allow_negative_stock,
+        'max_sets': str(bundle['max_sets']) if bundle['max_sets'] is not None else None,
         'items': item_results,
     })
 
 
+@login_required
+def terminal_bundle_menu(request, shift_id):
+    """Every bundle with its price per set and the sets in stock at the shift's register warehouse."""
+    shift = get_object_or_404(POSShift.objects.select_related('register__warehouse'), pk=shift_id)
+    warehouse = shift.register.warehouse
+    return JsonResponse({
+        'allow_negative_stock': warehouse.allow_negative_stock,
+        'bundles': [_bundle_json(b) for b in bundle_availability(warehouse.pk)],
+    })
+
+
+def _bundle_json(bundle):
+    return {
+        'id': bundle['id'],
+        'name': bundle['name'],
+        'unit_price': str(bundle['unit_price']),
+        'max_sets': str(bundle['max_sets']) if bundle['max_sets'] is not None else None,
+        'components': [
+            {
+                'item': c['item'], 'code': c['code'], 'name': c['name'],
+                'qty': str(c['qty']), 'available': str(c['available']),
+            }
+            for c in bundle['components']
+        ],
+    }
+
+
 @login_required
 @require_POST
 def terminal_checkout(request, sale_id):
@@ -765,19 +829,19 @@ def terminal_checkout(request, sale_id):
             reference_no=p.get('reference_no', ''),
         )
 
-    # Mark paid
     payment_sum = sum(p.amount for p in sale.payments.all())
     if payment_sum < sale.grand_total:
         return JsonResponse({
             'error': f'Payment total ({payment_sum}) < grand total ({sale.grand_total}).'
         }, status=400)
 
-    sale.status = SaleStatus.PAID
-    sale.save(update_fields=['status', 'updated_at'])
-
-    # Post (deduct stock)
+    # Mark paid and post (deduct stock) together; on any failure the sale
+    # stays DRAFT and the shift totals are untouched, to avoid "receipt but
+    # no stock move" situations.
     try:
-        post_pos_sale(sale.pk, request.user)
+        with transaction.atomic():
+            mark_sale_paid(sale.pk, request.user)
+            post_pos_sale(sale.pk, request.user)
         sale.refresh_from_db()
         return JsonResponse({
             'status': 'posted',
@@ -787,7 +851,120 @@ def terminal_checkout(request, sale_id):
             'change': str(payment_sum - sale.grand_total),
         })
     except Exception as e:
-        # Revert to DRAFT on any failure to avoid "receipt but no stock move" situations
-        sale.status = SaleStatus.DRAFT
-        sale.save(update_fields=['status', 'updated_at'])
         return JsonResponse({'error': str(e)}, status=400)
+
+
+@login_required
+def terminal_snapshot(request, shift_id):
+    """
+    Price / stock snapshot of the shift's register, used by the client-side
+    cart.  The ETag is the snapshot version; ?since=<version> returns only
+    what changed after it, and 304 when nothing did.
+    """
+    shift = get_object_or_404(POSShift.objects.select_related('register'), pk=shift_id)
+    register = shift.register
+    version = snapshot_version(register)
+    etag = f'"{version}"'
+    since = request.GET.get('since')
+    if since == version or request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    elif since:
+        response = JsonResponse(snapshot_delta(register, since, version))
+    else:
+        response = JsonResponse(register_snapshot(register, version))
+    response['ETag'] = etag
+    return response
+
+
+@login_required
+@require_POST
+def terminal_cart_checkout(request, shift_id):
+    """
+    Check out the terminal's client-side cart in one request.
+
+    The JSON body holds the lines and bundles with the unit prices the
+    terminal charged, the payments and the grand total it showed.  Stale
+    prices are refused with 409 and the current prices; nothing is written.
+    A retried checkout with the same client_uuid returns the posted sale.
+    """
+    import json
+
+    shift = get_object_or_404(
+        POSShift.objects.select_related('register__warehouse', 'register__default_location'),
+        pk=shift_id,
+    )
+    if shift.status != ShiftStatus.OPEN:
+        return JsonResponse({'error': 'Shift is closed.'}, status=400)
+
+    try:
+        data = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid cart.'}, status=400)
+    ser = TerminalCheckoutSerializer(data=data)
+    if not ser.is_valid():
+        return JsonResponse({'error': 'Invalid cart.', 'details': ser.errors}, status=400)
+    d = ser.validated_data
+
+    grand_total = d['grand_total']
+    # Default to cash for the full amount, as the per-line checkout does.
+    payments = d['payments'] or [{'method': PaymentMethod.CASH, 'amount': grand_total}]
+    try:
+        sale = checkout_terminal_cart(
+            shift, request.user, d['lines'], payments, bundles=d['bundles'],
+            grand_total=grand_total, draft=d.get('draft'), client_uuid=d.get('client_uuid'),
+        )
+    except StalePrices as e:
+        return JsonResponse({'error': str(e), 'stale': e.stale}, status=409)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    payment_sum = sum(p['amount'] for p in payments)
+    return JsonResponse({
+        'status': 'posted',
+        'client_uuid': str(sale.client_uuid) if sale.client_uuid else None,
+        'sale_no': sale.sale_no,
+        'sale_id': sale.pk,
+        'grand_total': str(grand_total),
+        'change': str(payment_sum - grand_total),
+    })
+
+
+@login_required
+@require_POST
+def terminal_replay(request, shift_id):
+    """
+    Replay sales the terminal queued while offline: {"sales": [...]}, each
+    with its client_uuid and the snapshot version it was priced from.
+    Answers 200 with one result per sale (posted, duplicate or error, plus
+    any price mismatches); the terminal drops posted and duplicate sales
+    from its queue and keeps the others for review.
+    """
+    import json
+
+    shift = get_object_or_404(
+        POSShift.objects.select_related('register__warehouse', 'register__default_location'),
+        pk=shift_id,
+    )
+    try:
+        sales = json.loads(request.body)['sales']
+    except (json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid queue.'}, status=400)
+    if not isinstance(sales, list):
+        return JsonResponse({'error': 'Invalid queue.'}, status=400)
+
+    # Malformed sales are reported on their own so they do not hold up the rest.
+    results = [None] * len(sales)
+    valid = []
+    for index, data in enumerate(sales):
+        ser = OfflineSaleSerializer(data=data)
+        if ser.is_valid():
+            valid.append((index, ser.validated_data))
+        else:
+            results[index] = {
+                'client_uuid': data.get('client_uuid') if isinstance(data, dict) else None,
+                'status': 'error', 'sale_id': None, 'sale_no': None,
+                'error': 'Invalid sale.', 'details': ser.errors, 'price_mismatches': [],
+            }
+    for (index, _), result in zip(valid, replay_offline_sales(shift, request.user, [d for _, d in valid])):
+        results[index] = result
+    return JsonResponse({'results': results})
@@ -0,0 +1,317 @@
+"""
+Price resolution shared by the price lookup API, sales order forms and the
+POS terminal.
+
+Every active price list row, customer catalog entry and discount rule is
+loaded once into an in-memory PriceBook: per (price list, item, unit) a
+tier array sorted by min_qty (highest first) carrying each tier's date
+validity, and per customer the catalogs in the order they apply.  A price
+resolves as
+
+    customer catalog → register's price list → default price lists → item price
+
+with exact Decimal comparisons.  The book is dropped by the post_save /
+post_delete signals in pricing.signals and revalidated against a version
+stamp of the pricing tables, like the unit conversion graph
+(catalog.conversions): on every access inside a transaction that wrote
+pricing rows, otherwise at most every PRICE_BOOK_TTL seconds (settings,
+default 5).
+"""
+import datetime
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+CENTS = Decimal('0.01')
+
+
+class Tier(NamedTuple):
+    min_qty: Decimal
+    price: Decimal
+    item_id: int
+    unit_id: int
+    price_list_id: int
+    start_date: Optional[datetime.date]
+    end_date: Optional[datetime.date]
+    pk: int
+
+    def valid_on(self, day):
+        return (self.start_date is None or self.start_date <= day) and (self.end_date is None or self.end_date >= day)
+
+
+class Catalog(NamedTuple):
+    name: str
+    start_date: Optional[datetime.date]
+    end_date: Optional[datetime.date]
+    prices: dict  # {(item_id, unit_id): price}
+    by_item: dict  # {item_id: [(unit_id, price), ...]} in unit order
+
+    def valid_on(self, day):
+        return (self.start_date is None or self.start_date <= day) and (self.end_date is None or self.end_date >= day)
+
+
+class DiscountTerms(NamedTuple):
+    scope: str
+    discount_type: str
+    value: Decimal
+    name: str
+
+
+class PriceMatch(NamedTuple):
+    """A resolved unit price; *source* is 'customer', 'register', 'default' or 'item'."""
+    price: Decimal
+    unit_id: Optional[int]
+    source: str
+    name: str = ''
+    min_qty: Decimal = Decimal('1')
+
+
+class PriceBook:
+    """Read-only index of the active pricing rows; get one with get_price_book()."""
+
+    def __init__(self, tiers, lists, catalogs, rules):
+        # *lists*: {price_list_id: (name, is_active, is_default)}; *catalogs*:
+        # {customer_id: [Catalog, ...]} in the order they apply.
+        self.lists = lists
+        grouped = defaultdict(list)
+        for tier in tiers:
+            _, is_active, is_default = lists[tier.price_list_id]
+            if not is_active:
+                continue
+            keys = [tier.price_list_id, 'default'] if is_default else [tier.price_list_id]
+            for key in keys:
+                grouped[(key, tier.item_id, tier.unit_id)].append(tier)
+                grouped[(key, tier.item_id, None)].append(tier)
+        self._tiers = {
+            key: tuple(sorted(group, key=lambda t: (-t.min_qty, t.pk)))
+            for key, group in grouped.items()
+        }
+        self._catalogs = catalogs
+        self.rules = tuple(rules)
+
+    def tiers(self, price_list_id, item_id, unit_id=None):
+        """
+        Tiers of an active price list ('default' for the default lists
+        together), highest min_qty first; *unit_id* None for every unit.
+        Inactive lists have none.
+        """
+        return self._tiers.get((price_list_id, item_id, unit_id), ())
+
+    def match(self, price_list_id, item_id, qty, unit_id=None, on=None):
+        """The first tier valid on *on* whose min_qty *qty* reaches, or None."""
+        on = on or timezone.localdate()
+        for tier in self.tiers(price_list_id, item_id, unit_id):
+            if qty >= tier.min_qty and tier.valid_on(on):
+                return tier
+        return None
+
+    def customer_catalogs(self, customer_id, on=None):
+        """The customer's catalogs valid on *on*, in the order they apply."""
+        on = on or timezone.localdate()
+        return [c for c in self._catalogs.get(customer_id, ()) if c.valid_on(on)]
+
+    def customer_price(self, customer_id, item_id, unit_id=None, on=None):
+        """(price, unit_id, catalog name) from the first valid catalog listing the item, or None."""
+        for catalog in self.customer_catalogs(customer_id, on):
+            if unit_id is None:
+                entries = catalog.by_item.get(item_id)
+                if entries:
+                    return entries[0][1], entries[0][0], catalog.name
+            elif (item_id, unit_id) in catalog.prices:
+                return catalog.prices[(item_id, unit_id)], unit_id, catalog.name
+        return None
+
+    def resolve(self, item_id, qty, unit_id=None, price_list_id=None, customer_id=None, on=None):
+        """
+        The customer's catalog, then the price list *price_list_id* (the
+        register's, skipped when inactive), then the default lists.  None
+        when none of them prices the item; resolve_prices() falls back to
+        the item price.  *unit_id* narrows the catalog entries and the
+        default lists; the register's list is tried in every unit, and the
+        match says which one its price is in.
+        """
+        on = on or timezone.localdate()
+        if customer_id:
+            found = self.customer_price(customer_id, item_id, unit_id, on)
+            if found:
+                return PriceMatch(found[0], found[1], 'customer', found[2])
+        for key, unit, source in ((price_list_id, None, 'register'), ('default', unit_id, 'default')):
+            tier = self.match(key, item_id, qty, unit, on) if key else None
+            if tier:
+                return PriceMatch(tier.price, tier.unit_id, source, self.lists[tier.price_list_id][0], tier.min_qty)
+        return None
+
+    def line_discount(self, amount, qty):
+        """The largest per-item discount rule for a line of *qty* worth *amount*, capped at the amount."""
+        best = Decimal('0')
+        for rule in self.rules:
+            if rule.scope == 'ITEM':
+                best = max(best, amount * rule.value / 100 if rule.discount_type == 'PERCENT' else rule.value * qty)
+        return min(best, amount).quantize(CENTS)
+
+    def order_discount(self, subtotal):
+        """The largest per-order discount rule for *subtotal*, capped at it."""
+        best = Decimal('0')
+        for rule in self.rules:
+            if rule.scope == 'ORDER':
+                best = max(best, subtotal * rule.value / 100 if rule.discount_type == 'PERCENT' else rule.value)
+        return min(best, subtotal).quantize(CENTS)
+
+
+def _version_stamp():
+    """Fingerprint of the pricing tables (one aggregate query per table)."""
+    from core.versioning import version_stamp
+    from pricing.models import (
+        CustomerPriceCatalog, CustomerPriceCatalogItem, DiscountRule, PriceList, PriceListItem,
+    )
+
+    # Catalog rows have no timestamps; their edits go through the catalog
+    # form, which saves the catalog too.
+    return version_stamp([PriceList, PriceListItem, CustomerPriceCatalog, DiscountRule, CustomerPriceCatalogItem])
+
+
+def _load_book():
+    from pricing.models import (
+        CustomerPriceCatalog, CustomerPriceCatalogItem, DiscountRule, PriceList, PriceListItem,
+    )
+
+    lists = {
+        pk: (name, is_active, is_default)
+        for pk, name, is_active, is_default in PriceList.all_objects.values_list('pk', 'name', 'is_active', 'is_default')
+    }
+    tiers = [
+        Tier(*row)
+        for row in PriceListItem.objects.values_list(
+            'min_qty', 'price', 'item_id', 'unit_id', 'price_list_id', 'start_date', 'end_date', 'pk',
+        )
+    ]
+
+    entries = defaultdict(list)
+    for catalog_id, item_id, unit_id, price in (
+        CustomerPriceCatalogItem.objects.filter(catalog__is_active=True)
+        .order_by('unit_id', 'pk').values_list('catalog_id', 'item_id', 'unit_id', 'price')
+    ):
+        entries[catalog_id].append((item_id, unit_id, price))
+    catalogs = defaultdict(list)
+    for pk, customer_id, name, start_date, end_date in (
+        CustomerPriceCatalog.objects.values_list('pk', 'customer_id', 'name', 'start_date', 'end_date')
+    ):
+        by_item = defaultdict(list)
+        for item_id, unit_id, price in entries[pk]:
+            by_item[item_id].append((unit_id, price))
+        catalogs[customer_id].append(Catalog(
+            name, start_date, end_date,
+            {(item_id, unit_id): price for item_id, unit_id, price in entries[pk]}, dict(by_item),
+        ))
+    for customer_catalogs in catalogs.values():
+        customer_catalogs.sort(key=lambda c: (c.start_date or datetime.date.min, c.name))
+
+    rules = [
+        DiscountTerms(*row)
+        for row in DiscountRule.objects.order_by('pk').values_list('scope', 'discount_type', 'value', 'name')
+    ]
+    return PriceBook(tiers, lists, dict(catalogs), rules)
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.book = None
+        self.stamp = None
+        self.checked_at = 0.0
+        # True while a transaction that wrote pricing rows may still roll back.
+        self.volatile = False
+
+
+_registry = _Registry()
+
+
+def get_price_book():
+    """Return the current PriceBook, (re)loading it when stale."""
+    reg = _registry
+    ttl = getattr(settings, 'PRICE_BOOK_TTL', 5)
+    now = time.monotonic()
+    book = reg.book
+    if book is not None and not reg.volatile and now - reg.checked_at < ttl:
+        return book
+
+    stamp = _version_stamp()
+    with reg.lock:
+        if reg.book is None or stamp != reg.stamp:
+            reg.book = _load_book()
+            reg.stamp = stamp
+        reg.checked_at = now
+        if not connection.in_atomic_block:
+            reg.volatile = False
+        return reg.book
+
+
+def invalidate_price_book():
+    """Drop the cached book; the next lookup reloads it."""
+    reg = _registry
+    with reg.lock:
+        reg.book = None
+        reg.stamp = None
+        if connection.in_atomic_block:
+            reg.volatile = True
+    if connection.in_atomic_block:
+        transaction.on_commit(_drop_after_commit)
+
+
+def _drop_after_commit():
+    with _registry.lock:
+        _registry.book = None
+        _registry.stamp = None
+
+
+def resolve_prices(lines, price_list_id=None, customer_id=None, on=None):
+    """
+    Resolve a whole cart or order in one call.  *lines*: (item_id, qty,
+    unit_id or None) tuples.  Returns a PriceMatch per line; lines no
+    price list or catalog prices get the item's selling price (source
+    'item'), or None for unknown items.  Register prices and item prices
+    are converted to the line's unit when one is given and the units
+    convert.  One query, for the item prices, when some line falls back
+    to them.
+    """
+    from catalog.conversions import get_conversion_graph
+    from catalog.models import Item
+    from catalog.utils import _convert_price
+
+    book = get_price_book()
+    on = on or timezone.localdate()
+    lines = [(item_id, Decimal(str(qty)), unit_id) for item_id, qty, unit_id in lines]
+    matches = [
+        book.resolve(item_id, qty, unit_id, price_list_id=price_list_id, customer_id=customer_id, on=on)
+        for item_id, qty, unit_id in lines
+    ]
+    graph = None
+    for index, ((item_id, _, unit_id), match) in enumerate(zip(lines, matches)):
+        if match and unit_id and match.unit_id != unit_id:
+            graph = graph or get_conversion_graph()
+            if graph.factor(match.unit_id, unit_id, item_id):
+                matches[index] = match._replace(
+                    price=_convert_price(graph, match.price, match.unit_id, unit_id, item_id), unit_id=unit_id,
+                )
+    missing = {item_id for (item_id, _, _), match in zip(lines, matches) if match is None}
+    if missing:
+        items = {
+            pk: (selling_price, selling_unit_id or default_unit_id)
+            for pk, selling_price, selling_unit_id, default_unit_id in Item.objects.filter(pk__in=missing).values_list(
+                'pk', 'selling_price', 'selling_unit_id', 'default_unit_id',
+            )
+        }
+        graph = graph or get_conversion_graph()
+        for index, (item_id, _, unit_id) in enumerate(lines):
+            if matches[index] is None and item_id in items:
+                price, stock_unit_id = items[item_id]
+                if unit_id and unit_id != stock_unit_id:
+                    price, stock_unit_id = _convert_price(graph, price, stock_unit_id, unit_id, item_id), unit_id
+                matches[index] = PriceMatch(price, stock_unit_id, 'item')
+    return matches
@@ -0,0 +1,22 @@
+"""
+Pricing signal handlers.
+
+Any write to price lists, their rows, customer catalogs or discount rules
+drops the in-process price book (pricing.services) so the next lookup
+reloads it.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from pricing.models import (
+    CustomerPriceCatalog, CustomerPriceCatalogItem, DiscountRule, PriceList, PriceListItem,
+)
+from pricing.services import invalidate_price_book
+
+
+def pricing_changed(sender, instance, **kwargs):
+    invalidate_price_book()
+
+
+for model in (PriceList, PriceListItem, CustomerPriceCatalog, CustomerPriceCatalogItem, DiscountRule):
+    post_save.connect(pricing_changed, sender=model)
+    post_delete.connect(pricing_changed, sender=model)
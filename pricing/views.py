@@ -1,8 +1,9 @@
+from decimal import Decimal
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Q
 from rest_framework import viewsets
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -79,72 +80,99 @@ def bundle_items(request, pk):
 def price_lookup(request):
     """
     Look up the best price for an item.
-    Query params: item, qty, unit, register (optional)
+    Query params: item, qty, unit, register, customer, date (all but item optional)
     """
     from pos.models import POSRegister
+    from pricing.services import get_price_book
 
     item_id = request.query_params.get('item')
-    qty = request.query_params.get('qty', '1')
-    unit_id = request.query_params.get('unit')
-    register_id = request.query_params.get('register')
-
     if not item_id:
         return Response({'error': 'item is required'}, status=400)
+    try:
+        item_id = int(item_id)
+        qty = Decimal(request.query_params.get('qty', '1'))
+        unit_id = _optional_int(request.query_params.get('unit'))
+        customer_id = _optional_int(request.query_params.get('customer'))
+        register_id = _optional_int(request.query_params.get('register'))
+        on = _query_date(request.query_params.get('date'))
+    except (ValueError, ArithmeticError):
+        return Response({'error': 'Invalid item, qty, unit, register, customer or date.'}, status=400)
+
+    # Customer catalog, then the register's price list, then the default lists.
+    price_list_id = None
+    if register_id:
+        price_list_id = POSRegister.objects.filter(pk=register_id).values_list('price_list_id', flat=True).first()
+    match = get_price_book().resolve(
+        item_id, qty, unit_id, price_list_id=price_list_id, customer_id=customer_id, on=on,
+    )
+    if match:
+        return Response({
+            'price': str(match.price),
+            'unit': match.unit_id,
+            'price_list': match.name,
+            'source': match.source,
+        })
 
-    today = timezone.now().date()
-    filters = {
-        'item_id': item_id,
-        'price_list__is_active': True,
-    }
-    if unit_id:
-        filters['unit_id'] = unit_id
+    return Response({'price': None, 'message': 'No price found'})
 
-    # If register provided, try register's price list first
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def price_resolve(request):
+    """
+    Price a whole cart or order in one call.
+    Body: {lines: [{item, qty, unit}], register, customer, date} (all but lines optional)
+    Each line gets its price (customer catalog → register list → default
+    lists → item price), the source and the largest per-item discount rule;
+    the order gets the largest per-order discount rule.
+    """
+    from pos.models import POSRegister
+    from pricing.services import CENTS, get_price_book, resolve_prices
+
+    data = request.data
+    try:
+        lines = [
+            (int(line['item']), Decimal(str(line.get('qty', '1'))), _optional_int(line.get('unit')))
+            for line in data.get('lines') or []
+        ]
+        customer_id = _optional_int(data.get('customer'))
+        register_id = _optional_int(data.get('register'))
+        on = _query_date(data.get('date'))
+    except (KeyError, TypeError, ValueError, ArithmeticError, AttributeError):
+        return Response({'error': 'Invalid lines, register, customer or date.'}, status=400)
+
+    price_list_id = None
     if register_id:
-        try:
-            reg = POSRegister.objects.get(pk=register_id)
-            if reg.price_list_id:
-                reg_prices = PriceListItem.objects.filter(
-                    price_list=reg.price_list, item_id=item_id,
-                ).filter(
-                    models_q_date_range(today)
-                ).order_by('-min_qty')
-                for p in reg_prices:
-                    if float(qty) >= float(p.min_qty):
-                        return Response({
-                            'price': str(p.price),
-                            'unit': p.unit_id,
-                            'price_list': p.price_list.name,
-                        })
-        except POSRegister.DoesNotExist:
-            pass
-
-    # Fall back to default price list
-    from django.db.models import Q
-    qs = PriceListItem.objects.filter(**filters).filter(
-        Q(start_date__isnull=True) | Q(start_date__lte=today),
-        Q(end_date__isnull=True) | Q(end_date__gte=today),
-        price_list__is_active=True,
-    ).select_related('price_list').order_by('price_list__is_default', '-min_qty')
-
-    for p in qs:
-        if float(qty) >= float(p.min_qty):
-            return Response({
-                'price': str(p.price),
-                'unit': p.unit_id,
-                'price_list': p.price_list.name,
-            })
+        price_list_id = POSRegister.objects.filter(pk=register_id).values_list('price_list_id', flat=True).first()
+    book = get_price_book()
+    results = []
+    subtotal = Decimal('0')
+    for (item_id, qty, _), match in zip(lines, resolve_prices(lines, price_list_id, customer_id, on)):
+        if match is None:
+            results.append({'item': item_id, 'qty': str(qty), 'price': None})
+            continue
+        amount = (qty * match.price).quantize(CENTS)
+        discount = book.line_discount(amount, qty)
+        subtotal += amount - discount
+        results.append({
+            'item': item_id, 'qty': str(qty), 'unit': match.unit_id, 'price': str(match.price),
+            'source': match.source, 'price_list': match.name,
+            'amount': str(amount), 'discount': str(discount),
+        })
+    return Response({
+        'lines': results,
+        'subtotal': str(subtotal),
+        'order_discount': str(book.order_discount(subtotal)),
+    })
 
-    return Response({'price': None, 'message': 'No price found'})
 
+def _optional_int(value):
+    return int(value) if value not in (None, '') else None
 
-def models_q_date_range(today):
-    from django.db.models import Q
-    return (
-        Q(start_date__isnull=True) | Q(start_date__lte=today)
-    ) & (
-        Q(end_date__isnull=True) | Q(end_date__gte=today)
-    )
+
+def _query_date(value):
+    """A YYYY-MM-DD parameter as a date, or None (today)."""
+    return timezone.datetime.strptime(value, '%Y-%m-%d').date() if value else None
 
 
 # ── Template Views ─────────────────────────────────────────────────────────
@@ -264,7 +292,10 @@ def customer_catalog_api(request, customer_pk):
     Response:
       { customer_id, has_catalog, items: [{item_id, unit_id, price, item_code, item_name, unit_abbr}] }
     """
+    from catalog.models import Item, Unit
     from partners.models import Customer
+    from pricing.services import get_price_book
+
     customer = get_object_or_404(Customer, pk=customer_pk)
     order_date = request.query_params.get('order_date')
     if order_date:
@@ -274,42 +305,33 @@ def customer_catalog_api(request, customer_pk):
             return Response({'error': 'Invalid order_date. Use YYYY-MM-DD.'}, status=400)
     else:
         effective_date = timezone.now().date()
-    catalogs = (
-        CustomerPriceCatalog.objects
-        .filter(
-            customer=customer,
-            is_active=True,
-        )
-        .filter(
-            Q(start_date__isnull=True) | Q(start_date__lte=effective_date),
-            Q(end_date__isnull=True) | Q(end_date__gte=effective_date),
-        )
-        .prefetch_related('items__item', 'items__unit')
-        .order_by('start_date', 'name')
-    )
-    items = []
-    seen = set()
-    for cat in catalogs:
-        for ci in cat.items.select_related('item', 'unit').all():
-            key = (ci.item_id, ci.unit_id)
-            if key in seen:
-                continue
-            seen.add(key)
-            items.append({
-                'item_id': ci.item_id,
-                'unit_id': ci.unit_id,
-                'price': str(ci.price),
-                'item_code': ci.item.code,
-                'item_name': ci.item.name,
-                'unit_abbr': ci.unit.abbreviation,
-                'catalog_name': cat.name,
-            })
+
+    # Earlier catalogs win for an item/unit listed in several.
+    entries = {}
+    for cat in get_price_book().customer_catalogs(customer.pk, effective_date):
+        for key, price in cat.prices.items():
+            entries.setdefault(key, (price, cat.name))
+    items = Item.all_objects.in_bulk({item_id for item_id, _ in entries})
+    units = Unit.objects.in_bulk({unit_id for _, unit_id in entries})
+    rows = []
+    for (item_id, unit_id), (price, catalog_name) in entries.items():
+        item, unit = items.get(item_id), units.get(unit_id)
+        rows.append({
+            'item_id': item_id,
+            'unit_id': unit_id,
+            'price': str(price),
+            'item_code': item.code if item else '',
+            'item_name': item.name if item else '',
+            'unit_abbr': unit.abbreviation if unit else '',
+            'catalog_name': catalog_name,
+        })
+    rows.sort(key=lambda row: row['item_code'])
     return Response({
         'customer_id': customer.pk,
         'customer_name': customer.name,
         'effective_date': effective_date.isoformat(),
-        'has_catalog': len(items) > 0,
-        'items': items,
+        'has_catalog': len(rows) > 0,
+        'items': rows,
     })
 
 
@@ -0,0 +1,195 @@
+"""
+Stock aging, computed set-based.
+
+Two modes:
+
+* ``first`` (default) — each positive balance is aged from the first posted
+  RECEIVE / RETURN_IN into its item/location.  The dates come from one
+  ``MIN(posted_at)`` query grouped by item/location, read next to the
+  balances (a correlated subquery per balance is far slower on SQLite).
+* ``fifo`` — the quantity on hand is assumed to be the most recent receipts
+  (first in, first out), so it is split into receipt layers and each layer
+  is aged from its own receipt.  Balances are read in one query and receipt
+  moves are streamed in a second one.  Quantity not covered by any receipt
+  (opening stock, adjustments, transfers) is aged from the oldest receipt,
+  or 0 days when there is none — the same rule as the ``first`` mode.
+
+Rows are plain dicts read with values(), so 50k balances stay in the
+low seconds; exports stream them.
+"""
+from decimal import Decimal
+from itertools import groupby
+
+from django.db.models import Min
+from django.utils import timezone
+
+from inventory.models import MoveType, StockBalance, StockMove
+
+RECEIPT_TYPES = [MoveType.RECEIVE, MoveType.RETURN_IN]
+
+# (max age in days, label, sort order); the last bucket is open-ended.
+BUCKETS = [
+    (30, '0-30 days', 1),
+    (60, '31-60 days', 2),
+    (90, '61-90 days', 3),
+    (180, '91-180 days', 4),
+    (None, '180+ days', 5),
+]
+
+MODES = ('first', 'fifo')
+
+COLUMNS = [
+    ('item_code', 'Item Code'),
+    ('item_name', 'Item Name'),
+    ('warehouse', 'Warehouse'),
+    ('location', 'Location'),
+    ('qty', 'Qty'),
+    ('cost_price', 'Cost Price'),
+    ('value', 'Value'),
+    ('age_days', 'Age (days)'),
+    ('bucket', 'Bucket'),
+]
+
+
+def bucket_for(age_days):
+    """(label, sort order) of the aging bucket for *age_days*."""
+    for limit, label, order in BUCKETS:
+        if limit is None or age_days <= limit:
+            return label, order
+
+
+def _receipts():
+    return StockMove.objects.filter(move_type__in=RECEIPT_TYPES, status='POSTED')
+
+
+def _balances(warehouse_id):
+    balances = StockBalance.objects.filter(qty_on_hand__gt=0)
+    if warehouse_id:
+        balances = balances.filter(location__warehouse_id=warehouse_id)
+    return balances
+
+
+def _oldest_first(row):
+    return (-row['bucket_order'], -row['age_days'], row['item_code'], row['location'])
+
+
+def _row(balance, qty, age_days):
+    cost = balance['item__cost_price'] or Decimal('0')
+    bucket, bucket_order = bucket_for(age_days)
+    return {
+        'item_code': balance['item__code'],
+        'item_name': balance['item__name'],
+        'warehouse': balance['location__warehouse__name'],
+        'location': balance['location__code'],
+        'qty': qty,
+        'cost_price': cost,
+        'value': float(qty * cost),
+        'age_days': age_days,
+        'bucket': bucket,
+        'bucket_order': bucket_order,
+    }
+
+
+BALANCE_FIELDS = (
+    'item_id', 'location_id', 'qty_on_hand',
+    'item__code', 'item__name', 'item__cost_price',
+    'location__code', 'location__warehouse__name',
+)
+
+
+def first_receipt_rows(warehouse_id=None, today=None):
+    """One row per positive balance, aged from its first receipt; oldest first."""
+    today = today or timezone.now().date()
+    receipts = _receipts().filter(to_location__isnull=False)
+    if warehouse_id:
+        receipts = receipts.filter(to_location__warehouse_id=warehouse_id)
+    first_receipts = {
+        (item_id, location_id): first
+        for item_id, location_id, first in (
+            receipts.order_by().values('item_id', 'to_location_id')
+            .annotate(first=Min('posted_at'))
+            .values_list('item_id', 'to_location_id', 'first')
+            .iterator(chunk_size=5000)
+        )
+    }
+    rows = []
+    for balance in _balances(warehouse_id).values(*BALANCE_FIELDS).iterator(chunk_size=5000):
+        first = first_receipts.get((balance['item_id'], balance['location_id']))
+        age_days = (today - first.date()).days if first else 0
+        rows.append(_row(balance, balance['qty_on_hand'], age_days))
+    rows.sort(key=_oldest_first)
+    return rows
+
+
+def fifo_rows(warehouse_id=None, today=None):
+    """
+    Rows per balance and aging bucket, splitting the quantity on hand into
+    FIFO receipt layers.  Sorted oldest bucket first.
+    """
+    today = today or timezone.now().date()
+    balances = {
+        (b['item_id'], b['location_id']): b
+        for b in _balances(warehouse_id).values(*BALANCE_FIELDS).iterator(chunk_size=2000)
+    }
+    receipts = _receipts().filter(to_location__isnull=False)
+    if warehouse_id:
+        receipts = receipts.filter(to_location__warehouse_id=warehouse_id)
+    receipts = receipts.order_by('item_id', 'to_location_id', '-posted_at', '-id').values_list(
+        'item_id', 'to_location_id', 'qty', 'posted_at',
+    )
+
+    rows = []
+    covered = set()
+    for key, moves in groupby(receipts.iterator(chunk_size=5000), key=lambda m: (m[0], m[1])):
+        balance = balances.get(key)
+        if balance is None:
+            continue
+        covered.add(key)
+        rows.extend(_layer_rows(balance, moves, today))
+    for key, balance in balances.items():
+        if key not in covered:
+            rows.append(_row(balance, balance['qty_on_hand'], 0))
+
+    rows.sort(key=_oldest_first)
+    return rows
+
+
+def _layer_rows(balance, moves, today):
+    """Consume *balance*'s quantity newest receipt first; one row per bucket reached."""
+    remaining = balance['qty_on_hand']
+    by_bucket = {}
+    age_days = 0
+    for _, _, qty, posted_at in moves:
+        if remaining <= 0:
+            break
+        age_days = (today - posted_at.date()).days if posted_at else 0
+        take = min(qty, remaining)
+        remaining -= take
+        _add_layer(by_bucket, age_days, take)
+    if remaining > 0:
+        # Not explained by receipts: age it like the oldest receipt seen.
+        _add_layer(by_bucket, age_days, remaining)
+    return [_row(balance, qty, age) for age, qty in by_bucket.values()]
+
+
+def _add_layer(by_bucket, age_days, qty):
+    label, _ = bucket_for(age_days)
+    oldest, total = by_bucket.get(label, (age_days, Decimal('0')))
+    by_bucket[label] = (max(oldest, age_days), total + qty)
+
+
+def aging_rows(mode='first', warehouse_id=None, today=None):
+    if mode == 'fifo':
+        return fifo_rows(warehouse_id, today)
+    return first_receipt_rows(warehouse_id, today)
+
+
+def bucket_summary(rows):
+    """{bucket: {'count', 'qty', 'value'}} in the order buckets first appear in *rows*."""
+    summary = {}
+    for row in rows:
+        data = summary.setdefault(row['bucket'], {'count': 0, 'qty': Decimal('0'), 'value': 0.0})
+        data['count'] += 1
+        data['qty'] += row['qty']
+        data['value'] += row['value']
+    return summary
@@ -0,0 +1,386 @@
+"""
+reports/facts.py — Daily sales facts.
+
+DailySalesFact rows pre-aggregate posted sales per day, source, channel and
+item, so the sales and profit margin reports are plain GROUP BY queries
+whose cost depends on the date range, not on the number of transactions.
+
+Sources (as the reports count them):
+  POS      POSTED / PAID sales, by local date of created_at.  Items: line
+           qty, line_total and discount_amount; documents: grand_total,
+           discount_total and tax_total.
+  SO       APPROVED / POSTED sales orders, by order_date and sales channel.
+           Items: line totals after line discounts, and bundle items at
+           price × min_qty × qty_multiplier; documents add each bundle's
+           bundle_total.  A bundle's COGS is split across its items in
+           proportion to their current cost.
+  SERVICE  COMPLETED services, by completion (else service) date.  Items:
+           qty × unit_price; documents: the invoice grand total.
+
+Item COGS is the lines' line_cogs snapshot, or the current cost for lines
+posted before it (core.cogs.line_cogs_by).
+
+refresh_sales_facts() rebuilds only the days holding a document saved since
+the previous refresh (ReportSyncState watermark), or an unstamped line of
+an item saved since; with nothing changed it is a handful of read-only
+queries and writes nothing.  Posting and cancelling a document saves it,
+so the reports — which refresh before reading — always see it.  The first
+refresh, and ``full=True``, rebuild all history; the reports leave that to
+the refresh_sales_facts command or background job (sales_facts_built()) and
+meanwhile rebuild just the days they show (build_sales_facts_between()).
+Hard-deleted documents, the old day of a document moved to another day,
+and unit conversion edits are only picked up by a full rebuild.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from core.cogs import bundle_cogs, line_cogs_by
+from reports.models import DailySalesFact, ReportSyncState, SalesSource
+
+SALES_FACTS_SYNC = 'daily_sales_facts'
+
+# Documents saved by transactions that were still open when the previous
+# refresh read its watermark carry an updated_at slightly before it.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+MONEY = DecimalField(max_digits=20, decimal_places=4)
+ZERO = Decimal('0')
+
+
+def so_line_discount():
+    """SalesOrderLine.discount_amount as a SQL expression."""
+    from sales.models import SalesOrderLineDiscountType
+
+    return Case(
+        When(discount_type=SalesOrderLineDiscountType.AMOUNT, then=F('discount_value')),
+        default=F('qty_ordered') * F('unit_price') * F('discount_value') / Decimal('100'),
+        output_field=MONEY,
+    )
+
+
+def so_line_total():
+    """SalesOrderLine.line_total as a SQL expression, for grouped revenue sums."""
+    return F('qty_ordered') * F('unit_price') - so_line_discount()
+
+
+def _day_ranges(days):
+    """Merge dates into contiguous (first, last) ranges."""
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return ranges
+
+
+def _date_q(field, ranges):
+    q = Q(pk__in=[])
+    for start, end in ranges:
+        q |= Q(**{f'{field}__range': (start, end)})
+    return q
+
+
+def _local_datetime_q(field, ranges):
+    # POS sales are dated by the local date of created_at.
+    q = Q(pk__in=[])
+    for start, end in ranges:
+        q |= Q(**{
+            f'{field}__gte': timezone.make_aware(datetime.combine(start, time.min)),
+            f'{field}__lt': timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        })
+    return q
+
+
+class _Facts:
+    """Fact rows of one source keyed by (date, channel, item); item None is the document row."""
+
+    def __init__(self, source):
+        self.source = source
+        self.rows = defaultdict(lambda: {
+            'qty': ZERO, 'revenue': ZERO, 'cogs': ZERO, 'discount': ZERO, 'tax': ZERO, 'count': 0,
+        })
+
+    def add(self, day, channel, item_id, **values):
+        row = self.rows[(day, channel, item_id)]
+        for field, value in values.items():
+            row[field] += value or 0
+
+    def objects(self):
+        """DailySalesFact rows; document rows keep the revenue and discount items do not account for."""
+        attributed = defaultdict(lambda: [ZERO, ZERO])
+        for (day, channel, item_id), row in self.rows.items():
+            if item_id is not None:
+                attributed[(day, channel)][0] += row['revenue']
+                attributed[(day, channel)][1] += row['discount']
+        facts = []
+        for (day, channel, item_id), row in self.rows.items():
+            if item_id is None:
+                revenue, discount = attributed[(day, channel)]
+                row = {**row, 'revenue': row['revenue'] - revenue, 'discount': row['discount'] - discount}
+            facts.append(DailySalesFact(
+                date=day, source=self.source, channel_id=channel, item_id=item_id, **row,
+            ))
+        return facts
+
+
+def _pos_facts(ranges):
+    from pos.models import POSSale, POSSaleLine, SaleStatus
+
+    facts = _Facts(SalesSource.POS)
+    sales = POSSale.objects.filter(status__in=[SaleStatus.POSTED, SaleStatus.PAID])
+    if ranges is not None:
+        sales = sales.filter(_local_datetime_q('created_at', ranges))
+    for day, channel, revenue, discount, tax, count in (
+        sales.annotate(day=TruncDate('created_at')).order_by()
+        .values('day', 'channel_id')
+        .annotate(
+            total_revenue=Sum('grand_total'), total_discount=Sum('discount_total'),
+            total_tax=Sum('tax_total'), documents=Count('pk'),
+        )
+        .values_list('day', 'channel_id', 'total_revenue', 'total_discount', 'total_tax', 'documents')
+    ):
+        facts.add(day, channel, None, revenue=revenue, discount=discount, tax=tax, count=count)
+
+    lines = POSSaleLine.objects.filter(sale__in=sales.values('pk')).annotate(
+        day=TruncDate('sale__created_at'), channel=F('sale__channel'),
+    )
+    key = ('day', 'channel', 'item_id')
+    for day, channel, item_id, qty, revenue, discount, count in (
+        lines.order_by().values(*key)
+        .annotate(
+            total_qty=Sum('qty'), total_revenue=Sum('line_total'),
+            total_discount=Sum('discount_amount'), lines=Count('pk'),
+        )
+        .values_list(*key, 'total_qty', 'total_revenue', 'total_discount', 'lines')
+    ):
+        facts.add(day, channel, item_id, qty=qty, revenue=revenue, discount=discount, count=count)
+    for (day, channel, item_id), cogs in line_cogs_by(lines, key).items():
+        facts.add(day, channel, item_id, cogs=cogs)
+    return facts
+
+
+def _sales_order_facts(ranges):
+    from core.models import DocumentStatus
+    from sales.models import SalesOrder, SalesOrderLine, SalesOrderPriceListLine
+
+    facts = _Facts(SalesSource.SALES_ORDER)
+    orders = SalesOrder.objects.filter(status__in=[DocumentStatus.APPROVED, DocumentStatus.POSTED])
+    if ranges is not None:
+        orders = orders.filter(_date_q('order_date', ranges))
+    for day, channel, count in (
+        orders.order_by().values('order_date', 'sales_channel_id')
+        .annotate(documents=Count('pk'))
+        .values_list('order_date', 'sales_channel_id', 'documents')
+    ):
+        facts.add(day, channel, None, count=count)
+
+    lines = SalesOrderLine.objects.filter(sales_order__in=orders.values('pk')).annotate(
+        day=F('sales_order__order_date'), channel=F('sales_order__sales_channel'),
+    )
+    key = ('day', 'channel', 'item_id')
+    for day, channel, item_id, qty, revenue, discount, count in (
+        lines.order_by().values(*key)
+        .annotate(
+            total_qty=Sum('qty_ordered'), total_revenue=Sum(so_line_total()),
+            total_discount=Sum(so_line_discount()), lines=Count('pk'),
+        )
+        .values_list(*key, 'total_qty', 'total_revenue', 'total_discount', 'lines')
+    ):
+        facts.add(day, channel, item_id, qty=qty, revenue=revenue, discount=discount, count=count)
+        facts.add(day, channel, None, revenue=revenue, discount=discount)
+    for (day, channel, item_id), cogs in line_cogs_by(lines, key, qty_field='qty_ordered').items():
+        facts.add(day, channel, item_id, cogs=cogs)
+
+    bundles = list(
+        SalesOrderPriceListLine.objects.filter(sales_order__in=orders.values('pk'))
+        .select_related('sales_order').prefetch_related('price_list__items__item')
+    )
+    costs = bundle_cogs(bundles)
+    for bundle in bundles:
+        day, channel = bundle.sales_order.order_date, bundle.sales_order.sales_channel_id
+        facts.add(day, channel, None, revenue=bundle.bundle_total, discount=bundle.bundle_discount_amount)
+        components = list(bundle.price_list.items.all())
+        weights = [(p.item.cost_price or ZERO) * p.min_qty for p in components]
+        weight_total = sum(weights, ZERO)
+        if not weight_total:
+            facts.add(day, channel, None, cogs=costs[bundle.pk])
+            weight_total = 1
+        for p, weight in zip(components, weights):
+            qty = p.min_qty * bundle.qty_multiplier
+            facts.add(
+                day, channel, p.item_id,
+                qty=qty, revenue=p.price * qty, cogs=costs[bundle.pk] * weight / weight_total,
+            )
+    return facts
+
+
+def _service_facts(ranges):
+    from services.models import CustomerService, ServiceLine, ServiceStatus
+
+    facts = _Facts(SalesSource.SERVICE)
+    services = CustomerService.objects.filter(status=ServiceStatus.COMPLETED).annotate(
+        day=Coalesce('completion_date', 'service_date'),
+    )
+    if ranges is not None:
+        services = services.filter(_date_q('day', ranges))
+    for day, revenue, count in (
+        services.order_by().values('day')
+        .annotate(
+            total_revenue=Sum('invoice__grand_total', filter=Q(invoice__is_void=False)),
+            documents=Count('pk'),
+        )
+        .values_list('day', 'total_revenue', 'documents')
+    ):
+        facts.add(day, None, None, revenue=revenue, count=count)
+
+    lines = ServiceLine.objects.filter(service__in=services.values('pk')).annotate(
+        day=Coalesce('service__completion_date', 'service__service_date'),
+    )
+    key = ('day', 'item_id')
+    for day, item_id, qty, revenue, count in (
+        lines.order_by().values(*key)
+        .annotate(
+            total_qty=Sum('qty'), total_revenue=Sum(F('qty') * F('unit_price'), output_field=MONEY),
+            lines=Count('pk'),
+        )
+        .values_list(*key, 'total_qty', 'total_revenue', 'lines')
+    ):
+        facts.add(day, None, item_id, qty=qty, revenue=revenue, count=count)
+    for (day, item_id), cogs in line_cogs_by(lines, key).items():
+        facts.add(day, None, item_id, cogs=cogs)
+    return facts
+
+
+BUILDERS = {
+    SalesSource.POS: _pos_facts,
+    SalesSource.SALES_ORDER: _sales_order_facts,
+    SalesSource.SERVICE: _service_facts,
+}
+
+
+def _touched_days(since):
+    """{source: days holding a document saved at or after *since*, or an unstamped line of an item saved since}."""
+    from catalog.models import Item
+    from core.models import Invoice
+    from pos.models import POSSale, POSSaleLine
+    from sales.models import SalesOrder, SalesOrderLine, SalesOrderPriceListLine
+    from services.models import CustomerService, ServiceLine
+
+    changed = Q(updated_at__gte=since)
+    unstamped = Q(line_cogs__isnull=True, item__in=Item.all_objects.filter(changed).values('pk'))
+
+    sales = POSSale.objects.filter(
+        changed | Q(pk__in=POSSaleLine.objects.filter(unstamped).values('sale_id'))
+    )
+    orders = SalesOrder.all_objects.filter(
+        changed
+        | Q(pk__in=SalesOrderLine.objects.filter(unstamped).values('sales_order_id'))
+        | Q(pk__in=SalesOrderPriceListLine.objects.filter(
+            line_cogs__isnull=True,
+            price_list__items__item__in=Item.all_objects.filter(changed).values('pk'),
+        ).values('sales_order_id'))
+    )
+    services = CustomerService.objects.filter(
+        changed
+        | Q(invoice__in=Invoice.objects.filter(changed).values('pk'))
+        | Q(pk__in=ServiceLine.objects.filter(unstamped).values('service_id'))
+    )
+    return {
+        SalesSource.POS: set(
+            sales.annotate(day=TruncDate('created_at')).order_by().values_list('day', flat=True).distinct()
+        ),
+        SalesSource.SALES_ORDER: set(orders.order_by().values_list('order_date', flat=True).distinct()),
+        SalesSource.SERVICE: set(
+            services.annotate(day=Coalesce('completion_date', 'service_date'))
+            .order_by().values_list('day', flat=True).distinct()
+        ),
+    }
+
+
+def sales_facts_built():
+    """Whether the facts have been built once, so incremental refreshes apply."""
+    return ReportSyncState.objects.filter(name=SALES_FACTS_SYNC, watermark__isnull=False).exists()
+
+
+def refresh_sales_facts(full=False):
+    """
+    Bring DailySalesFact up to date and return the number of fact rows written.
+
+    Incremental by default: each source's facts are rebuilt only for the
+    days touched since the previous refresh, and when no day was touched
+    nothing is locked or written.  ``full=True`` — and the first refresh —
+    rebuild every day from all history.
+    """
+    if not full:
+        watermark = (
+            ReportSyncState.objects.filter(name=SALES_FACTS_SYNC)
+            .values_list('watermark', flat=True).first()
+        )
+        if watermark is not None and not any(_touched_days(watermark - WATERMARK_OVERLAP).values()):
+            return 0
+    return _rebuild_sales_facts(full)
+
+
+@transaction.atomic
+def build_sales_facts_between(first, last):
+    """
+    Rebuild the facts of the days from *first* to *last* for a report read
+    before the first full build, and return the number of rows written.
+    The watermark stays unset, so the full build still runs; None when it
+    ran meanwhile and refresh_sales_facts() applies instead.
+    """
+    ReportSyncState.objects.get_or_create(name=SALES_FACTS_SYNC)
+    state = ReportSyncState.objects.select_for_update().get(name=SALES_FACTS_SYNC)
+    if state.watermark is not None:
+        return None
+
+    DailySalesFact.objects.filter(date__range=(first, last)).delete()
+    written = 0
+    for builder in BUILDERS.values():
+        facts = builder([(first, last)]).objects()
+        DailySalesFact.objects.bulk_create(facts, batch_size=1000)
+        written += len(facts)
+    return written
+
+
+@transaction.atomic
+def _rebuild_sales_facts(full):
+    started = timezone.now()
+    ReportSyncState.objects.get_or_create(name=SALES_FACTS_SYNC)
+    state = ReportSyncState.objects.select_for_update().get(name=SALES_FACTS_SYNC)
+    full = full or state.watermark is None
+
+    if full:
+        DailySalesFact.objects.all().delete()
+        touched = dict.fromkeys(BUILDERS)
+    else:
+        touched = _touched_days(state.watermark - WATERMARK_OVERLAP)
+        if not any(touched.values()):  # refreshed by a concurrent caller meanwhile
+            return 0
+
+    written = 0
+    for source, days in touched.items():
+        ranges = None
+        if days is not None:
+            if not days:
+                continue
+            DailySalesFact.objects.filter(source=source, date__in=days).delete()
+            ranges = _day_ranges(days)
+        facts = BUILDERS[source](ranges).objects()
+        DailySalesFact.objects.bulk_create(facts, batch_size=1000)
+        written += len(facts)
+
+    state.watermark = started
+    update_fields = ['watermark', 'updated_at']
+    if full:
+        state.last_full_sync_at = started
+        update_fields.append('last_full_sync_at')
+    state.save(update_fields=update_fields)
+    return written
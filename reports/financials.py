@@ -0,0 +1,218 @@
+"""
+reports/financials.py — Monthly financial statement rollups.
+
+The financial statement sums paid invoices (by paid_date), their COGS,
+expenses by category and the invoices' payments by method.  Completed months
+are closed into MonthlyFinancialSnapshot rows (close_month /
+close_financial_months, run by ``manage.py close_financial_months`` or the
+close_financial_months job), written once and never updated, so a statement
+over several years reads a few dozen rows.  Days not covered by a closed
+month — the open month, partial months at either end of the range and
+months nobody has closed yet — are computed live.
+
+Closing freezes a month the way an accounting period close does: invoices
+paid, voided or edited afterwards with a paid_date in that month, and
+expenses dated in it, no longer change the statement until the month is
+reopened (reopen_month / ``--reopen``) and closed again.
+
+Totals of a month are dicts::
+
+    {'revenue', 'so_revenue', 'pos_revenue', 'svc_revenue', 'discount',
+     'invoice_cogs': Decimal, 'invoice_count': int,
+     'expenses': {(category_id, category_name, is_cogs): amount},
+     'payments': {method: [amount, count]}}
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.cogs import bulk_invoice_cogs
+from reports.models import MonthlyExpenseTotal, MonthlyFinancialSnapshot, MonthlyPaymentTotal
+
+ZERO = Decimal('0')
+AMOUNT_FIELDS = ('revenue', 'so_revenue', 'pos_revenue', 'svc_revenue', 'discount', 'invoice_cogs')
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def paid_invoices(date_from=None, date_to=None):
+    """Invoices counted by the statement: paid and not void, by paid_date."""
+    from core.models import Invoice
+
+    qs = Invoice.objects.filter(is_paid=True, is_void=False, paid_date__isnull=False)
+    if date_from:
+        qs = qs.filter(paid_date__gte=date_from)
+    if date_to:
+        qs = qs.filter(paid_date__lte=date_to)
+    return qs
+
+
+def data_bounds():
+    """(first, last) paid_date / expense date on record, or (None, None)."""
+    from core.models import Expense
+
+    invoices = paid_invoices().aggregate(first=Min('paid_date'), last=Max('paid_date'))
+    expenses = Expense.objects.aggregate(first=Min('date'), last=Max('date'))
+    firsts = [d for d in (invoices['first'], expenses['first']) if d]
+    lasts = [d for d in (invoices['last'], expenses['last']) if d]
+    return (min(firsts) if firsts else None, max(lasts) if lasts else None)
+
+
+def empty_month():
+    totals = {field: ZERO for field in AMOUNT_FIELDS}
+    totals.update(invoice_count=0, expenses={}, payments={})
+    return totals
+
+
+def live_months(date_from, date_to):
+    """{month: totals} of the days from *date_from* to *date_to*, from the documents."""
+    from core.models import Expense, InvoicePayment
+
+    months = defaultdict(empty_month)
+    invoices = paid_invoices(date_from, date_to)
+
+    rows = invoices.annotate(month=TruncMonth('paid_date')).values('month').annotate(
+        revenue=Sum('grand_total'),
+        so_revenue=Sum('grand_total', filter=Q(sales_order__isnull=False)),
+        pos_revenue=Sum('grand_total', filter=Q(pos_sale__isnull=False)),
+        svc_revenue=Sum('grand_total', filter=Q(sales_order__isnull=True, pos_sale__isnull=True)),
+        discount=Sum('discount_total'),
+        invoice_count=Count('pk'),
+    ).order_by()
+    for row in rows:
+        totals = months[row.pop('month')]
+        for field, value in row.items():
+            totals[field] = value if value is not None else ZERO
+
+    paid = list(invoices.only('pk', 'pos_sale', 'sales_order', 'paid_date').order_by())
+    cogs_map = bulk_invoice_cogs(paid)
+    for inv in paid:
+        months[month_start(inv.paid_date)]['invoice_cogs'] += cogs_map[inv.pk]
+
+    expenses = Expense.objects.filter(date__gte=date_from, date__lte=date_to).annotate(
+        month=TruncMonth('date'),
+    ).values('month', 'category_id', 'category__name', 'category__is_cogs').annotate(
+        amount=Sum('amount'),
+    ).order_by()
+    for row in expenses:
+        key = (row['category_id'], row['category__name'], row['category__is_cogs'])
+        months[row['month']]['expenses'][key] = row['amount']
+
+    payments = InvoicePayment.objects.filter(invoice__in=invoices).annotate(
+        month=TruncMonth('invoice__paid_date'),
+    ).values('month', 'method').annotate(amount=Sum('amount'), count=Count('pk')).order_by()
+    for row in payments:
+        months[row['month']]['payments'][row['method']] = [row['amount'], row['count']]
+
+    return dict(months)
+
+
+def snapshot_totals(snapshot):
+    """Totals of a closed month; expects expenses and payments prefetched."""
+    totals = {field: getattr(snapshot, field) for field in AMOUNT_FIELDS}
+    totals['invoice_count'] = snapshot.invoice_count
+    totals['expenses'] = {
+        (row.category_id, row.category_name, row.is_cogs): row.amount for row in snapshot.expenses.all()
+    }
+    totals['payments'] = {row.method: [row.amount, row.count] for row in snapshot.payments.all()}
+    return totals
+
+
+def statement_months(date_from, date_to):
+    """
+    {month: totals} for the days from *date_from* to *date_to*, oldest first:
+    closed months wholly inside the range from their snapshots, the other
+    days computed live.
+    """
+    first_whole = date_from if date_from.day == 1 else next_month(date_from)
+    snapshots = [
+        snapshot for snapshot in MonthlyFinancialSnapshot.objects.filter(
+            month__gte=first_whole, month__lte=date_to,
+        ).prefetch_related('expenses', 'payments').order_by('month')
+        if next_month(snapshot.month) - timedelta(days=1) <= date_to
+    ]
+
+    months = {snapshot.month: snapshot_totals(snapshot) for snapshot in snapshots}
+    # Live days come in runs between closed months; a month is in one run at most.
+    start = date_from
+    for month in [snapshot.month for snapshot in snapshots] + [None]:
+        end = month - timedelta(days=1) if month else date_to
+        if start <= end:
+            months.update(live_months(start, end))
+        if month:
+            start = next_month(month)
+    return dict(sorted(months.items()))
+
+
+@transaction.atomic
+def close_month(month):
+    """
+    Close the month containing *month* into a snapshot; returns
+    (snapshot, created).  A closed month is returned as is.  Raises
+    ValueError for a month that is not over yet.
+    """
+    month = month_start(month)
+    if next_month(month) > timezone.localdate():
+        raise ValueError(f'{month:%b %Y} is not over yet.')
+    existing = MonthlyFinancialSnapshot.objects.filter(month=month).first()
+    if existing:
+        return existing, False
+
+    totals = live_months(month, next_month(month) - timedelta(days=1)).get(month) or empty_month()
+    snapshot = MonthlyFinancialSnapshot.objects.create(
+        month=month, invoice_count=totals['invoice_count'],
+        **{field: totals[field] for field in AMOUNT_FIELDS},
+    )
+    MonthlyExpenseTotal.objects.bulk_create([
+        MonthlyExpenseTotal(
+            snapshot=snapshot, category_id=category_id, category_name=name,
+            is_cogs=is_cogs, amount=amount,
+        )
+        for (category_id, name, is_cogs), amount in totals['expenses'].items()
+    ])
+    MonthlyPaymentTotal.objects.bulk_create([
+        MonthlyPaymentTotal(snapshot=snapshot, method=method, amount=amount, count=count)
+        for method, (amount, count) in totals['payments'].items()
+    ])
+    return snapshot, True
+
+
+def close_financial_months(until=None):
+    """
+    Close every completed month from the first one with data up to *until*
+    (default: last month) that is not closed yet; returns the new snapshots.
+    """
+    last = month_start(month_start(timezone.localdate()) - timedelta(days=1))
+    if until:
+        last = min(last, month_start(until))
+    first, _ = data_bounds()
+    if first is None:
+        return []
+
+    closed = set(MonthlyFinancialSnapshot.objects.filter(
+        month__gte=month_start(first), month__lte=last,
+    ).values_list('month', flat=True))
+    created = []
+    month = month_start(first)
+    while month <= last:
+        if month not in closed:
+            created.append(close_month(month)[0])
+        month = next_month(month)
+    return created
+
+
+def reopen_month(month):
+    """Drop the snapshot of the month containing *month*; returns whether one existed."""
+    deleted, _ = MonthlyFinancialSnapshot.objects.filter(month=month_start(month)).delete()
+    return bool(deleted)
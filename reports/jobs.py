@@ -0,0 +1,12 @@
+"""Background job handlers for the reports app (see core.jobs)."""
+from core.jobs import register, run_command
+
+
+@register('refresh_sales_facts', label='Sales facts refresh')
+def refresh_sales_facts_job(job, ctx, **options):
+    return run_command(ctx, 'refresh_sales_facts', **options)
+
+
+@register('close_financial_months', label='Financial month close')
+def close_financial_months_job(job, ctx, **options):
+    return run_command(ctx, 'close_financial_months', **options)
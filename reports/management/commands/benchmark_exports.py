@@ -0,0 +1,122 @@
+"""
+Management command: benchmark_exports
+
+Measures the memory of the streaming report exports (reports.exports) by
+exporting generated expenses through the expense report's ?export=csv|xlsx,
+at a tenth of --rows and at --rows, next to an in-memory openpyxl workbook
+of the same rows (how exports used to be built).  Peak memory is traced
+Python allocations while the response body is produced and consumed.  Runs
+inside a transaction that is always rolled back.
+
+Usage:
+  python manage.py benchmark_exports
+  python manage.py benchmark_exports --rows 50000
+"""
+import io
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+BULK_BATCH = 5000
+
+
+class Command(BaseCommand):
+    help = 'Benchmark peak memory of streaming CSV / XLSX exports against an in-memory workbook.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=200000,
+            help='Expense rows exported in the large phase (default: 200000).',
+        )
+
+    def handle(self, *args, **options):
+        n_rows = options['rows']
+        if n_rows < 10:
+            raise CommandError('--rows must be at least 10.')
+
+        results = []
+        with transaction.atomic():
+            user, category = self._setup()
+            self.category = category
+            created = 0
+            for size in (n_rows // 10, n_rows):
+                self._expenses(user, category, created, size)
+                created = size
+                for label, export in (('csv', self._csv), ('xlsx', self._xlsx), ('workbook', self._workbook)):
+                    results.append((size, label, *self._measure(export, user)))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"rows":>8} {"export":>9} {"seconds":>8} {"peak MB":>8} {"size MB":>8}')
+        for size, label, seconds, peak, length in results:
+            self.stdout.write(f'{size:>8} {label:>9} {seconds:>8.1f} {peak / 2**20:>8.1f} {length / 2**20:>8.1f}')
+        self.stdout.write(self.style.SUCCESS('Done. All benchmark data was rolled back.'))
+
+    def _setup(self):
+        from accounts.models import User
+        from core.models import ExpenseCategory
+
+        user = User.objects.create_user(username='__export_benchmark__', password=None)
+        category = ExpenseCategory.objects.create(code='__XBENCH__', name='Export benchmark')
+        return user, category
+
+    def _expenses(self, user, category, start, stop):
+        from core.models import Expense
+
+        first = date(2020, 1, 1)
+        for offset in range(start, stop, BULK_BATCH):
+            Expense.objects.bulk_create([
+                Expense(
+                    date=first + timedelta(days=i % 1500), category=category, amount=Decimal(i % 997) + Decimal('0.25'),
+                    item_description=f'Benchmark expense {i}', vendor=f'Vendor {i % 300}',
+                    reference_no=f'XB-{i:07d}', created_by=user,
+                )
+                for i in range(offset, min(offset + BULK_BATCH, stop))
+            ])
+
+    def _request(self, user, export):
+        # Only the generated expenses are exported.
+        request = RequestFactory().get('/reports/expenses/', {
+            'date_from': '', 'date_to': '', 'category': self.category.pk, 'export': export,
+        })
+        request.user = user
+        return request
+
+    def _csv(self, user):
+        from reports.views import expense_report_view
+
+        return sum(len(chunk) for chunk in expense_report_view(self._request(user, 'csv')).streaming_content)
+
+    def _xlsx(self, user):
+        from reports.views import expense_report_view
+
+        return sum(len(chunk) for chunk in expense_report_view(self._request(user, 'xlsx')).streaming_content)
+
+    def _workbook(self, user):
+        import openpyxl
+
+        from core.models import Expense
+        from reports.views import EXPENSE_COLUMNS, _expense_rows
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append([header for _, header in EXPENSE_COLUMNS])
+        for row in _expense_rows(Expense.objects.filter(category=self.category)):
+            ws.append([float(v) if isinstance(v, Decimal) else v for v in (row[key] for key, _ in EXPENSE_COLUMNS)])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer.tell()
+
+    def _measure(self, export, user):
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            length = export(user)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return time.perf_counter() - started, peak, length
@@ -0,0 +1,171 @@
+import math
+import time
+from io import StringIO
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+BULK_BATCH = 2000
+# Sales are spread over this many days, ending today.
+DAYS = 90
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the profit margin report over a quarter of generated POS and sales '
+        'order lines, before and after their COGS snapshot is backfilled: a full daily '
+        'sales fact rebuild, then report requests for the quarter over current facts. '
+        'Runs against throwaway fixtures inside a transaction that is always rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=int,
+            default=100000,
+            help='Sale lines to generate, 4/5 POS and 1/5 sales order (default: 100000).',
+        )
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=500,
+            help='Distinct items the lines are spread over (default: 500).',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=5,
+            help='Report requests per phase (default: 5).',
+        )
+
+    def handle(self, *args, **options):
+        n_lines, n_items, iterations = options['lines'], options['items'], options['iterations']
+        if n_lines < 10 or n_items < 1 or iterations < 1:
+            raise CommandError('--lines must be at least 10; --items and --iterations must be positive.')
+
+        results = []
+        with transaction.atomic():
+            user = self._fixtures(n_lines, n_items)
+            results.append(('unstamped', *self._run(user, iterations)))
+            call_command('backfill_line_costs', stdout=StringIO())
+            results.append(('stamped', *self._run(user, iterations)))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{n_lines} lines over {n_items} items')
+        self.stdout.write(f'{"phase":>10} {"rebuild ms":>11} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8}')
+        for phase, rebuild, p50, p95, queries in results:
+            self.stdout.write(f'{phase:>10} {rebuild:>11.1f} {p50:>9.1f} {p95:>9.1f} {queries:>8}')
+        self.stdout.write(self.style.SUCCESS('Done. All benchmark data was rolled back.'))
+
+    def _fixtures(self, n_lines, n_items):
+        from accounts.models import User
+        from catalog.models import Category, Item, Unit
+        from core.models import DocumentStatus
+        from partners.models import Customer
+        from pos.models import POSRegister, POSSale, POSSaleLine, POSShift, SaleStatus, ShiftStatus
+        from sales.models import SalesOrder, SalesOrderLine
+        from warehouses.models import Location, Warehouse
+
+        user = User.objects.create_user(username='__margin_benchmark__', password=None)
+        category = Category.objects.create(code='__MBENCH__', name='Margin benchmark')
+        unit = Unit.objects.create(name='__mbench_pcs__', abbreviation='__mbpcs__')
+        warehouse = Warehouse.objects.create(code='__MBENCH__', name='Margin benchmark')
+        location = Location.objects.create(warehouse=warehouse, code='__MBENCH__', name='Margin benchmark')
+        customer = Customer.objects.create(code='__MBENCH__', name='Margin benchmark')
+        items = Item.objects.bulk_create([
+            Item(
+                code=f'__MBENCH-{i:05d}__', name=f'Benchmark item {i}', item_type='FINISHED',
+                category=category, default_unit=unit,
+                cost_price=Decimal(5 + i % 7), selling_price=Decimal(12 + i % 7),
+            )
+            for i in range(n_items)
+        ])
+        register = POSRegister.objects.create(
+            name='__mbench__', warehouse=warehouse, default_location=location,
+        )
+        shift = POSShift.objects.create(
+            register=register, opened_by=user, opened_at=user.date_joined,
+            opening_cash=Decimal('0'), status=ShiftStatus.OPEN,
+        )
+
+        per_doc = 10
+        n_so_lines = n_lines // 5
+        n_pos_lines = n_lines - n_so_lines
+        sales = POSSale.objects.bulk_create([
+            POSSale(
+                sale_no=f'__MBENCH-{i:07d}__', register=register, shift=shift,
+                warehouse=warehouse, location=location, status=SaleStatus.POSTED,
+                created_by=user,
+            )
+            for i in range(math.ceil(n_pos_lines / per_doc))
+        ], batch_size=BULK_BATCH)
+        POSSaleLine.objects.bulk_create([
+            POSSaleLine(
+                sale=sales[i // per_doc], item=items[i % n_items], unit=unit,
+                qty=Decimal(1 + i % 3), unit_price=Decimal('15'), line_total=Decimal(15 * (1 + i % 3)),
+            )
+            for i in range(n_pos_lines)
+        ], batch_size=BULK_BATCH)
+
+        orders = SalesOrder.objects.bulk_create([
+            SalesOrder(
+                document_number=f'__MBENCH-SO-{i:07d}__', customer=customer, warehouse=warehouse,
+                order_date=date.today() - timedelta(days=i % DAYS), status=DocumentStatus.APPROVED,
+                created_by=user,
+            )
+            for i in range(math.ceil(n_so_lines / per_doc))
+        ], batch_size=BULK_BATCH)
+        SalesOrderLine.objects.bulk_create([
+            SalesOrderLine(
+                sales_order=orders[i // per_doc], item=items[i % n_items], unit=unit,
+                qty_ordered=Decimal(1 + i % 4), unit_price=Decimal('14'),
+                discount_type='AMOUNT', discount_value=Decimal('1'),
+            )
+            for i in range(n_so_lines)
+        ], batch_size=BULK_BATCH)
+
+        # Date the sales over the quarter, and make everything look saved
+        # before the last fact refresh, as history would be.
+        earlier = timezone.now() - timedelta(days=1)
+        for day in range(DAYS):
+            POSSale.objects.filter(pk__in=[s.pk for s in sales[day::DAYS]]).update(
+                created_at=earlier - timedelta(days=day), updated_at=earlier,
+            )
+        SalesOrder.all_objects.filter(pk__in=[o.pk for o in orders]).update(updated_at=earlier)
+        Item.all_objects.filter(pk__in=[i.pk for i in items]).update(updated_at=earlier)
+        return user
+
+    def _run(self, user, iterations):
+        from reports.facts import refresh_sales_facts
+        from reports.views import profit_margin_view
+
+        start = time.perf_counter()
+        refresh_sales_facts(full=True)
+        rebuild = (time.perf_counter() - start) * 1000
+
+        factory = RequestFactory()
+        timings = []
+        queries = 0
+        for _ in range(iterations):
+            request = factory.get('/reports/profit-margin/', {
+                'date_from': (date.today() - timedelta(days=DAYS)).isoformat(),
+                'date_to': date.today().isoformat(),
+            })
+            request.user = user
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = profit_margin_view(request)
+                timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'Profit margin report returned {response.status_code}.')
+            queries = len(ctx.captured_queries)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[max(0, math.ceil(0.95 * len(timings)) - 1)]
+        return rebuild, p50, p95, queries
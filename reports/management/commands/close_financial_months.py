@@ -0,0 +1,56 @@
+"""
+Management command: close_financial_months
+
+Closes completed months into MonthlyFinancialSnapshot rows for the financial
+statement (reports.financials).  Every month from the first paid invoice or
+expense up to last month that is not closed yet is closed; closed months are
+never recomputed.  Run it after month end (cron, or the close_financial_months
+job via ``run_jobs --enqueue``).  To restate a closed month after late
+corrections, reopen it and run the command again.
+
+Usage:
+  python manage.py close_financial_months
+  python manage.py close_financial_months --until 2025-06
+  python manage.py close_financial_months --reopen 2025-06
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.financials import close_financial_months, reopen_month
+
+
+def _month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Invalid month "{value}", expected YYYY-MM.')
+
+
+class Command(BaseCommand):
+    help = 'Close completed months into financial statement snapshots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until', metavar='YYYY-MM', default=None,
+            help='Close months up to this one only (default: last month).',
+        )
+        parser.add_argument(
+            '--reopen', metavar='YYYY-MM', default=None,
+            help='Drop the snapshot of this month so it is computed live again, then exit.',
+        )
+
+    def handle(self, *args, **options):
+        if options['reopen']:
+            month = _month(options['reopen'])
+            if reopen_month(month):
+                self.stdout.write(self.style.SUCCESS(f'{month:%b %Y} reopened.'))
+            else:
+                self.stdout.write(f'{month:%b %Y} was not closed.')
+            return
+
+        until = _month(options['until']) if options['until'] else None
+        snapshots = close_financial_months(until=until)
+        for snapshot in snapshots:
+            self.stdout.write(f'  {snapshot.month:%b %Y}: revenue {snapshot.revenue:.2f}, {snapshot.invoice_count} invoice(s)')
+        self.stdout.write(self.style.SUCCESS(f'{len(snapshots)} month(s) closed.'))
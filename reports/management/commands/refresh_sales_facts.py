@@ -0,0 +1,36 @@
+"""
+Management command: refresh_sales_facts
+
+Brings the daily sales fact table behind the sales and profit margin reports
+(reports.facts) up to date.  By default only the days touched since the
+previous refresh are rebuilt; --full rebuilds every day from all history
+(audits, or after hard deletes and unit conversion edits).
+
+Usage:
+  python manage.py refresh_sales_facts
+  python manage.py refresh_sales_facts --full
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.facts import refresh_sales_facts
+
+
+class Command(BaseCommand):
+    help = 'Refresh the daily sales facts (incremental by default).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild every day instead of the days changed since the last refresh.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = refresh_sales_facts(full=options['full'])
+        elapsed = time.perf_counter() - started
+        mode = 'full' if options['full'] else 'incremental'
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} fact row{"" if count == 1 else "s"} written ({mode}, {elapsed:.2f}s).'
+        ))
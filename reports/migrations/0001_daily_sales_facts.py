@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalog', '0008_unitconversion_conversion_price'),
+        ('core', '0010_invoice_cogs_synced_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+                ('last_full_sync_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('source', models.CharField(choices=[('POS', 'POS'), ('SO', 'Sales Order'), ('SERVICE', 'Service')], max_length=10)),
+                ('qty', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('revenue', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('cogs', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('discount', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('tax', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('count', models.PositiveIntegerField(default=0, help_text='Lines (item rows) or documents')),
+                ('channel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.saleschannel')),
+                ('item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'source'], name='reports_dai_date_feabc8_idx')],
+            },
+        ),
+    ]
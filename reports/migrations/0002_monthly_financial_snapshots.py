@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_invoice_cogs_synced_at'),
+        ('reports', '0001_daily_sales_facts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyFinancialSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month', unique=True)),
+                ('revenue', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('so_revenue', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('pos_revenue', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('svc_revenue', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('discount', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('invoice_cogs', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyExpenseTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_name', models.CharField(max_length=100)),
+                ('is_cogs', models.BooleanField(default=False)),
+                ('amount', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.expensecategory')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expenses', to='reports.monthlyfinancialsnapshot')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyPaymentTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(choices=[('CASH', 'Cash'), ('CHECK', 'Check'), ('BANK_TRANSFER', 'Bank Transfer'), ('GCASH', 'GCash'), ('CARD', 'Card'), ('OTHER', 'Other')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='reports.monthlyfinancialsnapshot')),
+            ],
+        ),
+    ]
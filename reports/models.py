@@ -1,3 +1,102 @@
 from django.db import models
 
-# Create your models here.
+from core.models import PaymentMethod, TimeStampedModel
+
+
+class SalesSource(models.TextChoices):
+    POS = 'POS', 'POS'
+    SALES_ORDER = 'SO', 'Sales Order'
+    SERVICE = 'SERVICE', 'Service'
+
+
+class DailySalesFact(models.Model):
+    """
+    Pre-aggregated sales of one item per day, source and channel, rebuilt by
+    reports.facts.  A row without an item holds the document-level part of
+    that day: document count, tax, and the revenue / discount / COGS not
+    attributed to items (header discounts, bundle discounts), so summing all
+    rows gives document totals.
+    """
+    date = models.DateField()
+    source = models.CharField(max_length=10, choices=SalesSource.choices)
+    channel = models.ForeignKey(
+        'core.SalesChannel', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+    )
+    item = models.ForeignKey(
+        'catalog.Item', on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+    )
+    qty = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    revenue = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    cogs = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    discount = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    tax = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    count = models.PositiveIntegerField(default=0, help_text='Lines (item rows) or documents')
+
+    class Meta:
+        indexes = [models.Index(fields=['date', 'source'])]
+
+    def __str__(self):
+        return f"{self.date} {self.source} {self.item_id or '-'}: {self.revenue}"
+
+
+class ReportSyncState(TimeStampedModel):
+    """
+    Progress marker of an incremental report table refresh (see
+    reports.facts).  ``watermark`` is the time the last successful refresh
+    started; the next one only looks at documents changed since then.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    last_full_sync_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
+
+
+class MonthlyFinancialSnapshot(models.Model):
+    """
+    Financial statement totals of one closed month (see reports.financials):
+    paid invoices by paid_date, expenses by category and payments by method.
+    Rows are written once when the month is closed and never updated; the
+    statement computes months that are not closed yet live.
+    """
+    month = models.DateField(unique=True, help_text='First day of the month')
+    revenue = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    so_revenue = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    pos_revenue = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    svc_revenue = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    discount = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    invoice_cogs = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    invoice_count = models.PositiveIntegerField(default=0)
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['month']
+
+    def __str__(self):
+        return f"{self.month:%b %Y} (closed {self.closed_at:%Y-%m-%d})"
+
+
+class MonthlyExpenseTotal(models.Model):
+    """Expenses of a closed month per category, with the category as it was at closing."""
+    snapshot = models.ForeignKey(MonthlyFinancialSnapshot, on_delete=models.CASCADE, related_name='expenses')
+    category = models.ForeignKey(
+        'core.ExpenseCategory', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+    )
+    category_name = models.CharField(max_length=100)
+    is_cogs = models.BooleanField(default=False)
+    amount = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+
+    def __str__(self):
+        return f"{self.snapshot.month:%b %Y} {self.category_name}: {self.amount}"
+
+
+class MonthlyPaymentTotal(models.Model):
+    """Payments of a closed month's paid invoices per method."""
+    snapshot = models.ForeignKey(MonthlyFinancialSnapshot, on_delete=models.CASCADE, related_name='payments')
+    method = models.CharField(max_length=20, choices=PaymentMethod.choices)
+    amount = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.snapshot.month:%b %Y} {self.method}: {self.amount}"
@@ -3,8 +3,9 @@ from datetime import date, timedelta
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum, Q, F, Count, DecimalField
-from django.db.models.functions import Coalesce, TruncDate, TruncMonth, ExtractYear, ExtractMonth
+from django.db.models.functions import Coalesce, TruncMonth
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -12,7 +13,9 @@ from rest_framework.response import Response
 from inventory.models import StockBalance, StockMove, MoveType
 from catalog.models import Item
 from warehouses.models import Warehouse
-from core.cogs import compute_invoice_cogs
+from core.cogs import bulk_invoice_cogs
+from inventory.totals import low_stock_items
+from reports.exports import export_response
 
 
 # ── API Views ──────────────────────────────────────────────────────────────
@@ -84,20 +87,15 @@ def damaged_summary_report(request):
 @permission_classes([IsAuthenticated])
 def low_stock_report(request):
     """Items below reorder point."""
-    items = Item.objects.filter(is_active=True, reorder_point__gt=0)
     result = []
-    for item in items:
-        total_on_hand = StockBalance.objects.filter(item=item).aggregate(
-            total=Sum('qty_on_hand')
-        )['total'] or 0
-        if total_on_hand <= item.reorder_point:
-            result.append({
-                'item_code': item.code,
-                'item_name': item.name,
-                'reorder_point': str(item.reorder_point),
-                'qty_on_hand': str(total_on_hand),
-                'deficit': str(item.reorder_point - total_on_hand),
-            })
+    for item in low_stock_items():
+        result.append({
+            'item_code': item.code,
+            'item_name': item.name,
+            'reorder_point': str(item.reorder_point),
+            'qty_on_hand': str(item.total_on_hand),
+            'deficit': str(item.reorder_point - item.total_on_hand),
+        })
     return Response(result)
 
 
@@ -108,9 +106,39 @@ def reports_dashboard_view(request):
     return render(request, 'reports/dashboard.html')
 
 
+STOCK_ON_HAND_COLUMNS = [
+    ('item_code', 'Item Code'),
+    ('item_name', 'Item Name'),
+    ('warehouse', 'Warehouse'),
+    ('location', 'Location'),
+    ('unit', 'Unit'),
+    ('qty_on_hand', 'On Hand'),
+    ('qty_reserved', 'Reserved'),
+    ('qty_available', 'Available'),
+    ('cost_price', 'Cost Price'),
+    ('value', 'Value'),
+]
+
+
+def _stock_on_hand_rows(qs):
+    for bal in qs.iterator(chunk_size=2000):
+        yield {
+            'item_code': bal.item.code,
+            'item_name': bal.item.name,
+            'warehouse': bal.location.warehouse.code,
+            'location': bal.location.code,
+            'unit': bal.item.default_unit.abbreviation if bal.item.default_unit_id else '',
+            'qty_on_hand': bal.qty_on_hand,
+            'qty_reserved': bal.qty_reserved,
+            'qty_available': bal.qty_available,
+            'cost_price': bal.item.cost_price,
+            'value': bal.line_value,
+        }
+
+
 @login_required
 def stock_on_hand_view(request):
-    """HTML rendered stock-on-hand report with warehouse filter."""
+    """HTML rendered stock-on-hand report with warehouse filter; ?export=csv|xlsx to download."""
     warehouse_id = request.GET.get('warehouse')
     warehouses = Warehouse.objects.filter(is_active=True)
     qs = StockBalance.objects.select_related(
@@ -122,6 +150,13 @@ def stock_on_hand_view(request):
         qs = qs.filter(location__warehouse_id=warehouse_id)
     qs = qs.order_by('item__code', 'location__warehouse__code')
 
+    response = export_response(
+        request, f'stock_on_hand_{timezone.now():%Y%m%d}', 'Stock on Hand',
+        STOCK_ON_HAND_COLUMNS, _stock_on_hand_rows(qs),
+    )
+    if response:
+        return response
+
     # Total value is calculated over ALL balances (including negative stock) so
     # over-dispatched items correctly reduce the total inventory value.
     all_bal_qs = StockBalance.objects.annotate(
@@ -144,9 +179,42 @@ def stock_on_hand_view(request):
     })
 
 
+STOCK_MOVEMENT_COLUMNS = [
+    ('posted_at', 'Date'),
+    ('move_type', 'Type'),
+    ('item_code', 'Item Code'),
+    ('item_name', 'Item Name'),
+    ('qty', 'Qty'),
+    ('unit', 'Unit'),
+    ('from_location', 'From'),
+    ('to_location', 'To'),
+    ('reference', 'Reference'),
+    ('created_by', 'By'),
+]
+
+
+def _stock_movement_rows(qs):
+    for move in qs.iterator(chunk_size=2000):
+        yield {
+            'posted_at': timezone.localtime(move.posted_at).strftime('%Y-%m-%d %H:%M') if move.posted_at else '',
+            'move_type': move.get_move_type_display(),
+            'item_code': move.item.code,
+            'item_name': move.item.name,
+            'qty': move.qty,
+            'unit': move.unit.abbreviation if move.unit_id else '',
+            'from_location': move.from_location.code if move.from_location_id else '',
+            'to_location': move.to_location.code if move.to_location_id else '',
+            'reference': move.reference_number,
+            'created_by': (move.created_by.get_full_name() or move.created_by.username) if move.created_by_id else '',
+        }
+
+
 @login_required
 def stock_movement_view(request):
-    """HTML rendered stock movement report with filters."""
+    """
+    HTML rendered stock movement report with filters.  The page shows the
+    first 200 moves; ?export=csv|xlsx downloads all of them.
+    """
     today = date.today()
     first_of_month = today.replace(day=1)
     item_id = request.GET.get('item')
@@ -166,6 +234,13 @@ def stock_movement_view(request):
     if date_to:
         qs = qs.filter(posted_at__date__lte=date_to)
 
+    response = export_response(
+        request, f'stock_movement_{timezone.now():%Y%m%d}', 'Stock Movement',
+        STOCK_MOVEMENT_COLUMNS, _stock_movement_rows(qs),
+    )
+    if response:
+        return response
+
     items = Item.objects.filter(is_active=True).order_by('code')
     move_types = MoveType.choices
 
@@ -185,31 +260,62 @@ def stock_movement_view(request):
 @login_required
 def low_stock_view(request):
     """HTML rendered low-stock report."""
-    items = Item.objects.filter(is_active=True, reorder_point__gt=0)
     rows = []
-    for item in items:
-        total_on_hand = StockBalance.objects.filter(item=item).aggregate(
-            total=Coalesce(Sum('qty_on_hand'), Decimal('0'))
-        )['total']
-        if total_on_hand <= item.reorder_point:
-            pct = (total_on_hand / item.reorder_point * 100) if item.reorder_point > 0 else Decimal('0')
-            rows.append({
-                'item': item,
-                'qty_on_hand': total_on_hand,
-                'deficit': item.reorder_point - total_on_hand,
-                'stock_pct': min(pct, Decimal('100')),
-            })
+    for item in low_stock_items(Item.objects.select_related('default_unit')):
+        pct = (item.total_on_hand / item.reorder_point * 100) if item.reorder_point > 0 else Decimal('0')
+        rows.append({
+            'item': item,
+            'qty_on_hand': item.total_on_hand,
+            'deficit': item.reorder_point - item.total_on_hand,
+            'stock_pct': min(pct, Decimal('100')),
+        })
     return render(request, 'reports/low_stock.html', {'rows': rows})
 
 
 # ═══════════════════════════════════════════════════════════════════════════
 # SALES REPORT  (daily/monthly by channel/product)
 # ═══════════════════════════════════════════════════════════════════════════
+def _sales_facts(request, date_from, date_to):
+    """
+    Refreshed daily sales facts of POS sales and sales orders in the date
+    range.  The first build covers all history, so it is queued as a
+    background job; until it has run, only the range's days are rebuilt
+    (all history when the range is open-ended).
+    """
+    from reports.facts import build_sales_facts_between, refresh_sales_facts, sales_facts_built
+    from reports.models import DailySalesFact, SalesSource
+
+    if sales_facts_built():
+        refresh_sales_facts()
+    else:
+        from core.jobs import enqueue
+
+        enqueue('refresh_sales_facts', {'full': True}, user=request.user)
+        first, last = _parse_date(date_from), _parse_date(date_to)
+        if not (first and last) or build_sales_facts_between(first, last) is None:
+            refresh_sales_facts()
+    facts = DailySalesFact.objects.filter(source__in=[SalesSource.POS, SalesSource.SALES_ORDER])
+    if date_from:
+        facts = facts.filter(date__gte=date_from)
+    if date_to:
+        facts = facts.filter(date__lte=date_to)
+    return facts
+
+
+def _fact_totals():
+    """Money sums over daily sales facts, plus the document count (item-less rows)."""
+    totals = {
+        field: Coalesce(Sum(field), Decimal('0'), output_field=DecimalField())
+        for field in ('revenue', 'discount', 'tax', 'cogs')
+    }
+    totals['count'] = Coalesce(Sum('count', filter=Q(item__isnull=True)), 0)
+    return totals
+
+
 @login_required
 def sales_report_view(request):
-    from pos.models import POSSale, POSSaleLine, SaleStatus
-    from sales.models import SalesOrder, SalesOrderLine, SalesOrderPriceListLine
-    from core.models import SalesChannel, DocumentStatus
+    from core.models import SalesChannel
+    from reports.models import SalesSource
 
     today = date.today()
     first_of_month = today.replace(day=1)
@@ -218,117 +324,44 @@ def sales_report_view(request):
     channel_id = request.GET.get('channel', '')
     group_by = request.GET.get('group', 'daily')  # daily or monthly
 
-    # POS sales
-    pos_qs = POSSale.objects.filter(status__in=[SaleStatus.POSTED, SaleStatus.PAID])
-    if date_from:
-        pos_qs = pos_qs.filter(created_at__date__gte=date_from)
-    if date_to:
-        pos_qs = pos_qs.filter(created_at__date__lte=date_to)
+    # POS sales (filtered by channel) and Sales Orders — APPROVED and POSTED
+    facts = _sales_facts(request, date_from, date_to)
     if channel_id:
-        pos_qs = pos_qs.filter(channel_id=channel_id)
+        facts = facts.filter(Q(source=SalesSource.SALES_ORDER) | Q(channel_id=channel_id))
+    pos_facts = facts.filter(source=SalesSource.POS)
+    so_facts = facts.filter(source=SalesSource.SALES_ORDER)
 
-    # Sales Orders — APPROVED (confirmed) and POSTED (invoice paid / fulfilled)
-    so_qs = SalesOrder.objects.filter(status__in=[DocumentStatus.APPROVED, DocumentStatus.POSTED])
-    if date_from:
-        so_qs = so_qs.filter(order_date__gte=date_from)
-    if date_to:
-        so_qs = so_qs.filter(order_date__lte=date_to)
-
-    # Summary totals (POS + SO)
-    pos_summary = pos_qs.aggregate(
-        total_revenue=Coalesce(Sum('grand_total'), Decimal('0'), output_field=DecimalField()),
-        total_discount=Coalesce(Sum('discount_total'), Decimal('0'), output_field=DecimalField()),
-        total_tax=Coalesce(Sum('tax_total'), Decimal('0'), output_field=DecimalField()),
-        sale_count=Count('id'),
-    )
-
-    so_lines_qs = list(SalesOrderLine.objects.filter(
-        sales_order__in=so_qs
-    ).select_related('sales_order', 'item'))
-    so_bundles_qs = list(SalesOrderPriceListLine.objects.filter(
-        sales_order__in=so_qs
-    ).select_related('sales_order', 'price_list').prefetch_related('price_list__items__item'))
-    # Revenue: line totals (includes per-line discounts) + bundle totals
-    so_line_rev = sum(line.line_total for line in so_lines_qs)
-    so_bundle_rev = sum(bundle.bundle_total for bundle in so_bundles_qs)
-    so_revenue = so_line_rev + so_bundle_rev
-    so_count = so_qs.count()
+    # Summary totals (POS + SO); SO revenue is line totals (after per-line
+    # discounts) + bundle totals
+    pos_summary = pos_facts.aggregate(**_fact_totals())
+    so_summary = so_facts.aggregate(**_fact_totals())
+    so_revenue = so_summary['revenue']
+    so_count = so_summary['count']
 
     summary = {
-        'total_revenue': pos_summary['total_revenue'] + so_revenue,
-        'total_discount': pos_summary['total_discount'],
-        'total_tax': pos_summary['total_tax'],
-        'sale_count': pos_summary['sale_count'] + so_count,
+        'total_revenue': pos_summary['revenue'] + so_revenue,
+        'total_discount': pos_summary['discount'],
+        'total_tax': pos_summary['tax'],
+        'sale_count': pos_summary['count'] + so_count,
     }
 
-    # COGS
-    pos_lines = POSSaleLine.objects.filter(sale__in=pos_qs)
-    cogs_pos = pos_lines.aggregate(
-        total=Coalesce(
-            Sum(F('item__cost_price') * F('qty'), output_field=DecimalField()),
-            Decimal('0'), output_field=DecimalField(),
-        )
-    )['total']
-    # SO COGS: line item costs + bundle item costs
-    cogs_so_lines = sum(
-        (line.item.cost_price or Decimal('0')) * line.qty_ordered
-        for line in so_lines_qs
-    )
-    cogs_so_bundles = Decimal('0')
-    for _b in so_bundles_qs:
-        for _p in _b.price_list.items.all():
-            cogs_so_bundles += ((_p.item.cost_price or Decimal('0')) * _p.min_qty * _b.qty_multiplier)
-    cogs_so = cogs_so_lines + cogs_so_bundles
+    # COGS: line costs snapshotted at posting (bundle costs for SO bundles)
+    cogs_pos = pos_summary['cogs']
+    cogs_so = so_summary['cogs']
     cogs = cogs_pos + cogs_so
     gross_profit = summary['total_revenue'] - cogs
     margin = (gross_profit / summary['total_revenue'] * 100) if summary['total_revenue'] > 0 else Decimal('0')
 
     # ── By-date breakdown (combined POS + SO) ─────────────────────────
-    trunc_fn_pos = TruncDate('created_at') if group_by == 'daily' else TruncMonth('created_at')
-    trunc_fn_so = TruncDate('sales_order__order_date') if group_by == 'daily' else TruncMonth('sales_order__order_date')
-
-    date_bucket = {}
-    for row in pos_qs.annotate(period=trunc_fn_pos).values('period').annotate(
-        revenue=Coalesce(Sum('grand_total'), Decimal('0'), output_field=DecimalField()),
-        count=Count('id'),
-    ):
-        date_bucket[row['period']] = {
-            'revenue': row['revenue'],
-            'count': row['count'],
-        }
-
-    # Sales Order lines by period
-    for line in so_lines_qs:
-        period = line.sales_order.order_date
-        if group_by == 'monthly':
-            period = period.replace(day=1)
-        revenue = line.line_total
-        if period in date_bucket:
-            date_bucket[period]['revenue'] += revenue
-            date_bucket[period]['count'] += 1
-        else:
-            date_bucket[period] = {'revenue': revenue, 'count': 1}
-    # Bundle lines by period (each bundle contributes its bundle_total)
-    for bundle in so_bundles_qs:
-        period = bundle.sales_order.order_date
-        if group_by == 'monthly':
-            period = period.replace(day=1)
-        if period in date_bucket:
-            date_bucket[period]['revenue'] += bundle.bundle_total
-        else:
-            date_bucket[period] = {'revenue': bundle.bundle_total, 'count': 0}
-
-    date_rows = [
-        {'period': k, 'revenue': v['revenue'], 'count': v['count']}
-        for k, v in date_bucket.items()
-    ]
-    date_rows.sort(key=lambda r: r['period'])
+    period = F('date') if group_by == 'daily' else TruncMonth('date')
+    date_rows = list(
+        facts.annotate(period=period).values('period').annotate(**_fact_totals()).order_by('period')
+    )
 
     # ── By channel breakdown (POS channels + Sales Orders bucket) ──────
-    channel_rows = list(pos_qs.values('channel__name').annotate(
-        revenue=Coalesce(Sum('grand_total'), Decimal('0'), output_field=DecimalField()),
-        count=Count('id'),
-    ).order_by('-revenue'))
+    channel_rows = list(
+        pos_facts.values('channel__name').annotate(**_fact_totals()).order_by('-revenue')
+    )
 
     if so_revenue > 0:
         channel_rows.append({
@@ -337,51 +370,13 @@ def sales_report_view(request):
             'count': so_count,
         })
 
-    # ── Top items (combined) ───────────────────────────────────────────
-    item_bucket = {}
-    for row in pos_lines.values('item__code', 'item__name').annotate(
-        total_qty=Sum('qty'),
-        total_revenue=Sum('line_total'),
-    ):
-        key = row['item__code']
-        item_bucket[key] = {
-            'item__code': row['item__code'],
-            'item__name': row['item__name'],
-            'total_qty': row['total_qty'],
-            'total_revenue': row['total_revenue'],
-        }
-
-    for line in so_lines_qs:
-        key = line.item.code
-        revenue = line.line_total
-        if key in item_bucket:
-            item_bucket[key]['total_qty'] += line.qty_ordered
-            item_bucket[key]['total_revenue'] += revenue
-        else:
-            item_bucket[key] = {
-                'item__code': line.item.code,
-                'item__name': line.item.name,
-                'total_qty': line.qty_ordered,
-                'total_revenue': revenue,
-            }
-    # Bundle items (each PriceListItem as individual sold item)
-    for _b in so_bundles_qs:
-        for _p in _b.price_list.items.all():
-            key = _p.item.code
-            qty = _p.min_qty * _b.qty_multiplier
-            revenue = _p.price * qty
-            if key in item_bucket:
-                item_bucket[key]['total_qty'] += qty
-                item_bucket[key]['total_revenue'] += revenue
-            else:
-                item_bucket[key] = {
-                    'item__code': _p.item.code,
-                    'item__name': _p.item.name,
-                    'total_qty': qty,
-                    'total_revenue': revenue,
-                }
-
-    top_items = sorted(item_bucket.values(), key=lambda r: r['total_revenue'], reverse=True)[:15]
+    # ── Top items (combined; bundle items count individually) ─────────
+    top_items = list(
+        facts.filter(item__isnull=False).values('item__code', 'item__name').annotate(
+            total_qty=Sum('qty'),
+            total_revenue=Sum('revenue'),
+        ).order_by('-total_revenue')[:15]
+    )
 
     channels = SalesChannel.objects.all()
 
@@ -399,10 +394,10 @@ def sales_report_view(request):
     channel_data = [float(r['revenue']) for r in channel_rows]
 
     # ── Formula breakdown values ─────────────────────────────────────
-    pos_revenue_val = pos_summary['total_revenue']
+    pos_revenue_val = pos_summary['revenue']
     formulas = {
         'pos_revenue': pos_revenue_val,
-        'pos_count': pos_summary['sale_count'],
+        'pos_count': pos_summary['count'],
         'so_revenue': so_revenue,
         'so_count': so_count,
         'total_revenue': summary['total_revenue'],
@@ -444,105 +439,32 @@ def sales_report_view(request):
 @login_required
 def profit_margin_view(request):
     """HTML rendered profit margin report from POS sales and Sales Orders."""
-    from pos.models import POSSale, POSSaleLine, SaleStatus
-    from core.models import DocumentStatus
-    from sales.models import SalesOrder, SalesOrderLine, SalesOrderPriceListLine
-
     today = date.today()
     first_of_month = today.replace(day=1)
     date_from = request.GET.get('date_from', first_of_month.isoformat())
     date_to = request.GET.get('date_to', today.isoformat())
 
-    # ── POS lines ─────────────────────────────────────────────────────
-    pos_qs = POSSaleLine.objects.filter(
-        sale__status__in=[SaleStatus.POSTED, SaleStatus.PAID],
-    ).select_related('item', 'item__default_unit', 'item__selling_unit', 'unit', 'sale')
-    if date_from:
-        pos_qs = pos_qs.filter(sale__created_at__date__gte=date_from)
-    if date_to:
-        pos_qs = pos_qs.filter(sale__created_at__date__lte=date_to)
-
-    # POS grouped by item
-    item_stats = pos_qs.values(
-        'item__code', 'item__name', 'item__cost_price',
+    # Items sold via POS lines, SO lines and SO bundles; a bundle's COGS is
+    # split across its items (see reports.facts)
+    item_stats = _sales_facts(request, date_from, date_to).filter(item__isnull=False).values(
+        'item__code', 'item__name',
     ).annotate(
         total_qty=Sum('qty'),
-        total_revenue=Sum('line_total'),
-    )
-
-    item_bucket = {}
-    for row in item_stats:
-        key = row['item__code']
-        item_bucket[key] = {
-            'item_code': row['item__code'],
-            'item_name': row['item__name'],
-            'cost_price': row['item__cost_price'] or Decimal('0'),
-            'total_qty': row['total_qty'],
-            'total_revenue': row['total_revenue'],
-        }
-
-    # ── SO lines (APPROVED + POSTED) ──────────────────────────────────
-    so_qs_pm = SalesOrder.objects.filter(status__in=[DocumentStatus.APPROVED, DocumentStatus.POSTED])
-    if date_from:
-        so_qs_pm = so_qs_pm.filter(order_date__gte=date_from)
-    if date_to:
-        so_qs_pm = so_qs_pm.filter(order_date__lte=date_to)
-    so_lines_pm = list(SalesOrderLine.objects.filter(
-        sales_order__in=so_qs_pm
-    ).select_related('item'))
-    so_bundles_pm = list(SalesOrderPriceListLine.objects.filter(
-        sales_order__in=so_qs_pm
-    ).select_related('price_list').prefetch_related('price_list__items__item'))
-    # Revenue: line totals (includes per-line discounts) + bundle totals
-    so_line_rev = sum(line.line_total for line in so_lines_pm)
-    so_bundle_rev = sum(bundle.bundle_total for bundle in so_bundles_pm)
-    so_revenue = so_line_rev + so_bundle_rev
-
-    # Add SO lines to item bucket
-    for line in so_lines_pm:
-        key = line.item.code
-        revenue = line.line_total
-        if key in item_bucket:
-            item_bucket[key]['total_qty'] += line.qty_ordered
-            item_bucket[key]['total_revenue'] += revenue
-        else:
-            item_bucket[key] = {
-                'item_code': line.item.code,
-                'item_name': line.item.name,
-                'cost_price': line.item.cost_price or Decimal('0'),
-                'total_qty': line.qty_ordered,
-                'total_revenue': revenue,
-            }
-    # Bundle items in profit margin
-    for _b in so_bundles_pm:
-        for _p in _b.price_list.items.all():
-            key = _p.item.code
-            qty = _p.min_qty * _b.qty_multiplier
-            revenue = _p.price * qty
-            cost = _p.item.cost_price or Decimal('0')
-            if key in item_bucket:
-                item_bucket[key]['total_qty'] += qty
-                item_bucket[key]['total_revenue'] += revenue
-            else:
-                item_bucket[key] = {
-                    'item_code': _p.item.code,
-                    'item_name': _p.item.name,
-                    'cost_price': cost,
-                    'total_qty': qty,
-                    'total_revenue': revenue,
-                }
+        total_revenue=Sum('revenue'),
+        total_cogs=Sum('cogs'),
+    ).order_by('-total_revenue')
 
     # ── Build output rows ─────────────────────────────────────────────
     rows = []
     grand_revenue = Decimal('0')
     grand_cogs = Decimal('0')
-    for data in sorted(item_bucket.values(), key=lambda x: x['total_revenue'], reverse=True):
-        cogs = data['cost_price'] * data['total_qty']
+    for data in item_stats:
+        cogs = data['total_cogs']
         profit = data['total_revenue'] - cogs
         margin = (profit / data['total_revenue'] * 100) if data['total_revenue'] > 0 else Decimal('0')
         rows.append({
-            'item_code': data['item_code'],
-            'item_name': data['item_name'],
+            'item_code': data['item__code'],
+            'item_name': data['item__name'],
             'qty_sold': data['total_qty'],
             'revenue': data['total_revenue'],
             'cogs': cogs,
@@ -568,116 +490,114 @@ def profit_margin_view(request):
 # ═══════════════════════════════════════════════════════════════════════════
 # FINANCIAL STATEMENT  (P&L)  — Invoice-based (paid invoices only)
 # ═══════════════════════════════════════════════════════════════════════════
+# Invoices listed in the computation breakdown; the totals cover the whole range.
+BREAKDOWN_LIMIT = 500
+
+
+def _parse_date(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
 @login_required
 def financial_statement_view(request):
-    from core.models import Expense, Invoice
+    """
+    P&L over paid invoices by paid_date.  Closed months come from their
+    MonthlyFinancialSnapshot, the other days are computed live (see
+    reports.financials).
+    """
+    from core.models import PaymentMethod as PM
+    from reports.financials import data_bounds, paid_invoices, statement_months
 
     today = date.today()
     first_of_month = today.replace(day=1)
     date_from = request.GET.get('date_from', first_of_month.isoformat())
     date_to = request.GET.get('date_to', today.isoformat())
 
-    # ── PAID INVOICES (filtered by paid_date) ──────────────────────────
-    inv_qs = Invoice.objects.filter(is_paid=True, is_void=False, paid_date__isnull=False)
-    if date_from:
-        inv_qs = inv_qs.filter(paid_date__gte=date_from)
-    if date_to:
-        inv_qs = inv_qs.filter(paid_date__lte=date_to)
-
-    invoice_rows = list(
-        inv_qs.select_related('sales_order__customer', 'pos_sale__customer')
-        .prefetch_related('payments', 'customer_services__lines__item')
-        .order_by('paid_date')
-    )
-
-    agg = inv_qs.aggregate(
-        revenue=Coalesce(Sum('grand_total'), Decimal('0'), output_field=DecimalField()),
-        discount=Coalesce(Sum('discount_total'), Decimal('0'), output_field=DecimalField()),
-    )
-    invoice_revenue = agg['revenue']
-    discount = agg['discount']
-    invoice_cogs_map = {inv.pk: compute_invoice_cogs(inv) for inv in invoice_rows}
-    cogs_from_invoices = sum(invoice_cogs_map.values(), Decimal('0'))
-
-    so_invoice_revenue = sum(inv.grand_total for inv in invoice_rows if inv.sales_order_id)
-    pos_invoice_revenue = sum(inv.grand_total for inv in invoice_rows if inv.pos_sale_id)
-    svc_invoice_revenue = sum(
-        inv.grand_total for inv in invoice_rows
-        if not inv.sales_order_id and not inv.pos_sale_id
-    )
+    # An empty bound means all history (and anything dated in the future).
+    start, end = _parse_date(date_from), _parse_date(date_to)
+    if start is None or end is None:
+        first, last = data_bounds()
+        start = start or first or today
+        end = end or max(last or today, today)
+    months = statement_months(start, end) if start <= end else {}
+
+    def total(field):
+        return sum((m[field] for m in months.values()), Decimal('0'))
+
+    invoice_revenue = total('revenue')
+    so_invoice_revenue = total('so_revenue')
+    pos_invoice_revenue = total('pos_revenue')
+    svc_invoice_revenue = total('svc_revenue')
+    discount = total('discount')
+    cogs_from_invoices = total('invoice_cogs')
+    inv_count = sum(m['invoice_count'] for m in months.values())
 
     net_revenue = invoice_revenue - discount
 
-    # ── COGS from expense categories marked as COGS ────────────────────
-    exp_qs = Expense.objects.all()
-    if date_from:
-        exp_qs = exp_qs.filter(date__gte=date_from)
-    if date_to:
-        exp_qs = exp_qs.filter(date__lte=date_to)
+    # ── Expenses by category; COGS categories count towards COGS ───────
+    expense_totals = {}
+    for m in months.values():
+        for (_, name, is_cogs), amount in m['expenses'].items():
+            expense_totals[name, is_cogs] = expense_totals.get((name, is_cogs), Decimal('0')) + amount
 
-    cogs_expenses = exp_qs.filter(category__is_cogs=True).aggregate(
-        total=Coalesce(Sum('amount'), Decimal('0'), output_field=DecimalField())
-    )['total']
+    cogs_expenses = sum(
+        (amount for (_, is_cogs), amount in expense_totals.items() if is_cogs), Decimal('0'),
+    )
 
     total_cogs = cogs_from_invoices + cogs_expenses
     gross_profit = net_revenue - total_cogs
     gross_margin = (gross_profit / net_revenue * 100) if net_revenue > 0 else Decimal('0')
 
     # ── OPERATING EXPENSES (non-COGS) ──────────────────────────────────
-    opex_rows = exp_qs.filter(category__is_cogs=False).values(
-        'category__name'
-    ).annotate(
-        total=Coalesce(Sum('amount'), Decimal('0'), output_field=DecimalField())
-    ).order_by('-total')
+    opex_rows = sorted(
+        (
+            {'category__name': name, 'total': amount}
+            for (name, is_cogs), amount in expense_totals.items() if not is_cogs
+        ),
+        key=lambda r: -r['total'],
+    )
 
     total_opex = sum(r['total'] for r in opex_rows)
     net_profit = gross_profit - total_opex
     net_margin = (net_profit / net_revenue * 100) if net_revenue > 0 else Decimal('0')
 
     # ── Monthly P&L trend (by paid_date month) ─────────────────────────
-    monthly_inv_raw = list(
-        inv_qs.annotate(yr=ExtractYear('paid_date'), mo=ExtractMonth('paid_date'))
-        .values('yr', 'mo').annotate(
-            total=Coalesce(Sum('grand_total'), Decimal('0'), output_field=DecimalField())
-        ).order_by('yr', 'mo')
-    )
-    monthly_exp_raw = list(
-        exp_qs.annotate(yr=ExtractYear('date'), mo=ExtractMonth('date'))
-        .values('yr', 'mo').annotate(
-            total=Coalesce(Sum('amount'), Decimal('0'), output_field=DecimalField())
-        ).order_by('yr', 'mo')
+    trend_labels, trend_revenue, trend_expenses, trend_profit = [], [], [], []
+    for month, m in months.items():
+        expenses = sum(m['expenses'].values(), Decimal('0'))
+        if not m['invoice_count'] and not m['expenses']:
+            continue
+        trend_labels.append(month.strftime('%b %Y'))
+        trend_revenue.append(float(m['revenue']))
+        trend_expenses.append(float(expenses))
+        trend_profit.append(float(m['revenue'] - expenses))
+
+    # ── Breakdown: one row per paid invoice (latest BREAKDOWN_LIMIT) ───
+    invoice_rows = list(
+        paid_invoices(start, end)
+        .select_related('sales_order__customer', 'pos_sale__customer')
+        .prefetch_related('payments', 'customer_services')
+        .order_by('-paid_date', '-pk')[:BREAKDOWN_LIMIT]
     )
-
-    month_map = {}
-    for r in monthly_inv_raw:
-        key = date(r['yr'], r['mo'], 1).strftime('%b %Y')
-        month_map.setdefault(key, {'revenue': Decimal('0'), 'expenses': Decimal('0')})
-        month_map[key]['revenue'] += r['total']
-    for r in monthly_exp_raw:
-        key = date(r['yr'], r['mo'], 1).strftime('%b %Y')
-        month_map.setdefault(key, {'revenue': Decimal('0'), 'expenses': Decimal('0')})
-        month_map[key]['expenses'] = r['total']
-
-    trend_labels = list(month_map.keys())
-    trend_revenue = [float(month_map[k]['revenue']) for k in trend_labels]
-    trend_expenses = [float(month_map[k]['expenses']) for k in trend_labels]
-    trend_profit = [float(month_map[k]['revenue'] - month_map[k]['expenses']) for k in trend_labels]
-
-    # ── Breakdown: one row per paid invoice ────────────────────────────
-    from core.models import InvoicePayment
+    invoice_rows.reverse()
+    invoice_cogs_map = bulk_invoice_cogs(invoice_rows)
     breakdown_rows = []
     for inv in invoice_rows:
         source_type = 'INV'
         ref = ''
+        services = inv.customer_services.all()
         if inv.sales_order_id:
             source_type = 'SO'
             ref = inv.sales_order.document_number
         elif inv.pos_sale_id:
             source_type = 'POS'
             ref = inv.pos_sale.sale_no
-        elif hasattr(inv, 'customer_services') and inv.customer_services.exists():
+        elif services:
             source_type = 'SVC'
-            ref = inv.customer_services.first().service_number
+            ref = services[0].service_number
         cogs_val = invoice_cogs_map[inv.pk]
         payment_methods = ', '.join(
             p.get_method_display() for p in inv.payments.all()
@@ -695,31 +615,23 @@ def financial_statement_view(request):
             'payment_methods': payment_methods,
         })
 
-    breakdown_total_revenue = sum(r['revenue'] for r in breakdown_rows)
-    breakdown_total_discount = sum(r['discount'] for r in breakdown_rows)
-    breakdown_total_cogs = sum(r['cogs'] for r in breakdown_rows)
-    breakdown_total_gp = sum(r['gross_profit'] for r in breakdown_rows)
-
-    # ── Payment method summary (from InvoicePayment records) ───────────
-    from django.db.models import Count
-    payment_method_rows = list(
-        InvoicePayment.objects.filter(invoice__in=inv_qs)
-        .values('method')
-        .annotate(
-            total=Coalesce(Sum('amount'), Decimal('0'), output_field=DecimalField()),
-            count=Count('id'),
-        )
-        .order_by('-total')
-    )
-    # Attach display name
-    from core.models import PaymentMethod as PM
+    breakdown_total_revenue = invoice_revenue
+    breakdown_total_discount = discount
+    breakdown_total_cogs = cogs_from_invoices
+    breakdown_total_gp = invoice_revenue - discount - cogs_from_invoices
+
+    # ── Payment method summary (payments of the paid invoices) ─────────
+    payment_totals = {}
+    for m in months.values():
+        for method, (amount, count) in m['payments'].items():
+            row = payment_totals.setdefault(method, {'method': method, 'total': Decimal('0'), 'count': 0})
+            row['total'] += amount
+            row['count'] += count
+    payment_method_rows = sorted(payment_totals.values(), key=lambda r: -r['total'])
     for row in payment_method_rows:
         row['method_display'] = dict(PM.choices).get(row['method'], row['method'])
     payment_total_collected = sum(r['total'] for r in payment_method_rows)
 
-    # Invoice count
-    inv_count = inv_qs.count()
-
     return render(request, 'reports/financial_statement.html', {
         'invoice_revenue': invoice_revenue,
         'so_invoice_revenue': so_invoice_revenue,
@@ -742,6 +654,7 @@ def financial_statement_view(request):
         'trend_profit': trend_profit,
         'filters': {'date_from': date_from, 'date_to': date_to},
         'breakdown_rows': breakdown_rows,
+        'breakdown_truncated': inv_count > len(breakdown_rows),
         'breakdown_total_revenue': breakdown_total_revenue,
         'breakdown_total_discount': breakdown_total_discount,
         'breakdown_total_cogs': breakdown_total_cogs,
@@ -756,86 +669,69 @@ def financial_statement_view(request):
 
 @login_required
 def stock_aging_view(request):
-    """Shows stock aging based on first RECEIVE move date per item/location."""
-    today = timezone.now().date()
-    warehouse_id = request.GET.get('warehouse', '')
+    """
+    Stock aging per item/location (see reports.aging).
 
-    balances = StockBalance.objects.filter(qty_on_hand__gt=0).select_related(
-        'item', 'location', 'location__warehouse'
-    )
-    if warehouse_id:
-        balances = balances.filter(location__warehouse_id=warehouse_id)
-
-    aging_data = []
-    for bal in balances:
-        first_receive = StockMove.objects.filter(
-            item=bal.item,
-            to_location=bal.location,
-            move_type__in=[MoveType.RECEIVE, MoveType.RETURN_IN],
-            status='POSTED',
-        ).order_by('posted_at').values_list('posted_at', flat=True).first()
-
-        if first_receive:
-            age_days = (today - first_receive.date()).days
-        else:
-            age_days = 0
-
-        if age_days <= 30:
-            bucket = '0-30 days'
-            bucket_order = 1
-        elif age_days <= 60:
-            bucket = '31-60 days'
-            bucket_order = 2
-        elif age_days <= 90:
-            bucket = '61-90 days'
-            bucket_order = 3
-        elif age_days <= 180:
-            bucket = '91-180 days'
-            bucket_order = 4
-        else:
-            bucket = '180+ days'
-            bucket_order = 5
-
-        value = float(bal.qty_on_hand * (bal.item.cost_price or Decimal('0')))
-        aging_data.append({
-            'item_code': bal.item.code,
-            'item_name': bal.item.name,
-            'warehouse': bal.location.warehouse.name,
-            'location': bal.location.code,
-            'qty': bal.qty_on_hand,
-            'cost_price': bal.item.cost_price or Decimal('0'),
-            'value': value,
-            'age_days': age_days,
-            'bucket': bucket,
-            'bucket_order': bucket_order,
-        })
+    ?mode=first (age from first receipt) or fifo (age remaining receipt
+    layers), ?warehouse=<id>, ?export=csv|xlsx to download.
+    """
+    from reports import aging
 
-    aging_data.sort(key=lambda x: (-x['bucket_order'], -x['age_days']))
+    warehouse_id = request.GET.get('warehouse', '')
+    mode = request.GET.get('mode', 'first')
+    if mode not in aging.MODES:
+        mode = 'first'
+    rows = aging.aging_rows(mode, warehouse_id or None)
 
-    # Summary by bucket
-    bucket_summary = {}
-    for row in aging_data:
-        b = row['bucket']
-        if b not in bucket_summary:
-            bucket_summary[b] = {'count': 0, 'qty': Decimal('0'), 'value': 0.0}
-        bucket_summary[b]['count'] += 1
-        bucket_summary[b]['qty'] += row['qty']
-        bucket_summary[b]['value'] += row['value']
+    response = export_response(
+        request, f'stock_aging_{mode}_{timezone.now():%Y%m%d}', 'Stock Aging', aging.COLUMNS, rows,
+    )
+    if response:
+        return response
 
+    aging_data = list(rows)
     warehouses = Warehouse.objects.all()
     return render(request, 'reports/stock_aging.html', {
         'aging_data': aging_data,
-        'bucket_summary': bucket_summary,
+        'bucket_summary': aging.bucket_summary(aging_data),
         'warehouses': warehouses,
         'selected_warehouse': warehouse_id,
+        'mode': mode,
     })
 
 
 # ── Expense Report ───────────────────────────────────────────────────────────
 
+EXPENSE_COLUMNS = [
+    ('date', 'Date'),
+    ('category', 'Category'),
+    ('description', 'Description'),
+    ('vendor', 'Vendor'),
+    ('reference_no', 'Reference'),
+    ('status', 'Status'),
+    ('amount', 'Amount'),
+]
+
+
+def _expense_rows(qs):
+    for expense in qs.select_related('category').order_by('date', 'pk').iterator(chunk_size=2000):
+        yield {
+            'date': expense.date,
+            'category': expense.category.name,
+            'description': expense.item_description,
+            'vendor': expense.vendor,
+            'reference_no': expense.reference_no,
+            'status': expense.get_status_display(),
+            'amount': expense.amount,
+        }
+
+
 @login_required
 def expense_report_view(request):
-    """HTML rendered expense report with date/category filters."""
+    """
+    HTML rendered expense report with date/category filters; ?export=csv|xlsx
+    downloads the expenses themselves.
+    """
     from core.models import Expense, ExpenseCategory
 
     today = date.today()
@@ -853,6 +749,12 @@ def expense_report_view(request):
     if category_id:
         qs = qs.filter(category_id=category_id)
 
+    response = export_response(
+        request, f'expenses_{timezone.now():%Y%m%d}', 'Expenses', EXPENSE_COLUMNS, _expense_rows(qs),
+    )
+    if response:
+        return response
+
     total_expenses = qs.aggregate(
         total=Coalesce(Sum('amount'), Decimal('0'), output_field=DecimalField()),
         count=Count('id'),
@@ -920,9 +822,36 @@ def expense_report_view(request):
 
 # ── Inventory Valuation Report ──────────────────────────────────────────────
 
+INVENTORY_VALUATION_COLUMNS = [
+    ('warehouse', 'Warehouse'),
+    ('location', 'Location'),
+    ('item_code', 'Item Code'),
+    ('item_name', 'Item Name'),
+    ('unit', 'Unit'),
+    ('qty', 'Qty On Hand'),
+    ('cost_price', 'Cost Price'),
+    ('value', 'Total Value'),
+]
+
+
+def _inventory_valuation_rows(qs):
+    for bal in qs.iterator(chunk_size=2000):
+        cost = bal.item.cost_price or Decimal('0')
+        yield {
+            'warehouse': bal.location.warehouse.name,
+            'location': bal.location.code,
+            'item_code': bal.item.code,
+            'item_name': bal.item.name,
+            'unit': bal.item.default_unit.abbreviation if bal.item.default_unit_id else '',
+            'qty': bal.qty_on_hand,
+            'cost_price': cost,
+            'value': bal.qty_on_hand * cost,
+        }
+
+
 @login_required
 def inventory_valuation_view(request):
-    """HTML rendered inventory valuation report."""
+    """HTML rendered inventory valuation report; ?export=csv|xlsx to download."""
     warehouse_id = request.GET.get('warehouse')
     warehouses = Warehouse.objects.filter(is_active=True)
 
@@ -931,10 +860,18 @@ def inventory_valuation_view(request):
     )
     if warehouse_id:
         qs = qs.filter(location__warehouse_id=warehouse_id)
+    qs = qs.order_by('location__warehouse__code', 'item__code')
+
+    response = export_response(
+        request, f'inventory_valuation_{timezone.now():%Y%m%d}', 'Inventory Valuation',
+        INVENTORY_VALUATION_COLUMNS, _inventory_valuation_rows(qs),
+    )
+    if response:
+        return response
 
     rows = []
     grand_total = Decimal('0')
-    for bal in qs.order_by('location__warehouse__code', 'item__code'):
+    for bal in qs:
         cost = bal.item.cost_price or Decimal('0')
         value = bal.qty_on_hand * cost
         grand_total += value
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_salespickup_salespickupline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryline',
+            name='line_cogs',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='unit_cost × qty when posted', max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='deliveryline',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Item cost per line unit when posted (COGS snapshot)', max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='salesorderline',
+            name='line_cogs',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='unit_cost × qty_ordered when posted', max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='salesorderline',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Item cost per line unit when posted (COGS snapshot)', max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='salesorderpricelistline',
+            name='line_cogs',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='unit_cost × qty_multiplier when posted', max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='salesorderpricelistline',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Cost of one set of the bundle items when posted (COGS snapshot)', max_digits=15, null=True),
+        ),
+    ]
@@ -121,6 +121,14 @@ class SalesOrderLine(models.Model):
     batch_number = models.CharField(max_length=100, blank=True, default='')
     serial_number = models.CharField(max_length=100, blank=True, default='')
     notes = models.TextField(blank=True, default='')
+    unit_cost = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='Item cost per line unit when posted (COGS snapshot)',
+    )
+    line_cogs = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='unit_cost × qty_ordered when posted',
+    )
 
     @property
     def qty_remaining(self):
@@ -168,6 +176,14 @@ class SalesOrderPriceListLine(models.Model):
         help_text='Bundle-level discount applied on top of individual item prices.',
     )
     notes = models.TextField(blank=True, default='')
+    unit_cost = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='Cost of one set of the bundle items when posted (COGS snapshot)',
+    )
+    line_cogs = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='unit_cost × qty_multiplier when posted',
+    )
 
     @property
     def bundle_subtotal(self):
@@ -220,6 +236,14 @@ class DeliveryLine(models.Model):
     batch_number = models.CharField(max_length=100, blank=True, default='')
     serial_number = models.CharField(max_length=100, blank=True, default='')
     notes = models.TextField(blank=True, default='')
+    unit_cost = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='Item cost per line unit when posted (COGS snapshot)',
+    )
+    line_cogs = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='unit_cost × qty when posted',
+    )
 
     def __str__(self):
         return f"Delivery Line: {self.item.code} x{self.qty}"
@@ -15,6 +15,7 @@ from sales.forms import (
 )
 from django.utils import timezone
 from inventory.services import post_delivery, reserve_stock, cancel_document, post_sales_pickup
+from core.cogs import stamp_sales_order_costs
 from core.models import DocumentStatus
 from accounts.decorators import sales_access
 
@@ -39,6 +40,7 @@ class SalesOrderViewSet(viewsets.ModelViewSet):
         so.approved_by = request.user
         so.approved_at = timezone.now()
         so.save(update_fields=['status', 'approved_by', 'approved_at', 'updated_at'])
+        stamp_sales_order_costs(so)
         from inventory.automation import auto_create_delivery_from_so, auto_create_pickup_from_so
         result = {'status': 'approved'}
         if so.fulfillment_type == 'DELIVER':
@@ -186,6 +188,7 @@ def sales_order_approve_view(request, pk):
             so.approved_by = request.user
             so.approved_at = timezone.now()
             so.save(update_fields=['status', 'approved_by', 'approved_at', 'updated_at'])
+            stamp_sales_order_costs(so)
             messages.success(request, f'Sales Order {so.document_number} approved.')
             from inventory.automation import auto_create_delivery_from_so, auto_create_pickup_from_so
             if so.fulfillment_type == 'DELIVER':
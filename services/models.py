@@ -170,6 +170,14 @@ class ServiceLine(models.Model):
         help_text='Selling price per unit (auto-filled from Item catalog)',
     )
     notes = models.TextField(blank=True, default='')
+    unit_cost = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='Item cost per line unit when posted (COGS snapshot)',
+    )
+    line_cogs = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        help_text='unit_cost × qty when posted',
+    )
 
     @property
     def line_total(self):
@@ -332,7 +332,8 @@ def service_complete(request, pk):
     # ── Inventory deduction (Product Lines + Bundles) ──────────────────────
     if lines or bundles:
         try:
-            from inventory.models import StockMove, StockBalance, MoveType, MoveStatus
+            from inventory.models import StockMove, MoveType, MoveStatus
+            from inventory.services import BalanceBatch, _create_moves
             from catalog.models import convert_to_base_unit
             from warehouses.models import Location
 
@@ -347,6 +348,7 @@ def service_complete(request, pk):
 
             missing_location_items = []
             moves = []
+            balances = BalanceBatch()
 
             def deduct_item(item, sale_unit, qty, location):
                 base_qty = convert_to_base_unit(qty, sale_unit, item.stock_unit, item=item)
@@ -368,20 +370,7 @@ def service_complete(request, pk):
                     posted_at=now,
                 )
                 moves.append(move)
-
-                balance, _ = StockBalance.objects.select_for_update().get_or_create(
-                    item=item,
-                    location=location,
-                    defaults={'qty_on_hand': Decimal('0'), 'qty_reserved': Decimal('0')},
-                )
-                balance.qty_on_hand -= base_qty
-                wh = location.warehouse
-                if not wh.allow_negative_stock and balance.qty_on_hand < 0:
-                    raise ValueError(
-                        f"Insufficient stock for {item.code} at {location}. "
-                        f"Available: {balance.qty_on_hand + base_qty}, Requested: {base_qty}"
-                    )
-                balance.save()
+                balances.add(item, location, -base_qty)
 
             for line in lines:
                 location = line.location or default_location
@@ -401,8 +390,9 @@ def service_complete(request, pk):
                         continue
                     deduct_item(pli.item, pli.unit, bundle_qty, location)
 
+            balances.apply()
             if moves:
-                StockMove.objects.bulk_create(moves)
+                _create_moves(moves)
 
             if missing_location_items:
                 messages.warning(
@@ -415,6 +405,10 @@ def service_complete(request, pk):
             messages.error(request, f'Stock error: {exc}')
             return redirect('service_detail', pk=pk)
 
+    # ── Snapshot product line costs (reports sum line_cogs) ────────────────
+    from core.cogs import SNAPSHOT_FIELDS, stamp_line_costs
+    ServiceLine.objects.bulk_update(stamp_line_costs(lines), SNAPSHOT_FIELDS)
+
     # ── Compute COGS for invoice ───────────────────────────────────────────
     try:
         from catalog.utils import get_item_cogs_for_unit
@@ -0,0 +1,129 @@
+"""
+Tests for the background job runner (core/jobs.py).
+
+Scenarios covered:
+  1. The cash-flow sync button queues a job that the page can poll.
+  2. An identical job is not queued twice while one is active.
+  3. `run_jobs --once` drains the database queue; command output is kept.
+  4. A failing handler marks the job FAILED with its error.
+  5. Running jobs without a recent heartbeat are failed, freeing their key;
+     with the thread backend, so are jobs left queued by a dead process.
+"""
+import io
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.jobs import dedupe_key, enqueue, register, run_job
+from core.models import Job, JobStatus
+
+User = get_user_model()
+
+
+@register('test_explode')
+def _explode_job(job, ctx):
+    ctx.progress(1, 4, 'About to fail', force=True)
+    raise RuntimeError('boom')
+
+
+class BackgroundJobsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('jobs_u', 'jobs@test.com', 'pass')
+        cls.other = User.objects.create_user('jobs_other', password='pass')
+
+    @override_settings(JOBS_BACKEND='inline')
+    def test_cashflow_sync_runs_as_job(self):
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/cashflow/sync/')
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertTrue(body['created'])
+
+        status = self.client.get(body['status_url']).json()
+        self.assertEqual(status['status'], JobStatus.SUCCEEDED)
+        self.assertTrue(status['finished'])
+        self.assertTrue(status['result']['success'])
+        self.assertIn('Cash flow sync complete', status['result']['message'])
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(body['status_url']).status_code, 404)
+
+    @override_settings(JOBS_BACKEND='db')
+    def test_duplicate_job_reuses_active_one(self):
+        job, created = enqueue('sync_invoice_cogs', {'dry_run': True})
+        again, created_again = enqueue('sync_invoice_cogs', {'dry_run': True})
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, job.pk)
+        # Different parameters are a different job.
+        self.assertTrue(enqueue('sync_invoice_cogs', {})[1])
+
+        run_job(job.pk)
+        self.assertTrue(enqueue('sync_invoice_cogs', {'dry_run': True})[1])
+
+    @override_settings(JOBS_BACKEND='db')
+    def test_worker_drains_queue(self):
+        first, _ = enqueue('sync_pos_stock_moves')
+        second, _ = enqueue('sync_invoice_cogs', {'dry_run': True})
+        out = io.StringIO()
+        call_command('run_jobs', '--once', stdout=out)
+        self.assertIn('2 job(s) run.', out.getvalue())
+        for job in (first, second):
+            job.refresh_from_db()
+            self.assertEqual(job.status, JobStatus.SUCCEEDED)
+            self.assertIsNotNone(job.finished_at)
+        self.assertIn('Done. Processed=0', first.output)
+        self.assertEqual(first.message, 'Done. Processed=0, Fixed=0')
+        self.assertIsNone(run_job(first.pk))  # already claimed
+
+    @override_settings(JOBS_BACKEND='db')
+    def test_failed_job(self):
+        job, _ = enqueue('test_explode', user=self.user)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            job = run_job(job.pk)
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertEqual(job.message, 'boom')
+        self.assertIn('RuntimeError', job.error)
+        self.assertEqual((job.progress_done, job.progress_total), (1, 4))
+        with self.assertRaises(ValueError):
+            enqueue('no_such_job')
+
+    @override_settings(JOBS_BACKEND='db', JOBS_STALE_AFTER=60)
+    def test_stale_running_job_is_reaped(self):
+        job, _ = enqueue('sync_payments')
+        Job.objects.filter(pk=job.pk).update(
+            status=JobStatus.RUNNING, heartbeat_at=timezone.now() - timedelta(minutes=5),
+        )
+        fresh, created = enqueue('sync_payments')
+        self.assertTrue(created)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertNotEqual(fresh.pk, job.pk)
+
+    @override_settings(JOBS_BACKEND='thread', JOBS_STALE_AFTER=60)
+    def test_orphaned_queued_job_is_reaped(self):
+        # The process died before its executor ran the job: the row stays QUEUED.
+        job = Job.objects.create(kind='sync_payments', dedupe_key=dedupe_key('sync_payments', {}))
+        Job.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            fresh, created = enqueue('sync_payments')
+        self.assertTrue(created)
+        self.assertNotEqual(fresh.pk, job.pk)
+        self.assertEqual(len(callbacks), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOBS_BACKEND='db', JOBS_STALE_AFTER=60)
+    def test_queued_job_waits_for_db_workers(self):
+        job, _ = enqueue('sync_payments')
+        Job.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        again, created = enqueue('sync_payments')
+        self.assertFalse(created)
+        self.assertEqual(again.pk, job.pk)
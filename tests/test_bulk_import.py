@@ -0,0 +1,225 @@
+"""
+Tests for the set-based CSV importers (core.import_utils.BulkImporter and
+core.importers).
+
+Scenarios covered:
+  1. The catalog import creates new codes, updates known ones, creates
+     missing categories / units once with a warning, and reports bad rows
+     with their file row numbers; repeated codes are counted per row and
+     the last row wins.
+  2. The catalog import runs a few queries per batch of rows, not per row;
+     re-importing unchanged rows writes nothing.
+  3. A failing batch is retried one record at a time: only the bad row is
+     reported and the rest of the batch is saved.
+  4. The expense import creates the cash flow entries (with logs and CF
+     numbers) of PAID expenses that a saved expense would get.
+  5. The supply import creates and updates supply items.
+  6. The sales order and stock-in imports create their documents with
+     lines; the stock-in is posted.
+"""
+import csv
+import io
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from catalog.models import Category, Item, Unit
+from core.importers import CatalogImporter, ExpenseImporter, SupplyImporter
+
+User = get_user_model()
+
+CATALOG_HEADER = [
+    'Product / Service Name', 'Item Code (SKU)', 'Item Type', 'Category', 'Unit', 'Item Cost',
+    'Item Selling Price',
+]
+
+
+def catalog_row(code, name='', item_type='RAW', category='Bulk', unit='bpc', cost='1', price='2'):
+    return dict(zip(CATALOG_HEADER, [name, code, item_type, category, unit, cost, price]))
+
+
+def csv_upload(rows):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return SimpleUploadedFile('import.csv', output.getvalue().encode('utf-8'), content_type='text/csv')
+
+
+class BulkImportTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('bulk_u', 'bulk@test.com', 'pass')
+        cls.category = Category.objects.create(code='BULK', name='Bulk')
+        cls.unit = Unit.objects.create(name='Bulk Piece', abbreviation='bpc')
+        cls.item = Item.objects.create(
+            code='BLK-OLD', name='Old name', category=cls.category, default_unit=cls.unit,
+        )
+
+    def test_catalog_import(self):
+        result = CatalogImporter(self.user).run([
+            catalog_row('BLK-OLD', 'Renamed', cost='7.5'),
+            catalog_row('BLK-1', 'First', category='Bulk New', unit='Bulk Box'),
+            catalog_row('BLK-2', 'Second', item_type='GADGET'),
+            catalog_row('', 'No code'),
+            catalog_row('', '', category='', unit=''),
+            catalog_row('BLK-3', 'Third', category='bulk new', unit='BULK BOX', item_type='Finished Product'),
+            catalog_row('BLK-1', 'First again', price='9'),
+        ])
+
+        self.assertEqual((result.created, result.updated, result.skipped), (2, 2, 3))
+        self.assertEqual(
+            [(e['row_num'], e['message']) for e in result.errors],
+            [(4, 'Invalid Item Type "GADGET". Use RAW, FINISHED, or SERVICE.'),
+             (5, 'Item Code (SKU) is required.')],
+        )
+        self.assertEqual(result.warnings, ['Row 3: Created new category: Bulk New', 'Row 3: Created new unit: Bulk Box'])
+
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.name, self.item.cost_price), ('Renamed', Decimal('7.5')))
+        first = Item.objects.get(code='BLK-1')
+        self.assertEqual((first.name, first.selling_price, first.category.name), ('First again', Decimal('9'), 'Bulk'))
+        third = Item.objects.select_related('category', 'default_unit').get(code='BLK-3')
+        self.assertEqual(
+            (third.item_type, third.category.code, third.default_unit.abbreviation),
+            ('FINISHED', 'BULK_NEW', 'bulk box'),
+        )
+        self.assertFalse(Item.objects.filter(code='BLK-2').exists())
+
+    def test_catalog_import_queries_are_per_batch(self):
+        def run(rows):
+            with CaptureQueriesContext(connection) as ctx:
+                result = CatalogImporter(self.user).run(rows)
+            return result, ctx.captured_queries
+
+        result, few = run([catalog_row(f'FEW-{i}', f'Item {i}') for i in range(5)])
+        self.assertEqual(result.created, 5)
+        rows = [catalog_row(f'MANY-{i}', f'Item {i}') for i in range(400)]
+        result, many = run(rows)
+        self.assertEqual(result.created, 400)
+        # Inserts are split to stay under SQLite's parameter limit, about
+        # 50 items per statement; the per-row import took 4+ per row.
+        self.assertLessEqual(len(many), len(few) + 400 // 50)
+
+        rows[7] = catalog_row('MANY-7', 'Item 7', cost='3')
+        result, again = run(rows)
+        self.assertEqual(result.updated, 400)
+        self.assertEqual([q['sql'].split()[0] for q in again].count('UPDATE'), 1)
+        self.assertEqual(Item.objects.get(code='MANY-7').cost_price, Decimal('3'))
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        class FlakyImporter(CatalogImporter):
+            batch_size = 3
+
+            def write(self, objs):
+                if any(obj.code == 'BLK-BAD' for obj in objs):
+                    raise IntegrityError('bad row')
+                super().write(objs)
+
+        result = FlakyImporter(self.user).run([
+            catalog_row('BLK-A'), catalog_row('BLK-BAD'), catalog_row('BLK-OLD'), catalog_row('BLK-B'),
+        ])
+        self.assertEqual((result.created, result.updated, result.skipped), (2, 1, 1))
+        self.assertEqual([(e['row_num'], e['message']) for e in result.errors], [(3, 'bad row')])
+        self.assertEqual(
+            set(Item.objects.filter(code__startswith='BLK-').values_list('code', flat=True)),
+            {'BLK-OLD', 'BLK-A', 'BLK-B'},
+        )
+
+    def test_expense_import_creates_cash_flow_entries(self):
+        from cashflow.models import CashFlowTransaction
+        from core.models import Expense
+
+        header = ['Purchase Date', 'Category', 'Item Description', 'Total Cost', 'Status', 'Reference No']
+        result = ExpenseImporter(self.user).run([
+            dict(zip(header, row)) for row in [
+                ['2025-03-01', 'Bulk Utilities', 'Power', '1,200.50', 'Paid', 'OR-1'],
+                ['03/02/2025', 'bulk utilities', '', '300', 'PENDING', ''],
+                ['2025-03-03', 'Bulk Utilities', 'Water', '0', 'PAID', ''],
+                ['not a date', '', '', '5', '', ''],
+                ['2025-03-04', '', '', '50', '', ''],
+            ]
+        ])
+        self.assertEqual((result.created, result.skipped), (3, 2))
+        self.assertEqual([e['row_num'] for e in result.errors], [4, 5])
+        self.assertEqual(result.warnings, [
+            'Row 2: Created new expense category: Bulk Utilities',
+            'Row 6: Created new expense category: General',
+        ])
+
+        power = Expense.objects.get(reference_no='OR-1')
+        self.assertEqual(power.amount, Decimal('1200.50'))
+        entries = CashFlowTransaction.objects.filter(source_type='Expense').order_by('source_id')
+        self.assertEqual(
+            [(e.source_id, e.reason, e.amount, e.reference_no) for e in entries],
+            [(power.pk, 'Bulk Utilities: Power', Decimal('1200.50'), 'OR-1'),
+             (power.pk + 2, 'General', Decimal('50'), str(power.pk + 2))],
+        )
+        self.assertTrue(all(e.transaction_number.startswith('CF-') and e.logs.count() == 1 for e in entries))
+        self.assertEqual(len({e.transaction_number for e in entries}), 2)
+
+    def test_supply_import(self):
+        from core.models import SupplyItem
+
+        SupplyItem.objects.create(code='SUP-OLD', name='Old supply')
+        header = ['Product Name', 'Item Code', 'Category', 'Item Cost', 'Available Stocks']
+        result = SupplyImporter(self.user).run([
+            dict(zip(header, row)) for row in [
+                ['Glue', 'SUP-OLD', 'Bulk Adhesives', '12', '3'],
+                ['Packing Tape', '', 'bulk adhesives', '5', '10'],
+                ['', '', '', '', ''],
+            ]
+        ])
+        self.assertEqual((result.created, result.updated, result.skipped), (1, 1, 1))
+        self.assertEqual(result.warnings, ['Row 2: Created new supply category: Bulk Adhesives'])
+        glue = SupplyItem.objects.get(code='SUP-OLD')
+        self.assertEqual((glue.name, glue.cost_per_unit), ('Glue', Decimal('12')))
+        tape = SupplyItem.objects.get(code='PACKING-TAPE')
+        self.assertEqual((tape.current_stock, tape.category_id), (Decimal('10'), glue.category_id))
+
+    def test_sales_order_and_stock_in_imports(self):
+        from inventory.models import StockBalance
+        from partners.models import Supplier
+        from procurement.models import GoodsReceipt
+        from sales.models import SalesOrder
+        from warehouses.models import Location, Warehouse
+
+        warehouse = Warehouse.objects.create(code='BLK-WH', name='Bulk WH')
+        location = Location.objects.create(warehouse=warehouse, code='BLK-L', name='Bulk Loc')
+        Supplier.objects.create(code='BLK-SUP', name='Bulk Supplier')
+        self.client.force_login(self.user)
+
+        sales_header = ['Billing Date', 'Product / Service Name', 'Item Code (SKU)', 'Quantity', 'Item Price', 'Receipt No', 'Customer Name']
+        response = self.client.post('/core/import/sales-orders/', {'csv_file': csv_upload([
+            dict(zip(sales_header, row)) for row in [
+                ['2025-03-01', '', 'blk-old', '2', '15', 'BLK-R1', 'Bulk Buyer'],
+                ['2025-03-01', 'Old name', '', '1', '', 'BLK-R1', 'Bulk Buyer'],
+                ['2025-03-01', 'Missing', '', '1', '', 'BLK-R1', 'Bulk Buyer'],
+            ]
+        ])})
+        result = response.context['result']
+        self.assertEqual(result.created, 1)
+        self.assertEqual([e['row_num'] for e in result.errors], [4])
+        order = SalesOrder.objects.get(receipt_no='BLK-R1')
+        self.assertEqual(order.customer.name, 'Bulk Buyer')
+        self.assertEqual(sorted(order.lines.values_list('qty_ordered', flat=True)), [Decimal('1'), Decimal('2')])
+
+        stock_header = ['Stock-In Date', 'Warehouse', 'Supplier', 'Product Name', 'Item Code', 'Qty', 'Unit Cost', 'Location']
+        response = self.client.post('/core/import/procurement/', {'csv_file': csv_upload([
+            dict(zip(stock_header, row)) for row in [
+                ['2025-03-05', 'blk-wh', 'Bulk Supplier', 'Old name', '', '4', '3', 'blk-l'],
+                ['2025-03-05', 'Bulk WH', 'BLK-SUP', '', 'BLK-OLD', '6', '3', ''],
+                ['2025-03-05', 'Bulk WH', 'BLK-SUP', 'Old name', '', '0', '3', ''],
+            ]
+        ])})
+        result = response.context['result']
+        self.assertEqual((result.created, result.skipped), (2, 1))
+        grn = GoodsReceipt.objects.get(warehouse=warehouse)
+        self.assertEqual(grn.status, 'POSTED')
+        self.assertEqual(grn.purchase_order.lines.get().qty_ordered, Decimal('10'))
+        self.assertEqual(StockBalance.objects.get(item=self.item, location=location).qty_on_hand, Decimal('10'))
@@ -0,0 +1,108 @@
+"""
+Tests for bulk price conversion in catalog list views (catalog.utils.bulk_convert_prices).
+
+Scenarios covered:
+  1. bulk_convert_prices matches the single-item conversion helpers.
+  2. Selling prices honour conversion_price, cost prices never do.
+  3. /api/items/?unit=<id> issues the same number of queries for 3 and 20 items.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from catalog.models import Category, Unit, UnitCategory, UnitConversion, Item, ItemType
+from catalog.utils import (
+    bulk_convert_prices, bulk_get_prices_for_unit, convert_price_for_unit,
+    get_conversion_factor, get_item_cogs_for_unit,
+)
+
+User = get_user_model()
+
+
+class BulkPriceConversionTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('bulkprice_u', 'bp@test.com', 'pass')
+        cls.roll = Unit.objects.create(name='BP Roll', abbreviation='bprl', category=UnitCategory.LENGTH)
+        cls.meter = Unit.objects.create(name='BP Meter', abbreviation='bpm', category=UnitCategory.LENGTH)
+        cls.foot = Unit.objects.create(name='BP Foot', abbreviation='bpft', category=UnitCategory.LENGTH)
+        # 1 roll = 50 m, 1 m = 3 ft
+        UnitConversion.objects.create(from_unit=cls.roll, to_unit=cls.meter, factor=Decimal('50'))
+        UnitConversion.objects.create(from_unit=cls.meter, to_unit=cls.foot, factor=Decimal('3'))
+        cls.cat = Category.objects.create(name='BP Cat', code='BPCAT')
+
+        cls.roll_item = cls._item('BP-ROLL', cls.roll, cost='300', selling='600')
+        cls.meter_item = cls._item('BP-METER', cls.meter, cost='5', selling='12')
+        # Item-specific roll → meter with an explicit per-meter selling price
+        cls.special = cls._item('BP-SPECIAL', cls.roll, cost='400', selling='800')
+        UnitConversion.objects.create(
+            from_unit=cls.roll, to_unit=cls.meter, factor=Decimal('40'),
+            conversion_price=Decimal('25'), item=cls.special,
+        )
+
+    @classmethod
+    def _item(cls, code, unit, cost, selling):
+        return Item.objects.create(
+            code=code, name=code, item_type=ItemType.FINISHED, category=cls.cat,
+            default_unit=unit, cost_price=Decimal(cost), selling_price=Decimal(selling),
+        )
+
+    def _items(self):
+        return list(
+            Item.objects.filter(code__startswith='BP-').select_related('default_unit', 'selling_unit')
+        )
+
+    def test_matches_single_item_helpers(self):
+        for target in (self.roll, self.meter, self.foot):
+            result = bulk_convert_prices(self._items(), target)
+            for item in self._items():
+                row = result[item.id]
+                self.assertEqual(
+                    row['selling_price'],
+                    convert_price_for_unit(item.selling_price, item.stock_unit, target, item=item),
+                )
+                self.assertEqual(
+                    row['cost_price'],
+                    convert_price_for_unit(
+                        item.cost_price, item.stock_unit, target, item=item, use_conversion_price=False,
+                    ),
+                )
+                self.assertEqual(row['factor'], get_conversion_factor(item.stock_unit, target, item=item))
+
+    def test_selling_uses_conversion_price_cost_does_not(self):
+        row = bulk_convert_prices(self._items(), self.meter)[self.special.id]
+        self.assertEqual(row['selling_price'], Decimal('25.0000'))
+        self.assertEqual(row['cost_price'], Decimal('10.0000'))
+        self.assertEqual(row['factor'], Decimal('40'))
+        self.assertEqual(row['cost_price'], get_item_cogs_for_unit(self.special, self.meter))
+
+    def test_bulk_get_prices_for_unit(self):
+        prices = bulk_get_prices_for_unit(self._items(), self.foot)
+        self.assertEqual(prices[self.roll_item.id], Decimal('4.0000'))
+        self.assertEqual(prices[self.meter_item.id], Decimal('4.0000'))
+
+    def _list_queries(self, unit):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/items/', {'unit': unit.pk, 'search': 'BP-'})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()['results']
+
+    def test_list_query_count_independent_of_page_size(self):
+        self.client.force_login(self.user)
+        small_count, small = self._list_queries(self.foot)
+        self.assertEqual(len(small), 3)
+
+        for i in range(17):
+            self._item(f'BP-EXTRA-{i:02d}', self.roll, cost='150', selling='300')
+        large_count, large = self._list_queries(self.foot)
+        self.assertEqual(len(large), 20)
+        self.assertEqual(small_count, large_count)
+
+        by_code = {row['code']: row for row in large}
+        self.assertEqual(by_code['BP-ROLL']['converted_selling_price'], 4.0)
+        self.assertEqual(by_code['BP-ROLL']['conversion_factor'], 150.0)
+        self.assertEqual(by_code['BP-EXTRA-00']['converted_selling_price'], 2.0)
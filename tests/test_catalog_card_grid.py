@@ -137,7 +137,7 @@ class CatalogCardGridViewTests(TestCase):
     def test_excel_export_contains_all_items(self):
         import openpyxl, io
         r = self.client.get(reverse('catalog_export_excel'))
-        wb = openpyxl.load_workbook(io.BytesIO(r.content))
+        wb = openpyxl.load_workbook(io.BytesIO(b''.join(r.streaming_content)))
         ws = wb.active
         # Row 1 = header, rows 2+ = data; expect 15 data rows
         self.assertEqual(ws.max_row - 1, 15)
@@ -145,7 +145,7 @@ class CatalogCardGridViewTests(TestCase):
     def test_excel_export_headers(self):
         import openpyxl, io
         r = self.client.get(reverse('catalog_export_excel'))
-        wb = openpyxl.load_workbook(io.BytesIO(r.content))
+        wb = openpyxl.load_workbook(io.BytesIO(b''.join(r.streaming_content)))
         ws = wb.active
         headers = [ws.cell(row=1, column=c).value for c in range(1, ws.max_column + 1)]
         self.assertIn('Code', headers)
@@ -156,7 +156,7 @@ class CatalogCardGridViewTests(TestCase):
     def test_excel_export_respects_search_filter(self):
         import openpyxl, io
         r = self.client.get(reverse('catalog_export_excel') + '?q=GRID-005')
-        wb = openpyxl.load_workbook(io.BytesIO(r.content))
+        wb = openpyxl.load_workbook(io.BytesIO(b''.join(r.streaming_content)))
         ws = wb.active
         self.assertEqual(ws.max_row - 1, 1)
         self.assertEqual(ws.cell(row=2, column=1).value, 'GRID-005')
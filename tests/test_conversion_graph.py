@@ -0,0 +1,87 @@
+"""
+Tests for the in-process unit-conversion graph (catalog/conversions.py).
+
+Scenarios covered:
+  1. Multi-hop paths (roll → meter → foot) resolve in both directions.
+  2. Item-specific records override global ones along a path.
+  3. post_save / post_delete on UnitConversion invalidate the graph.
+  4. A warm graph serves lookups without touching the database.
+  5. convert_price_for_unit uses multi-hop factors.
+"""
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+
+from catalog.models import (
+    Category, Unit, UnitCategory, UnitConversion, Item, ItemType, convert_to_base_unit,
+)
+from catalog.utils import convert_price_for_unit, get_conversion_factor
+
+
+class ConversionGraphTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roll = Unit.objects.create(name='CG Roll', abbreviation='cgrl', category=UnitCategory.LENGTH)
+        cls.meter = Unit.objects.create(name='CG Meter', abbreviation='cgm', category=UnitCategory.LENGTH)
+        cls.foot = Unit.objects.create(name='CG Foot', abbreviation='cgft', category=UnitCategory.LENGTH)
+        cls.kg = Unit.objects.create(name='CG Kilo', abbreviation='cgkg', category=UnitCategory.MASS)
+        # 1 roll = 50 m, 1 m = 3 ft (round numbers keep the assertions exact)
+        UnitConversion.objects.create(from_unit=cls.roll, to_unit=cls.meter, factor=Decimal('50'))
+        UnitConversion.objects.create(from_unit=cls.meter, to_unit=cls.foot, factor=Decimal('3'))
+
+        cls.cat = Category.objects.create(name='CG Cat', code='CGCAT')
+        cls.item = Item.objects.create(
+            code='CG-ITEM', name='CG Item', item_type=ItemType.FINISHED,
+            category=cls.cat, default_unit=cls.roll,
+            cost_price=Decimal('300'), selling_price=Decimal('600'),
+        )
+
+    def test_multi_hop_forward(self):
+        self.assertEqual(convert_to_base_unit(Decimal('2'), self.roll, self.foot), Decimal('300'))
+
+    def test_multi_hop_reverse(self):
+        self.assertEqual(convert_to_base_unit(Decimal('150'), self.foot, self.roll), Decimal('1'))
+
+    def test_unconnected_units_still_raise(self):
+        with self.assertRaises(ValueError):
+            convert_to_base_unit(Decimal('1'), self.foot, self.kg)
+        self.assertIsNone(get_conversion_factor(self.foot, self.kg))
+
+    def test_item_specific_edge_overrides_global_on_path(self):
+        UnitConversion.objects.create(
+            from_unit=self.roll, to_unit=self.meter, factor=Decimal('40'), item=self.item,
+        )
+        self.assertEqual(
+            convert_to_base_unit(Decimal('1'), self.roll, self.foot, item=self.item), Decimal('120'),
+        )
+        self.assertEqual(convert_to_base_unit(Decimal('1'), self.roll, self.foot), Decimal('150'))
+
+    def test_save_and_delete_invalidate_graph(self):
+        conv = UnitConversion.objects.get(from_unit=self.meter, to_unit=self.foot)
+        self.assertEqual(get_conversion_factor(self.meter, self.foot), Decimal('3'))
+
+        conv.factor = Decimal('4')
+        conv.save()
+        self.assertEqual(get_conversion_factor(self.meter, self.foot), Decimal('4'))
+
+        conv.delete()
+        self.assertIsNone(get_conversion_factor(self.roll, self.foot))
+
+    def test_price_conversion_uses_multi_hop(self):
+        # 600 per roll / 150 ft per roll = 4 per ft
+        price = convert_price_for_unit(self.item.selling_price, self.roll, self.foot, item=self.item)
+        self.assertEqual(price, Decimal('4.0000'))
+
+    @override_settings(CONVERSION_GRAPH_TTL=3600)
+    def test_warm_graph_needs_no_queries(self):
+        from catalog import conversions
+
+        conversions.get_conversion_graph()
+        # Outside of a pending conversion write the version stamp is only
+        # rechecked once the TTL expires.
+        conversions._registry.volatile = False
+        with self.assertNumQueries(0):
+            for _ in range(20):
+                convert_to_base_unit(Decimal('1'), self.roll, self.foot, item=self.item)
+                get_conversion_factor(self.foot, self.meter)
@@ -0,0 +1,117 @@
+"""
+Tests for the streaming CSV upload parser (core.import_utils.iter_csv_upload)
+and batch-by-batch imports.
+
+Scenarios covered:
+  1. Rows come out lazily and intact when chunks split a BOM, a multi-byte
+     character, a quoted field with a line break and a line ending.
+  2. Encoding: latin-1 when the first chunk is not UTF-8; a later invalid
+     chunk switches the rest of the file to latin-1.
+  3. Missing, non-CSV and header-only uploads raise ValueError;
+     parse_csv_upload still returns a list.
+  4. BulkImporter writes each batch before reading the next rows.
+  5. A row the csv module rejects stops the import with an error on that
+     row; earlier batches stay saved.
+"""
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
+from django.test import TestCase
+
+from catalog.models import Category, Item, Unit
+from core.import_utils import iter_csv_upload, parse_csv_upload
+from core.importers import CatalogImporter
+
+User = get_user_model()
+
+
+def upload(data, name='rows.csv'):
+    # Chunked like an upload spooled to disk; in-memory uploads come in one chunk.
+    return UploadedFile(io.BytesIO(data), name=name, content_type='text/csv', size=len(data))
+
+
+class CsvStreamingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('stream_u', 'stream@test.com', 'pass')
+        Category.objects.create(code='STR', name='Stream')
+        Unit.objects.create(name='Stream Piece', abbreviation='spc')
+
+    def _catalog_csv(self, n, extra=b''):
+        lines = [b'Item Code (SKU),Product / Service Name,Category,Unit']
+        lines += [f'STR-{i},Item {i},Stream,spc'.encode() for i in range(n)]
+        return b'\r\n'.join(lines) + b'\r\n' + extra
+
+    def test_rows_survive_chunk_boundaries(self):
+        data = '﻿Code,Name,Notes\r\nA-1,Café ₱,"two\r\nlines"\r\nA-2,Plain,\r\n'.encode('utf-8')
+        for chunk_size in (1, 2, 3, 5, 7, len(data)):
+            headers, rows = iter_csv_upload(upload(data), chunk_size=chunk_size)
+            self.assertEqual(headers, ['Code', 'Name', 'Notes'])
+            self.assertEqual(list(rows), [
+                {'Code': 'A-1', 'Name': 'Café ₱', 'Notes': 'two\r\nlines'},
+                {'Code': 'A-2', 'Name': 'Plain', 'Notes': ''},
+            ], chunk_size)
+
+    def test_latin1_fallback(self):
+        data = 'Code,Name\nL-1,Señor\n'.encode('latin-1')
+        _, rows = iter_csv_upload(upload(data))
+        self.assertEqual(next(rows)['Name'], 'Señor')
+
+        data = 'Code,Name\nU-1,Café\n'.encode('utf-8') + 'U-2,Señor\n'.encode('latin-1')
+        _, rows = iter_csv_upload(upload(data), chunk_size=16)
+        self.assertEqual([row['Name'] for row in rows], ['Café', 'Señor'])
+
+    def test_invalid_uploads(self):
+        for uploaded, message in (
+            (None, 'No file was uploaded.'),
+            (upload(b'Code\nA\n', name='rows.xlsx'), 'Only CSV files are accepted.'),
+            (upload(b'Code,Name\r\n'), 'The CSV file is empty (no data rows found).'),
+        ):
+            with self.assertRaisesMessage(ValueError, message):
+                iter_csv_upload(uploaded)
+        headers, rows = parse_csv_upload(upload(b'Code,Name\nA,B\n'))
+        self.assertEqual((headers, rows), (['Code', 'Name'], [{'Code': 'A', 'Name': 'B'}]))
+
+    def test_batches_are_written_before_reading_on(self):
+        events = []
+
+        class Recorder(CatalogImporter):
+            batch_size = 2
+
+            def write(self, objs):
+                events.append(('write', len(objs)))
+                super().write(objs)
+
+        _, rows = iter_csv_upload(upload(self._catalog_csv(5)), chunk_size=8)
+
+        def reading(rows):
+            for row in rows:
+                events.append(('read', row['Item Code (SKU)']))
+                yield row
+
+        result = Recorder(self.user).run(reading(rows))
+        self.assertEqual(result.created, 5)
+        self.assertEqual(events, [
+            ('read', 'STR-0'), ('read', 'STR-1'), ('write', 2),
+            ('read', 'STR-2'), ('read', 'STR-3'), ('write', 2),
+            ('read', 'STR-4'), ('write', 1),
+        ])
+
+    def test_unreadable_row_stops_the_import(self):
+        class Small(CatalogImporter):
+            batch_size = 2
+
+        # A field over the csv module's 128 KiB field size limit.
+        data = self._catalog_csv(3, extra=b'STR-X,' + b'x' * 200000 + b',Stream,spc\r\nSTR-Y,After,Stream,spc\r\n')
+        _, rows = iter_csv_upload(upload(data))
+        result = Small(self.user).run(rows)
+        self.assertEqual(result.created, 3)
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(result.errors[0]['row_num'], 5)
+        self.assertIn('Could not read line', result.errors[0]['message'])
+        self.assertEqual(
+            sorted(Item.objects.filter(code__startswith='STR-').values_list('code', flat=True)),
+            ['STR-0', 'STR-1', 'STR-2'],
+        )
@@ -0,0 +1,95 @@
+"""
+Tests for the dashboard metrics layer (theme/metrics.py).
+
+Scenarios covered:
+  1. A second dashboard load is served from cache.
+  2. Saving a model bumps only the widgets reading its data group.
+  3. The JSON widget endpoint returns data and per-widget timings.
+  4. The 7-day revenue trend is computed with a single query.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.models import Expense, ExpenseCategory, Invoice
+from theme.metrics import get_widgets, period_bounds, revenue_trend_widget
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'dashboard-tests'}}
+
+
+@override_settings(CACHES=LOCMEM)
+class DashboardMetricsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('dash_u', 'dash@test.com', 'pass')
+        cls.category = ExpenseCategory.objects.create(name='Dash Utilities', code='DASH-UTIL')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_second_load_is_cached(self):
+        first = self.client.get('/dashboard/?period=month')
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(any(t['cached'] for t in first.context['dash_timings'].values()))
+        self.assertIn('revenue;dur=', first['Server-Timing'])
+
+        with self.assertNumQueries(2):  # session + user
+            second = self.client.get('/dashboard/?period=month')
+        self.assertTrue(all(t['cached'] for t in second.context['dash_timings'].values()))
+        self.assertEqual(second.context['total_items'], first.context['total_items'])
+
+    def test_save_invalidates_only_matching_widgets(self):
+        get_widgets(period='today')
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(
+                category=self.category, item_description='Power', amount=Decimal('125'),
+                date=date.today(), created_by=self.user,
+            )
+        data, timings = get_widgets(period='today')
+        self.assertFalse(timings['expenses']['cached'])
+        self.assertTrue(timings['revenue']['cached'])
+        self.assertTrue(timings['inventory']['cached'])
+        self.assertEqual(data['expenses']['total_expenses'], Decimal('125'))
+
+    def test_periods_are_cached_separately(self):
+        Expense.objects.create(
+            category=self.category, item_description='Old rent', amount=Decimal('40'),
+            date=date.today().replace(month=1, day=1) - timedelta(days=1), created_by=self.user,
+        )
+        self.assertEqual(get_widgets(['expenses'], period='today')[0]['expenses']['total_expenses'], 0)
+        _, timings = get_widgets(['expenses'], period='year')
+        self.assertFalse(timings['expenses']['cached'])
+
+    def test_widgets_api(self):
+        response = self.client.get('/dashboard/widgets/', {'widgets': 'pending,open_shifts', 'period': 'week'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['period'], 'week')
+        self.assertEqual(set(body['widgets']), {'pending', 'open_shifts'})
+        self.assertEqual(body['widgets']['pending']['pending_approvals_total'], 0)
+        self.assertIn('ms', body['timings']['pending'])
+
+        response = self.client.get('/dashboard/widgets/', {'widgets': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_revenue_trend_single_query(self):
+        today = date.today()
+        for days_ago, amount in ((0, '100'), (0, '50'), (3, '20'), (9, '999')):
+            Invoice.objects.create(
+                invoice_number=f'DASH-{days_ago}-{amount}', date=today,
+                grand_total=Decimal(amount), is_paid=True,
+                paid_date=today - timedelta(days=days_ago), created_by=self.user,
+            )
+        with self.assertNumQueries(1):
+            trend = revenue_trend_widget(period_bounds('today'))['revenue_trend']
+        self.assertEqual(len(trend), 7)
+        self.assertEqual(trend[-1]['revenue'], 150.0)
+        self.assertEqual(trend[-4]['revenue'], 20.0)
+        self.assertEqual(sum(day['revenue'] for day in trend), 170.0)
@@ -0,0 +1,171 @@
+"""
+Tests for document number sequences (core/sequences.py).
+
+Scenarios covered:
+  1. Numbers are sequential and continue from numbers already in the table.
+  2. A rolled-back transaction hands its number back (gapless).
+  3. Pre-allocated blocks serve numbers from memory after commit.
+  4. Many threads posting POS sales at once get unique, gapless numbers.
+"""
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from accounts.models import User
+from catalog.models import Category, Unit, Item
+from core.models import DocumentSequence
+from core.sequences import next_value, reset_block_cache
+from inventory.models import StockBalance
+from inventory.services import generate_document_number
+from pos.models import POSRegister, POSSale, POSSaleLine, POSPayment, PaymentMethod, SaleStatus
+from pos.services import generate_sale_number, open_shift, post_pos_sale
+from procurement.models import PurchaseOrder
+from partners.models import Supplier
+from warehouses.models import Warehouse, Location
+
+
+class DocumentSequenceTest(TestCase):
+
+    def setUp(self):
+        reset_block_cache()
+        self.addCleanup(reset_block_cache)
+
+    def test_sequential_numbers(self):
+        self.assertEqual([next_value('TST') for _ in range(3)], [1, 2, 3])
+        self.assertEqual(DocumentSequence.objects.get(name='TST').last_value, 3)
+
+    def test_seeded_from_existing_documents(self):
+        user = User.objects.create_user(username='seq_u', password='pass123')
+        supplier = Supplier.objects.create(code='SEQ-SUP', name='Seq Supplier')
+        warehouse = Warehouse.objects.create(code='SEQ-WH', name='Seq WH')
+        PurchaseOrder.objects.create(
+            document_number='PO-000041', supplier=supplier, order_date=date.today(),
+            warehouse=warehouse, created_by=user,
+        )
+        # Non-numeric numbers of the same prefix are ignored.
+        PurchaseOrder.objects.create(
+            document_number='PO-IMPORTED-9', supplier=supplier, order_date=date.today(),
+            warehouse=warehouse, created_by=user,
+        )
+        self.assertEqual(generate_document_number('PO', PurchaseOrder), 'PO-000042')
+        self.assertEqual(generate_document_number('PO', PurchaseOrder), 'PO-000043')
+
+    def test_rollback_returns_number(self):
+        self.assertEqual(next_value('TST'), 1)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertEqual(next_value('TST'), 2)
+                raise RuntimeError('document save failed')
+        self.assertEqual(next_value('TST'), 2)
+
+    @override_settings(DOCUMENT_SEQUENCE_BLOCKS={'BLK': 10})
+    def test_blocks_are_served_from_memory(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(next_value('BLK'), 1)
+        self.assertEqual(DocumentSequence.objects.get(name='BLK').last_value, 10)
+        with self.assertNumQueries(0):
+            values = [next_value('BLK') for _ in range(9)]
+        self.assertEqual(values, list(range(2, 11)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(next_value('BLK'), 11)
+        self.assertEqual(DocumentSequence.objects.get(name='BLK').last_value, 20)
+
+    @override_settings(DOCUMENT_SEQUENCE_BLOCKS={'BLK': 10})
+    def test_rolled_back_block_is_not_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    next_value('BLK')
+                    raise RuntimeError('rolled back')
+        self.assertEqual(next_value('BLK'), 1)
+
+
+class ConcurrentSaleNumberTest(TransactionTestCase):
+    """Threads posting sales simultaneously never share or skip a number."""
+
+    THREADS = 8
+    SALES_PER_THREAD = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='seq_cashier', password='pass123')
+        category = Category.objects.create(code='SEQCAT', name='Seq')
+        self.unit = Unit.objects.create(name='Seq Piece', abbreviation='sqpc')
+        self.item = Item.objects.create(
+            code='SEQ-ITEM', name='Seq Item', item_type='FINISHED',
+            category=category, default_unit=self.unit,
+        )
+        self.warehouse = Warehouse.objects.create(code='SEQ-POS', name='Seq POS')
+        self.location = Location.objects.create(
+            warehouse=self.warehouse, code='SEQ-BIN', name='Seq Bin',
+        )
+        self.register = POSRegister.objects.create(
+            name='Seq Register', warehouse=self.warehouse, default_location=self.location,
+        )
+        StockBalance.objects.create(
+            item=self.item, location=self.location, qty_on_hand=Decimal('1000'),
+        )
+        self.shift = open_shift(self.register, self.user, Decimal('0'))
+
+    def _post_sale(self):
+        with transaction.atomic():
+            sale = POSSale.objects.create(
+                sale_no=generate_sale_number(),
+                register=self.register, shift=self.shift,
+                warehouse=self.warehouse, location=self.location,
+                created_by=self.user, status=SaleStatus.PAID,
+                subtotal=Decimal('10'), grand_total=Decimal('10'),
+            )
+            POSSaleLine.objects.create(
+                sale=sale, item=self.item, location=self.location,
+                qty=Decimal('1'), unit=self.unit,
+                unit_price=Decimal('10'), line_total=Decimal('10'),
+            )
+            POSPayment.objects.create(
+                sale=sale, method=PaymentMethod.CASH, amount=Decimal('10'),
+            )
+            post_pos_sale(sale.pk, self.user)
+
+    def _post_sales(self, errors):
+        try:
+            for _ in range(self.SALES_PER_THREAD):
+                # The SQLite test database allows a single writer and reports
+                # contention as an error instead of blocking like Postgres row
+                # locks, so the whole sale is retried — the rolled-back
+                # attempt must hand its number back.
+                for attempt in range(500):
+                    try:
+                        self._post_sale()
+                        break
+                    except OperationalError as exc:
+                        if connection.vendor != 'sqlite' or 'locked' not in str(exc):
+                            raise
+                        time.sleep(0.01)
+        except Exception as exc:  # surfaced in the main thread
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def test_many_threads_posting_sales(self):
+        errors = []
+        threads = [
+            threading.Thread(target=self._post_sales, args=(errors,))
+            for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.SALES_PER_THREAD
+        numbers = sorted(POSSale.objects.values_list('sale_no', flat=True))
+        self.assertEqual(numbers, [f'POS-{n:06d}' for n in range(1, total + 1)])
+        self.assertEqual(
+            POSSale.objects.filter(status=SaleStatus.POSTED).count(), total,
+        )
+        balance = StockBalance.objects.get(item=self.item, location=self.location)
+        self.assertEqual(balance.qty_on_hand, Decimal('1000') - total)
@@ -0,0 +1,210 @@
+"""
+Tests for the monthly financial statement rollups (reports.financials).
+
+Scenarios covered:
+  1. Closing a month snapshots revenue by source, discount, invoice COGS,
+     expenses by category and payments by method.
+  2. The statement reads closed months from snapshots and the open month
+     live, with the same totals as before closing.
+  3. A closed month is frozen: later changes to its invoices do not reach
+     the statement until it is reopened and closed again.
+  4. A range starting mid-month computes that month live.
+  5. The current month cannot be closed; close_financial_months closes every
+     completed month once; the command closes and reopens months.
+  6. The statement's query count does not grow with closed months.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reports.financials import (
+    close_financial_months, close_month, live_months, month_start, statement_months,
+)
+from reports.models import MonthlyFinancialSnapshot
+
+User = get_user_model()
+
+
+class FinancialSnapshotTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from catalog.models import Category, Item, Unit
+        from core.models import ExpenseCategory
+        from services.models import CustomerService, ServiceLine, ServiceStatus
+        from warehouses.models import Warehouse
+
+        cls.user = User.objects.create_superuser('fin_u', 'fin@test.com', 'pass')
+        cls.this_month = month_start(timezone.localdate())
+        cls.last_month = month_start(cls.this_month - timedelta(days=1))
+        cls.two_months_ago = month_start(cls.last_month - timedelta(days=1))
+
+        cls.rent = ExpenseCategory.objects.create(name='Fin Rent', code='FIN-RENT')
+        cls.freight = ExpenseCategory.objects.create(name='Fin Freight', code='FIN-FRT', is_cogs=True)
+
+        unit = Unit.objects.create(name='Fin Piece', abbreviation='fnpc')
+        cat = Category.objects.create(name='Fin', code='FIN')
+        item = Item.objects.create(
+            code='FIN-A', name='Fin A', category=cat, default_unit=unit,
+            cost_price=Decimal('10'), selling_price=Decimal('30'),
+        )
+        warehouse = Warehouse.objects.create(code='FIN-WH', name='Fin WH')
+
+        # Two months ago: a service invoice of 300 less 20 (COGS 3 × 10), paid by card.
+        cls.service_invoice = cls._invoice('FIN-1', cls.two_months_ago + timedelta(days=4), '300', '20', 'CARD')
+        service = CustomerService.objects.create(
+            service_number='FIN-SVC-1', service_name='Fin Service', customer_name='Walk-in',
+            service_date=cls.two_months_ago, status=ServiceStatus.COMPLETED, warehouse=warehouse,
+            invoice=cls.service_invoice, created_by=cls.user,
+        )
+        ServiceLine.objects.create(service=service, item=item, qty=Decimal('3'), unit=unit, unit_price=Decimal('30'))
+        cls._expense(cls.rent, cls.two_months_ago + timedelta(days=1), '100')
+        cls._expense(cls.freight, cls.two_months_ago + timedelta(days=2), '15')
+
+        # Last month: two invoices paid in cash, one unpaid, one void.
+        cls.late_invoice = cls._invoice('FIN-2', cls.last_month + timedelta(days=10), '200', '0', 'CASH')
+        cls._invoice('FIN-3', cls.last_month, '50', '5', 'CASH')
+        cls._invoice('FIN-4', cls.last_month, '999', '0', None, is_paid=False)
+        cls._invoice('FIN-5', cls.last_month, '999', '0', 'CASH', is_void=True)
+        cls._expense(cls.rent, cls.last_month + timedelta(days=5), '100')
+
+        # This month: one invoice paid by GCash.
+        cls._invoice('FIN-6', cls.this_month, '80', '0', 'GCASH')
+
+    @classmethod
+    def _invoice(cls, number, paid_date, total, discount, method, is_paid=True, is_void=False):
+        from core.models import Invoice, InvoicePayment
+
+        invoice = Invoice.objects.create(
+            invoice_number=number, date=paid_date, grand_total=Decimal(total),
+            discount_total=Decimal(discount), is_paid=is_paid, is_void=is_void,
+            paid_date=paid_date if is_paid else None, created_by=cls.user,
+        )
+        if method:
+            InvoicePayment.objects.create(
+                invoice=invoice, date=paid_date, method=method, amount=Decimal(total), created_by=cls.user,
+            )
+        return invoice
+
+    @classmethod
+    def _expense(cls, category, day, amount):
+        from core.models import Expense
+
+        return Expense.objects.create(date=day, category=category, amount=Decimal(amount), created_by=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _statement(self, date_from=None, date_to=None):
+        response = self.client.get('/reports/financial-statement/', {
+            'date_from': (date_from or self.two_months_ago).isoformat(),
+            'date_to': (date_to or timezone.localdate()).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def _figures(self, context):
+        return {
+            key: context[key] for key in (
+                'invoice_revenue', 'svc_invoice_revenue', 'discount', 'cogs_from_invoices',
+                'cogs_expenses', 'total_opex', 'net_profit', 'inv_count', 'payment_total_collected',
+            )
+        }
+
+    def test_close_month_snapshots_totals(self):
+        snapshot, created = close_month(self.two_months_ago + timedelta(days=9))
+        self.assertTrue(created)
+        self.assertEqual(snapshot.month, self.two_months_ago)
+        self.assertEqual(
+            (snapshot.revenue, snapshot.svc_revenue, snapshot.pos_revenue, snapshot.discount,
+             snapshot.invoice_cogs, snapshot.invoice_count),
+            (Decimal('300'), Decimal('300'), Decimal('0'), Decimal('20'), Decimal('30'), 1),
+        )
+        self.assertEqual(
+            {(row.category_name, row.is_cogs, row.amount) for row in snapshot.expenses.all()},
+            {('Fin Rent', False, Decimal('100')), ('Fin Freight', True, Decimal('15'))},
+        )
+        self.assertEqual(
+            [(row.method, row.amount, row.count) for row in snapshot.payments.all()],
+            [('CARD', Decimal('300'), 1)],
+        )
+        self.assertEqual(close_month(self.two_months_ago), (snapshot, False))
+
+    def test_statement_reads_snapshots_with_same_totals(self):
+        before = self._figures(self._statement())
+        self.assertEqual(before['invoice_revenue'], Decimal('630'))
+        self.assertEqual(before['cogs_from_invoices'], Decimal('30'))
+        self.assertEqual(before['cogs_expenses'], Decimal('15'))
+        self.assertEqual(before['total_opex'], Decimal('200'))
+        self.assertEqual(before['inv_count'], 4)
+
+        self.assertEqual(len(close_financial_months()), 2)
+        context = self._statement()
+        self.assertEqual(self._figures(context), before)
+        self.assertEqual(len(context['trend_labels']), 3)
+        self.assertEqual(
+            {row['method']: row['total'] for row in context['payment_method_rows']},
+            {'CARD': Decimal('300'), 'CASH': Decimal('250'), 'GCASH': Decimal('80')},
+        )
+
+    def test_closed_month_is_frozen_until_reopened(self):
+        close_financial_months()
+        self.late_invoice.is_void = True
+        self.late_invoice.save()
+        self.assertEqual(self._statement()['invoice_revenue'], Decimal('630'))
+
+        call_command('close_financial_months', reopen=self.last_month.strftime('%Y-%m'), stdout=StringIO())
+        self.assertEqual(self._statement()['invoice_revenue'], Decimal('430'))
+        close_financial_months()
+        self.assertEqual(
+            MonthlyFinancialSnapshot.objects.get(month=self.last_month).revenue, Decimal('50'),
+        )
+
+    def test_partial_month_is_computed_live(self):
+        close_financial_months()
+        MonthlyFinancialSnapshot.objects.filter(month=self.last_month).update(revenue=Decimal('1'))
+        months = statement_months(self.last_month + timedelta(days=1), self.last_month + timedelta(days=20))
+        self.assertEqual(months[self.last_month]['revenue'], Decimal('200'))
+        self.assertEqual(
+            months, live_months(self.last_month + timedelta(days=1), self.last_month + timedelta(days=20)),
+        )
+
+    def test_close_rules_and_command(self):
+        with self.assertRaises(ValueError):
+            close_month(self.this_month)
+
+        out = StringIO()
+        call_command('close_financial_months', until=self.two_months_ago.strftime('%Y-%m'), stdout=out)
+        self.assertIn('1 month(s) closed.', out.getvalue())
+        call_command('close_financial_months', stdout=out)
+        self.assertIn('1 month(s) closed.', out.getvalue())
+        self.assertEqual(close_financial_months(), [])
+        self.assertEqual(
+            list(MonthlyFinancialSnapshot.objects.values_list('month', flat=True)),
+            [self.two_months_ago, self.last_month],
+        )
+
+    def test_statement_queries_do_not_grow_with_closed_months(self):
+        close_financial_months()
+
+        def count_queries(date_from):
+            with CaptureQueriesContext(connection) as ctx:
+                self._statement(date_from=date_from)
+            return len(ctx.captured_queries)
+
+        two_months = count_queries(self.two_months_ago)
+        for months_back in range(3, 15):
+            day = self.this_month
+            for _ in range(months_back):
+                day = month_start(day - timedelta(days=1))
+            self._invoice(f'FIN-OLD-{months_back}', day, '10', '0', 'CASH')
+            self._expense(self.rent, day, '1')
+        close_financial_months()
+        self.assertEqual(count_queries(day), two_months)
@@ -0,0 +1,186 @@
+"""
+Tests for the set-based invoice COGS engine (core.cogs.bulk_invoice_cogs)
+and sync_invoice_cogs --only-stale.
+
+Scenarios covered:
+  1. bulk_invoice_cogs matches compute_invoice_cogs for POS, sales order
+     (with a bundle) and service invoices, with unit conversions, in a
+     fixed number of queries.
+  2. A sync writes changed totals and stamps cogs_synced_at.
+  3. --only-stale skips invoices whose sources have not changed.
+  4. --only-stale picks up item cost, document and conversion changes.
+  5. --dry-run writes nothing.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from catalog.conversions import get_conversion_graph
+from catalog.models import Category, Item, Unit, UnitConversion
+from core.cogs import bulk_invoice_cogs, compute_invoice_cogs
+from core.models import Invoice
+
+User = get_user_model()
+
+
+class InvoiceCOGSSyncTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from partners.models import Customer
+        from pos.models import POSRegister, POSSale, POSSaleLine, POSShift, ShiftStatus
+        from pricing.models import PriceList, PriceListItem
+        from sales.models import SalesOrder, SalesOrderLine, SalesOrderPriceListLine
+        from services.models import CustomerService, ServiceLine
+        from warehouses.models import Location, Warehouse
+
+        cls.user = User.objects.create_superuser('cogs_sync_u', 'cs@test.com', 'pass')
+        cat = Category.objects.create(name='COGS Sync', code='CSY')
+        cls.piece = Unit.objects.create(name='Sync Piece', abbreviation='spc')
+        cls.box = Unit.objects.create(name='Sync Box', abbreviation='sbx')
+        cls.conversion = UnitConversion.objects.create(
+            from_unit=cls.box, to_unit=cls.piece, factor=Decimal('12'),
+        )
+        cls.item_a = Item.objects.create(
+            code='CSY-A', name='Sync A', category=cat, default_unit=cls.piece,
+            cost_price=Decimal('2.50'), selling_price=Decimal('5'),
+        )
+        cls.item_b = Item.objects.create(
+            code='CSY-B', name='Sync B', category=cat, default_unit=cls.box,
+            cost_price=Decimal('30'), selling_price=Decimal('50'),
+        )
+        wh = Warehouse.objects.create(code='CSY-WH', name='Sync WH')
+        loc = Location.objects.create(code='CSY-L', name='Sync Loc', warehouse=wh)
+        customer = Customer.objects.create(name='Sync Customer', code='CSY-C')
+
+        register = POSRegister.objects.create(name='CSY-REG', warehouse=wh, default_location=loc)
+        shift = POSShift.objects.create(
+            register=register, opened_by=cls.user, opened_at=timezone.now(),
+            opening_cash=Decimal('0'), status=ShiftStatus.OPEN,
+        )
+        sale = POSSale.objects.create(
+            sale_no='CSY-POS-1', register=register, shift=shift,
+            warehouse=wh, location=loc, created_by=cls.user,
+        )
+        POSSaleLine.objects.create(sale=sale, item=cls.item_a, qty=Decimal('2'), unit=cls.box)
+        POSSaleLine.objects.create(sale=sale, item=cls.item_b, qty=Decimal('5'), unit=cls.piece)
+
+        so = SalesOrder.objects.create(
+            document_number='CSY-SO-1', customer=customer, warehouse=wh,
+            order_date=date.today(), created_by=cls.user,
+        )
+        SalesOrderLine.objects.create(
+            sales_order=so, item=cls.item_b, qty_ordered=Decimal('1'), unit=cls.box,
+        )
+        bundle = PriceList.objects.create(name='CSY Bundle')
+        PriceListItem.objects.create(
+            price_list=bundle, item=cls.item_a, unit=cls.piece,
+            price=Decimal('4'), min_qty=Decimal('3'),
+        )
+        PriceListItem.objects.create(
+            price_list=bundle, item=cls.item_b, unit=cls.piece,
+            price=Decimal('4'), min_qty=Decimal('6'),
+        )
+        SalesOrderPriceListLine.objects.create(
+            sales_order=so, price_list=bundle, qty_multiplier=Decimal('2'),
+        )
+
+        cls.pos_invoice = Invoice.objects.create(
+            invoice_number='CSY-INV-POS', date=date.today(), pos_sale=sale, created_by=cls.user,
+        )
+        cls.so_invoice = Invoice.objects.create(
+            invoice_number='CSY-INV-SO', date=date.today(), sales_order=so, created_by=cls.user,
+        )
+        cls.service_invoice = Invoice.objects.create(
+            invoice_number='CSY-INV-SVC', date=date.today(), created_by=cls.user,
+        )
+        cls.service = CustomerService.objects.create(
+            service_number='CSY-SVC-1', service_name='Sync Service', customer_name='Walk-in',
+            service_date=date.today(), warehouse=wh, invoice=cls.service_invoice,
+            created_by=cls.user,
+        )
+        ServiceLine.objects.create(
+            service=cls.service, item=cls.item_a, location=loc, qty=Decimal('7'), unit=cls.piece,
+        )
+
+    def setUp(self):
+        from pos.models import POSSale
+        from pricing.models import PriceList, PriceListItem
+        from sales.models import SalesOrder
+        from services.models import CustomerService
+
+        # Fixtures date from before any sync, so only edits made by a test
+        # are newer than cogs_synced_at.
+        earlier = timezone.now() - timedelta(hours=1)
+        for model in (Item, UnitConversion, POSSale, SalesOrder, PriceList, PriceListItem,
+                      CustomerService, Invoice):
+            model._base_manager.update(updated_at=earlier)
+
+    def _sync(self, **options):
+        out = StringIO()
+        call_command('sync_invoice_cogs', stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def _cogs(self, invoice):
+        return Invoice.objects.get(pk=invoice.pk).grand_total_cogs
+
+    def test_bulk_matches_per_invoice(self):
+        invoices = list(Invoice.objects.filter(invoice_number__startswith='CSY-'))
+        # POS lines, SO lines, bundles, bundle items, service lines, the
+        # conversion graph freshness check and items.
+        get_conversion_graph()
+        with self.assertNumQueries(7):
+            bulk = bulk_invoice_cogs(invoices)
+        for inv in invoices:
+            self.assertEqual(bulk[inv.pk], compute_invoice_cogs(inv), inv.invoice_number)
+        # 2 boxes of A (12 × 2.50) + 5 pieces of B (30 / 12)
+        self.assertEqual(bulk[self.pos_invoice.pk], Decimal('72.50'))
+        # 1 box of B + 2 × (3 pieces of A + 6 pieces of B)
+        self.assertEqual(bulk[self.so_invoice.pk], Decimal('75.00'))
+        self.assertEqual(bulk[self.service_invoice.pk], Decimal('17.50'))
+
+    def test_sync_writes_totals_and_stamps(self):
+        output = self._sync()
+        self.assertIn('Sync complete. 3 updated', output)
+        self.assertEqual(self._cogs(self.so_invoice), Decimal('75.00'))
+        self.assertFalse(
+            Invoice.objects.filter(invoice_number__startswith='CSY-', cogs_synced_at__isnull=True).exists()
+        )
+        self.assertIn('0 updated, 3 already correct', self._sync())
+
+    def test_only_stale_skips_unchanged(self):
+        self._sync()
+        self.assertIn('0 updated, 0 already correct', self._sync(only_stale=True))
+
+    def test_only_stale_picks_up_changes(self):
+        from pos.models import POSSale
+
+        self._sync()
+        # Item cost change: reaches every invoice using item B.
+        Item.objects.filter(pk=self.item_b.pk).update(cost_price=Decimal('60'), updated_at=timezone.now())
+        self.assertIn('2 updated, 0 already correct', self._sync(only_stale=True))
+        self.assertEqual(self._cogs(self.pos_invoice), Decimal('85.00'))
+        self.assertEqual(self._cogs(self.so_invoice), Decimal('135.00'))
+        self.assertEqual(self._cogs(self.service_invoice), Decimal('17.50'))
+
+        # Document edit: only that invoice is recomputed.
+        POSSale.objects.filter(pk=self.pos_invoice.pos_sale_id).update(updated_at=timezone.now())
+        self.assertIn('0 updated, 1 already correct', self._sync(only_stale=True))
+
+        # Conversion change: every invoice is stale.
+        UnitConversion.objects.filter(pk=self.conversion.pk).update(
+            factor=Decimal('10'), updated_at=timezone.now(),
+        )
+        self.assertIn('Sync complete. 2 updated, 1 already correct', self._sync(only_stale=True))
+
+    def test_dry_run_writes_nothing(self):
+        output = self._sync(dry_run=True)
+        self.assertIn('CSY-INV-POS', output)
+        self.assertIn('Dry-run complete', output)
+        self.assertEqual(self._cogs(self.pos_invoice), Decimal('0'))
+        self.assertFalse(Invoice.objects.filter(cogs_synced_at__isnull=False).exists())
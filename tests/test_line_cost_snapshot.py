@@ -0,0 +1,184 @@
+"""
+Tests for the unit_cost / line_cogs snapshot stamped on lines at posting.
+
+Scenarios covered:
+  1. POS checkout and post_pos_sale stamp lines and stock moves at the cost
+     in the line's unit.
+  2. Approving a sales order stamps its lines and bundles.
+  3. A later item cost change leaves invoice and report COGS at the
+     posting-time cost.
+  4. Reports cost lines posted before the snapshot at the current cost,
+     with unit conversions.
+  5. backfill_line_costs stamps posted lines only; --dry-run writes nothing.
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from catalog.models import Category, Item, Unit, UnitConversion
+from core.cogs import compute_invoice_cogs
+from inventory.models import StockBalance, StockMove
+
+User = get_user_model()
+
+
+class LineCostSnapshotTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from partners.models import Customer
+        from pos.models import POSRegister
+        from pricing.models import PriceList, PriceListItem
+        from warehouses.models import Location, Warehouse
+
+        cls.user = User.objects.create_superuser('snap_u', 'snap@test.com', 'pass')
+        cat = Category.objects.create(name='Snapshot', code='SNP')
+        cls.piece = Unit.objects.create(name='Snap Piece', abbreviation='snpc')
+        cls.box = Unit.objects.create(name='Snap Box', abbreviation='snbx')
+        UnitConversion.objects.create(from_unit=cls.box, to_unit=cls.piece, factor=Decimal('12'))
+        cls.item = Item.objects.create(
+            code='SNP-A', name='Snap A', category=cat, default_unit=cls.piece,
+            cost_price=Decimal('2.50'), selling_price=Decimal('5'),
+        )
+        cls.warehouse = Warehouse.objects.create(code='SNP-WH', name='Snap WH')
+        cls.location = Location.objects.create(code='SNP-L', name='Snap Loc', warehouse=cls.warehouse)
+        StockBalance.objects.create(item=cls.item, location=cls.location, qty_on_hand=Decimal('1000'))
+        cls.register = POSRegister.objects.create(
+            name='SNP-REG', warehouse=cls.warehouse, default_location=cls.location,
+        )
+        cls.customer = Customer.objects.create(name='Snap Customer', code='SNP-C')
+        cls.bundle = PriceList.objects.create(name='SNP Bundle')
+        PriceListItem.objects.create(
+            price_list=cls.bundle, item=cls.item, unit=cls.piece,
+            price=Decimal('4'), min_qty=Decimal('3'),
+        )
+
+    def setUp(self):
+        from reports.facts import refresh_sales_facts
+
+        # The first (full) fact build is the refresh_sales_facts job's; the
+        # report views then refresh incrementally.
+        refresh_sales_facts()
+
+    def _checkout(self, qty=Decimal('2')):
+        from pos.models import PaymentMethod
+        from pos.services import checkout_cart, open_shift
+
+        shift = open_shift(self.register, self.user, Decimal('0'))
+        lines = [{'item': self.item.pk, 'qty': qty, 'unit': self.box.pk, 'unit_price': Decimal('40')}]
+        payments = [{'method': PaymentMethod.CASH, 'amount': Decimal('40') * qty}]
+        return checkout_cart(shift, self.user, lines, payments)
+
+    def _sales_order(self, **kwargs):
+        from sales.models import SalesOrder, SalesOrderLine, SalesOrderPriceListLine
+
+        so = SalesOrder.objects.create(
+            document_number=f'SNP-SO-{SalesOrder.objects.count() + 1}', customer=self.customer,
+            warehouse=self.warehouse, order_date=date.today(), created_by=self.user, **kwargs,
+        )
+        SalesOrderLine.objects.create(
+            sales_order=so, item=self.item, qty_ordered=Decimal('1'), unit=self.box,
+            unit_price=Decimal('50'),
+        )
+        SalesOrderPriceListLine.objects.create(sales_order=so, price_list=self.bundle, qty_multiplier=Decimal('2'))
+        return so
+
+    def _set_cost(self, cost):
+        Item.objects.filter(pk=self.item.pk).update(cost_price=cost, updated_at=timezone.now())
+
+    def _report_cogs(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/reports/profit-margin/')
+        self.assertEqual(response.status_code, 200)
+        return response.context['grand_cogs']
+
+    def test_pos_checkout_stamps_lines_and_moves(self):
+        sale = self._checkout()
+        line = sale.lines.get()
+        # 2 boxes of 12 pieces at 2.50
+        self.assertEqual(line.unit_cost, Decimal('30'))
+        self.assertEqual(line.line_cogs, Decimal('60'))
+        move = StockMove.objects.get(reference_type='POSSale', reference_id=sale.pk)
+        self.assertEqual(move.line_cogs, Decimal('60'))
+
+    def test_post_pos_sale_stamps_lines(self):
+        from pos.models import POSSale, POSSaleLine, SaleStatus
+        from pos.services import generate_sale_number, open_shift, post_pos_sale
+
+        shift = open_shift(self.register, self.user, Decimal('0'))
+        sale = POSSale.objects.create(
+            sale_no=generate_sale_number(), register=self.register, shift=shift,
+            warehouse=self.warehouse, location=self.location, created_by=self.user,
+            status=SaleStatus.PAID,
+        )
+        POSSaleLine.objects.create(
+            sale=sale, item=self.item, location=self.location, qty=Decimal('6'), unit=self.piece,
+            unit_price=Decimal('5'), line_total=Decimal('30'),
+        )
+        post_pos_sale(sale.pk, self.user)
+        line = sale.lines.get()
+        self.assertEqual((line.unit_cost, line.line_cogs), (Decimal('2.5'), Decimal('15')))
+
+    def test_sales_order_approval_stamps_lines_and_bundles(self):
+        so = self._sales_order()
+        self.client.force_login(self.user)
+        self.client.post(f'/sales/orders/{so.pk}/approve/')
+        line = so.lines.get()
+        self.assertEqual((line.unit_cost, line.line_cogs), (Decimal('30'), Decimal('30')))
+        bundle = so.price_list_lines.get()
+        # One set is 3 pieces at 2.50, sold twice.
+        self.assertEqual((bundle.unit_cost, bundle.line_cogs), (Decimal('7.5'), Decimal('15')))
+
+    def test_cost_change_after_posting_keeps_cogs(self):
+        from core.models import DocumentStatus
+
+        sale = self._checkout()
+        so = self._sales_order()
+        self.client.force_login(self.user)
+        self.client.post(f'/sales/orders/{so.pk}/approve/')
+        so.refresh_from_db()
+        self.assertEqual(so.status, DocumentStatus.APPROVED)
+        before = self._report_cogs()
+        self.assertEqual(before, Decimal('105'))
+
+        self._set_cost(Decimal('10'))
+        self.assertEqual(self._report_cogs(), before)
+        self.assertEqual(compute_invoice_cogs(sale.invoices.get()), Decimal('60'))
+
+    def test_unstamped_lines_use_current_cost(self):
+        from core.models import DocumentStatus
+        from sales.models import SalesOrderLine, SalesOrderPriceListLine
+
+        self._sales_order(status=DocumentStatus.APPROVED)
+        self.assertFalse(SalesOrderLine.objects.filter(line_cogs__isnull=False).exists())
+        # 1 box (30) + 2 sets of 3 pieces (15)
+        self.assertEqual(self._report_cogs(), Decimal('45'))
+        self._set_cost(Decimal('5'))
+        self.assertEqual(self._report_cogs(), Decimal('90'))
+        self.assertFalse(SalesOrderPriceListLine.objects.filter(line_cogs__isnull=False).exists())
+
+    def test_backfill_stamps_posted_lines_only(self):
+        from core.models import DocumentStatus
+
+        approved = self._sales_order(status=DocumentStatus.APPROVED)
+        draft = self._sales_order()
+
+        out = StringIO()
+        call_command('backfill_line_costs', dry_run=True, stdout=out)
+        self.assertIn('Dry-run complete. 2 lines stamped.', out.getvalue())
+        self.assertIsNone(approved.lines.get().line_cogs)
+
+        out = StringIO()
+        call_command('backfill_line_costs', stdout=out)
+        self.assertIn('Backfill complete. 2 lines stamped.', out.getvalue())
+        self.assertEqual(approved.lines.get().line_cogs, Decimal('30'))
+        self.assertEqual(approved.price_list_lines.get().line_cogs, Decimal('15'))
+        self.assertIsNone(draft.lines.get().line_cogs)
+
+        call_command('backfill_line_costs', stdout=out)
+        self.assertIn('Backfill complete. 0 lines stamped.', out.getvalue())
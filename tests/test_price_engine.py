@@ -0,0 +1,184 @@
+"""
+Tests for the price resolution engine (pricing/services.py).
+
+Scenarios covered:
+  1. Tiers match on exact Decimal min_qty and skip rows outside their dates.
+  2. Resolution order: customer catalog → register list → default lists →
+     item price; other price lists are not fallbacks.
+  3. resolve_prices prices a whole cart in one call, converting the item
+     price to the line's unit.
+  4. A requested unit narrows the default lists only; the register's list
+     is tried in every unit (its price converted to the line's unit), and
+     skipped when inactive.
+  5. Saving or deleting pricing rows invalidates the book; a warm book
+     answers without queries.
+  6. The price lookup, batch resolve (with discount rules) and customer
+     catalog APIs.
+"""
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from catalog.models import Category, Item, ItemType, Unit, UnitConversion
+from partners.models import Customer
+from pos.models import POSRegister
+from pricing.models import (
+    CustomerPriceCatalog, CustomerPriceCatalogItem, DiscountRule, PriceList, PriceListItem,
+)
+from pricing.services import get_price_book, resolve_prices
+from warehouses.models import Location, Warehouse
+
+User = get_user_model()
+
+
+class PriceEngineTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='pe_user', password='pass')
+        cls.pcs = Unit.objects.create(name='PE Piece', abbreviation='pepc')
+        cls.box = Unit.objects.create(name='PE Box', abbreviation='pebx')
+        UnitConversion.objects.create(from_unit=cls.box, to_unit=cls.pcs, factor=Decimal('12'))
+        category = Category.objects.create(code='PE', name='Price engine')
+        cls.item = Item.objects.create(
+            code='PE-1', name='Priced', item_type=ItemType.FINISHED, category=category,
+            default_unit=cls.pcs, selling_price=Decimal('10'),
+        )
+        cls.plain = Item.objects.create(
+            code='PE-2', name='Unlisted', item_type=ItemType.FINISHED, category=category,
+            default_unit=cls.pcs, selling_price=Decimal('7.5'),
+        )
+        cls.default = PriceList.objects.create(name='PE Default', is_default=True)
+        cls.store = PriceList.objects.create(name='PE Store')
+        cls.bundle = PriceList.objects.create(name='PE Bundle')
+        today = timezone.localdate()
+        for price_list, min_qty, price, start, end in (
+            (cls.default, '1', '9.50', None, None),
+            (cls.store, '1', '9.00', None, None),
+            (cls.store, '10', '8.00', None, None),
+            (cls.store, '5', '1.00', today + datetime.timedelta(days=1), None),
+            (cls.store, '5', '2.00', None, today - datetime.timedelta(days=1)),
+            (cls.bundle, '1', '0.50', None, None),
+        ):
+            PriceListItem.objects.create(
+                price_list=price_list, item=cls.item, unit=cls.pcs,
+                min_qty=Decimal(min_qty), price=Decimal(price), start_date=start, end_date=end,
+            )
+        warehouse = Warehouse.objects.create(code='PE-WH', name='PE Warehouse')
+        location = Location.objects.create(warehouse=warehouse, code='PE-BIN', name='PE Bin')
+        cls.register = POSRegister.objects.create(
+            name='PE Register', warehouse=warehouse, default_location=location, price_list=cls.store,
+        )
+        cls.customer = Customer.objects.create(code='PE-C', name='PE Customer')
+        catalog = CustomerPriceCatalog.objects.create(customer=cls.customer, name='PE VIP')
+        cls.catalog_row = CustomerPriceCatalogItem.objects.create(
+            catalog=catalog, item=cls.item, unit=cls.pcs, price=Decimal('7.00'),
+        )
+
+    def test_tiers_use_exact_quantities_and_dates(self):
+        book = get_price_book()
+        self.assertEqual(book.match(self.store.pk, self.item.pk, Decimal('9.9999')).price, Decimal('9.00'))
+        self.assertEqual(book.match(self.store.pk, self.item.pk, Decimal('10')).price, Decimal('8.00'))
+        # The min_qty 5 rows are not valid today: one starts tomorrow, one ended yesterday.
+        self.assertEqual(book.match(self.store.pk, self.item.pk, Decimal('6')).price, Decimal('9.00'))
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+        self.assertEqual(book.match(self.store.pk, self.item.pk, Decimal('6'), on=tomorrow).price, Decimal('1.00'))
+        self.assertIsNone(book.match(self.store.pk, self.item.pk, Decimal('0.5')))
+
+    def test_resolution_order(self):
+        book = get_price_book()
+        resolve = lambda **kw: book.resolve(self.item.pk, Decimal('2'), **kw)[:3]  # noqa: E731
+        self.assertEqual(
+            resolve(price_list_id=self.store.pk, customer_id=self.customer.pk),
+            (Decimal('7.00'), self.pcs.pk, 'customer'),
+        )
+        self.assertEqual(resolve(price_list_id=self.store.pk), (Decimal('9.00'), self.pcs.pk, 'register'))
+        # Without a register only the default list applies, not the bundle list.
+        self.assertEqual(resolve(), (Decimal('9.50'), self.pcs.pk, 'default'))
+        self.assertIsNone(book.resolve(self.plain.pk, Decimal('1')))
+
+    def test_batch_resolution(self):
+        matches = resolve_prices(
+            [(self.item.pk, '12', None), (self.plain.pk, '1', None), (self.plain.pk, '1', self.box.pk), (999999, '1', None)],
+            price_list_id=self.store.pk,
+        )
+        self.assertEqual(
+            [m[:3] if m else None for m in matches],
+            [
+                (Decimal('8.00'), self.pcs.pk, 'register'),
+                (Decimal('7.5'), self.pcs.pk, 'item'),
+                (Decimal('90.0000'), self.box.pk, 'item'),
+                None,
+            ],
+        )
+
+    def test_units_and_inactive_register_lists(self):
+        lines = [(self.item.pk, '2', self.box.pk)]
+        self.assertEqual(
+            resolve_prices(lines, price_list_id=self.store.pk)[0][:3],
+            (Decimal('108.0000'), self.box.pk, 'register'),
+        )
+        # The default list has no box price, so the item price applies.
+        self.assertEqual(resolve_prices(lines)[0][:3], (Decimal('120.0000'), self.box.pk, 'item'))
+
+        self.store.is_active = False
+        self.store.save()
+        self.assertEqual(
+            get_price_book().resolve(self.item.pk, Decimal('2'), price_list_id=self.store.pk)[:3],
+            (Decimal('9.50'), self.pcs.pk, 'default'),
+        )
+
+    def test_saves_and_deletes_invalidate_the_book(self):
+        row = PriceListItem.objects.get(price_list=self.default)
+        row.price = Decimal('9.25')
+        row.save()
+        self.assertEqual(get_price_book().resolve(self.item.pk, Decimal('1'))[0], Decimal('9.25'))
+        self.catalog_row.price = Decimal('6.50')
+        self.catalog_row.save()
+        self.assertEqual(get_price_book().customer_price(self.customer.pk, self.item.pk)[0], Decimal('6.50'))
+        row.delete()
+        self.assertIsNone(get_price_book().resolve(self.item.pk, Decimal('1')))
+
+    @override_settings(PRICE_BOOK_TTL=3600)
+    def test_warm_book_needs_no_queries(self):
+        from pricing import services
+
+        get_price_book()
+        services._registry.volatile = False
+        with self.assertNumQueries(0):
+            for qty in ('1', '10', '100'):
+                resolve_prices([(self.item.pk, qty, None)], price_list_id=self.store.pk, customer_id=self.customer.pk)
+
+    def test_apis(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/pricing/price/', {
+            'item': self.item.pk, 'qty': '10', 'register': self.register.pk,
+        })
+        self.assertEqual((response.json()['price'], response.json()['source']), ('8.0000', 'register'))
+        response = self.client.get('/api/pricing/price/', {'item': self.item.pk, 'customer': self.customer.pk})
+        self.assertEqual((response.json()['price'], response.json()['price_list']), ('7.0000', 'PE VIP'))
+
+        DiscountRule.objects.create(name='PE 10%', discount_type='PERCENT', value=Decimal('10'), scope='ITEM')
+        DiscountRule.objects.create(name='PE 1 off', discount_type='FIXED', value=Decimal('1'), scope='ITEM')
+        DiscountRule.objects.create(name='PE 5 off', discount_type='FIXED', value=Decimal('5'), scope='ORDER')
+        response = self.client.post('/api/pricing/resolve/', {
+            'register': self.register.pk,
+            'lines': [{'item': self.item.pk, 'qty': '10'}, {'item': self.plain.pk, 'qty': '2'}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        # 10 x 8.00 = 80.00, best item rule 1 off x 10 = 10.00; 2 x 7.5 = 15.00, 10% = 1.50 beats 2 x 1 off.
+        self.assertEqual(
+            [(l['source'], l['amount'], l['discount']) for l in data['lines']],
+            [('register', '80.00', '10.00'), ('item', '15.00', '2.00')],
+        )
+        self.assertEqual((data['subtotal'], data['order_discount']), ('83.00', '5.00'))
+
+        response = self.client.get(f'/pricing/api/customer-catalog/{self.customer.pk}/')
+        self.assertEqual(
+            [(i['item_code'], i['unit_abbr'], i['price']) for i in response.json()['items']],
+            [('PE-1', 'pepc', '7.0000')],
+        )
@@ -0,0 +1,145 @@
+"""
+Tests for the streaming CSV / XLSX report exports (reports.exports).
+
+Scenarios covered:
+  1. Stock on hand, stock movement, inventory valuation, expense report and
+     cash flow list stream ?export=csv with their columns and filters.
+  2. ?export=xlsx streams a workbook with the same rows.
+  3. The stock movement export is not capped at the 200 moves the page shows.
+  4. The catalog export streams XLSX by default and CSV with ?export=csv.
+  5. Exports read rows in chunks: the query count does not grow with rows.
+"""
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from catalog.models import Category, Item, Unit
+from inventory.models import MoveType, StockBalance, StockMove
+from warehouses.models import Location, Warehouse
+
+User = get_user_model()
+
+
+class ReportExportTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from core.models import Expense, ExpenseCategory
+
+        cls.user = User.objects.create_superuser('export_u', 'export@test.com', 'pass')
+        category = Category.objects.create(code='EXP', name='Export')
+        cls.unit = Unit.objects.create(name='Export Piece', abbreviation='xpc')
+        cls.item = Item.objects.create(
+            code='EXP-A', name='Export A', category=category, default_unit=cls.unit,
+            cost_price=Decimal('2.50'), selling_price=Decimal('4'),
+        )
+        cls.warehouse = Warehouse.objects.create(code='EXP-WH', name='Export WH')
+        cls.other_warehouse = Warehouse.objects.create(code='EXP-WH2', name='Export WH 2')
+        cls.location = Location.objects.create(warehouse=cls.warehouse, code='EXP-L', name='Export Loc')
+        other = Location.objects.create(warehouse=cls.other_warehouse, code='EXP-L2', name='Export Loc 2')
+        StockBalance.objects.create(item=cls.item, location=cls.location, qty_on_hand=Decimal('10'), qty_reserved=Decimal('4'))
+        StockBalance.objects.create(item=cls.item, location=other, qty_on_hand=Decimal('1'))
+
+        rent = ExpenseCategory.objects.create(code='EXP-RENT', name='Export Rent')
+        Expense.objects.create(
+            date=date(2025, 3, 2), category=rent, amount=Decimal('1200'), item_description='March rent',
+            vendor='Landlord', created_by=cls.user,
+        )
+        Expense.objects.create(date=date(2025, 4, 2), category=rent, amount=Decimal('1200'), created_by=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _csv(self, url, **params):
+        response = self.client.get(url, {**params, 'export': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(text)))
+
+    def _moves(self, count):
+        StockMove.objects.bulk_create([
+            StockMove(
+                move_type=MoveType.RECEIVE, item=self.item, qty=Decimal('1'), unit=self.unit,
+                to_location=self.location, status='POSTED', created_by=self.user,
+                posted_at=timezone.now(), reference_number=f'EXP-RCV-{i}',
+            )
+            for i in range(count)
+        ])
+
+    def test_csv_exports(self):
+        from cashflow.models import CashFlowTransaction, CashFlowType
+
+        rows = self._csv('/reports/stock-on-hand/', warehouse=self.warehouse.pk)
+        self.assertEqual(rows[0][:3], ['Item Code', 'Item Name', 'Warehouse'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][:5], ['EXP-A', 'Export A', 'EXP-WH', 'EXP-L', 'xpc'])
+        self.assertEqual(
+            [Decimal(v) for v in rows[1][5:]],
+            [Decimal('10'), Decimal('4'), Decimal('6'), Decimal('2.5'), Decimal('25')],
+        )
+
+        rows = self._csv('/reports/inventory-valuation/')
+        self.assertEqual([r[0] for r in rows[1:]], ['Export WH', 'Export WH 2'])
+        self.assertEqual(Decimal(rows[1][7]), Decimal('25'))
+
+        rows = self._csv('/reports/expenses/', date_from='2025-03-01', date_to='2025-03-31')
+        self.assertEqual(rows[1:], [['2025-03-02', 'Export Rent', 'March rent', 'Landlord', '', 'Paid', '1200.00']])
+
+        CashFlowTransaction.objects.create(
+            transaction_number='EXP-CF-1', flow_type=CashFlowType.CASH_IN, amount=Decimal('50'),
+            transaction_date=date(2025, 3, 5), reason='Export test', created_by=self.user,
+        )
+        rows = self._csv('/cashflow/', flow_type=CashFlowType.CASH_IN)
+        self.assertEqual(rows[0][0], 'Txn #')
+        self.assertEqual((rows[1][0], rows[1][4], rows[1][9]), ('EXP-CF-1', '50.00', 'Manual'))
+
+    def test_xlsx_export(self):
+        import openpyxl
+
+        response = self.client.get('/reports/stock-on-hand/', {'export': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('spreadsheetml', response['Content-Type'])
+        ws = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(ws.max_row, 3)
+        self.assertEqual(ws.cell(row=1, column=6).value, 'On Hand')
+        self.assertEqual(ws.cell(row=2, column=6).value, 10)
+
+    def test_stock_movement_export_is_not_capped(self):
+        self._moves(205)
+        self.assertEqual(len(self.client.get('/reports/stock-movement/').context['moves']), 200)
+        rows = self._csv('/reports/stock-movement/')
+        self.assertEqual(len(rows) - 1, 205)
+        self.assertEqual(rows[1][1:4], ['Receive', 'EXP-A', 'Export A'])
+
+    def test_catalog_export(self):
+        import openpyxl
+
+        response = self.client.get('/catalog/items/export-excel/', {'q': 'EXP-A'})
+        self.assertIsInstance(response, StreamingHttpResponse)
+        ws = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual([ws.cell(row=2, column=c).value for c in (1, 7)], ['EXP-A', 2.5])
+
+        rows = self._csv('/catalog/items/export-excel/', q='EXP-A')
+        self.assertEqual(rows[0][0], 'Code')
+        self.assertEqual(rows[1][:2], ['EXP-A', 'Export A'])
+
+    def test_export_queries_do_not_grow_with_rows(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/reports/stock-movement/', {'export': 'csv'})
+                b''.join(response.streaming_content)
+            return len(ctx.captured_queries)
+
+        self._moves(5)
+        before = count_queries()
+        self._moves(500)
+        self.assertEqual(count_queries(), before)
@@ -0,0 +1,447 @@
+"""
+Tests for the partitioned resync_inventory pipeline (inventory/resync.py).
+
+The dataset is generated: documents of six types with unit-converted
+lines, legacy moves that store raw line quantities, moves without a source
+line, stale reversal moves, bundle sales and wrong balances.  Its size is
+set by RESYNC_TEST_MOVES (default 3000); the pipeline was checked on 100k::
+
+    RESYNC_TEST_MOVES=100000 python manage.py test tests.test_resync_pipeline
+
+Scenarios covered:
+  1. Phases 1 and 2 leave moves and balances exactly as the serial run does.
+  2. Reversal moves are fixed without a query per move.
+  3. A run interrupted in phase 1 resumes from its checkpoints and still
+     matches the serial run; checkpoints are removed when it finishes.
+  4. A resumed phase 2 reuses the stored partition deltas.
+  5. --dry-run writes neither fixes nor checkpoints.
+"""
+import datetime
+import os
+import random
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory import resync
+from inventory.models import MoveStatus, MoveType, ResyncCheckpoint, StockBalance, StockMove
+
+User = get_user_model()
+
+MOVES = int(os.environ.get('RESYNC_TEST_MOVES', '3000'))
+LINES_PER_DOC = 4
+
+# (reference type, move type, share of the documents)
+DOC_TYPES = [
+    ('GoodsReceipt', MoveType.RECEIVE, 3),
+    ('DeliveryNote', MoveType.DELIVER, 2),
+    ('POSSale', MoveType.POS_SALE, 3),
+    ('StockTransfer', MoveType.TRANSFER, 1),
+    ('StockAdjustment', MoveType.ADJUST, 1),
+    ('DamagedReport', MoveType.DAMAGE, 1),
+]
+
+
+class _DatasetBuilder:
+    """Bulk-creates the generated dataset; every move is recorded in self.moves."""
+
+    def __init__(self, cls):
+        from catalog.models import Category, Item, ItemType, Unit, UnitCategory, UnitConversion
+        from partners.models import Customer, Supplier
+        from pos.models import POSRegister, POSShift, ShiftStatus
+        from procurement.models import PurchaseOrder
+        from warehouses.models import Location, Warehouse
+        from core.models import DocumentStatus
+
+        self.rng = random.Random(13)
+        self.user = cls.user = User.objects.create_superuser('rp_u', 'rp@t.com', 'pass')
+        self.pcs = Unit.objects.create(name='RP_Piece', abbreviation='rppcs', category=UnitCategory.QUANTITY)
+        self.box = Unit.objects.create(name='RP_Box', abbreviation='rpbox', category=UnitCategory.QUANTITY)
+        self.kg = Unit.objects.create(name='RP_Kilo', abbreviation='rpkg', category=UnitCategory.MASS)
+        UnitConversion.objects.create(from_unit=self.box, to_unit=self.pcs, factor=Decimal('4'))
+        category = Category.objects.create(name='RP_Cat', code='RPCAT')
+        n_items = max(40, MOVES // 200)
+        self.items = Item.objects.bulk_create([
+            Item(
+                code=f'RP-{i:05d}', name=f'Resync item {i}', item_type=ItemType.FINISHED,
+                category=category, default_unit=self.pcs,
+                # Every fifth item is stocked in boxes.
+                selling_unit=self.box if i % 5 == 0 else None,
+                cost_price=Decimal('1'), selling_price=Decimal('2'),
+            )
+            for i in range(n_items)
+        ])
+        self.wh = Warehouse.objects.create(name='RP_WH', code='RPWH')
+        self.locations = [
+            Location.objects.create(name=f'RP_Loc{i}', code=f'RPLOC{i}', warehouse=self.wh)
+            for i in range(3)
+        ]
+        self.supplier = Supplier.objects.create(name='RP_Sup', code='RPSUP')
+        self.customer = Customer.objects.create(name='RP_Cust', code='RPCUS')
+        self.po = PurchaseOrder.objects.create(
+            document_number='PO-RP-0001', supplier=self.supplier, warehouse=self.wh,
+            order_date=datetime.date(2025, 1, 1), created_by=self.user,
+            status=DocumentStatus.APPROVED,
+        )
+        register = POSRegister.objects.create(name='RP_POS', warehouse=self.wh, default_location=self.locations[0])
+        self.shift = POSShift.objects.create(
+            register=register, opened_by=self.user, opened_at=timezone.make_aware(datetime.datetime(2025, 1, 1, 8, 0)),
+            opening_cash=Decimal('0'), status=ShiftStatus.OPEN,
+        )
+        self.register = register
+        self.moves = []
+
+    # ── random line attributes ──────────────────────────────────────────────
+
+    def _qty_unit(self):
+        """A line qty/unit whose conversion to the stock unit terminates."""
+        roll = self.rng.random()
+        if roll < 0.02:
+            return Decimal(self.rng.randint(1, 9)), self.kg  # no conversion: warning path
+        if roll < 0.4:
+            return Decimal(self.rng.randint(1, 9)), self.box
+        return Decimal(self.rng.randint(1, 40)), self.pcs
+
+    def _stored(self, item, qty, unit):
+        """(qty, unit) as a legacy or current posting would have stored it."""
+        if self.rng.random() < 0.5 or unit == self.kg:
+            return qty, unit  # legacy: raw line qty
+        stock_unit = self.box if item.selling_unit_id else self.pcs
+        if unit == stock_unit:
+            return qty, unit
+        return (qty * 4, stock_unit) if unit == self.box else (qty / 4, stock_unit)
+
+    def _move(self, ref_type, move_type, doc_id, number, item, qty, unit, from_loc=None, to_loc=None, **extra):
+        self.moves.append(StockMove(
+            move_type=move_type, item=item, qty=qty, unit=unit,
+            from_location=from_loc, to_location=to_loc,
+            reference_type=ref_type, reference_id=doc_id, reference_number=number,
+            status=MoveStatus.POSTED, created_by=self.user, **extra,
+        ))
+
+    # ── documents ───────────────────────────────────────────────────────────
+
+    def build(self):
+        n_docs = max(len(DOC_TYPES), MOVES // LINES_PER_DOC)
+        weight = sum(share for _, _, share in DOC_TYPES)
+        for ref_type, move_type, share in DOC_TYPES:
+            count = max(1, n_docs * share // weight)
+            getattr(self, f'_build_{ref_type}')(ref_type, move_type, count)
+        self._build_reversals()
+        StockMove.objects.bulk_create(self.moves, batch_size=2000)
+        self._build_balances()
+
+    def _doc_lines(self):
+        return self.rng.sample(self.items, LINES_PER_DOC)
+
+    def _simple(self, ref_type, move_type, count, doc_model, line_model, doc_field, doc_kwargs, outgoing):
+        from core.models import DocumentStatus
+
+        docs = doc_model.objects.bulk_create([
+            doc_model(
+                document_number=f'{ref_type[:3].upper()}-RP-{i:06d}', warehouse=self.wh,
+                created_by=self.user, posted_by=self.user, status=DocumentStatus.POSTED,
+                **doc_kwargs,
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        lines = []
+        for doc in docs:
+            for item in self._doc_lines():
+                qty, unit = self._qty_unit()
+                loc = self.rng.choice(self.locations)
+                lines.append(line_model(**{doc_field: doc}, item=item, location=loc, qty=qty, unit=unit))
+                stored_qty, stored_unit = self._stored(item, qty, unit)
+                if outgoing:
+                    self._move(ref_type, move_type, doc.pk, doc.document_number, item, stored_qty, stored_unit, from_loc=loc)
+                else:
+                    self._move(ref_type, move_type, doc.pk, doc.document_number, item, stored_qty, stored_unit, to_loc=loc)
+            if self.rng.random() < 0.05:
+                # A move whose item is not on the document: no source line.
+                item = self.items[-1]
+                self._move(ref_type, move_type, doc.pk, doc.document_number, item, Decimal('1'), self.pcs,
+                           **({'from_loc': self.locations[0]} if outgoing else {'to_loc': self.locations[0]}))
+        line_model.objects.bulk_create(lines, batch_size=2000)
+
+    def _build_GoodsReceipt(self, ref_type, move_type, count):
+        from core.models import DocumentStatus
+        from procurement.models import GoodsReceipt, GoodsReceiptLine
+
+        docs = GoodsReceipt.objects.bulk_create([
+            GoodsReceipt(
+                document_number=f'GRN-RP-{i:06d}', purchase_order=self.po, supplier=self.supplier,
+                warehouse=self.wh, receipt_date=datetime.date(2025, 1, 2),
+                created_by=self.user, posted_by=self.user, status=DocumentStatus.POSTED,
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        lines = []
+        for doc in docs:
+            items = self._doc_lines()
+            # The same item twice on a receipt, in two units and locations.
+            if self.rng.random() < 0.2:
+                items[1] = items[0]
+            for n, item in enumerate(items):
+                qty, unit = self._qty_unit()
+                loc = self.locations[n % 2]
+                batch = f'B{self.rng.randint(1, 3)}' if self.rng.random() < 0.3 else ''
+                lines.append(GoodsReceiptLine(
+                    goods_receipt=doc, item=item, location=loc, qty=qty, unit=unit, batch_number=batch,
+                ))
+                stored_qty, stored_unit = self._stored(item, qty, unit)
+                self._move(ref_type, move_type, doc.pk, doc.document_number, item, stored_qty, stored_unit,
+                           to_loc=loc, batch_number=batch)
+        GoodsReceiptLine.objects.bulk_create(lines, batch_size=2000)
+
+    def _build_DeliveryNote(self, ref_type, move_type, count):
+        from sales.models import DeliveryLine, DeliveryNote
+
+        self._simple(ref_type, move_type, count, DeliveryNote, DeliveryLine, 'delivery', {
+            'customer': self.customer, 'delivery_date': datetime.date(2025, 1, 3),
+        }, outgoing=True)
+
+    def _build_DamagedReport(self, ref_type, move_type, count):
+        from inventory.models import DamagedReport, DamagedReportLine
+
+        self._simple(ref_type, move_type, count, DamagedReport, DamagedReportLine, 'report', {}, outgoing=True)
+
+    def _build_StockTransfer(self, ref_type, move_type, count):
+        from core.models import DocumentStatus
+        from inventory.models import StockTransfer, StockTransferLine
+
+        docs = StockTransfer.objects.bulk_create([
+            StockTransfer(
+                document_number=f'TR-RP-{i:06d}', from_warehouse=self.wh, to_warehouse=self.wh,
+                created_by=self.user, posted_by=self.user, status=DocumentStatus.POSTED,
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        lines = []
+        for doc in docs:
+            for item in self._doc_lines():
+                qty, unit = self._qty_unit()
+                src, dst = self.rng.sample(self.locations, 2)
+                lines.append(StockTransferLine(
+                    transfer=doc, item=item, from_location=src, to_location=dst, qty=qty, unit=unit,
+                ))
+                stored_qty, stored_unit = self._stored(item, qty, unit)
+                self._move(ref_type, move_type, doc.pk, doc.document_number, item, stored_qty, stored_unit,
+                           from_loc=src, to_loc=dst)
+        StockTransferLine.objects.bulk_create(lines, batch_size=2000)
+
+    def _build_StockAdjustment(self, ref_type, move_type, count):
+        from core.models import DocumentStatus
+        from inventory.models import StockAdjustment, StockAdjustmentLine
+
+        docs = StockAdjustment.objects.bulk_create([
+            StockAdjustment(
+                document_number=f'ADJ-RP-{i:06d}', warehouse=self.wh,
+                created_by=self.user, posted_by=self.user, status=DocumentStatus.POSTED,
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        lines = []
+        for doc in docs:
+            for item in self._doc_lines():
+                counted, unit = self._qty_unit()
+                system = counted + self.rng.choice([-3, -1, 0, 2, 5])
+                loc = self.rng.choice(self.locations)
+                lines.append(StockAdjustmentLine(
+                    adjustment=doc, item=item, location=loc,
+                    qty_counted=counted, qty_system=system, unit=unit,
+                ))
+                diff = counted - system
+                if diff == 0:
+                    continue
+                stored_qty, stored_unit = self._stored(item, abs(diff), unit)
+                locs = {'to_loc': loc} if diff > 0 else {'from_loc': loc}
+                self._move(ref_type, move_type, doc.pk, doc.document_number, item, stored_qty, stored_unit, **locs)
+        StockAdjustmentLine.objects.bulk_create(lines, batch_size=2000)
+
+    def _build_POSSale(self, ref_type, move_type, count):
+        from pos.models import POSSale, POSSaleBundleLine, POSSaleLine, SaleStatus
+        from pricing.models import PriceList, PriceListItem
+
+        bundles = []
+        for n in range(2):
+            price_list = PriceList.objects.create(name=f'RP Bundle {n}')
+            for item in self.items[n * 3:n * 3 + 3]:
+                PriceListItem.objects.create(
+                    price_list=price_list, item=item, unit=self.rng.choice([self.pcs, self.box]),
+                    price=Decimal('5'), min_qty=Decimal(self.rng.randint(0, 3)),
+                )
+            bundles.append(price_list)
+
+        sales = POSSale.objects.bulk_create([
+            POSSale(
+                sale_no=f'POS-RP-{i:06d}', register=self.register, shift=self.shift,
+                warehouse=self.wh, location=self.rng.choice(self.locations), status=SaleStatus.POSTED,
+                created_by=self.user, posted_by=self.user, posted_at=timezone.make_aware(datetime.datetime(2025, 1, 4, 9, 0)),
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        lines, bundle_lines = [], []
+        for sale in sales:
+            for item in self._doc_lines():
+                qty, unit = self._qty_unit()
+                loc = self.rng.choice(self.locations) if self.rng.random() < 0.5 else None
+                lines.append(POSSaleLine(sale=sale, item=item, location=loc, qty=qty, unit=unit))
+                stored_qty, stored_unit = self._stored(item, qty, unit)
+                self._move(ref_type, move_type, sale.pk, sale.sale_no, item, stored_qty, stored_unit,
+                           from_loc=loc or sale.location)
+            if self.rng.random() < 0.05:
+                bundle_lines.append(POSSaleBundleLine(
+                    sale=sale, price_list=self.rng.choice(bundles), qty_sets=Decimal(self.rng.randint(1, 3)),
+                ))
+        POSSaleLine.objects.bulk_create(lines, batch_size=2000)
+        POSSaleBundleLine.objects.bulk_create(bundle_lines, batch_size=2000)
+
+    def _build_reversals(self):
+        # Reversals of single-move documents, so their original is unambiguous.
+        from inventory.models import DamagedReport, DamagedReportLine
+        from core.models import DocumentStatus
+
+        count = max(5, MOVES // 100)
+        docs = DamagedReport.objects.bulk_create([
+            DamagedReport(
+                document_number=f'DMR-RP-{i:06d}', warehouse=self.wh,
+                created_by=self.user, posted_by=self.user, status=DocumentStatus.POSTED,
+            )
+            for i in range(count)
+        ])
+        lines = []
+        for doc in docs:
+            item = self.rng.choice(self.items)
+            qty, unit = self._qty_unit()
+            loc = self.rng.choice(self.locations)
+            lines.append(DamagedReportLine(report=doc, item=item, location=loc, qty=qty, unit=unit))
+            self._move('DamagedReport', MoveType.DAMAGE, doc.pk, doc.document_number, item, qty, unit, from_loc=loc)
+            self._move('DamagedReport', MoveType.DAMAGE, doc.pk, f'REV-{doc.document_number}',
+                       item, qty + 1, unit, to_loc=loc)
+        DamagedReportLine.objects.bulk_create(lines)
+
+    def _build_balances(self):
+        StockBalance.objects.bulk_create([
+            StockBalance(item=item, location=loc, qty_on_hand=Decimal(self.rng.randint(-5, 50)))
+            for item in self.items[::3] for loc in self.locations
+        ])
+
+
+def _snapshot():
+    moves = sorted(
+        (m[0], m[1] or 0, m[2], m[3], m[4].normalize(), m[5], m[6] or 0, m[7] or 0)
+        for m in StockMove.objects.values_list(
+            'reference_type', 'reference_id', 'reference_number', 'item_id', 'qty', 'unit_id',
+            'from_location_id', 'to_location_id',
+        )
+    )
+    balances = {
+        (item_id, location_id): qty.normalize()
+        for item_id, location_id, qty in StockBalance.objects.values_list('item_id', 'location_id', 'qty_on_hand')
+    }
+    return moves, balances
+
+
+def _call_resync(*args):
+    out = StringIO()
+    call_command('resync_inventory', '--quiet', *args, stdout=out)
+    return out.getvalue()
+
+
+def _summary(output):
+    return [line for line in output.splitlines() if 'total' in line or 'Creates:' in line]
+
+
+class ResyncPipelineTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        _DatasetBuilder(cls).build()
+
+    def _run(self, *args):
+        """Phases 1 and 2 with *args*; returns (snapshot, summary lines) and rolls back."""
+        with transaction.atomic():
+            output = _call_resync('--phase', '1', *args) + _call_resync('--phase', '2', *args)
+            result = _snapshot(), _summary(output)
+            transaction.set_rollback(True)
+        return result
+
+    def test_pipeline_matches_serial(self):
+        before = _snapshot()
+        serial = self._run('--serial')
+        pipeline = self._run('--workers', '1', '--chunk-items', '7')
+        self.assertNotEqual(serial[0], before)
+        self.assertEqual(pipeline[0][0], serial[0][0])
+        self.assertEqual(pipeline[0][1], serial[0][1])
+        self.assertEqual(pipeline[1], serial[1])
+        self.assertFalse(ResyncCheckpoint.objects.exists())
+
+    def test_reversals_fixed_without_per_move_queries(self):
+        reversals = StockMove.objects.filter(reference_number__startswith='REV-')
+        self.assertGreaterEqual(reversals.count(), 5)
+        # The reversal moves, their originals, then one UPDATE per distinct qty/unit.
+        targets = {
+            (qty, unit_id) for qty, unit_id in StockMove.objects.filter(
+                reference_number__in=[number[4:] for number in reversals.values_list('reference_number', flat=True)],
+            ).values_list('qty', 'unit_id')
+        }
+        with transaction.atomic():
+            with self.assertNumQueries(2 + len(targets)):
+                fixed = resync.fix_reversals(dry_run=False)
+            transaction.set_rollback(True)
+        self.assertEqual(fixed, reversals.count())
+
+    def test_interrupted_phase1_resumes(self):
+        serial = self._run('--serial')
+        real = resync.fix_moves_partition
+        calls = []
+
+        def crash_on_third(*partition):
+            calls.append(partition)
+            if len(calls) == 3:
+                raise RuntimeError('worker died')
+            return real(*partition)
+
+        with mock.patch.object(resync, 'fix_moves_partition', crash_on_third):
+            with self.assertRaises(RuntimeError):
+                _call_resync('--phase', '1', '--workers', '1', '--chunk-items', '7')
+        self.assertEqual(ResyncCheckpoint.objects.filter(phase='1').count(), 2)
+
+        with mock.patch.object(resync, 'fix_moves_partition', side_effect=real) as resumed:
+            output = _call_resync('--phase', '1', '--workers', '1', '--chunk-items', '7', '--resume')
+        self.assertIn('Resuming run', output)
+        self.assertNotIn(calls[0], [c.args for c in resumed.call_args_list])
+        self.assertIn(calls[2], [c.args for c in resumed.call_args_list])
+        self.assertFalse(ResyncCheckpoint.objects.exists())
+
+        output = _call_resync('--phase', '2', '--workers', '1', '--chunk-items', '7')
+        self.assertEqual(_snapshot(), serial[0])
+
+    def test_resumed_phase2_reuses_stored_deltas(self):
+        serial = self._run('--serial')
+        _call_resync('--phase', '1', '--workers', '1')
+        with mock.patch.object(StockBalance.objects, 'bulk_create', side_effect=RuntimeError('crash')):
+            with self.assertRaises(RuntimeError):
+                _call_resync('--phase', '2', '--workers', '1', '--chunk-items', '7')
+        stored = ResyncCheckpoint.objects.filter(phase='2').count()
+        self.assertGreater(stored, 0)
+
+        with mock.patch.object(resync, 'balance_partition') as partition:
+            output = _call_resync('--phase', '2', '--workers', '1', '--chunk-items', '7', '--resume')
+        partition.assert_not_called()
+        self.assertIn('Resuming run', output)
+        self.assertEqual(_snapshot(), serial[0])
+        self.assertFalse(ResyncCheckpoint.objects.exists())
+
+    def test_dry_run_writes_nothing(self):
+        before = _snapshot()
+        output = _call_resync('--dry-run', '--phase', '1', '--workers', '1')
+        self.assertIn('Phase 1 throughput:', output)
+        self.assertEqual(_snapshot(), before)
+        self.assertFalse(ResyncCheckpoint.objects.exists())
@@ -0,0 +1,273 @@
+"""
+Tests for the daily sales facts behind the sales and profit margin reports
+(reports.facts).
+
+Scenarios covered:
+  1. A refresh aggregates POS sales, sales orders (lines and bundles) and
+     completed services into item and document rows whose sums match the
+     documents' revenue, discount and COGS.
+  2. The sales and profit margin reports read their totals from the facts.
+  3. Incremental refresh: only days touched since the last refresh are
+     rebuilt; voiding a sale drops it; nothing changed writes nothing.
+  4. refresh_sales_facts --full rebuilds everything.
+  5. The reports' query count does not grow with the number of sales.
+  6. Reports never build the facts for the first time in the request (a
+     background job is queued, and only the shown days are built meanwhile)
+     and write nothing when nothing changed.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q, Sum
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from catalog.models import Category, Item, Unit
+from reports.facts import refresh_sales_facts
+from reports.models import DailySalesFact, SalesSource
+
+User = get_user_model()
+
+
+class SalesFactsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from core.models import DocumentStatus, Invoice, SalesChannel
+        from partners.models import Customer
+        from pos.models import POSRegister, POSShift, SaleStatus, ShiftStatus
+        from pricing.models import PriceList, PriceListItem
+        from sales.models import SalesOrder, SalesOrderLine, SalesOrderPriceListLine
+        from services.models import CustomerService, ServiceLine, ServiceStatus
+        from warehouses.models import Location, Warehouse
+
+        cls.user = User.objects.create_superuser('facts_u', 'facts@test.com', 'pass')
+        cat = Category.objects.create(name='Facts', code='FCT')
+        cls.unit = Unit.objects.create(name='Facts Piece', abbreviation='fpc')
+        cls.item_a = Item.objects.create(
+            code='FCT-A', name='Facts A', category=cat, default_unit=cls.unit,
+            cost_price=Decimal('4'), selling_price=Decimal('8'),
+        )
+        cls.item_b = Item.objects.create(
+            code='FCT-B', name='Facts B', category=cat, default_unit=cls.unit,
+            cost_price=Decimal('10'), selling_price=Decimal('20'),
+        )
+        cls.warehouse = Warehouse.objects.create(code='FCT-WH', name='Facts WH')
+        cls.location = Location.objects.create(code='FCT-L', name='Facts Loc', warehouse=cls.warehouse)
+        cls.register = POSRegister.objects.create(
+            name='FCT-REG', warehouse=cls.warehouse, default_location=cls.location,
+        )
+        cls.shift = POSShift.objects.create(
+            register=cls.register, opened_by=cls.user, opened_at=timezone.now(),
+            opening_cash=Decimal('0'), status=ShiftStatus.OPEN,
+        )
+        cls.channel = SalesChannel.objects.create(name='Facts Online', code='FCT-ON')
+        customer = Customer.objects.create(name='Facts Customer', code='FCT-C')
+        cls.today = timezone.localdate()
+
+        # POS: 3 A at 8 + 1 B at 20, 4 off the whole sale.
+        cls.sale = cls._pos_sale(
+            [(cls.item_a, '3', '24'), (cls.item_b, '1', '20')],
+            discount='4', channel=cls.channel,
+        )
+        cls._pos_sale([(cls.item_b, '5', '100')], status=SaleStatus.DRAFT)
+
+        # SO three days ago: 2 B at 25 less 5, and 2 sets of a 2 × A bundle
+        # (6 each) less 3.
+        so = SalesOrder.objects.create(
+            document_number='FCT-SO-1', customer=customer, warehouse=cls.warehouse,
+            order_date=cls.today - timedelta(days=3), status=DocumentStatus.APPROVED,
+            created_by=cls.user,
+        )
+        SalesOrderLine.objects.create(
+            sales_order=so, item=cls.item_b, qty_ordered=Decimal('2'), unit=cls.unit,
+            unit_price=Decimal('25'), discount_type='AMOUNT', discount_value=Decimal('5'),
+        )
+        bundle = PriceList.objects.create(name='FCT Bundle')
+        PriceListItem.objects.create(
+            price_list=bundle, item=cls.item_a, unit=cls.unit, price=Decimal('6'), min_qty=Decimal('2'),
+        )
+        SalesOrderPriceListLine.objects.create(
+            sales_order=so, price_list=bundle, qty_multiplier=Decimal('2'),
+            discount_type='AMOUNT', discount_value=Decimal('3'),
+        )
+
+        # Service completed yesterday: invoiced 100, one A at 15.
+        invoice = Invoice.objects.create(
+            invoice_number='FCT-INV-SVC', date=cls.today, grand_total=Decimal('100'),
+            created_by=cls.user,
+        )
+        service = CustomerService.objects.create(
+            service_number='FCT-SVC-1', service_name='Facts Service', customer_name='Walk-in',
+            service_date=cls.today - timedelta(days=2), completion_date=cls.today - timedelta(days=1),
+            status=ServiceStatus.COMPLETED, warehouse=cls.warehouse, invoice=invoice,
+            created_by=cls.user,
+        )
+        ServiceLine.objects.create(
+            service=service, item=cls.item_a, qty=Decimal('1'), unit=cls.unit, unit_price=Decimal('15'),
+        )
+
+    @classmethod
+    def _pos_sale(cls, lines, discount='0', channel=None, status=None):
+        from pos.models import POSSale, POSSaleLine, SaleStatus
+
+        subtotal = sum(Decimal(total) for _, _, total in lines)
+        sale = POSSale.objects.create(
+            sale_no=f'FCT-POS-{POSSale.objects.count() + 1}', register=cls.register, shift=cls.shift,
+            warehouse=cls.warehouse, location=cls.location, channel=channel,
+            status=status or SaleStatus.PAID, created_by=cls.user, subtotal=subtotal,
+            discount_total=Decimal(discount), grand_total=subtotal - Decimal(discount),
+        )
+        for item, qty, total in lines:
+            POSSaleLine.objects.create(
+                sale=sale, item=item, qty=Decimal(qty), unit=cls.unit,
+                unit_price=Decimal(total) / Decimal(qty), line_total=Decimal(total),
+            )
+        return sale
+
+    def setUp(self):
+        from core.models import Invoice
+        from pos.models import POSSale
+        from sales.models import SalesOrder
+        from services.models import CustomerService
+
+        # Fixtures date from before any refresh, so only documents saved by
+        # a test are newer than the watermark.
+        earlier = timezone.now() - timedelta(hours=1)
+        for model in (Item, POSSale, SalesOrder, CustomerService, Invoice):
+            model._base_manager.update(updated_at=earlier)
+
+    def _totals(self, source, **filters):
+        return DailySalesFact.objects.filter(source=source, **filters).aggregate(
+            revenue=Sum('revenue'), discount=Sum('discount'), cogs=Sum('cogs'),
+            documents=Sum('count', filter=Q(item__isnull=True)),
+        )
+
+    def test_refresh_aggregates_documents(self):
+        refresh_sales_facts()
+        self.assertEqual(self._totals(SalesSource.POS), {
+            'revenue': Decimal('40'), 'discount': Decimal('4'), 'cogs': Decimal('22'), 'documents': 1,
+        })
+        # Line 45 + bundle 12 - 3; COGS 2 × 10 + 2 sets × 2 × 4.
+        self.assertEqual(self._totals(SalesSource.SALES_ORDER), {
+            'revenue': Decimal('54'), 'discount': Decimal('8'), 'cogs': Decimal('36'), 'documents': 1,
+        })
+        self.assertEqual(self._totals(SalesSource.SERVICE), {
+            'revenue': Decimal('100'), 'discount': Decimal('0'), 'cogs': Decimal('4'), 'documents': 1,
+        })
+
+        pos_a = DailySalesFact.objects.get(source=SalesSource.POS, item=self.item_a)
+        self.assertEqual(
+            (pos_a.date, pos_a.channel_id, pos_a.qty, pos_a.revenue, pos_a.cogs, pos_a.count),
+            (self.today, self.channel.pk, Decimal('3'), Decimal('24'), Decimal('12'), 1),
+        )
+        so_a = DailySalesFact.objects.get(source=SalesSource.SALES_ORDER, item=self.item_a)
+        self.assertEqual(
+            (so_a.date, so_a.qty, so_a.revenue, so_a.cogs),
+            (self.today - timedelta(days=3), Decimal('4'), Decimal('24'), Decimal('16')),
+        )
+
+    def test_reports_read_facts(self):
+        refresh_sales_facts()
+        self.client.force_login(self.user)
+        params = {'date_from': (self.today - timedelta(days=7)).isoformat(), 'date_to': self.today.isoformat()}
+
+        formulas = self.client.get('/reports/sales/', params).context['formulas']
+        self.assertEqual(formulas['pos_revenue'], Decimal('40'))
+        self.assertEqual(formulas['so_revenue'], Decimal('54'))
+        self.assertEqual(formulas['cogs'], Decimal('58'))
+        self.assertEqual(formulas['total_count'], 2)
+        self.assertEqual(formulas['total_discount'], Decimal('4'))
+
+        context = self.client.get('/reports/profit-margin/', params).context
+        rows = {row['item_code']: row for row in context['rows']}
+        self.assertEqual(
+            (rows['FCT-A']['qty_sold'], rows['FCT-A']['revenue'], rows['FCT-A']['cogs']),
+            (Decimal('7'), Decimal('48'), Decimal('28')),
+        )
+        self.assertEqual(
+            (rows['FCT-B']['qty_sold'], rows['FCT-B']['revenue'], rows['FCT-B']['cogs']),
+            (Decimal('3'), Decimal('65'), Decimal('30')),
+        )
+        self.assertEqual(context['grand_revenue'], Decimal('113'))
+
+    def test_incremental_refresh_rebuilds_touched_days(self):
+        from pos.models import SaleStatus
+
+        refresh_sales_facts()
+        so_rows = set(
+            DailySalesFact.objects.filter(source=SalesSource.SALES_ORDER).values_list('pk', flat=True)
+        )
+        self.assertEqual(refresh_sales_facts(), 0)
+
+        self._pos_sale([(self.item_b, '2', '40')])
+        # Today's POS facts: A, B and the document row of the channel sale,
+        # B and the document row without a channel.
+        self.assertEqual(refresh_sales_facts(), 5)
+        self.assertEqual(self._totals(SalesSource.POS)['revenue'], Decimal('80'))
+        self.assertEqual(
+            set(DailySalesFact.objects.filter(source=SalesSource.SALES_ORDER).values_list('pk', flat=True)),
+            so_rows,
+        )
+
+        self.sale.status = SaleStatus.VOID
+        self.sale.save(update_fields=['status', 'updated_at'])
+        refresh_sales_facts()
+        self.assertEqual(self._totals(SalesSource.POS)['revenue'], Decimal('40'))
+        self.assertFalse(DailySalesFact.objects.filter(source=SalesSource.POS, item=self.item_a).exists())
+
+    def test_full_rebuild_command(self):
+        refresh_sales_facts()
+        DailySalesFact.objects.filter(source=SalesSource.POS).delete()
+        out = StringIO()
+        call_command('refresh_sales_facts', stdout=out)
+        self.assertIn('0 fact rows written (incremental', out.getvalue())
+        call_command('refresh_sales_facts', full=True, stdout=out)
+        self.assertIn('(full,', out.getvalue())
+        self.assertEqual(self._totals(SalesSource.POS)['revenue'], Decimal('40'))
+
+    def test_report_queries_do_not_grow_with_sales(self):
+        self.client.force_login(self.user)
+
+        def count_queries():
+            self.setUp()
+            refresh_sales_facts(full=True)
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get('/reports/profit-margin/')
+                self.client.get('/reports/sales/')
+            return len(ctx.captured_queries)
+
+        before = count_queries()
+        for _ in range(10):
+            self._pos_sale([(self.item_a, '1', '8'), (self.item_b, '1', '20')])
+        self.assertEqual(count_queries(), before)
+
+    def test_reports_do_not_build_or_write_in_the_request(self):
+        from core.models import Job
+        from reports.models import ReportSyncState
+
+        self.client.force_login(self.user)
+        params = {'date_from': (self.today - timedelta(days=1)).isoformat(), 'date_to': self.today.isoformat()}
+        formulas = self.client.get('/reports/sales/', params).context['formulas']
+        self.assertEqual((formulas['pos_revenue'], formulas['so_revenue']), (Decimal('40'), Decimal('0')))
+        self.assertEqual(
+            list(Job.objects.values_list('kind', 'params')), [('refresh_sales_facts', {'full': True})],
+        )
+        # Only the shown days were built; the full build is still due.
+        self.assertFalse(DailySalesFact.objects.filter(date__lt=self.today - timedelta(days=1)).exists())
+        self.assertFalse(ReportSyncState.objects.filter(watermark__isnull=False).exists())
+        context = self.client.get('/reports/profit-margin/', params).context
+        self.assertEqual(context['grand_revenue'], Decimal('44'))
+
+        refresh_sales_facts()
+        state = ReportSyncState.objects.get()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/reports/profit-margin/')
+        writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))]
+        self.assertEqual(writes, [])
+        self.assertEqual(ReportSyncState.objects.get().updated_at, state.updated_at)
@@ -0,0 +1,87 @@
+"""
+Tests for per-item stock totals (inventory/totals.py).
+
+Scenarios covered:
+  1. with_stock_totals sums on-hand and reserved across locations.
+  2. low_stock_items / inventory_valuation match the per-item definitions.
+  3. Dashboard and low-stock pages issue the same number of queries for
+     a small and a larger catalog.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from catalog.models import Category, Item, Unit
+from inventory.models import StockBalance
+from inventory.totals import inventory_valuation, low_stock_items, with_stock_totals
+from warehouses.models import Location, Warehouse
+
+User = get_user_model()
+
+
+class StockTotalsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('totals_u', 'totals@test.com', 'pass')
+        cls.category = Category.objects.create(code='TOT', name='Totals')
+        cls.unit = Unit.objects.create(name='Totals Piece', abbreviation='tpc')
+        warehouse = Warehouse.objects.create(code='TOT-WH', name='Totals WH')
+        cls.loc_a = Location.objects.create(warehouse=warehouse, code='TOT-A', name='A')
+        cls.loc_b = Location.objects.create(warehouse=warehouse, code='TOT-B', name='B')
+        cls.low = cls._item('TOT-LOW', reorder='10', cost='2', stock=('4', '3'))
+        cls.ok = cls._item('TOT-OK', reorder='10', cost='5', stock=('8', '8'))
+        cls.empty = cls._item('TOT-EMPTY', reorder='1', cost='7', stock=())
+        cls.no_reorder = cls._item('TOT-NONE', reorder='0', cost='1', stock=('-2',))
+
+    @classmethod
+    def _item(cls, code, reorder, cost, stock):
+        item = Item.objects.create(
+            code=code, name=code, item_type='FINISHED', category=cls.category,
+            default_unit=cls.unit, reorder_point=Decimal(reorder), cost_price=Decimal(cost),
+        )
+        for location, qty in zip((cls.loc_a, cls.loc_b), stock):
+            StockBalance.objects.create(
+                item=item, location=location, qty_on_hand=Decimal(qty), qty_reserved=Decimal('1'),
+            )
+        return item
+
+    def test_with_stock_totals(self):
+        items = with_stock_totals(Item.objects.filter(code__startswith='TOT-')).in_bulk()
+        self.assertEqual(items[self.low.pk].total_on_hand, Decimal('7'))
+        self.assertEqual(items[self.low.pk].total_reserved, Decimal('2'))
+        self.assertEqual(items[self.empty.pk].total_on_hand, Decimal('0'))
+        self.assertEqual(items[self.no_reorder.pk].total_on_hand, Decimal('-2'))
+
+    def test_low_stock_and_valuation(self):
+        self.assertEqual(
+            [item.code for item in low_stock_items()], ['TOT-EMPTY', 'TOT-LOW'],
+        )
+        # 7*2 + 16*5 + 0*7 - 2*1
+        self.assertEqual(inventory_valuation(), Decimal('92'))
+
+    def test_low_stock_api(self):
+        self.client.force_login(self.user)
+        rows = self.client.get('/api/reports/low-stock/').json()
+        low = next(row for row in rows if row['item_code'] == 'TOT-LOW')
+        self.assertEqual(Decimal(low['qty_on_hand']), Decimal('7'))
+        self.assertEqual(Decimal(low['deficit']), Decimal('3'))
+
+    def _queries(self, url):
+        cache.clear()  # dashboard widgets are cached
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_independent_of_catalog_size(self):
+        self.client.force_login(self.user)
+        urls = ('/dashboard/', '/reports/low-stock/', '/api/reports/low-stock/')
+        small = [self._queries(url) for url in urls]
+        for i in range(20):
+            self._item(f'TOT-EXTRA-{i:02d}', reorder='5', cost='1', stock=('1', '1'))
+        self.assertEqual([self._queries(url) for url in urls], small)
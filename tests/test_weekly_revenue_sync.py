@@ -0,0 +1,183 @@
+"""
+Tests for the incremental weekly sales revenue sync (cashflow/sync.py).
+
+Scenarios covered:
+  1. A run with nothing changed writes nothing and only probes for changes.
+  2. Editing a sale updates only its week's entry, in place.
+  3. Voiding the only sale of a week removes that week's entry.
+  4. A week still in progress at the last run is synced once it is over.
+  5. Incremental runs end up with the same entries as a full rebuild.
+  6. COGS recomputed by sync_invoice_cogs reaches the week's entry on the
+     next incremental run.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cashflow.models import CashFlowLog, CashFlowSyncState, CashFlowTransaction
+from cashflow.sync import WEEKLY_SALES_SYNC, _monday_of, _week_source_id, sync_weekly_sales_revenue
+from core.models import Invoice
+from pos.models import POSRegister, POSSale, POSShift, SaleStatus
+from warehouses.models import Location, Warehouse
+
+User = get_user_model()
+
+
+class WeeklyRevenueSyncTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('weekly_u', 'weekly@test.com', 'pass')
+        warehouse = Warehouse.objects.create(code='WK-WH', name='Weekly WH')
+        location = Location.objects.create(warehouse=warehouse, code='WK-A', name='A')
+        cls.register = POSRegister.objects.create(
+            name='WK-R1', warehouse=warehouse, default_location=location,
+        )
+        cls.shift = POSShift.objects.create(register=cls.register, opened_by=cls.user, opened_at=timezone.now())
+        this_monday = _monday_of(date.today())
+        cls.weeks = [this_monday - timedelta(weeks=n) for n in (3, 2, 1)]
+
+    def _sale(self, day, total, status=SaleStatus.POSTED):
+        return POSSale.objects.create(
+            sale_no=f'WK-{POSSale.objects.count() + 1:04d}',
+            register=self.register, shift=self.shift,
+            warehouse=self.register.warehouse, location=self.register.default_location,
+            status=status, grand_total=Decimal(total),
+            posted_at=datetime.combine(day, datetime.min.time().replace(hour=12), tzinfo=dt_timezone.utc),
+            posted_by=self.user, created_by=self.user,
+        )
+
+    def _age_documents(self):
+        """Make everything created so far look older than the last run."""
+        past = timezone.now() - timedelta(days=30)
+        POSSale.objects.update(updated_at=past)
+        CashFlowSyncState.objects.update(watermark=timezone.now())
+
+    def _amounts(self):
+        return dict(
+            CashFlowTransaction.objects.filter(source_type='WeeklySalesRevenue')
+            .values_list('source_id', 'amount')
+        )
+
+    def test_nothing_changed(self):
+        for day, total in zip(self.weeks, ('100', '200', '300')):
+            self._sale(day, total)
+        self.assertEqual(sync_weekly_sales_revenue(self.user), 3)
+        self._age_documents()
+        logs = CashFlowLog.objects.count()
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(sync_weekly_sales_revenue(self.user), 0)
+        if date.today().isoweekday() != 7:  # on Sundays the current week is due
+            # savepoint, state x2, four change probes, watermark, release
+            self.assertEqual(len(ctx.captured_queries), 9)
+        self.assertEqual(CashFlowLog.objects.count(), logs)
+        self.assertEqual(len(self._amounts()), 3)
+
+    def test_edit_updates_only_its_week(self):
+        sales = [self._sale(day, total) for day, total in zip(self.weeks, ('100', '200', '300'))]
+        sync_weekly_sales_revenue(self.user)
+        before = {
+            txn.source_id: txn for txn in CashFlowTransaction.objects.filter(source_type='WeeklySalesRevenue')
+        }
+        self._age_documents()
+
+        sales[1].grand_total = Decimal('250')
+        sales[1].save()
+        self.assertEqual(sync_weekly_sales_revenue(self.user), 1)
+
+        key = _week_source_id(self.weeks[1])
+        txn = CashFlowTransaction.objects.get(source_type='WeeklySalesRevenue', source_id=key)
+        self.assertEqual(txn.pk, before[key].pk)
+        self.assertEqual(txn.amount, Decimal('250.00'))
+        self.assertEqual(txn.transaction_number, before[key].transaction_number)
+        log = txn.logs.get(action='UPDATED')
+        self.assertEqual(log.old_values['amount'], '200.00')
+        for other in (self.weeks[0], self.weeks[2]):
+            self.assertFalse(
+                CashFlowTransaction.objects.get(source_id=_week_source_id(other)).logs.filter(action='UPDATED').exists()
+            )
+
+    def test_void_removes_week(self):
+        sale = self._sale(self.weeks[0], '80')
+        self._sale(self.weeks[1], '90')
+        sync_weekly_sales_revenue(self.user)
+        self._age_documents()
+
+        sale.status = SaleStatus.VOID
+        sale.save()
+        sync_weekly_sales_revenue(self.user)
+        self.assertEqual(self._amounts(), {_week_source_id(self.weeks[1]): Decimal('90.00')})
+
+    def test_week_in_progress_at_last_run(self):
+        self._sale(self.weeks[2], '40')
+        sync_weekly_sales_revenue(self.user)
+        CashFlowTransaction.objects.all().delete()
+        # Last run happened mid-way through that week, before it was over.
+        POSSale.objects.update(updated_at=timezone.now() - timedelta(days=30))
+        CashFlowSyncState.objects.update(
+            watermark=datetime.combine(self.weeks[2] + timedelta(days=2), datetime.min.time(), tzinfo=dt_timezone.utc),
+        )
+
+        self.assertEqual(sync_weekly_sales_revenue(self.user), 1)
+        self.assertEqual(self._amounts(), {_week_source_id(self.weeks[2]): Decimal('40.00')})
+
+    def test_incremental_matches_full_rebuild(self):
+        sales = [self._sale(day, total) for day, total in zip(self.weeks, ('10', '20', '30'))]
+        sync_weekly_sales_revenue(self.user)
+        self._age_documents()
+
+        sales[0].posted_at = sales[0].posted_at + timedelta(days=1)  # same week
+        sales[0].grand_total = Decimal('15')
+        sales[0].save()
+        self._sale(self.weeks[2], '5')
+        Invoice.objects.create(
+            invoice_number='WK-INV-1', date=self.weeks[2], pos_sale=sales[2],
+            grand_total=Decimal('30'), grand_total_cogs=Decimal('12'), created_by=self.user,
+        )
+        sync_weekly_sales_revenue(self.user)
+        incremental = self._amounts()
+        notes = CashFlowTransaction.objects.get(source_id=_week_source_id(self.weeks[2])).notes
+        self.assertIn('COGS: ₱12.00', notes)
+
+        call_command('sync_weekly_revenue', '--full', '--user', 'weekly_u', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self._amounts(), incremental)
+        self.assertEqual(incremental[_week_source_id(self.weeks[2])], Decimal('35.00'))
+        state = CashFlowSyncState.objects.get(name=WEEKLY_SALES_SYNC)
+        self.assertIsNotNone(state.last_full_sync_at)
+
+    def test_recomputed_cogs_reaches_incremental_sync(self):
+        from catalog.models import Category, Item, Unit
+        from pos.models import POSSaleLine
+
+        unit = Unit.objects.create(name='Weekly Piece', abbreviation='wkpc')
+        item = Item.objects.create(
+            code='WK-ITEM', name='Weekly item', category=Category.objects.create(code='WK', name='Weekly'),
+            default_unit=unit, cost_price=Decimal('4'),
+        )
+        sale = self._sale(self.weeks[1], '100')
+        POSSaleLine.objects.create(
+            sale=sale, item=item, location=self.register.default_location,
+            qty=Decimal('5'), unit=unit, unit_price=Decimal('20'), line_total=Decimal('100'),
+        )
+        invoice = Invoice.objects.create(
+            invoice_number='WK-INV-COGS', date=self.weeks[1], pos_sale=sale,
+            grand_total=Decimal('100'), grand_total_cogs=Decimal('12'), created_by=self.user,
+        )
+        sync_weekly_sales_revenue(self.user)
+        self.assertIn('COGS: ₱12.00', CashFlowTransaction.objects.get(source_id=_week_source_id(self.weeks[1])).notes)
+        self._age_documents()
+        Invoice.objects.update(updated_at=timezone.now() - timedelta(days=30))
+
+        call_command('sync_invoice_cogs', stdout=open('/dev/null', 'w'))
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.grand_total_cogs, Decimal('20.00'))
+        self.assertEqual(sync_weekly_sales_revenue(self.user), 1)
+        notes = CashFlowTransaction.objects.get(source_id=_week_source_id(self.weeks[1])).notes
+        self.assertIn('COGS: ₱20.00', notes)
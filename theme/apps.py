@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ThemeConfig(AppConfig):
     name = 'theme'
+
+    def ready(self):
+        import theme.signals  # noqa: F401 — dashboard cache invalidation
@@ -0,0 +1,360 @@
+"""
+Dashboard metrics layer.
+
+Every dashboard widget is a named provider: a function of the selected
+period that returns the context entries it renders.  Results are cached per
+(widget, period) in Django's cache framework with a per-widget TTL.
+
+Providers declare the data groups they read ('invoices', 'stock', ...).
+Each group has a generation stamp in the cache which is part of the cache
+key, so bumping a group (theme/signals.py does that when an invoice, stock
+document, expense ... is saved or deleted) makes every widget reading it
+recompute on the next request without enumerating keys.  Writes that bypass
+model signals (queryset.update / bulk_create) are bounded by the TTL.
+
+The cache alias is settings.DASHBOARD_CACHE (default 'default').  The
+default local-memory backend is per process; deployments with several
+workers should point it at a shared backend so invalidation reaches all of
+them.
+
+Each call reports per-widget timings ({'ms': ..., 'cached': ...}), logged
+at DEBUG on the 'theme.metrics' logger.
+"""
+import logging
+import time
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, DecimalField, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+PERIODS = ('today', 'week', 'month', 'year')
+
+Period = namedtuple('Period', ['name', 'start', 'end', 'now'])
+Provider = namedtuple('Provider', ['name', 'func', 'groups', 'ttl', 'periodic'])
+
+_providers = {}
+
+
+def provider(name, groups=(), ttl=DEFAULT_TTL, periodic=False):
+    """Register a dashboard widget.  *periodic* widgets are cached per period."""
+    def register(func):
+        _providers[name] = Provider(name, func, tuple(groups), ttl, periodic)
+        return func
+    return register
+
+
+def widget_names():
+    return list(_providers)
+
+
+def period_bounds(period, now=None):
+    """Period for 'today', 'week' (Mon-Sun), 'month' or 'year'; unknown values mean today."""
+    now = now or timezone.now()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        start = today_start - timedelta(days=now.weekday())
+        end = start + timedelta(days=7)
+    elif period == 'month':
+        start = today_start.replace(day=1)
+        if now.month == 12:
+            end = start.replace(year=now.year + 1, month=1)
+        else:
+            end = start.replace(month=now.month + 1)
+    elif period == 'year':
+        start = today_start.replace(month=1, day=1)
+        end = start.replace(year=now.year + 1)
+    else:
+        period = 'today'
+        start = today_start
+        end = today_start + timedelta(days=1)
+    return Period(period, start, end, now)
+
+
+def _cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE', 'default')]
+
+
+def _generation_key(group):
+    return f'dashboard:gen:{group}'
+
+
+def invalidate(*groups):
+    """Make every widget reading one of *groups* recompute on its next request."""
+    stamp = time.time_ns()
+    _cache().set_many({_generation_key(group): stamp for group in groups}, timeout=None)
+
+
+def _cache_key(prov, period, generations):
+    scope = period.name if prov.periodic else '-'
+    stamps = '.'.join(str(generations.get(_generation_key(g), 0)) for g in prov.groups)
+    return f'dashboard:{prov.name}:{scope}:{stamps}'
+
+
+def get_widgets(names=None, period='today', now=None):
+    """
+    Compute (or read from cache) the given widgets, all by default.
+
+    Returns (data, timings): data maps widget name to its context dict,
+    timings maps widget name to {'ms': float, 'cached': bool}.
+    """
+    period = period if isinstance(period, Period) else period_bounds(period, now)
+    names = list(names) if names is not None else widget_names()
+    unknown = [name for name in names if name not in _providers]
+    if unknown:
+        raise KeyError(f"Unknown dashboard widget(s): {', '.join(unknown)}")
+
+    cache = _cache()
+    provs = [_providers[name] for name in names]
+    groups = {g for prov in provs for g in prov.groups}
+    generations = cache.get_many([_generation_key(g) for g in groups])
+    keys = {prov.name: _cache_key(prov, period, generations) for prov in provs}
+    cached = cache.get_many(keys.values())
+
+    data, timings = {}, {}
+    for prov in provs:
+        start = time.perf_counter()
+        key = keys[prov.name]
+        hit = key in cached
+        if hit:
+            data[prov.name] = cached[key]
+        else:
+            data[prov.name] = prov.func(period)
+            cache.set(key, data[prov.name], prov.ttl)
+        ms = (time.perf_counter() - start) * 1000
+        timings[prov.name] = {'ms': round(ms, 2), 'cached': hit}
+        logger.debug('dashboard widget %s (%s): %.1f ms%s', prov.name, period.name, ms, ' [cached]' if hit else '')
+    return data, timings
+
+
+def server_timing(timings):
+    """Server-Timing header value for *timings* (visible in browser dev tools)."""
+    return ', '.join(
+        f"{name};dur={t['ms']};desc=\"{'cached' if t['cached'] else 'computed'}\""
+        for name, t in timings.items()
+    )
+
+
+def _money(qs, field):
+    return qs.aggregate(
+        total=Coalesce(Sum(field), Decimal('0'), output_field=DecimalField())
+    )['total']
+
+
+# ── Providers ─────────────────────────────────────────────────────────────
+
+@provider('revenue', groups=('invoices',), ttl=120, periodic=True)
+def revenue_widget(period):
+    """Revenue and COGS from paid invoices, by paid_date."""
+    from core.cogs import bulk_invoice_cogs
+    from core.models import Invoice
+
+    invoices = Invoice.objects.filter(
+        is_paid=True, is_void=False, paid_date__isnull=False,
+        paid_date__gte=period.start.date(),
+        paid_date__lt=period.end.date(),
+    )
+    rows = list(invoices)
+    revenue = sum((inv.grand_total for inv in rows), Decimal('0'))
+    discount = sum((inv.discount_total for inv in rows), Decimal('0'))
+    cogs = sum(bulk_invoice_cogs(rows).values(), Decimal('0'))
+    return {
+        'inv_revenue': revenue,
+        'inv_discount': discount,
+        'inv_cogs': cogs,
+        'inv_count': len(rows),
+    }
+
+
+@provider('expenses', groups=('expenses',), ttl=300, periodic=True)
+def expenses_widget(period):
+    from core.models import Expense
+
+    expenses = Expense.objects.filter(
+        date__gte=period.start.date(),
+        date__lt=period.end.date(),
+    )
+    by_category = list(
+        expenses.values('category__name').annotate(
+            total=Coalesce(Sum('amount'), Decimal('0'), output_field=DecimalField())
+        ).order_by('-total')[:5]
+    )
+    return {
+        'total_expenses': _money(expenses, 'amount'),
+        'exp_cat_labels': [r['category__name'] for r in by_category],
+        'exp_cat_data': [float(r['total']) for r in by_category],
+    }
+
+
+@provider('pos_sales', groups=('pos',), ttl=120, periodic=True)
+def pos_sales_widget(period):
+    """POS sales count, channel breakdown and top items (non-revenue widgets)."""
+    from pos.models import POSSale, POSSaleLine, SaleStatus
+
+    sales = POSSale.objects.filter(
+        status__in=[SaleStatus.POSTED, SaleStatus.PAID],
+        created_at__gte=period.start,
+        created_at__lt=period.end,
+    )
+    channel_breakdown = list(
+        sales.values('channel__name').annotate(
+            total=Coalesce(Sum('grand_total'), Decimal('0'), output_field=DecimalField()),
+            count=Count('id'),
+        ).order_by('-total')
+    )
+    top_items = list(
+        POSSaleLine.objects.filter(sale__in=sales).values(
+            'item__code', 'item__name'
+        ).annotate(
+            total_qty=Sum('qty'),
+            total_revenue=Sum('line_total'),
+        ).order_by('-total_revenue')[:5]
+    )
+    return {
+        'pos_count': sales.count(),
+        'channel_breakdown': channel_breakdown,
+        'ch_labels': [r['channel__name'] or 'No Channel' for r in channel_breakdown],
+        'ch_data': [float(r['total']) for r in channel_breakdown],
+        'top_items': top_items,
+    }
+
+
+@provider('revenue_trend', groups=('invoices',), ttl=300)
+def revenue_trend_widget(period):
+    """Paid-invoice revenue for the last 7 days (one grouped query)."""
+    from core.models import Invoice
+
+    days = [(period.now - timedelta(days=i)).date() for i in range(6, -1, -1)]
+    totals = dict(
+        Invoice.objects.filter(
+            is_paid=True, is_void=False, paid_date__gte=days[0], paid_date__lte=days[-1],
+        ).order_by().values('paid_date').annotate(
+            total=Coalesce(Sum('grand_total'), Decimal('0'), output_field=DecimalField())
+        ).values_list('paid_date', 'total')
+    )
+    return {
+        'revenue_trend': [
+            {'date': day.strftime('%b %d'), 'revenue': float(totals.get(day, 0))}
+            for day in days
+        ],
+    }
+
+
+@provider('inventory', groups=('stock',), ttl=300)
+def inventory_widget(period):
+    """Item count, low-stock count, reorder suggestions and valuation."""
+    from catalog.models import Item
+    from inventory.totals import inventory_valuation, low_stock_items
+
+    reorder_items = []
+    for item in low_stock_items():
+        target_stock = getattr(item, 'maximum_stock', None)
+        if target_stock is None:
+            target_stock = item.reorder_point * 2
+        reorder_items.append({
+            'item': item,
+            'on_hand': item.total_on_hand,
+            'reorder_point': item.reorder_point,
+            'suggested_qty': max(0, target_stock - item.total_on_hand),
+        })
+    return {
+        'total_items': Item.objects.filter(is_active=True).count(),
+        'low_stock_count': len(reorder_items),
+        'reorder_items': reorder_items,
+        'inventory_valuation': inventory_valuation(),
+    }
+
+
+@provider('stock_activity', groups=('stock',), ttl=60)
+def stock_activity_widget(period):
+    from inventory.models import StockMove
+
+    thirty_days_ago = period.now - timedelta(days=30)
+    recent_moves = StockMove.objects.filter(
+        status='POSTED', posted_at__gte=thirty_days_ago
+    ).values('move_type').annotate(count=Count('id')).order_by('move_type')
+    latest = StockMove.objects.filter(status='POSTED').select_related('item', 'created_by')[:10]
+    return {
+        'recent_moves': list(recent_moves),
+        'latest_transactions': list(latest),
+    }
+
+
+@provider('pending', groups=('documents',), ttl=120)
+def pending_widget(period):
+    """Draft documents awaiting approval."""
+    from procurement.models import GoodsReceipt, PurchaseOrder
+    from sales.models import DeliveryNote, SalesOrder
+
+    pending_po = PurchaseOrder.objects.filter(status='DRAFT').count()
+    pending_so = SalesOrder.objects.filter(status='DRAFT').count()
+    pending_grn = GoodsReceipt.objects.filter(status='DRAFT').count()
+    pending_dn = DeliveryNote.objects.filter(status='DRAFT').count()
+    return {
+        'pending_grns': pending_grn,
+        'pending_deliveries': pending_dn,
+        'pending_po': pending_po,
+        'pending_so': pending_so,
+        'pending_grn_draft': pending_grn,
+        'pending_dn_draft': pending_dn,
+        'pending_approvals_total': pending_po + pending_so + pending_grn + pending_dn,
+    }
+
+
+@provider('unpaid_invoices', groups=('invoices',), ttl=120)
+def unpaid_invoices_widget(period):
+    from core.models import Invoice
+
+    unpaid = Invoice.objects.filter(is_paid=False)
+    agg = unpaid.aggregate(
+        count=Count('id'),
+        total=Coalesce(Sum('grand_total'), Decimal('0'), output_field=DecimalField()),
+    )
+    return {
+        'unpaid_invoices': list(unpaid.order_by('-date')[:5]),
+        'unpaid_invoice_count': agg['count'],
+        'unpaid_invoice_total': agg['total'],
+    }
+
+
+@provider('open_shifts', groups=('pos',), ttl=60)
+def open_shifts_widget(period):
+    from pos.models import POSShift, ShiftStatus
+
+    return {
+        'open_shifts': list(
+            POSShift.objects.filter(status=ShiftStatus.OPEN).select_related('register', 'opened_by')
+        ),
+    }
+
+
+@provider('goals', groups=('goals',), ttl=600)
+def goals_widget(period):
+    from core.models import TargetGoal
+
+    return {
+        'active_goals': list(
+            TargetGoal.objects.filter(
+                status__in=['PENDING', 'IN_PROGRESS']
+            ).order_by('-priority', 'due_date')[:5]
+        ),
+    }
+
+
+@provider('recent_docs', groups=('audit',), ttl=60)
+def recent_docs_widget(period):
+    """Recently posted documents (audit log feed)."""
+    from audit.models import AuditLog
+
+    return {
+        'recent_auto_docs': list(
+            AuditLog.objects.filter(action='POST').select_related('user').order_by('-timestamp')[:8]
+        ),
+    }
@@ -0,0 +1,46 @@
+"""
+Dashboard cache invalidation.
+
+Saving or deleting any of the models below bumps the matching dashboard
+data group (see theme.metrics) once the transaction commits.  Posting and
+cancelling documents always save the document header, so bulk-written
+stock moves and balances are covered through their document.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+GROUP_MODELS = {
+    'invoices': ['core.Invoice'],
+    'expenses': ['core.Expense', 'core.ExpenseCategory'],
+    'stock': [
+        'inventory.StockMove', 'inventory.StockBalance', 'catalog.Item',
+        'procurement.GoodsReceipt', 'sales.DeliveryNote',
+        'inventory.StockTransfer', 'inventory.StockAdjustment', 'inventory.DamagedReport',
+        'pos.POSSale', 'pos.POSRefund',
+    ],
+    'pos': ['pos.POSSale', 'pos.POSRefund', 'pos.POSShift'],
+    'documents': [
+        'procurement.PurchaseOrder', 'procurement.GoodsReceipt',
+        'sales.SalesOrder', 'sales.DeliveryNote',
+    ],
+    'goals': ['core.TargetGoal'],
+    'audit': ['audit.AuditLog'],
+}
+
+_groups_by_model = {}
+for _group, _models in GROUP_MODELS.items():
+    for _model in _models:
+        _groups_by_model.setdefault(_model, []).append(_group)
+
+
+def _handler(groups):
+    def invalidate_dashboard(sender, **kwargs):
+        from theme.metrics import invalidate
+        transaction.on_commit(lambda: invalidate(*groups))
+    return invalidate_dashboard
+
+
+for _model, _groups in _groups_by_model.items():
+    _receiver = _handler(tuple(_groups))
+    post_save.connect(_receiver, sender=_model, weak=False, dispatch_uid=f'dashboard-save-{_model}')
+    post_delete.connect(_receiver, sender=_model, weak=False, dispatch_uid=f'dashboard-delete-{_model}')